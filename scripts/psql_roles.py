@@ -0,0 +1,215 @@
+"""Provision the vd_dbo / vd_reader PostgreSQL roles in one transaction.
+
+Python replacement for create-psql-roles.ps1, which installs a psql client
+when it is missing and sends the statements through separate psql
+invocations. This provisioner opens one connection to the flexible server
+(psycopg 3) and does everything in a single transaction:
+
+1. take a transaction-scoped advisory lock (concurrent runs serialize)
+2. read the existing roles and role memberships in one catalog query
+3. apply only the missing CREATE ROLE / GRANT statements in one round trip
+
+A second run with nothing missing sends no DDL. Admin credentials come from
+Key Vault like the PowerShell script (psql-admin-username/-password), or
+pass --dsn to connect directly (e.g. a local PostgreSQL instance). Use
+--port 6432 to go through the flexible server's built-in PgBouncer.
+
+Parameters come from the same environment variables as the PowerShell
+script: SERVER_HOST, KV_NAME, UAMI_CLIENT_ID.
+
+Requires: pip install "psycopg[binary]"
+
+Usage:
+    python scripts/psql_roles.py
+    python scripts/psql_roles.py --dry-run
+    python scripts/psql_roles.py --dsn postgresql://postgres@localhost/postgres --uami-client-id <client-id>
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Sequence, Set, Tuple
+
+ROLES = ('vd_dbo', 'vd_reader')
+# (role, member): the UAMI logs in with its client ID as the role name (Entra authentication)
+GRANTED_TO_UAMI = ('vd_dbo',)
+
+CONNECT_RETRIES = 30
+CONNECT_DELAY = 10
+# Serializes concurrent provisioners on the same server
+LOCK_KEY = 'vd-psql-roles'
+
+CATALOG_QUERY = """
+SELECT r.rolname,
+       ARRAY(SELECT g.rolname
+             FROM pg_auth_members m JOIN pg_roles g ON g.oid = m.roleid
+             WHERE m.member = r.oid) AS member_of
+FROM pg_roles r
+WHERE r.rolname = ANY(%s)
+"""
+
+
+def quote_ident(name: str) -> str:
+    """SQL identifier quoting (doubles embedded quotes)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+@dataclass
+class CatalogState:
+    """Roles that exist and role memberships, as (role, member) pairs."""
+    roles: Set[str] = field(default_factory=set)
+    memberships: Set[Tuple[str, str]] = field(default_factory=set)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> 'CatalogState':
+        state = cls()
+        for rolname, member_of in rows:
+            state.roles.add(rolname)
+            state.memberships.update((role, rolname) for role in member_of or [])
+        return state
+
+
+def plan(state: CatalogState, roles: Sequence[str], grants: Sequence[Tuple[str, str]]) -> List[str]:
+    """Statements that bring the catalog to the desired roles and grants.
+
+    Args:
+        state: Current catalog state
+        roles: Roles that must exist
+        grants: (role, member) memberships that must exist
+
+    Returns:
+        CREATE ROLE statements for missing roles, then GRANT statements for
+        missing memberships (empty when nothing is missing)
+
+    Raises:
+        ValueError: If a grant's member role does not exist (the UAMI's Entra
+            role must be created by the server's Entra admin first)
+    """
+    statements = [f'CREATE ROLE {quote_ident(role)}' for role in roles if role not in state.roles]
+    for role, member in grants:
+        if member not in state.roles:
+            raise ValueError(f"Role '{member}' does not exist; it must be created before {role} can be granted")
+        if (role, member) not in state.memberships:
+            statements.append(f'GRANT {quote_ident(role)} TO {quote_ident(member)}')
+    return statements
+
+
+def desired_grants(uami_client_id: str) -> List[Tuple[str, str]]:
+    return [(role, uami_client_id) for role in GRANTED_TO_UAMI]
+
+
+def provision(conn, roles: Sequence[str], grants: Sequence[Tuple[str, str]], dry_run: bool = False) -> List[str]:
+    """Read the catalog and apply the missing roles and grants in one transaction.
+
+    Args:
+        conn: psycopg connection in autocommit mode (the transaction is explicit)
+        roles: Roles that must exist
+        grants: (role, member) memberships that must exist
+        dry_run: Only read the catalog
+
+    Returns:
+        The statements applied (or, with dry_run, that would be applied)
+    """
+    names = sorted(set(roles) | {member for _, member in grants})
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (LOCK_KEY,))
+            cur.execute(CATALOG_QUERY, (names,))
+            statements = plan(CatalogState.from_rows(cur.fetchall()), roles, grants)
+            if statements and not dry_run:
+                # No parameters, so all statements go to the server in one round trip
+                cur.execute('; '.join(statements))
+    return statements
+
+
+def get_admin_credentials(kv_name: str) -> Tuple[bool, Any]:
+    """Admin username and password from Key Vault.
+
+    Returns:
+        Tuple of (success, (username, password)) or (False, error message)
+    """
+    values = []
+    for secret in ('psql-admin-username', 'psql-admin-password'):
+        try:
+            result = subprocess.run(
+                ['az', 'keyvault', 'secret', 'show', '--vault-name', kv_name, '--name', secret,
+                 '--query', 'value', '-o', 'tsv'],
+                capture_output=True, text=True, check=True
+            )
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr or str(e)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+        if not result.stdout.strip():
+            return False, f"Secret {secret} is empty in Key Vault {kv_name}"
+        values.append(result.stdout.strip())
+    return True, tuple(values)
+
+
+def connect(retries: int = CONNECT_RETRIES, delay: float = CONNECT_DELAY, **conninfo: Any):
+    """Open an autocommit psycopg connection, retrying while the server is not ready.
+
+    Raises:
+        psycopg.OperationalError: If the server is still unreachable after all retries
+    """
+    import psycopg
+    for attempt in range(1, retries + 1):
+        try:
+            return psycopg.connect(autocommit=True, connect_timeout=10, **conninfo)
+        except psycopg.OperationalError:
+            if attempt == retries:
+                raise
+            print(f"Waiting for PostgreSQL server... (attempt {attempt}/{retries})")
+            time.sleep(delay)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server-host', default=os.getenv('SERVER_HOST'), help='default: $SERVER_HOST')
+    parser.add_argument('--kv-name', default=os.getenv('KV_NAME'), help='default: $KV_NAME')
+    parser.add_argument('--uami-client-id', default=os.getenv('UAMI_CLIENT_ID'), help='default: $UAMI_CLIENT_ID')
+    parser.add_argument('--port', type=int, default=5432, help='5432, or 6432 for the built-in PgBouncer')
+    parser.add_argument('--dsn', help='connect with this DSN instead of Key Vault credentials')
+    parser.add_argument('--dry-run', action='store_true', help='show the missing statements without applying them')
+    args = parser.parse_args(argv)
+
+    try:
+        import psycopg
+    except ImportError:
+        print('ERROR psycopg is required: pip install "psycopg[binary]"')
+        return 1
+    if not args.uami_client_id:
+        print("ERROR UAMI_CLIENT_ID is required")
+        return 1
+    if args.dsn:
+        conninfo = {'conninfo': args.dsn}
+    else:
+        missing = [env for env, value in (('SERVER_HOST', args.server_host), ('KV_NAME', args.kv_name)) if not value]
+        if missing:
+            print(f"ERROR {', '.join(missing)} is required (or pass --dsn)")
+            return 1
+        success, credentials = get_admin_credentials(args.kv_name)
+        if not success:
+            print(f"ERROR retrieving admin credentials: {credentials}")
+            return 1
+        user, password = credentials
+        conninfo = {'host': args.server_host, 'port': args.port, 'user': user, 'password': password,
+                    'dbname': 'postgres', 'sslmode': 'require'}
+
+    try:
+        with connect(**conninfo) as conn:
+            statements = provision(conn, ROLES, desired_grants(args.uami_client_id), args.dry_run)
+    except (ValueError, psycopg.Error) as e:
+        print(f"ERROR {e}")
+        return 1
+    for statement in statements:
+        print(f"{'WOULD RUN' if args.dry_run else 'APPLIED'} {statement}")
+    if not statements:
+        print("Roles and grants already in place")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,340 @@
+"""Reconcile RBAC role assignments for the UAMI and the customer admin.
+
+Python replacement for assign-rbac-roles-uami.ps1 and
+assign-rbac-roles-admin.ps1. The PowerShell scripts run one
+`az role assignment list` and one `az role assignment create` per role, one
+after another. This reconciler:
+
+1. builds the desired assignments, with the same deterministic names as the
+   PowerShell scripts (so assignments they created are recognized)
+2. lists the existing assignments once per scope (scopes in parallel)
+3. diffs desired against actual: an assignment is present if its name exists
+   at the scope, or the same principal already holds the role there
+4. creates only the missing ones, with at most --workers concurrent calls
+
+Parameters come from the same environment variables as the PowerShell
+scripts (RESOURCE_GROUP_ID, UAMI_PRINCIPAL_ID, KV_ID, ...) or from flags.
+
+Usage:
+    python scripts/rbac_reconcile.py uami --dry-run
+    python scripts/rbac_reconcile.py admin --workers 8
+    python scripts/rbac_reconcile.py uami --state-file assignments.json   # local stand-in for ARM
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_WORKERS = 4
+
+ROLE_DEFINITIONS = {
+    'Contributor': 'b24988ac-6180-42a0-ab88-20f7382dd24c',
+    'Reader': 'acdd72a7-3385-48ef-bd42-f606fba81ae7',
+    'LogAnalyticsContributor': '73c42c96-874c-492b-b04d-ab87d138a893',
+    'KeyVaultSecretsOfficer': 'b86a8fe4-44ce-4948-aee5-eccb2c155cd7',
+    'KeyVaultSecretsUser': '4633458b-17de-408a-b874-0445c86b69e6',
+    'StorageBlobDataContributor': 'ba92f5b4-2d11-453d-a403-e96b0029c9fe',
+    'StorageQueueDataContributor': '974c5e8b-45b9-4653-ba55-5f855dd0fb88',
+    'StorageTableDataContributor': '0a9a7e1f-b9d0-4cc4-a60d-0319b160aaa3',
+    'StorageBlobDataReader': '2a2b9908-6ea1-4ae2-8e65-a410df84e7d1',
+    'StorageQueueDataReader': '19e7f393-937e-4f77-808e-945a386e9b0a',
+    'StorageTableDataReader': '76199698-9eea-4c19-bc75-cec21354c015',
+    'AcrPull': '7f951dda-4ed3-4680-a7ca-43fe172d538d',
+    'AcrPush': '8311e382-0749-4cb8-b61a-304f252e45ec',
+    'SearchServiceContributor': 'de139f84-1756-47ae-9be6-808fbbe84772',
+    'SearchServiceReader': '88308d66-4209-4f3e-9b77-8200b49e9c22',
+    'CognitiveServicesContributor': 'a97b65f3-24c7-4388-baec-2e87135dc908',
+    # assign-rbac-roles-admin.ps1 uses this definition ID for "CognitiveServicesUser"
+    'CognitiveServicesUser': 'a97b65f3-24c7-4388-baec-2e87135dc908',
+    'AutomationJobOperator': '4fe576fe-1146-4730-92eb-48519fa6bf9f',
+}
+
+# (parameter, role, name suffix) per profile, in the PowerShell scripts' order.
+# The UAMI's resource group and LAW assignment names are seeded with the UAMI
+# resource ID, all others with its principal ID (as in the PowerShell script).
+UAMI_ROLES = [
+    ('resource_group_id', 'Contributor', 'Contributor'),
+    ('law_id', 'LogAnalyticsContributor', 'LAW-Contrib'),
+    ('kv_id', 'KeyVaultSecretsOfficer', 'kv-secret-officer'),
+    ('storage_id', 'StorageBlobDataContributor', 'st-blob-data-contrib'),
+    ('storage_id', 'StorageQueueDataContributor', 'st-queue-data-contrib'),
+    ('storage_id', 'StorageTableDataContributor', 'st-table-data-contrib'),
+    ('acr_id', 'AcrPull', 'acr-pull'),
+    ('acr_id', 'AcrPush', 'acr-push'),
+    ('search_id', 'SearchServiceContributor', 'search-contrib'),
+    ('ai_id', 'CognitiveServicesContributor', 'ai-contrib'),
+    ('automation_id', 'AutomationJobOperator', 'automation-job-operator'),
+]
+UAMI_ID_SEEDED = {'Contributor', 'LAW-Contrib'}
+
+ADMIN_ROLES = [
+    ('resource_group_id', 'Reader', 'Reader'),
+    ('kv_id', 'KeyVaultSecretsUser', 'kv-secrets-user'),
+    ('storage_id', 'StorageBlobDataReader', 'st-blob-reader'),
+    ('storage_id', 'StorageQueueDataReader', 'st-queue-reader'),
+    ('storage_id', 'StorageTableDataReader', 'st-table-reader'),
+    ('acr_id', 'AcrPull', 'acr-pull'),
+    ('search_id', 'SearchServiceReader', 'search-reader'),
+    ('ai_id', 'CognitiveServicesUser', 'ai-user'),
+    ('automation_id', 'AutomationJobOperator', 'automation-job-operator'),
+]
+
+# Flag / environment variable per parameter
+PARAMETERS = {
+    'resource_group_id': 'RESOURCE_GROUP_ID',
+    'uami_principal_id': 'UAMI_PRINCIPAL_ID',
+    'uami_id': 'UAMI_ID',
+    'customer_admin_object_id': 'CUSTOMER_ADMIN_OBJECT_ID',
+    'customer_admin_principal_type': 'CUSTOMER_ADMIN_PRINCIPAL_TYPE',
+    'law_id': 'LAW_ID',
+    'law_name': 'LAW_NAME',
+    'kv_id': 'KV_ID',
+    'storage_id': 'STORAGE_ID',
+    'acr_id': 'ACR_ID',
+    'search_id': 'SEARCH_ID',
+    'ai_id': 'AI_ID',
+    'automation_id': 'AUTOMATION_ID',
+}
+
+
+def deterministic_guid(scope: str, principal_id: str, suffix: str) -> str:
+    """Assignment name as generated by Get-DeterministicGuid in the PowerShell scripts.
+
+    MD5 of '<scope>-<principal>-<suffix>' with the version/variant bits set,
+    read in .NET System.Guid byte order (little-endian first three fields).
+    """
+    digest = bytearray(hashlib.md5(f'{scope}-{principal_id}-{suffix}'.encode('utf-8')).digest())
+    digest[6] = (digest[6] & 0x0F) | 0x40
+    digest[8] = (digest[8] & 0x3F) | 0x80
+    return str(uuid.UUID(bytes_le=bytes(digest)))
+
+
+def _role_guid(role_definition_id: str) -> str:
+    return role_definition_id.rstrip('/').rsplit('/', 1)[-1].lower()
+
+
+@dataclass(frozen=True)
+class Assignment:
+    """One role assignment: who gets which role where, and its deterministic name."""
+    scope: str
+    role: str
+    role_definition_id: str
+    principal_id: str
+    principal_type: str
+    name: str
+
+
+def desired_assignments(profile: str, params: Dict[str, Optional[str]]) -> List[Assignment]:
+    """Assignments the PowerShell script for profile would make, given its parameters.
+
+    Raises:
+        ValueError: If a required parameter is missing
+    """
+    if profile == 'uami':
+        required = ['resource_group_id', 'uami_principal_id', 'uami_id']
+        roles, principal, principal_type = UAMI_ROLES, params.get('uami_principal_id'), 'ServicePrincipal'
+    elif profile == 'admin':
+        required = ['resource_group_id', 'customer_admin_object_id']
+        roles, principal = ADMIN_ROLES, params.get('customer_admin_object_id')
+        principal_type = params.get('customer_admin_principal_type') or 'User'
+    else:
+        raise ValueError(f"Unknown profile '{profile}' (expected uami or admin)")
+    missing = [PARAMETERS[p] for p in required if not params.get(p)]
+    if missing:
+        raise ValueError(f"{', '.join(missing)} is required")
+
+    assignments = []
+    for parameter, role, suffix in roles:
+        scope = params.get(parameter)
+        if not scope or (parameter == 'law_id' and not params.get('law_name')):
+            continue
+        seed = params['uami_id'] if profile == 'uami' and suffix in UAMI_ID_SEEDED else principal
+        assignments.append(Assignment(
+            scope=scope,
+            role=role,
+            role_definition_id=ROLE_DEFINITIONS[role],
+            principal_id=principal,
+            principal_type=principal_type,
+            name=deterministic_guid(scope, seed, suffix),
+        ))
+    return assignments
+
+
+class AzRoleAssignments:
+    """Role assignments via the Azure CLI."""
+
+    def list_at_scope(self, scope: str) -> Tuple[bool, Any]:
+        """Assignments at exactly scope.
+
+        Returns:
+            Tuple of (success, list of assignments) or (False, error message)
+        """
+        try:
+            result = subprocess.run(['az', 'role', 'assignment', 'list', '--scope', scope, '--output', 'json'],
+                                    capture_output=True, text=True, check=True)
+            return True, json.loads(result.stdout or '[]')
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr or str(e)
+        except json.JSONDecodeError as e:
+            return False, f"Unparseable role assignment list: {e}"
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+
+    def create(self, assignment: Assignment) -> Tuple[bool, str]:
+        # --assignee-object-id with a principal type skips the Graph lookup --assignee needs
+        try:
+            subprocess.run([
+                'az', 'role', 'assignment', 'create',
+                '--scope', assignment.scope,
+                '--role', assignment.role_definition_id,
+                '--assignee-object-id', assignment.principal_id,
+                '--assignee-principal-type', assignment.principal_type,
+                '--name', assignment.name,
+                '--output', 'none'
+            ], capture_output=True, text=True, check=True)
+            return True, ''
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr or str(e)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+
+
+class LocalRoleAssignments:
+    """Local stand-in for ARM: assignments kept in a JSON file in `az role assignment list` format."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.assignments: List[Dict[str, Any]] = json.loads(self.path.read_text()) if self.path.exists() else []
+        self.calls = {'list': 0, 'create': 0}
+        self._lock = threading.Lock()
+
+    def list_at_scope(self, scope: str) -> Tuple[bool, Any]:
+        with self._lock:
+            self.calls['list'] += 1
+            return True, [a for a in self.assignments if a['scope'].lower() == scope.lower()]
+
+    def create(self, assignment: Assignment) -> Tuple[bool, str]:
+        with self._lock:
+            self.calls['create'] += 1
+            if any(a['name'] == assignment.name for a in self.assignments):
+                return False, f"(RoleAssignmentExists) The role assignment already exists: {assignment.name}"
+            self.assignments.append({
+                'name': assignment.name,
+                'scope': assignment.scope,
+                'principalId': assignment.principal_id,
+                'principalType': assignment.principal_type,
+                'roleDefinitionId': f'/providers/Microsoft.Authorization/roleDefinitions/{assignment.role_definition_id}',
+            })
+            self.path.write_text(json.dumps(self.assignments, indent=2) + '\n')
+            return True, ''
+
+
+@dataclass
+class ReconcileResult:
+    """Outcome of a reconcile run."""
+    present: List[Assignment] = field(default_factory=list)
+    created: List[Assignment] = field(default_factory=list)
+    missing: List[Assignment] = field(default_factory=list)
+    failed: List[Tuple[Assignment, str]] = field(default_factory=list)
+    list_errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return not self.failed and not self.list_errors
+
+
+def diff(desired: List[Assignment], existing: Dict[str, List[Dict[str, Any]]]) -> Tuple[List[Assignment], List[Assignment]]:
+    """Split desired assignments into (present, missing) given the existing ones per scope."""
+    present, missing = [], []
+    for assignment in desired:
+        at_scope = existing.get(assignment.scope, [])
+        names = {a.get('name', '').lower() for a in at_scope}
+        grants = {(a.get('principalId', '').lower(), _role_guid(a.get('roleDefinitionId', ''))) for a in at_scope}
+        if (assignment.name.lower() in names
+                or (assignment.principal_id.lower(), assignment.role_definition_id.lower()) in grants):
+            present.append(assignment)
+        else:
+            missing.append(assignment)
+    return present, missing
+
+
+def reconcile(desired: List[Assignment], backend, workers: int = DEFAULT_WORKERS, dry_run: bool = False) -> ReconcileResult:
+    """List each scope once, then create the missing assignments concurrently.
+
+    Args:
+        desired: Assignments that should exist
+        backend: AzRoleAssignments or LocalRoleAssignments
+        workers: Maximum concurrent az calls
+        dry_run: Only compute the diff
+
+    Returns:
+        ReconcileResult
+    """
+    result = ReconcileResult()
+    scopes = list(dict.fromkeys(a.scope for a in desired))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        existing: Dict[str, List[Dict[str, Any]]] = {}
+        for scope, (success, listed) in zip(scopes, pool.map(backend.list_at_scope, scopes)):
+            if success:
+                existing[scope] = listed
+            else:
+                result.list_errors[scope] = listed
+        # Never create blindly where the current state is unknown
+        known = [a for a in desired if a.scope in existing]
+        result.present, result.missing = diff(known, existing)
+        if dry_run:
+            return result
+        for assignment, (success, error) in zip(result.missing, pool.map(backend.create, result.missing)):
+            if success or 'RoleAssignmentExists' in error:
+                result.created.append(assignment)
+            else:
+                result.failed.append((assignment, error.strip()))
+    return result
+
+
+def format_result(result: ReconcileResult, dry_run: bool = False) -> List[str]:
+    lines = [f"PRESENT {a.role} on {a.scope}" for a in result.present]
+    if dry_run:
+        lines += [f"MISSING {a.role} on {a.scope} ({a.name})" for a in result.missing]
+    lines += [f"CREATED {a.role} on {a.scope} ({a.name})" for a in result.created]
+    lines += [f"FAILED {a.role} on {a.scope}: {error}" for a, error in result.failed]
+    lines += [f"ERROR listing {scope}: {error.strip()}" for scope, error in result.list_errors.items()]
+    lines.append(f"{len(result.present)} present, {len(result.missing)} missing, {len(result.created)} created, "
+                 f"{len(result.failed)} failed")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', choices=['uami', 'admin'], help='whose roles to reconcile')
+    for parameter, env in PARAMETERS.items():
+        parser.add_argument(f"--{parameter.replace('_', '-')}", dest=parameter, default=os.getenv(env),
+                            help=f'default: ${env}')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'concurrent az calls (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--dry-run', action='store_true', help='only show what is missing')
+    parser.add_argument('--state-file', type=Path, help='local JSON stand-in for ARM role assignments')
+    args = parser.parse_args(argv)
+
+    try:
+        desired = desired_assignments(args.profile, vars(args))
+    except ValueError as e:
+        print(f"ERROR {e}")
+        return 1
+    backend = LocalRoleAssignments(args.state_file) if args.state_file else AzRoleAssignments()
+    result = reconcile(desired, backend, args.workers, args.dry_run)
+    for line in format_result(result, args.dry_run):
+        print(line)
+    return 0 if result.success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+"""Benchmarks for the test harness hot paths.
+
+Runs entirely offline: `run_what_if` is timed end to end against a fake `az`
+on PATH serving a what-if payload shaped like a full main.bicep run.
+
+Usage:
+    python -m tests.benchmarks.bench_harness                 # run and update results.json
+    python -m tests.benchmarks.bench_harness --no-save       # run and compare only
+    python -m tests.benchmarks.bench_harness --copies 10     # 10x larger payload
+
+Results are written to tests/benchmarks/results.json so changes show up in
+review. Absolute timings depend on the machine, so every run also times a
+fixed reference workload (a JSON round trip and a pure-Python walk of the
+payload, no harness code) and each benchmark is stored relative to it.
+Benchmarks whose relative time is more than --threshold above the stored
+results are reported as regressions (exit code 1). The absolute numbers and
+the machine they came from are kept for reading only.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.benchmarks.what_if_payload import generate_what_if_payload, what_if_stdout
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.test_utils import (
+    extract_bicep_parameters,
+    extract_module_dependencies,
+    run_what_if,
+    strip_cli_warnings
+)
+from tests.unit.helpers.what_if_parser import (
+    _extract_resource_changes,
+    parse_what_if_output,
+    validate_no_deletions,
+    validate_no_unexpected_changes,
+    validate_resource_created
+)
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+MAIN_BICEP = REPO_ROOT / 'iac' / 'main.bicep'
+RESULTS_FILE = Path(__file__).parent / 'results.json'
+# Benchmark every other one is measured against (not harness code)
+REFERENCE = 'reference'
+
+
+def time_call(fn: Callable[[], Any], repeat: int, number: int) -> Dict[str, float]:
+    """Time fn over `repeat` rounds of `number` calls; return per-call seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'repeat': repeat,
+        'number': number
+    }
+
+
+def reference_workload(payload: Dict[str, Any]) -> int:
+    """Machine-speed yardstick: JSON round trip plus a pure-Python walk of the payload."""
+    stack = [json.loads(json.dumps(payload))]
+    nodes = 0
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return nodes
+
+
+def run_benchmarks(copies: int = 1, repeat: int = 5, scale: float = 1.0) -> Dict[str, Any]:
+    """Run all harness benchmarks.
+
+    Args:
+        copies: Size multiplier for the what-if payload (1 = one main.bicep run)
+        repeat: Timing rounds per benchmark
+        scale: Multiplier for calls per round (use < 1 for quick smoke runs)
+
+    Returns:
+        Dict with 'environment', 'payload' and 'benchmarks' sections; each
+        benchmark's 'relative' is its median over the reference median
+    """
+    payload = generate_what_if_payload(copies=copies)
+    raw_output = what_if_stdout(payload)
+    clean_output = strip_cli_warnings(raw_output)
+    parsed = parse_what_if_output(clean_output)
+    resource_changes = parsed['resource_changes']
+    main_bicep_text = MAIN_BICEP.read_text()
+
+    def n(count: int) -> int:
+        return max(1, int(count * scale))
+
+    benchmarks = {REFERENCE: time_call(lambda: reference_workload(payload), repeat, n(20))}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        (tmp_path / 'what-if.txt').write_text(raw_output)
+        install_fake_az(tmp_path / 'bin', [
+            {'argv': ['group', 'exists'], 'stdout': 'true\n'},
+            {'argv': ['ad', 'signed-in-user', 'show'], 'stdout': '11111111-1111-1111-1111-111111111111\n'},
+            {'argv': ['deployment', 'group', 'what-if'], 'stdout_file': str(tmp_path / 'what-if.txt')},
+        ])
+        original_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = prepend_path(tmp_path / 'bin')['PATH']
+        try:
+            benchmarks['run_what_if_end_to_end'] = time_call(
+                lambda: run_what_if(MAIN_BICEP), repeat, n(3))
+        finally:
+            os.environ['PATH'] = original_path
+
+    benchmarks['strip_cli_warnings'] = time_call(lambda: strip_cli_warnings(raw_output), repeat, n(50))
+    benchmarks['parse_what_if_output'] = time_call(lambda: parse_what_if_output(clean_output), repeat, n(20))
+    benchmarks['extract_resource_changes'] = time_call(
+        lambda: _extract_resource_changes(payload['changes']), repeat, n(500))
+    benchmarks['validate_resource_created'] = time_call(
+        lambda: validate_resource_created(resource_changes, 'Microsoft.Compute/virtualMachines', 'missing'), repeat, n(500))
+    benchmarks['validate_no_unexpected_changes'] = time_call(
+        lambda: validate_no_unexpected_changes(resource_changes, ['Microsoft.Network', 'Microsoft.KeyVault']), repeat, n(200))
+    benchmarks['validate_no_deletions'] = time_call(lambda: validate_no_deletions(resource_changes), repeat, n(500))
+    benchmarks['extract_bicep_parameters'] = time_call(lambda: extract_bicep_parameters(MAIN_BICEP), repeat, n(200))
+    benchmarks['extract_module_dependencies'] = time_call(
+        lambda: extract_module_dependencies(main_bicep_text), repeat, n(200))
+
+    reference = benchmarks[REFERENCE]['median']
+    for stats in benchmarks.values():
+        stats['relative'] = stats['median'] / reference
+
+    return {
+        'environment': {
+            'python': f"{platform.python_implementation()} {platform.python_version()}",
+            'platform': platform.platform(terse=True),
+            'machine': platform.machine(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count()
+        },
+        'payload': {
+            'copies': copies,
+            'resource_changes': len(resource_changes),
+            'bytes': len(raw_output)
+        },
+        'benchmarks': benchmarks
+    }
+
+
+def compare_results(previous: Dict[str, Any], current: Dict[str, Any], threshold: float) -> list[str]:
+    """Return benchmarks whose time relative to the reference grew by more than `threshold` (fraction).
+
+    Results without relative times (or of another payload size) are not comparable.
+    """
+    regressions = []
+    if previous.get('payload', {}).get('copies') != current['payload']['copies']:
+        return regressions
+    for name, stats in current['benchmarks'].items():
+        before = previous.get('benchmarks', {}).get(name)
+        if name == REFERENCE or not before or not before.get('relative'):
+            continue
+        ratio = stats['relative'] / before['relative']
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {before['relative']:.4g} -> {stats['relative']:.4g} x reference ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=1, help='payload size multiplier (default: 1)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per benchmark (default: 5)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='regression threshold (default: 0.25 = 25%%)')
+    parser.add_argument('--output', type=Path, default=RESULTS_FILE, help='results JSON file')
+    parser.add_argument('--no-save', action='store_true', help='do not overwrite the results file')
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(copies=args.copies, repeat=args.repeat)
+    print(f"Payload: {current['payload']['resource_changes']} resource changes, {current['payload']['bytes']:,} bytes")
+    for name, stats in current['benchmarks'].items():
+        print(f"  {name:<34} median {stats['median'] * 1e3:9.3f}ms  min {stats['min'] * 1e3:9.3f}ms"
+              f"  {stats['relative']:9.4g}x reference")
+
+    regressions = []
+    if args.output.exists():
+        regressions = compare_results(json.loads(args.output.read_text()), current, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+    if not args.no_save:
+        args.output.write_text(json.dumps(current, indent=2, sort_keys=True) + '\n')
+        print(f"Results written to {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Smoke tests for the harness benchmarks (no Azure CLI needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.benchmarks.bench_harness import compare_results, main, run_benchmarks
+from tests.benchmarks.what_if_payload import generate_what_if_payload, what_if_stdout
+from tests.unit.helpers.test_utils import strip_cli_warnings
+
+
+def test_strip_cli_warnings_recovers_payload():
+    payload = generate_what_if_payload()
+    assert json.loads(strip_cli_warnings(what_if_stdout(payload))) == payload
+
+
+def test_run_benchmarks_quick():
+    results = run_benchmarks(repeat=1, scale=0.01)
+    assert results['payload']['resource_changes'] > 100
+    assert set(results['benchmarks']) >= {
+        'run_what_if_end_to_end', 'strip_cli_warnings', 'parse_what_if_output',
+        'extract_resource_changes', 'validate_no_deletions', 'extract_bicep_parameters',
+        'extract_module_dependencies', 'reference'
+    }
+    assert results['benchmarks']['reference']['relative'] == 1.0
+    assert {'python', 'machine', 'cpu_count'} <= set(results['environment'])
+
+
+def test_compare_results_flags_regressions():
+    previous = {'payload': {'copies': 1}, 'benchmarks': {'a': {'relative': 1.0}, 'b': {'relative': 1.0}}}
+    current = {'payload': {'copies': 1}, 'benchmarks': {'a': {'relative': 1.1}, 'b': {'relative': 2.0}}}
+    regressions = compare_results(previous, current, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith('b:')
+    # Different payload sizes and results without relative times are not comparable
+    assert compare_results({**previous, 'payload': {'copies': 5}}, current, 0.25) == []
+    assert compare_results({'payload': {'copies': 1}, 'benchmarks': {'b': {'median': 1.0}}}, current, 0.25) == []
+
+
+def test_slower_machine_is_not_a_regression():
+    # Everything, the reference included, took twice as long: the relative times are unchanged
+    previous = {'payload': {'copies': 1}, 'benchmarks': {
+        'reference': {'median': 1.0, 'relative': 1.0}, 'a': {'median': 3.0, 'relative': 3.0}}}
+    current = {'payload': {'copies': 1}, 'benchmarks': {
+        'reference': {'median': 2.0, 'relative': 1.0}, 'a': {'median': 6.0, 'relative': 3.0}}}
+    assert compare_results(previous, current, threshold=0.25) == []
+
+
+def test_main_writes_results(tmp_path, monkeypatch):
+    monkeypatch.setattr('tests.benchmarks.bench_harness.run_benchmarks',
+                        lambda copies, repeat: {'payload': {'copies': copies, 'resource_changes': 1, 'bytes': 1},
+                                                'benchmarks': {'a': {'median': 1.0, 'min': 1.0, 'relative': 1.0}}})
+    output = tmp_path / 'results.json'
+    assert main(['--output', str(output)]) == 0
+    assert json.loads(output.read_text())['benchmarks']['a']['median'] == 1.0
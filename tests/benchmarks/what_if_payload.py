@@ -0,0 +1,146 @@
+"""Deterministic what-if payloads shaped like a full main.bicep run.
+
+Generates the resource mix the 18 main.bicep modules produce (VNet, NSGs,
+private endpoints and DNS zone groups, diagnostic settings, role assignments,
+data services, gateway, VM, ...) with FullResourcePayloads-style 'after'
+bodies and nested Modify deltas, so the harness can be benchmarked without
+Azure.
+"""
+import json
+import random
+from typing import Any, Dict, List
+
+SUBSCRIPTION_ID = '00000000-0000-0000-0000-000000000000'
+
+# (resource type, count) for one main.bicep deployment
+RESOURCE_MIX = [
+    ('Microsoft.ManagedIdentity/userAssignedIdentities', 1),
+    ('Microsoft.OperationalInsights/workspaces', 1),
+    ('Microsoft.OperationalInsights/workspaces/tables', 4),
+    ('Microsoft.Network/virtualNetworks', 1),
+    ('Microsoft.Network/virtualNetworks/subnets', 6),
+    ('Microsoft.Network/networkSecurityGroups', 4),
+    ('Microsoft.Network/privateDnsZones', 8),
+    ('Microsoft.Network/privateDnsZones/virtualNetworkLinks', 8),
+    ('Microsoft.KeyVault/vaults', 1),
+    ('Microsoft.KeyVault/vaults/secrets', 4),
+    ('Microsoft.Storage/storageAccounts', 1),
+    ('Microsoft.Storage/storageAccounts/blobServices/containers', 2),
+    ('Microsoft.Storage/storageAccounts/queueServices/queues', 2),
+    ('Microsoft.Storage/storageAccounts/tableServices/tables', 2),
+    ('Microsoft.ContainerRegistry/registries', 1),
+    ('Microsoft.DBforPostgreSQL/flexibleServers', 1),
+    ('Microsoft.Web/serverfarms', 1),
+    ('Microsoft.Network/publicIPAddresses', 2),
+    ('Microsoft.Network/ApplicationGatewayWebApplicationFirewallPolicies', 1),
+    ('Microsoft.Network/applicationGateways', 1),
+    ('Microsoft.Search/searchServices', 1),
+    ('Microsoft.CognitiveServices/accounts', 1),
+    ('Microsoft.Automation/automationAccounts', 1),
+    ('Microsoft.Network/bastionHosts', 1),
+    ('Microsoft.Network/networkInterfaces', 1),
+    ('Microsoft.Compute/virtualMachines', 1),
+    ('Microsoft.Network/privateEndpoints', 8),
+    ('Microsoft.Network/privateEndpoints/privateDnsZoneGroups', 8),
+    ('Microsoft.Insights/diagnosticSettings', 8),
+    ('Microsoft.Authorization/roleAssignments', 24),
+]
+
+
+def _resource_id(resource_group: str, resource_type: str, index: int) -> str:
+    namespace, *types = resource_type.split('/')
+    name_parts = []
+    for depth, type_name in enumerate(types):
+        name_parts.append(f'{type_name}/vd-{type_name.lower()[:8]}-{index:02d}-{depth}')
+    return f'/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/{resource_group}/providers/{namespace}/' + '/'.join(name_parts)
+
+
+def _properties(rng: random.Random, depth: int = 0) -> Dict[str, Any]:
+    props: Dict[str, Any] = {}
+    for i in range(rng.randint(6, 12) if depth == 0 else rng.randint(2, 5)):
+        kind = rng.random()
+        key = f'setting{i}'
+        if kind < 0.35 and depth < 3:
+            props[key] = _properties(rng, depth + 1)
+        elif kind < 0.5:
+            props[key] = [f'10.20.{rng.randint(0, 255)}.0/24' for _ in range(rng.randint(1, 4))]
+        elif kind < 0.7:
+            props[key] = rng.choice(['Enabled', 'Disabled', 'Allow', 'Deny', 'Standard', 'Premium'])
+        elif kind < 0.85:
+            props[key] = rng.randint(0, 10000)
+        else:
+            props[key] = rng.random() < 0.5
+    props['networkAcls'] = {'defaultAction': 'Deny', 'bypass': 'AzureServices', 'ipRules': []}
+    return props
+
+
+def _delta(rng: random.Random) -> List[Dict[str, Any]]:
+    leaves = [
+        {'path': 'defaultAction', 'propertyChangeType': 'Modify', 'before': 'Allow', 'after': 'Deny'},
+        {'path': 'bypass', 'propertyChangeType': 'NoEffect', 'before': 'AzureServices'},
+    ]
+    delta = [{
+        'path': 'properties',
+        'propertyChangeType': 'Modify',
+        'children': [{'path': 'networkAcls', 'propertyChangeType': 'Modify', 'children': leaves}]
+    }]
+    if rng.random() < 0.5:
+        delta.append({'path': 'tags.created', 'propertyChangeType': 'Modify', 'before': '2026-01-01', 'after': '2026-01-02'})
+    return delta
+
+
+def generate_what_if_payload(
+    resource_group: str = 'test-rg',
+    location: str = 'southeastasia',
+    copies: int = 1,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """Build a what-if response dict.
+
+    Args:
+        resource_group: Resource group name used in resource IDs
+        location: Location written to every 'after' payload
+        copies: Repeat the main.bicep resource mix this many times
+        seed: Random seed (payloads are deterministic per seed)
+
+    Returns:
+        Dict shaped like `az deployment group what-if --output json` output
+    """
+    rng = random.Random(seed)
+    change_types = ['Create'] * 6 + ['Modify'] * 3 + ['NoChange'] * 2 + ['Delete']
+    changes = []
+    for copy_index in range(copies):
+        for resource_type, count in RESOURCE_MIX:
+            for i in range(count):
+                resource_id = _resource_id(resource_group, resource_type, copy_index * 100 + i)
+                change_type = rng.choice(change_types)
+                after = {
+                    'id': resource_id,
+                    'name': resource_id.rsplit('/', 1)[-1],
+                    'type': resource_type,
+                    'location': location,
+                    'tags': {'environment': 'dev', 'owner': 'ci', 'purpose': 'ephemeral', 'managedBy': 'bicep-iac'},
+                    'properties': _properties(rng)
+                }
+                change = {'resourceId': resource_id, 'changeType': change_type}
+                if change_type != 'Delete':
+                    change['after'] = after
+                if change_type in ('Modify', 'NoChange', 'Delete'):
+                    change['before'] = after
+                if change_type == 'Modify':
+                    change['delta'] = _delta(rng)
+                changes.append(change)
+    return {'status': 'Succeeded', 'changes': changes, 'error': None}
+
+
+def what_if_stdout(payload: Dict[str, Any]) -> str:
+    """Render a payload the way az prints it, including leading WARNING blocks."""
+    warnings = (
+        'WARNING: A new Bicep release is available: v0.99.0. Upgrade now by running "az bicep upgrade".\n'
+        '\n'
+        'WARNING: The underlying Active Directory Graph API will be replaced by Microsoft Graph API.\n'
+        'This warning spans several lines\n'
+        'until the next blank line.\n'
+        '\n'
+    )
+    return warnings + json.dumps(payload)
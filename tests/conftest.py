@@ -0,0 +1,120 @@
+"""Shared pytest configuration for the test harness."""
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from tests.unit.helpers.az_cassette import record_session, use_cassette
+from tests.unit.helpers.durations import DurationDB, order_module_items, what_if_prediction
+from tests.unit.helpers.result_broker import get_session_id, remove_session_dir
+from tests.unit.helpers.rg_pool import end_session_lease, start_session_lease
+from tests.unit.helpers.sku_index import blocked_modules, preflight, requested_skus
+from tests.unit.helpers.test_utils import (
+    SHARED_PARAMS_FILE,
+    get_location_from_shared_params,
+    get_subscription_id_from_shared_params
+)
+from tests.unit.helpers.tracing import flush, span
+
+# Check the compute SKUs against the region's cached SKU index before any what-if runs
+SKU_PREFLIGHT = os.getenv('SKU_PREFLIGHT', 'false').lower() == 'true'
+# Lease each worker its own resource group from a pool of this many (see rg_pool.py)
+RG_POOL = int(os.getenv('RG_POOL', '0') or 0)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def rg_pool_lease():
+    """Exclusive pool resource group for this worker's what-ifs (RG_POOL=<N>)."""
+    if not RG_POOL:
+        yield None
+        return
+    lease = start_session_lease(RG_POOL)
+    try:
+        yield lease
+    finally:
+        end_session_lease()
+
+
+@pytest.fixture(autouse=True)
+def az_cassette(request):
+    """Record/replay az calls into one cassette per test file (see AZ_CASSETTE_MODE)."""
+    use_cassette(Path(str(request.node.fspath)).stem)
+    yield
+    use_cassette('default')
+
+
+@pytest.fixture(autouse=True)
+def trace_test(request):
+    """One trace span per test (see HARNESS_TRACE in tests/unit/helpers/tracing.py)."""
+    with span(request.node.nodeid, cat='test'):
+        yield
+
+
+# xdist run IDs seen by the controller (workers share one broker session per run)
+_xdist_sessions = set()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    _xdist_sessions.add(node.workerinput['testrunuid'])
+
+
+def pytest_sessionfinish(session):
+    flush()
+    # Controller only: workers still running would lose the shared results
+    if not hasattr(session.config, 'workerinput'):
+        for session_id in {get_session_id(), *_xdist_sessions}:
+            remove_session_dir(session_id)
+
+
+def _worker_count(config) -> int:
+    workers = getattr(config.option, 'numprocesses', None)
+    if workers in ('auto', 'logical'):
+        return os.cpu_count() or 1
+    return int(workers or 1)
+
+
+def pytest_configure(config):
+    # Snapshot duration history before pytest-xdist starts workers, so every
+    # worker collects the tests in the same order
+    DurationDB.shared()
+    # One record session for the run and its workers: re-recording replaces old cassettes
+    record_session()
+
+
+def pytest_report_header(config):
+    """Predicted what-if completion time from recorded durations (see durations.py)."""
+    return what_if_prediction(DurationDB.shared(), get_location_from_shared_params(), _worker_count(config))
+
+
+def _sku_preflight(items) -> None:
+    """Skip what-if tests of modules whose SKU is not available in the region (SKU_PREFLIGHT=true)."""
+    try:
+        subscription = get_subscription_id_from_shared_params()
+    except ValueError:
+        subscription = ''
+    params = json.loads(SHARED_PARAMS_FILE.read_text()).get('parameters', {})
+    success, checks = preflight(requested_skus(params), subscription, get_location_from_shared_params())
+    if not success:
+        # No index (e.g. not logged in): the what-ifs report the problem themselves
+        return
+    blocked = blocked_modules(checks)
+    for item in items:
+        module = getattr(getattr(item, 'callspec', None), 'params', {}).get('module_name')
+        if module in blocked and 'cached_what_if_output' in item.fixturenames:
+            item.add_marker(pytest.mark.skip(reason=f"SKU pre-flight: {blocked[module]}"))
+
+
+def pytest_collection_modifyitems(session, config, items):
+    """Dispatch module what-if tests longest-expected-first."""
+    modules = {item.callspec.params['module_name'] for item in items
+               if 'module_name' in getattr(getattr(item, 'callspec', None), 'params', {})}
+    if modules:
+        estimates = DurationDB.shared().estimates('what-if', sorted(modules), get_location_from_shared_params())
+        order_module_items(items, estimates)
+        if SKU_PREFLIGHT:
+            _sku_preflight(items)
@@ -1,32 +1,50 @@
 """End-to-end tests for main.bicep (full-scope deployment)."""
 import os
+import sys
 import json
 import pytest
 import subprocess
 import tempfile
 from pathlib import Path
 
-# Summarize what-if changes helper function
-def summarize(changes):
-    """Summarize what-if changes by change type."""
-    summary = {"Create": 0, "Modify": 0, "Delete": 0, "NoChange": 0}
-    for change in changes:
-        change_type = change.get("changeType", "Unknown")
-        summary[change_type] = summary.get(change_type, 0) + 1
-    return summary
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.what_if_parser import summarize
+from tests.unit.helpers.tiered_what_if import run_escalating
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.az_errors import classify_az_error, run_with_retry, skip_reason
+from tests.unit.helpers.result_broker import get_broker, make_key, named_lock, write_text_atomic
+from tests.unit.helpers.wave_deploy import WaveDeployer
+from tests.unit.helpers.deploy_monitor import AzDeploymentFeed, deploy_and_monitor
+from tests.unit.helpers.durations import DurationDB
+from tests.unit.helpers.waf_ranges import compact_params, describe
+from tests.unit.helpers.tracing import span
+from tests.state_check.verify_state import AzResourceGraph, load_spec, verify_state
 
 
 # Use tests/fixtures/params.dev.json (not e2e/fixtures)
 FIXTURES_DIR = Path(__file__).parent.parent / 'fixtures'
 MAIN_BICEP = Path(__file__).parent.parent.parent / 'iac' / 'main.bicep'
 PARAMS_FILE = FIXTURES_DIR / 'params.dev.json'
+# Expected post-deployment state: tests/state_check/expected/<param set>.json
+PARAM_SET = 'dev'
 TEST_RG = 'test-rg'  # Fallback only - should come from params file
 WHAT_IF_OUTPUT = Path(__file__).parent / 'what-if-output.json'
 DEPLOYMENT_OUTPUT = Path(__file__).parent / 'deployment-output.json'
 DEPLOYMENT_ERROR_LOG = Path(__file__).parent / 'deployment-error.log'
+DEPLOYMENT_EVENTS = Path(__file__).parent / 'deployment-events.jsonl'
 
 # Check if actual deployment is enabled
 ENABLE_ACTUAL_DEPLOYMENT = os.getenv('ENABLE_ACTUAL_DEPLOYMENT', 'false').lower() == 'true'
+# Deploy module by module in dependency waves instead of one main.bicep deployment
+WAVE_DEPLOYMENT = os.getenv('WAVE_DEPLOYMENT', 'false').lower() == 'true'
+# Wave deployment that skips modules whose template and params match the last deployment
+INCREMENTAL_DEPLOYMENT = os.getenv('INCREMENTAL_DEPLOYMENT', 'false').lower() == 'true'
+# Submit main.bicep with --no-wait and stream operation state changes while it runs
+DEPLOY_MONITOR = os.getenv('DEPLOY_MONITOR', 'false').lower() == 'true'
+# With DEPLOY_MONITOR, cancel the deployment on the first failed operation
+CANCEL_ON_FAILURE = os.getenv('CANCEL_ON_FAILURE', 'false').lower() == 'true'
 
 
 def get_resource_group_from_params():
@@ -75,7 +93,8 @@ def get_merged_params_file():
     """Create a merged params file with metadata values injected into parameters.
     
     Merges metadata values (like isManagedApplication) into the parameters section
-    so they can be passed to Bicep templates via Azure CLI.
+    so they can be passed to Bicep templates via Azure CLI, and compacts
+    customerIpRanges (see tests/unit/helpers/waf_ranges.py).
     
     Returns:
         Path to temporary merged params file (caller should clean up)
@@ -96,6 +115,14 @@ def get_merged_params_file():
     if 'isManagedApplication' in metadata and 'isManagedApplication' not in merged_params['parameters']:
         merged_params['parameters']['isManagedApplication'] = {'value': metadata['isManagedApplication']}
     
+    # Collapse customerIpRanges to the minimal covering CIDR set before deployment
+    try:
+        compaction = compact_params(merged_params['parameters'])
+    except ValueError as e:
+        pytest.fail(f"Invalid customerIpRanges in {PARAMS_FILE}: {e}")
+    if compaction and compaction.saved:
+        print(describe(compaction))
+    
     # Create temporary file with merged params
     tmp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False)
     json.dump(merged_params, tmp_file, indent=2)
@@ -113,7 +140,7 @@ def ensure_subscription_set():
     subscription_id = get_subscription_id_from_params()
     if subscription_id:
         try:
-            subprocess.run(
+            az_run(
                 ['az', 'account', 'set', '--subscription', subscription_id],
                 capture_output=True,
                 text=True,
@@ -140,7 +167,7 @@ def ensure_resource_group(rg_name: str, location: str):
         str: Resource group name
     """
     # Check if RG exists
-    check_result = subprocess.run(
+    check_result = az_run(
         ['az', 'group', 'exists', '--name', rg_name],
         capture_output=True,
         text=True,
@@ -154,7 +181,7 @@ def ensure_resource_group(rg_name: str, location: str):
     
     # Create new RG
     print(f"Creating resource group {rg_name} in {location}...")
-    create_result = subprocess.run(
+    create_result = az_run(
         ['az', 'group', 'create', '--name', rg_name, '--location', location],
         capture_output=True,
         text=True,
@@ -162,7 +189,7 @@ def ensure_resource_group(rg_name: str, location: str):
     )
     
     # Verify creation
-    check_result = subprocess.run(
+    check_result = az_run(
         ['az', 'group', 'exists', '--name', rg_name],
         capture_output=True,
         text=True,
@@ -176,6 +203,43 @@ def ensure_resource_group(rg_name: str, location: str):
     return rg_name
 
 
+def run_main_what_if(rg_name: str, result_format: str = 'FullResourcePayloads') -> tuple[bool, str]:
+    """Run what-if for main.bicep against the given resource group.
+    
+    Args:
+        rg_name: Resource group name
+        result_format: 'FullResourcePayloads' or 'ResourceIdOnly' (IDs and change types only)
+    
+    Returns:
+        Tuple of (success: bool, output: str) - stdout on success, stderr on failure
+    """
+    merged_params_file = get_merged_params_file()
+    try:
+        result = az_run(
+            [
+                'az', 'deployment', 'group', 'what-if',
+                '--resource-group', rg_name,
+                '--template-file', str(MAIN_BICEP),
+                '--parameters', f'@{merged_params_file}',
+                '--output', 'json',
+                '--result-format', result_format,
+                '--no-pretty-print'
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return True, result.stdout
+    except subprocess.CalledProcessError as e:
+        return False, e.stderr
+    except FileNotFoundError:
+        return False, "Azure CLI not found. Please install Azure CLI."
+    finally:
+        # Clean up temporary merged params file
+        if merged_params_file.exists():
+            merged_params_file.unlink()
+
+
 @pytest.fixture(scope="function", autouse=True)
 def setup_azure_context():
     """Automatically set Azure subscription from params file if provided.
@@ -207,18 +271,63 @@ def test_resource_group():
     else:
         # For actual deployment tests, ensure RG exists
         location = get_location_from_params()
-        ensure_resource_group(rg_name, location)
+        with named_lock(f'rg-{rg_name}'):
+            ensure_resource_group(rg_name, location)
         yield rg_name
         # No cleanup - resource group persists for next test run
 
 
+def run_wave_deployment(rg_name: str, params_file: Path):
+    """Deploy main.bicep module by module in dependency waves (WAVE_DEPLOYMENT=true).
+    
+    A failed run records the modules that succeeded; rerunning the test resumes
+    at the failed wave instead of redeploying everything. With
+    INCREMENTAL_DEPLOYMENT=true, modules unchanged since their last successful
+    deployment to this resource group are skipped.
+    """
+    deployer = WaveDeployer(
+        rg_name, params_file, main_bicep=MAIN_BICEP, location=get_location_from_params(),
+        incremental=INCREMENTAL_DEPLOYMENT, durations=DurationDB()
+    )
+    result = deployer.run()
+    write_text_atomic(DEPLOYMENT_OUTPUT, json.dumps({
+        'waves': result.waves,
+        'modules': {
+            name: {
+                'success': r.success, 'resumed': r.resumed, 'unchanged': r.unchanged,
+                'duration': round(r.duration, 1), 'outputs': r.outputs
+            }
+            for name, r in result.results.items()
+        }
+    }, indent=2))
+    if result.success:
+        return
+    errors = '\n'.join(f"  - {name}: {result.results[name].error}" for name in result.failed)
+    if "azure cli not found" in errors.lower():
+        pytest.skip("Azure CLI not found")
+    DEPLOYMENT_ERROR_LOG.write_text(f"Wave deployment failed:\n{errors}")
+    pytest.fail(f"Wave deployment failed (rerun to resume from the failed wave). "
+                f"Check {DEPLOYMENT_ERROR_LOG} for details:\n{errors}")
+
+
+def test_invalid_ip_ranges_fail_with_the_parse_error(tmp_path, monkeypatch):
+    params = json.loads(PARAMS_FILE.read_text())
+    params['parameters']['customerIpRanges'] = {'value': ['203.0.113.0/24', 'not-a-cidr']}
+    bad_params = tmp_path / 'params.json'
+    bad_params.write_text(json.dumps(params))
+    monkeypatch.setattr(sys.modules[__name__], 'PARAMS_FILE', bad_params)
+
+    with pytest.raises(pytest.fail.Exception, match="'not-a-cidr' is not an IP address or CIDR"):
+        get_merged_params_file()
+
+
 class TestMainBicep:
     """Test suite for main.bicep full-scope deployment."""
 
     def test_bicep_compiles(self):
         """Test that main.bicep compiles successfully."""
         try:
-            result = subprocess.run(
+            result = az_run(
                 ['az', 'bicep', 'build', '--file', str(MAIN_BICEP), '--stdout'],
                 capture_output=True,
                 text=True,
@@ -245,40 +354,30 @@ class TestMainBicep:
             pytest.fail(f"Invalid JSON in params file: {e}")
 
     def test_what_if_succeeds(self):
-        """Test that what-if execution succeeds (default mode)."""
-        try:
-            rg_name = get_resource_group_from_params()
-            merged_params_file = get_merged_params_file()
-            try:
-                result = subprocess.run(
-                    [
-                        'az', 'deployment', 'group', 'what-if',
-                        '--resource-group', rg_name,
-                        '--template-file', str(MAIN_BICEP),
-                        '--parameters', f'@{merged_params_file}',
-                        '--output', 'json',
-                        '--result-format', 'FullResourcePayloads',
-                        '--no-pretty-print'
-                    ],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                assert result.returncode == 0
-                
-                # Save what-if output for post-deployment validation
-                WHAT_IF_OUTPUT.write_text(result.stdout)
-            finally:
-                # Clean up temporary merged params file
-                if merged_params_file.exists():
-                    merged_params_file.unlink()
-            
-        except subprocess.CalledProcessError as e:
-            if "not logged in" in e.stderr.lower():
-                pytest.skip("Azure CLI not configured - skipping what-if test")
-            pytest.fail(f"What-if failed: {e.stderr}")
-        except FileNotFoundError:
-            pytest.skip("Azure CLI not found")
+        """Test that what-if execution succeeds (default mode).
+        
+        Uses the ResourceIdOnly result format: the saved output feeds the
+        summary checks, which only need resource IDs and change types. If any
+        resource already exists (changeType 'Deploy'), the full payloads are
+        fetched so Modify/NoChange drift still shows in the saved output.
+        Under pytest-xdist the what-if runs once per session; other workers reuse the result.
+        """
+        rg_name = get_resource_group_from_params()
+        # Summary and output checks only need resource IDs and change types
+        key = make_key('e2e-what-if', MAIN_BICEP, PARAMS_FILE, rg_name, 'ResourceIdOnly')
+        success, output = get_broker().get_or_compute(
+            key, lambda: run_escalating(lambda fmt: run_with_retry(lambda: run_main_what_if(rg_name, fmt))))
+        
+        if not success:
+            if "azure cli not found" in output.lower():
+                pytest.skip("Azure CLI not found")
+            reason = skip_reason(classify_az_error(output), "what-if test")
+            if reason:
+                pytest.skip(reason)
+            pytest.fail(f"What-if failed: {output}")
+        
+        # Save what-if output for post-deployment validation (atomic so parallel readers never see partial JSON)
+        write_text_atomic(WHAT_IF_OUTPUT, output)
 
     def test_what_if_output_valid(self):
         """Test that what-if output is valid JSON and can be parsed."""
@@ -320,16 +419,94 @@ class TestMainBicep:
         
         This test:
         1. Deploys main.bicep to create/update real resources
+           (module by module in dependency waves with WAVE_DEPLOYMENT=true,
+           skipping unchanged modules with INCREMENTAL_DEPLOYMENT=true;
+           streaming operation state changes with DEPLOY_MONITOR=true)
         2. Runs what-if to validate deployed state (no unexpected deletions)
+        3. Verifies actual resource state against tests/state_check/expected/<param set>.json
         
         Note: Resource group persists after test - next run will update existing resources.
         """
         # Step 1: Deploy resources
-        merged_params_file = get_merged_params_file()
+        with span('deploy', resource_group=test_resource_group,
+                  mode='wave' if WAVE_DEPLOYMENT or INCREMENTAL_DEPLOYMENT else 'complete'):
+            merged_params_file = get_merged_params_file()
+            if WAVE_DEPLOYMENT or INCREMENTAL_DEPLOYMENT:
+                try:
+                    run_wave_deployment(test_resource_group, merged_params_file)
+                finally:
+                    merged_params_file.unlink(missing_ok=True)
+            elif DEPLOY_MONITOR:
+                self._deploy_monitored(test_resource_group, merged_params_file)
+            else:
+                self._deploy_main(test_resource_group, merged_params_file)
+        
+        # Step 2: Post-deployment state check (before fixture tears down RG)
+        # Run what-if against deployed resources to validate state.
+        # ResourceIdOnly first; deployed resources come back as 'Deploy', which
+        # escalates to full payloads so Modify/NoChange can be told apart.
+        with span('post_deploy_what_if', resource_group=test_resource_group) as what_if_span:
+            success, output = run_escalating(
+                lambda fmt: run_with_retry(lambda: run_main_what_if(test_resource_group, fmt)))
+            what_if_span.set(payload_bytes=len(output or ''))
+        if not success:
+            if "azure cli not found" in output.lower():
+                pytest.skip("Azure CLI not found")
+            pytest.fail(f"Post-deployment what-if failed: {output}")
+        
+        # Parse and validate what-if output
+        what_if_data = json.loads(output)
+        changes = what_if_data.get('changes', [])
+        summary = summarize(changes)
+        
+        # After deployment, we expect mostly NoChange (or some Modify for idempotency)
+        # Unexpected Creates or Deletes indicate drift
+        unexpected_deletes = summary.get('Delete', 0)
+        
+        # Allow some Creates/Modifies for idempotency, but no Deletes
+        assert unexpected_deletes == 0, (
+            f"Unexpected resource deletions detected after deployment: {summary}. "
+            f"This indicates drift between template and deployed state."
+        )
+        
+        # Step 3: Verify actual state against the expected spec (one paged Resource Graph query)
+        with span('verify_state', resource_group=test_resource_group, param_set=PARAM_SET):
+            result = verify_state(AzResourceGraph(get_subscription_id_from_params()), test_resource_group, load_spec(PARAM_SET))
+        if result.unavailable:
+            pytest.skip(result.unavailable)
+        assert result.success, (
+            f"Deployed state does not match tests/state_check/expected/{PARAM_SET}.json "
+            f"({result.resource_count} resources checked):\n" + "\n".join(result.errors)
+        )
+
+    def _deploy_monitored(self, test_resource_group, merged_params_file):
+        """Deploy main.bicep with --no-wait, reporting failed operations as soon as they happen."""
+        DEPLOYMENT_EVENTS.unlink(missing_ok=True)
+        try:
+            result = deploy_and_monitor(
+                AzDeploymentFeed(test_resource_group), MAIN_BICEP, merged_params_file,
+                cancel_on_failure=CANCEL_ON_FAILURE, log_file=DEPLOYMENT_EVENTS
+            )
+        finally:
+            merged_params_file.unlink(missing_ok=True)
+        if any('azure cli not found' in error.lower() for error in result.errors):
+            pytest.skip("Azure CLI not found")
+        if not result.success:
+            failed_summary = [f"  - {e.resource_type}/{e.resource_name}: {json.dumps(e.error, indent=4)}"
+                              for e in result.failed]
+            failed_msg = (f"Deployment {result.name} ended {result.state}"
+                          f"{' (cancelled on first failure)' if result.canceled else ''}:\n"
+                          + "\n".join(failed_summary + result.errors))
+            DEPLOYMENT_ERROR_LOG.write_text(failed_msg)
+            pytest.fail(f"Actual deployment failed. Check {DEPLOYMENT_ERROR_LOG} and {DEPLOYMENT_EVENTS} "
+                        f"for details:\n{failed_msg}")
+
+    def _deploy_main(self, test_resource_group, merged_params_file):
+        """Deploy main.bicep as a single Complete-mode deployment."""
         deployment_data = None
         try:
             try:
-                deploy_result = subprocess.run(
+                deploy_result = az_run(
                     [
                         'az', 'deployment', 'group', 'create',
                         '--resource-group', test_resource_group,
@@ -344,7 +521,7 @@ class TestMainBicep:
                 )
                 
                 # Save deployment output to file for debugging
-                DEPLOYMENT_OUTPUT.write_text(deploy_result.stdout)
+                write_text_atomic(DEPLOYMENT_OUTPUT, deploy_result.stdout)
                 if deploy_result.stderr:
                     DEPLOYMENT_ERROR_LOG.write_text(deploy_result.stderr)
                 
@@ -387,7 +564,7 @@ class TestMainBicep:
                     deployment_name = deployment_data.get('name', '')
                     if deployment_name:
                         # Check for failed operations
-                        ops_result = subprocess.run(
+                        ops_result = az_run(
                             [
                                 'az', 'deployment', 'operation', 'group', 'list',
                                 '--resource-group', test_resource_group,
@@ -426,53 +603,9 @@ class TestMainBicep:
         except subprocess.CalledProcessError as e:
             # Save error output to files for debugging
             if e.stdout:
-                DEPLOYMENT_OUTPUT.write_text(e.stdout)
+                write_text_atomic(DEPLOYMENT_OUTPUT, e.stdout)
             if e.stderr:
                 DEPLOYMENT_ERROR_LOG.write_text(f"Deployment command failed:\n{e.stderr}")
             pytest.fail(f"Actual deployment failed. Check {DEPLOYMENT_ERROR_LOG} for details:\n{e.stderr}")
         except FileNotFoundError:
             pytest.skip("Azure CLI not found")
-        
-        # Step 2: Post-deployment state check (before fixture tears down RG)
-        # Run what-if against deployed resources to validate state
-        merged_params_file = get_merged_params_file()
-        try:
-            try:
-                what_if_result = subprocess.run(
-                    [
-                        'az', 'deployment', 'group', 'what-if',
-                        '--resource-group', test_resource_group,
-                        '--template-file', str(MAIN_BICEP),
-                        '--parameters', f'@{merged_params_file}',
-                        '--output', 'json',
-                        '--result-format', 'FullResourcePayloads',
-                        '--no-pretty-print'
-                    ],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-            finally:
-                # Clean up temporary merged params file
-                if merged_params_file.exists():
-                    merged_params_file.unlink()
-            
-            # Parse and validate what-if output
-            what_if_data = json.loads(what_if_result.stdout)
-            changes = what_if_data.get('changes', [])
-            summary = summarize(changes)
-            
-            # After deployment, we expect mostly NoChange (or some Modify for idempotency)
-            # Unexpected Creates or Deletes indicate drift
-            unexpected_deletes = summary.get('Delete', 0)
-            
-            # Allow some Creates/Modifies for idempotency, but no Deletes
-            assert unexpected_deletes == 0, (
-                f"Unexpected resource deletions detected after deployment: {summary}. "
-                f"This indicates drift between template and deployed state."
-            )
-            
-        except subprocess.CalledProcessError as e:
-            pytest.fail(f"Post-deployment what-if failed: {e.stderr}")
-        except FileNotFoundError:
-            pytest.skip("Azure CLI not found")
@@ -0,0 +1,125 @@
+"""Tests for the post-deployment state verifier (local Resource Graph stand-in, no Azure needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.state_check.verify_state import (
+    GRAPH_EXTENSION_MISSING,
+    AzResourceGraph,
+    LocalResourceGraph,
+    fetch_resources,
+    get_path,
+    load_spec,
+    main,
+    verify_state
+)
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+
+RG = 'test-rg-sg'
+RG_ID = f'/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/{RG}'
+
+
+def resources_matching(spec):
+    """Build the Resource Graph rows a correct deployment of `spec` would return."""
+    rows = []
+    for i, expected in enumerate(spec['resources']):
+        for n in range(expected.get('count', 1)):
+            name = expected.get('name', '*').replace('*', f'x{i}n{n}')
+            row = {
+                'id': f"{RG_ID}/providers/{expected['type']}/{name}",
+                'name': name,
+                'type': expected['type'].lower(),
+                'resourceGroup': RG,
+                'location': expected.get('location', spec['location']),
+                'properties': {}
+            }
+            for path, value in expected.get('properties', {}).items():
+                *parents, leaf = path.split('.')
+                target = row
+                for key in parents:
+                    target = target.setdefault(key, {})
+                target[leaf] = value
+            rows.append(row)
+    return rows
+
+
+def write_graph(tmp_path, rows):
+    other_rg = {'id': '/subscriptions/x/resourceGroups/other/providers/Microsoft.KeyVault/vaults/vd-kv-other',
+                'name': 'vd-kv-other', 'type': 'microsoft.keyvault/vaults', 'resourceGroup': 'other'}
+    path = tmp_path / 'graph.json'
+    path.write_text(json.dumps({'data': rows + [other_rg]}))
+    return path
+
+
+def test_dev_spec_matches_correct_state_across_pages(tmp_path):
+    spec = load_spec('dev')
+    rows = resources_matching(spec)
+    graph = LocalResourceGraph(write_graph(tmp_path, rows), page_size=10)
+
+    result = verify_state(graph, RG, spec)
+
+    assert result.success, result.errors
+    assert result.resource_count == len(rows)
+    assert graph.calls == -(-len(rows) // 10)  # one query per page, no per-resource calls
+
+
+def test_fetch_resources_filters_resource_group(tmp_path):
+    graph = LocalResourceGraph(write_graph(tmp_path, []), page_size=1)
+    success, resources = fetch_resources(graph, 'other')
+    assert success and [r['name'] for r in resources] == ['vd-kv-other']
+
+
+def test_mismatches_are_reported(tmp_path):
+    spec = load_spec('dev')
+    rows = resources_matching(spec)
+    vault = next(r for r in rows if r['type'] == 'microsoft.keyvault/vaults')
+    vault['properties']['publicNetworkAccess'] = 'Enabled'
+    rows = [r for r in rows if r['type'] != 'microsoft.compute/virtualmachines']
+    rows.append({'id': f'{RG_ID}/providers/Microsoft.Sql/servers/rogue', 'name': 'rogue',
+                 'type': 'microsoft.sql/servers', 'resourceGroup': RG, 'location': 'southeastasia'})
+
+    result = verify_state(LocalResourceGraph(write_graph(tmp_path, rows)), RG, spec)
+
+    assert not result.success
+    assert any('properties.publicNetworkAccess' in e and "'Enabled'" in e for e in result.errors)
+    assert any(e.startswith("Microsoft.Compute/virtualMachines 'vd-vm-*': expected 1") for e in result.errors)
+    assert any(e.endswith('/servers/rogue: not in expected spec') for e in result.errors)
+
+
+def test_values_compare_case_insensitively():
+    resource = {'properties': {'publicNetworkAccess': 'disabled', 'prefixes': ['10.0.0.0/16']}}
+    assert get_path(resource, 'properties.prefixes.0') == '10.0.0.0/16'
+    spec = {'location': 'southeastasia', 'resources': [
+        {'type': 'Microsoft.Search/searchServices', 'name': 'vd-search-*',
+         'properties': {'properties.publicNetworkAccess': 'Disabled'}}]}
+
+    class Graph:
+        def query_page(self, resource_group, skip_token=None):
+            return True, {'data': [{
+                'id': f'{RG_ID}/providers/Microsoft.Search/searchServices/vd-search-a',
+                'name': 'vd-search-a', 'type': 'microsoft.search/searchservices',
+                'location': 'SouthEastAsia', **resource}]}
+
+    assert verify_state(Graph(), RG, spec).success
+
+
+def test_cli_with_graph_file(tmp_path, capsys):
+    rows = resources_matching(load_spec('dev'))
+    assert main(['--param-set', 'dev', '--graph-file', str(write_graph(tmp_path, rows))]) == 0
+    assert f'in {RG} against dev.json' in capsys.readouterr().out
+
+
+def test_missing_graph_extension_is_reported_as_unavailable(tmp_path, monkeypatch):
+    install_fake_az(tmp_path / 'bin', [{
+        'argv': ['graph'], 'returncode': 2,
+        'stderr': "ERROR: 'graph' is misspelled or not recognized by the system.\nDid you mean 'group' ?"
+    }], tmp_path / 'calls.jsonl')
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    monkeypatch.setenv('AZ_CASSETTE_MODE', 'off')
+
+    result = verify_state(AzResourceGraph(), RG, load_spec('dev'))
+
+    assert not result.success and result.unavailable == GRAPH_EXTENSION_MISSING
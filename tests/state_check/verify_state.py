@@ -0,0 +1,261 @@
+"""Post-deployment state verification against an expected JSON spec.
+
+Fetches every resource in the resource group with one paged Resource Graph
+query (instead of an `az resource show` per resource), indexes the results by
+resource ID and checks them against tests/state_check/expected/<param-set>.json.
+
+Spec format:
+
+    {
+      "paramsFile": "tests/fixtures/params.dev.json",
+      "location": "southeastasia",           # default expected location
+      "allowUnexpected": false,              # fail on resources no entry matches
+      "resources": [
+        {
+          "type": "Microsoft.KeyVault/vaults",
+          "name": "vd-kv-*",                 # glob on the resource name (default "*")
+          "count": 1,                        # default 1
+          "location": "southeastasia",       # optional, overrides the default
+          "properties": {"properties.enableRbacAuthorization": true}   # dotted paths
+        }
+      ]
+    }
+
+Types, names and string values are compared case-insensitively (ARM and
+Resource Graph normalize casing differently).
+
+Usage:
+    python -m tests.state_check.verify_state --param-set dev
+    python -m tests.state_check.verify_state --param-set dev --graph-file resources.json   # local stand-in
+"""
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.az_cassette import az_run
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+EXPECTED_DIR = Path(__file__).parent / 'expected'
+PAGE_SIZE = 1000
+
+_MISSING = object()
+
+CLI_MISSING = "Azure CLI not found. Please install Azure CLI."
+GRAPH_EXTENSION_MISSING = "Resource Graph extension not installed. Run: az extension add --name resource-graph"
+
+
+class AzResourceGraph:
+    """Resource Graph query endpoint via `az graph query` (resource-graph extension)."""
+
+    def __init__(self, subscription_id: Optional[str] = None, page_size: int = PAGE_SIZE):
+        self.subscription_id = subscription_id
+        self.page_size = page_size
+
+    def query_page(self, resource_group: str, skip_token: Optional[str] = None) -> tuple[bool, Any]:
+        """Fetch one page of resources in a resource group.
+
+        Returns:
+            Tuple of (success, page) where page is {'data': [...], 'skip_token': str|None},
+            or (False, error message)
+        """
+        query = (
+            "Resources"
+            f" | where resourceGroup =~ '{resource_group}'"
+            " | project id, name, type, location, kind, sku, tags, properties"
+            " | order by id asc"
+        )
+        cmd = ['az', 'graph', 'query', '-q', query, '--first', str(self.page_size), '--output', 'json']
+        if self.subscription_id:
+            cmd += ['--subscriptions', self.subscription_id]
+        if skip_token:
+            cmd += ['--skip-token', skip_token]
+        try:
+            result = az_run(cmd, capture_output=True, text=True, check=True)
+            return True, json.loads(result.stdout)
+        except subprocess.CalledProcessError as e:
+            output = e.stderr or str(e)
+            if _extension_missing(output):
+                return False, GRAPH_EXTENSION_MISSING
+            return False, output
+        except json.JSONDecodeError as e:
+            return False, f"Unparseable Resource Graph response: {e}"
+        except FileNotFoundError:
+            return False, CLI_MISSING
+
+
+def _extension_missing(output: str) -> bool:
+    """True when az failed because `az graph` (resource-graph extension) is not installed."""
+    lowered = output.lower()
+    return ("'graph' is misspelled or not recognized" in lowered
+            or ('resource-graph' in lowered and 'extension' in lowered and 'install' in lowered))
+
+
+class LocalResourceGraph:
+    """Local stand-in for the query endpoint: serves a JSON file in the same paged format.
+
+    The file holds a list of resources (or {'data': [...]}) with at least
+    id, name, type and resourceGroup; skip tokens are page offsets.
+    """
+
+    def __init__(self, path: Path, page_size: int = PAGE_SIZE):
+        data = json.loads(Path(path).read_text())
+        self.resources = sorted(data['data'] if isinstance(data, dict) else data, key=lambda r: r['id'].lower())
+        self.page_size = page_size
+        self.calls = 0
+
+    def query_page(self, resource_group: str, skip_token: Optional[str] = None) -> tuple[bool, Any]:
+        self.calls += 1
+        matching = [r for r in self.resources if r.get('resourceGroup', '').lower() == resource_group.lower()]
+        start = int(skip_token or 0)
+        end = start + self.page_size
+        return True, {
+            'data': matching[start:end],
+            'count': len(matching[start:end]),
+            'total_records': len(matching),
+            'skip_token': str(end) if end < len(matching) else None
+        }
+
+
+def fetch_resources(graph, resource_group: str) -> tuple[bool, Any]:
+    """Fetch all pages for a resource group.
+
+    Returns:
+        Tuple of (success, list of resources) or (False, error message)
+    """
+    resources: List[Dict[str, Any]] = []
+    skip_token = None
+    while True:
+        success, page = graph.query_page(resource_group, skip_token)
+        if not success:
+            return False, page
+        resources.extend(page.get('data', []))
+        skip_token = page.get('skip_token') or page.get('$skipToken')
+        if not skip_token:
+            return True, resources
+
+
+def index_resources(resources: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Index resources by lower-cased resource ID."""
+    return {r['id'].lower(): r for r in resources}
+
+
+def get_path(resource: Dict[str, Any], path: str) -> Any:
+    """Resolve a dotted path (list indices as numbers); returns _MISSING if absent."""
+    value: Any = resource
+    for key in path.split('.'):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return _MISSING
+    return value
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def _matches(resource: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    name = resource.get('name', '').rsplit('/', 1)[-1].lower()
+    return (resource.get('type', '').lower() == expected['type'].lower()
+            and fnmatchcase(name, expected.get('name', '*').lower()))
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of comparing actual state with the expected spec."""
+    errors: List[str] = field(default_factory=list)
+    resource_count: int = 0
+    # Set when the state could not be queried at all (no az or no resource-graph extension)
+    unavailable: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+def compare_state(index: Dict[str, Dict[str, Any]], spec: Dict[str, Any]) -> VerificationResult:
+    """Compare indexed resources with an expected spec."""
+    result = VerificationResult(resource_count=len(index))
+    default_location = spec.get('location')
+    claimed = set()
+    by_type: Dict[str, List[tuple[str, Dict[str, Any]]]] = {}
+    for resource_id, resource in index.items():
+        by_type.setdefault(resource.get('type', '').lower(), []).append((resource_id, resource))
+
+    for expected in spec.get('resources', []):
+        label = f"{expected['type']} '{expected.get('name', '*')}'"
+        matches = [(rid, r) for rid, r in by_type.get(expected['type'].lower(), []) if _matches(r, expected)]
+        count = expected.get('count', 1)
+        if len(matches) != count:
+            result.errors.append(f"{label}: expected {count} resource(s), found {len(matches)}")
+        location = expected.get('location', default_location)
+        for resource_id, resource in matches:
+            claimed.add(resource_id)
+            if location and _normalize(resource.get('location')) != _normalize(location):
+                result.errors.append(f"{resource['id']}: location is {resource.get('location')!r}, expected {location!r}")
+            for path, want in expected.get('properties', {}).items():
+                actual = get_path(resource, path)
+                if actual is _MISSING:
+                    result.errors.append(f"{resource['id']}: {path} is missing, expected {want!r}")
+                elif _normalize(actual) != _normalize(want):
+                    result.errors.append(f"{resource['id']}: {path} is {actual!r}, expected {want!r}")
+
+    if not spec.get('allowUnexpected', True):
+        for resource_id in sorted(set(index) - claimed):
+            result.errors.append(f"{index[resource_id]['id']}: not in expected spec")
+    return result
+
+
+def load_spec(param_set: str) -> Dict[str, Any]:
+    return json.loads((EXPECTED_DIR / f'{param_set}.json').read_text())
+
+
+def verify_state(graph, resource_group: str, spec: Dict[str, Any]) -> VerificationResult:
+    """Fetch the resource group's state through `graph` and compare it with `spec`."""
+    success, resources = fetch_resources(graph, resource_group)
+    if not success:
+        return VerificationResult(errors=[f"Resource Graph query failed: {resources}"],
+                                  unavailable=resources if resources in (CLI_MISSING, GRAPH_EXTENSION_MISSING) else None)
+    return compare_state(index_resources(resources), spec)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--param-set', default='dev', help='expected spec name (tests/state_check/expected/<name>.json)')
+    parser.add_argument('--resource-group', help="resource group (default: the spec's params file metadata)")
+    parser.add_argument('--subscription', help='subscription ID for the Resource Graph query')
+    parser.add_argument('--graph-file', type=Path, help='local JSON stand-in for the query endpoint')
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.param_set)
+    resource_group = args.resource_group
+    if not resource_group:
+        params = json.loads((REPO_ROOT / spec['paramsFile']).read_text())
+        resource_group = params.get('metadata', {}).get('resourceGroupName', '')
+    graph = LocalResourceGraph(args.graph_file) if args.graph_file else AzResourceGraph(args.subscription)
+
+    result = verify_state(graph, resource_group, spec)
+    print(f"Checked {result.resource_count} resources in {resource_group} against {args.param_set}.json")
+    for error in result.errors:
+        print(f"  MISMATCH {error}")
+    return 0 if result.success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
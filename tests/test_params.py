@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
 
+from tests.unit.helpers.cidr_planner import check_subnet_fit
+
 
 def test_params_dev_has_required_keys():
     """Validate that params.dev.json contains all required parameters for main.bicep."""
@@ -48,3 +50,12 @@ def test_params_dev_has_metadata():
     assert "location" in metadata, "metadata.location is required"
     assert metadata.get("resourceGroupName"), "metadata.resourceGroupName cannot be empty"
     assert metadata.get("location"), "metadata.location cannot be empty"
+
+
+def test_params_dev_vnet_cidr_fits_subnets():
+    """Validate that vnetCidr can hold the six /24 subnets network.bicep derives from it."""
+    data = json.loads(Path("tests/fixtures/params.dev.json").read_text())
+    vnet_cidr = data["parameters"]["vnetCidr"]["value"]
+
+    problems = check_subnet_fit(vnet_cidr)
+    assert not problems, f"vnetCidr {vnet_cidr} in params.dev.json: {problems}"
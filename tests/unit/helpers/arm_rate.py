@@ -0,0 +1,295 @@
+"""Cross-process ARM request rate limiter (token bucket per subscription and operation class).
+
+Parallel pytest workers and fleet runs against the same subscription share
+ARM's request quota, and nothing coordinated their rate, so runs failed
+with 429s in unpredictable places. az_run() now takes a token from a bucket
+before every az call that reaches ARM:
+
+- one bucket per (subscription, class), class being read, write or what-if
+  (bicep build, account show and other local commands are not limited); the
+  subscription is the call's --subscription, else AZURE_SUBSCRIPTION_ID, else
+  metadata.subscriptionId from params.dev.json, else az's active account
+- bucket state is a small JSON file in the machine-wide broker directory,
+  updated under a file lock, so every process on the machine shares it;
+  a caller reserves its token under the lock and sleeps outside it
+- the refill rate adapts to feedback: a throttled response (429) halves the
+  rate and pauses the bucket for the server's Retry-After; otherwise the
+  x-ms-ratelimit-remaining-subscription-* response headers set it. az only
+  logs response headers with --debug, so az_run() adds --debug to live
+  limited calls and strips the log lines (split_debug_output) before the
+  caller or the cassette sees stderr. The remaining count caps the local
+  bucket, and the rate becomes the configured rate scaled by how full the
+  server's bucket still is. Calls without headers (fake az, older az) fall
+  back to adding a twentieth of the configured rate back per success
+
+Configured rates follow ARM's subscription token buckets (reads 25/s with
+a burst of 250, writes 10/s with 200). What-ifs are expensive deployment
+validations and get a smaller bucket. Override with ARM_RATE_<CLASS>=
+"<per second>/<burst>" (e.g. ARM_RATE_WHAT_IF=0.5/10); ARM_RATE_LIMIT=false
+turns the limiter off. Replayed cassette calls never touch the limiter.
+"""
+import json
+import os
+import re
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tests.unit.helpers.az_errors import THROTTLED, classify_az_error
+from tests.unit.helpers.result_broker import BROKER_ROOT, file_lock, write_text_atomic
+from tests.unit.helpers.tracing import span
+
+RATE_ROOT = BROKER_ROOT / 'arm-rate'
+SHARED_PARAMS_FILE = Path(__file__).resolve().parents[2] / 'fixtures' / 'params.dev.json'
+
+READ = 'read'
+WRITE = 'write'
+WHAT_IF = 'what-if'
+
+# class -> (tokens per second, burst)
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    READ: (25.0, 250.0),
+    WRITE: (10.0, 200.0),
+    WHAT_IF: (1.0, 20.0),
+}
+# The adaptive rate never drops below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.05
+# Each success adds this fraction of the configured rate back
+INCREASE_FRACTION = 0.05
+# Pause after a 429 without Retry-After
+DEFAULT_PAUSE = 5.0
+
+# az command groups that never reach ARM
+_LOCAL_GROUPS = {'bicep', 'config', 'version', 'login', 'logout', 'extension', 'cloud', 'upgrade'}
+_WRITE_VERBS = {
+    'create', 'delete', 'update', 'set', 'cancel', 'start', 'stop', 'restart', 'deallocate',
+    'assign', 'import', 'purge', 'add', 'remove', 'invoke', 'run-command',
+}
+_REMAINING_RE = re.compile(
+    r"x-ms-ratelimit-remaining-subscription-(?:global-)?(reads|writes|deletes)'?\s*[:=]\s*'?(\d+)", re.IGNORECASE)
+_HEADER_CLASSES = {'reads': (READ,), 'writes': (WRITE, WHAT_IF), 'deletes': (WRITE,)}
+# Size of the server-side bucket each header counts down (ARM's, not the local configuration)
+_SERVER_BURST = {'reads': DEFAULT_LIMITS[READ][1], 'writes': DEFAULT_LIMITS[WRITE][1],
+                 'deletes': DEFAULT_LIMITS[WRITE][1]}
+# Log record prefixes of az's console logger; --debug adds DEBUG and INFO records
+_LOG_LEVEL_RE = re.compile(r'^(DEBUG|INFO|WARNING|ERROR|CRITICAL): ')
+_DEBUG_LEVELS = {'DEBUG', 'INFO'}
+
+
+def operation_class(cmd: List[str]) -> Optional[str]:
+    """read, write or what-if for an az command line (None for commands that stay local)."""
+    words = []
+    for arg in cmd[1:]:
+        if arg.startswith('-'):
+            break
+        words.append(arg)
+    if not words or words[0] in _LOCAL_GROUPS:
+        return None
+    if words[0] == 'account' and words[1:2] != ['list-locations']:
+        return None
+    if 'what-if' in words:
+        return WHAT_IF
+    if _WRITE_VERBS & set(words):
+        return WRITE
+    return READ
+
+
+_default_subscription: Optional[str] = None
+
+
+def _active_subscription() -> str:
+    """Subscription of az's active account ('' if unknown).
+
+    Runs az directly: az_run would come back through the limiter.
+    """
+    try:
+        result = subprocess.run(['az', 'account', 'show', '--query', 'id', '--output', 'tsv'],
+                                capture_output=True, text=True, check=False)
+    except FileNotFoundError:
+        return ''
+    return result.stdout.strip() if result.returncode == 0 else ''
+
+
+def default_subscription() -> str:
+    """Subscription for calls without --subscription (resolved once per process)."""
+    global _default_subscription
+    if os.getenv('AZURE_SUBSCRIPTION_ID'):
+        return os.environ['AZURE_SUBSCRIPTION_ID']
+    if _default_subscription is None:
+        try:
+            metadata = json.loads(SHARED_PARAMS_FILE.read_text()).get('metadata', {})
+        except (OSError, ValueError):
+            metadata = {}
+        _default_subscription = metadata.get('subscriptionId') or _active_subscription() or 'default'
+    return _default_subscription
+
+
+def subscription_of(cmd: List[str]) -> str:
+    """--subscription (or the first --subscriptions) of the call, else default_subscription()."""
+    for flag in ('--subscription', '--subscriptions'):
+        if flag in cmd[:-1]:
+            return cmd[cmd.index(flag) + 1]
+    return default_subscription()
+
+
+def split_debug_output(stderr: str) -> Tuple[str, str]:
+    """Split az --debug stderr into (stderr without DEBUG/INFO records, those records).
+
+    A line without a level prefix continues the record above it (multi-line
+    messages), so it goes wherever that record went.
+    """
+    kept, debug = [], []
+    target = kept
+    for line in (stderr or '').splitlines(keepends=True):
+        match = _LOG_LEVEL_RE.match(line)
+        if match:
+            target = debug if match.group(1) in _DEBUG_LEVELS else kept
+        target.append(line)
+    return ''.join(kept), ''.join(debug)
+
+
+def remaining_quota(output: str) -> Dict[str, int]:
+    """Last x-ms-ratelimit-remaining-subscription-* value per counter (reads, writes, deletes)."""
+    return {counter.lower(): int(value) for counter, value in _REMAINING_RE.findall(output or '')}
+
+
+def limits_from_env(defaults: Dict[str, Tuple[float, float]] = DEFAULT_LIMITS) -> Dict[str, Tuple[float, float]]:
+    limits = dict(defaults)
+    for cls in limits:
+        value = os.getenv(f"ARM_RATE_{cls.upper().replace('-', '_')}")
+        if value:
+            rate, _, burst = value.partition('/')
+            limits[cls] = (float(rate), float(burst or rate))
+    return limits
+
+
+@dataclass
+class Bucket:
+    """Shared state of one bucket (as stored in its JSON file)."""
+    tokens: float
+    rate: float
+    updated: float
+    paused_until: float = 0.0
+
+
+class RateLimiter:
+    """Token buckets shared by every process on the machine through lock-protected files."""
+
+    def __init__(self, root: Path = RATE_ROOT, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.root = Path(root)
+        self.limits = limits_from_env() if limits is None else limits
+        self.clock = clock
+        self.sleep = sleep
+
+    def _path(self, subscription: str, cls: str) -> Path:
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in subscription)
+        return self.root / f'{safe}-{cls}.json'
+
+    def _update(self, subscription: str, cls: str, change: Callable[[Bucket, float], float]) -> float:
+        """Apply change(bucket, now) to the refilled bucket under its lock; returns change's result."""
+        path = self._path(subscription, cls)
+        rate, burst = self.limits[cls]
+        with file_lock(path.with_suffix('.lock')):
+            now = self.clock()
+            try:
+                bucket = Bucket(**json.loads(path.read_text()))
+            except (OSError, ValueError, TypeError):
+                bucket = Bucket(tokens=burst, rate=rate, updated=now)
+            bucket.rate = min(max(bucket.rate, rate * MIN_RATE_FRACTION), rate)
+            bucket.tokens = min(burst, bucket.tokens + max(0.0, now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            result = change(bucket, now)
+            write_text_atomic(path, json.dumps(asdict(bucket)))
+        return result
+
+    def reserve(self, subscription: str, cls: str) -> float:
+        """Take one token, going into debt if the bucket is empty.
+
+        Returns:
+            Seconds the caller must wait before sending the request
+        """
+        def take(bucket: Bucket, now: float) -> float:
+            bucket.tokens -= 1
+            debt = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return max(debt, bucket.paused_until - now, 0.0)
+        return self._update(subscription, cls, take)
+
+    def acquire(self, cmd: List[str]) -> float:
+        """Wait for a token for an az call. Returns the seconds waited."""
+        cls = operation_class(cmd)
+        if cls is None:
+            return 0.0
+        wait = self.reserve(subscription_of(cmd), cls)
+        if wait > 0:
+            with span('arm_rate_wait', cat='az', op_class=cls, seconds=round(wait, 3)):
+                self.sleep(wait)
+        return wait
+
+    def feedback(self, cmd: List[str], returncode: int, output: str) -> None:
+        """Adapt the buckets to a finished call's outcome."""
+        cls = operation_class(cmd)
+        if cls is None:
+            return
+        subscription = subscription_of(cmd)
+        configured = self.limits[cls][0]
+        error = classify_az_error(output) if returncode != 0 else None
+
+        remaining = remaining_quota(output)
+        # Classes the headers speak for, with the remaining count and how full the server bucket is
+        quota: Dict[str, Tuple[float, float]] = {}
+        for counter, count in remaining.items():
+            for header_cls in _HEADER_CLASSES[counter]:
+                if header_cls in self.limits:
+                    fill = count / _SERVER_BURST[counter]
+                    previous = quota.get(header_cls, (float('inf'), float('inf')))
+                    quota[header_cls] = (min(previous[0], count), min(previous[1], fill))
+
+        if error is not None and error.category == THROTTLED:
+            def slow_down(bucket: Bucket, now: float) -> float:
+                bucket.rate = max(configured * MIN_RATE_FRACTION, bucket.rate / 2)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                bucket.paused_until = max(bucket.paused_until, now + (error.retry_after or DEFAULT_PAUSE))
+                return 0.0
+            self._update(subscription, cls, slow_down)
+            quota.pop(cls, None)
+        elif returncode == 0 and cls not in quota:
+            def speed_up(bucket: Bucket, now: float) -> float:
+                bucket.rate = min(configured, bucket.rate + configured * INCREASE_FRACTION)
+                return 0.0
+            self._update(subscription, cls, speed_up)
+
+        for header_cls, (count, fill) in quota.items():
+            header_rate = self.limits[header_cls][0]
+
+            def follow_server(bucket: Bucket, now: float, count: float = count, fill: float = fill,
+                              header_rate: float = header_rate) -> float:
+                bucket.tokens = min(bucket.tokens, count)
+                bucket.rate = min(max(header_rate * fill, header_rate * MIN_RATE_FRACTION), header_rate)
+                return 0.0
+            self._update(subscription, header_cls, follow_server)
+
+    def state(self, subscription: str, cls: str) -> Bucket:
+        """Current (refilled) bucket state."""
+        snapshot = {}
+
+        def read(bucket: Bucket, now: float) -> float:
+            snapshot.update(asdict(bucket))
+            return 0.0
+        self._update(subscription, cls, read)
+        return Bucket(**snapshot)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_limiter() -> Optional[RateLimiter]:
+    """The process-wide limiter (None when ARM_RATE_LIMIT=false)."""
+    global _limiter
+    if os.getenv('ARM_RATE_LIMIT', 'true').lower() == 'false':
+        return None
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,235 @@
+"""Record/replay transport for Azure CLI calls.
+
+Every `az` invocation in the harness goes through az_run(), a drop-in for
+subprocess.run(). Behaviour is selected with AZ_CASSETTE_MODE:
+
+- off (default): call the real `az`
+- record: call the real `az` and store argv, parameter payload, stdout,
+  stderr and exit code in a cassette; the first interaction a record session
+  writes to a cassette replaces what an earlier session recorded there
+- replay: serve recorded results without calling `az`; a call with no
+  recorded match (or called more often than recorded) raises CassetteMiss
+
+Cassettes are JSON files in AZ_CASSETTE_DIR (default tests/cassettes), one per
+test file (selected by the autouse fixture in tests/conftest.py). They hold
+subscription IDs and the recorder's object ID, so tests/cassettes/ is not
+committed.
+
+Live calls (off and record) first take a token from the machine-wide ARM
+rate limiter and report their outcome to it (see arm_rate.py).
+"""
+import json
+import os
+import subprocess
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tests.unit.helpers.arm_rate import get_limiter, operation_class, split_debug_output
+from tests.unit.helpers.result_broker import file_lock, write_text_atomic
+from tests.unit.helpers.tracing import span
+
+MODE_ENV = 'AZ_CASSETTE_MODE'
+DIR_ENV = 'AZ_CASSETTE_DIR'
+# Shared by a pytest run and its xdist workers (set in pytest_configure)
+SESSION_ENV = 'AZ_CASSETTE_SESSION'
+MODES = ('off', 'record', 'replay')
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_CASSETTE_DIR = REPO_ROOT / 'tests' / 'cassettes'
+
+
+class CassetteMiss(RuntimeError):
+    """Raised in replay mode when a call has no recorded interaction."""
+
+
+def get_mode() -> str:
+    mode = os.getenv(MODE_ENV, 'off').lower()
+    if mode not in MODES:
+        raise ValueError(f"{MODE_ENV} must be one of {MODES}, got '{mode}'")
+    return mode
+
+
+def record_session() -> str:
+    """ID of the current record session (inherited by child processes started after the first call)."""
+    return os.environ.setdefault(SESSION_ENV, uuid.uuid4().hex)
+
+
+def normalize_call(cmd: List[str]) -> Dict[str, Any]:
+    """Normalize an az argv so recordings match across machines and runs.
+
+    - '@file' parameter arguments (temp files with random names) are replaced
+      by a placeholder and their parsed JSON content is returned as 'params'
+    - Paths inside the repository are made repo-relative
+    """
+    argv = []
+    params = []
+    for arg in cmd:
+        if arg.startswith('@') and Path(arg[1:]).is_file():
+            params.append(json.loads(Path(arg[1:]).read_text()))
+            argv.append(f'@params[{len(params) - 1}]')
+            continue
+        try:
+            path = Path(arg)
+            if path.is_absolute() and path.exists():
+                arg = path.resolve().relative_to(REPO_ROOT).as_posix()
+        except (ValueError, OSError):
+            pass
+        argv.append(arg)
+    return {'argv': argv, 'params': params or None}
+
+
+def _key(call: Dict[str, Any]) -> str:
+    return json.dumps([call['argv'], call['params']], sort_keys=True)
+
+
+class Cassette:
+    """A JSON file of recorded az interactions."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._positions: Dict[str, int] = {}
+        self._index: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if not self.path.exists():
+            return {'interactions': []}
+        return json.loads(self.path.read_text())
+
+    def lookup(self, cmd: List[str]) -> Dict[str, Any]:
+        """Return the next recorded interaction for a call.
+
+        Repeated identical calls are served in recorded order; a call beyond
+        the recorded count is a miss.
+        """
+        if self._index is None:
+            self._index = {}
+            for interaction in self._load().get('interactions', []):
+                self._index.setdefault(_key(interaction), []).append(interaction)
+        call = normalize_call(cmd)
+        key = _key(call)
+        matches = self._index.get(key)
+        if not matches:
+            raise CassetteMiss(
+                f"No recorded az interaction in {self.path} for: az {' '.join(call['argv'][1:])}. "
+                f"Re-record with {MODE_ENV}=record."
+            )
+        position = self._positions.get(key, 0)
+        if position >= len(matches):
+            raise CassetteMiss(
+                f"az {' '.join(call['argv'][1:])} was recorded {len(matches)} time(s) in {self.path}, "
+                f"but called again. Re-record with {MODE_ENV}=record."
+            )
+        self._positions[key] = position + 1
+        return matches[position]
+
+    def record(self, cmd: List[str], result: subprocess.CompletedProcess, call: Dict[str, Any] = None) -> None:
+        """Append an interaction (merged under a lock so parallel workers can record).
+
+        Interactions recorded by an earlier record session are dropped first.
+        """
+        call = call or normalize_call(cmd)
+        interaction = {
+            **call,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'returncode': result.returncode
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        session = record_session()
+        with file_lock(self.path.with_suffix('.lock')):
+            data = self._load()
+            interactions = data.get('interactions', []) if data.get('session') == session else []
+            interactions.append(interaction)
+            write_text_atomic(self.path, json.dumps({'session': session, 'interactions': interactions},
+                                                    indent=2) + '\n')
+
+
+_cassette_name = 'default'
+_cassettes: Dict[Path, Cassette] = {}
+
+
+def use_cassette(name: str) -> None:
+    """Select the cassette used by subsequent az_run calls."""
+    global _cassette_name
+    _cassette_name = name
+
+
+def get_cassette() -> Cassette:
+    """Return the currently selected cassette (AZ_CASSETTE_DIR/<name>.json)."""
+    path = Path(os.getenv(DIR_ENV) or DEFAULT_CASSETTE_DIR) / f'{_cassette_name}.json'
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+def az_run(
+    cmd: List[str],
+    capture_output: bool = True,
+    text: bool = True,
+    check: bool = False,
+    **kwargs
+) -> subprocess.CompletedProcess:
+    """Run an az command through the cassette layer (same contract as subprocess.run).
+
+    Raises:
+        subprocess.CalledProcessError: If check is True and the (recorded) exit code is non-zero
+        FileNotFoundError: If az is not installed (off/record modes)
+        CassetteMiss: In replay mode when no matching interaction was recorded
+    """
+    mode = get_mode()
+    if not cmd or cmd[0] != 'az':
+        return subprocess.run(cmd, capture_output=capture_output, text=text, check=check, **kwargs)
+
+    # Replayed calls never reach ARM, so only live calls take a rate token
+    limiter = get_limiter() if mode != 'replay' else None
+    if limiter is not None:
+        limiter.acquire(cmd)
+    # az only logs the rate-limit response headers with --debug
+    debug = limiter is not None and capture_output and text and operation_class(cmd) is not None
+    with span(az_span_name(cmd), cat='az', mode=mode) as az_span:
+        result, debug_log = _az_run(cmd, mode, capture_output, text, debug, **kwargs)
+        az_span.set(returncode=result.returncode, stdout_bytes=len(result.stdout or ''))
+    if limiter is not None and text:
+        limiter.feedback(cmd, result.returncode, debug_log + (result.stderr or '') + (result.stdout or ''))
+    if check and result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+    return result
+
+
+def az_span_name(cmd: List[str]) -> str:
+    """Trace span name for an az call: the command words before the first option."""
+    words = []
+    for arg in cmd:
+        if arg.startswith('-'):
+            break
+        words.append(arg)
+    return ' '.join(words)
+
+
+def _az_run(cmd: List[str], mode: str, capture_output: bool, text: bool, debug: bool,
+            **kwargs) -> Tuple[subprocess.CompletedProcess, str]:
+    """Run (or replay) cmd; returns the result and the az --debug log split off its stderr.
+
+    With debug, az runs with --debug appended, but the result, the cassette
+    key and the recorded stderr are those of cmd as given.
+    """
+    if mode == 'replay':
+        interaction = get_cassette().lookup(cmd)
+        return subprocess.CompletedProcess(
+            cmd, interaction['returncode'], interaction['stdout'], interaction['stderr']), ''
+
+    # Normalize before running: temp params files may be deleted right after the call
+    call = normalize_call(cmd) if mode == 'record' else None
+    argv = cmd + ['--debug'] if debug else cmd
+    if mode == 'off':
+        result = subprocess.run(argv, capture_output=capture_output, text=text, check=False, **kwargs)
+    else:
+        result = subprocess.run(argv, capture_output=True, text=True, check=False, **kwargs)
+    debug_log = ''
+    if debug:
+        result.args = cmd
+        result.stderr, debug_log = split_debug_output(result.stderr)
+    if call is not None:
+        get_cassette().record(cmd, result, call)
+    return result, debug_log
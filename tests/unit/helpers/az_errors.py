@@ -0,0 +1,192 @@
+"""Classification and retry of Azure CLI errors.
+
+Splits `az` failures into categories so the harness can skip on environment
+problems (not logged in, SKU capacity), retry throttled or transient ARM
+errors with jittered exponential backoff, and fail fast on everything else.
+"""
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Set
+
+# Error categories
+AUTH = 'auth'                # Not logged in / token expired - skip
+CAPACITY = 'capacity'        # SKU not available in region - skip
+RG_DELETING = 'rg_deleting'  # Resource group is being deprovisioned - retry with long backoff
+THROTTLED = 'throttled'      # ARM 429 - retry
+TRANSIENT = 'transient'      # 5xx, timeouts, conflicting operations - retry
+PERMANENT = 'permanent'      # Template/validation/other errors - fail immediately
+
+# Categories that should skip the test instead of failing it
+SKIP_CATEGORIES = {AUTH, CAPACITY}
+
+# ARM error codes by category (compared case-insensitively)
+_CODE_CATEGORIES = {
+    AUTH: {'AuthenticationFailed', 'InvalidAuthenticationToken', 'ExpiredAuthenticationToken'},
+    CAPACITY: {'SkuNotAvailable', 'ZonalAllocationFailed', 'AllocationFailed', 'OverconstrainedAllocationRequest'},
+    RG_DELETING: {'ResourceGroupBeingDeleted'},
+    THROTTLED: {'TooManyRequests', 'RetryableError', 'SubscriptionRequestsThrottled'},
+    TRANSIENT: {
+        'InternalServerError', 'ServiceUnavailable', 'GatewayTimeout', 'BadGateway',
+        'RequestTimeout', 'AnotherOperationInProgress'
+    },
+}
+
+# Substring fallbacks for messages without a structured code (checked in order)
+_MESSAGE_PATTERNS = [
+    (AUTH, ('not logged in', 'authentication')),
+    (CAPACITY, ('skunotavailable', 'sku not available', 'capacity restrictions')),
+    (RG_DELETING, ('resourcegroupbeingdeleted', 'deprovisioning')),
+    (THROTTLED, ('too many requests', 'status code 429', '(429)', 'throttl')),
+    (TRANSIENT, ('timed out', 'connection reset', 'connection aborted', 'temporarily unavailable', 'status code 503')),
+]
+
+# Codes written by az as "(Code) message", "Code: X" or JSON {"code": "X"}
+_CODE_RES = [
+    re.compile(r'^\s*(?:ERROR:\s*)?\((\w+)\)', re.M),
+    re.compile(r'^\s*Code:\s*(\w+)', re.M),
+    re.compile(r'"code"\s*:\s*"(\w+)"'),
+]
+_RETRY_AFTER_RE = re.compile(r'retry[- ]after\D{0,5}(\d+)', re.I)
+
+
+@dataclass
+class AzError:
+    """Classified Azure CLI error."""
+    category: str
+    codes: Set[str] = field(default_factory=set)
+    message: str = ''
+    retry_after: Optional[float] = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.category in (THROTTLED, TRANSIENT, RG_DELETING)
+
+    @property
+    def should_skip(self) -> bool:
+        return self.category in SKIP_CATEGORIES
+
+
+def extract_error_codes(output: str) -> Set[str]:
+    """Extract structured ARM error codes (including nested details) from az output."""
+    codes = set()
+    for pattern in _CODE_RES:
+        codes.update(pattern.findall(output or ''))
+    return codes
+
+
+def classify_az_error(output: str) -> AzError:
+    """Classify az stderr/stdout into an error category.
+
+    Structured error codes take precedence over message substrings; when a
+    payload carries several codes the most actionable category wins
+    (skip > retry > permanent).
+    """
+    output = output or ''
+    codes = extract_error_codes(output)
+    lowered_codes = {code.lower() for code in codes}
+    retry_after_match = _RETRY_AFTER_RE.search(output)
+    retry_after = float(retry_after_match.group(1)) if retry_after_match else None
+
+    for category in (AUTH, CAPACITY, RG_DELETING, THROTTLED, TRANSIENT):
+        if lowered_codes & {code.lower() for code in _CODE_CATEGORIES[category]}:
+            return AzError(category, codes, output, retry_after)
+
+    lowered = output.lower()
+    for category, needles in _MESSAGE_PATTERNS:
+        if any(needle in lowered for needle in needles):
+            return AzError(category, codes, output, retry_after)
+    return AzError(PERMANENT, codes, output, retry_after)
+
+
+@dataclass
+class RetryPolicy:
+    """Retry settings for one error category."""
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than a server Retry-After."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    THROTTLED: RetryPolicy(max_attempts=5, base_delay=2.0, max_delay=60.0),
+    TRANSIENT: RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=30.0),
+    RG_DELETING: RetryPolicy(max_attempts=4, base_delay=15.0, max_delay=120.0),
+}
+
+
+class RetryBudget:
+    """Global cap on retries across all calls in a run (thread-safe)."""
+
+    def __init__(self, total: int):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        """Consume one retry; return False if the budget is exhausted."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+# Process-wide budget, override with AZ_RETRY_BUDGET
+DEFAULT_BUDGET = RetryBudget(int(os.getenv('AZ_RETRY_BUDGET', '10')))
+
+
+def run_with_retry(
+    call: Callable[[], tuple[bool, str]],
+    policies: Dict[str, RetryPolicy] = None,
+    budget: RetryBudget = None,
+    sleep: Callable[[float], None] = time.sleep
+) -> tuple[bool, str]:
+    """Run an az call, retrying throttled/transient failures.
+
+    Args:
+        call: Function returning (success, output), e.g. a run_what_if call
+        policies: Retry policy per category (default: DEFAULT_POLICIES)
+        budget: Shared retry budget (default: DEFAULT_BUDGET)
+        sleep: Sleep function (injectable for tests)
+
+    Returns:
+        Tuple of (success: bool, output: str) from the last attempt.
+        Permanent and skip-category errors are returned after a single attempt.
+    """
+    policies = DEFAULT_POLICIES if policies is None else policies
+    budget = DEFAULT_BUDGET if budget is None else budget
+    attempts: Dict[str, int] = {}
+    while True:
+        success, output = call()
+        if success:
+            return success, output
+        error = classify_az_error(output)
+        policy = policies.get(error.category)
+        if policy is None:
+            return success, output
+        attempt = attempts.get(error.category, 0) + 1
+        if attempt >= policy.max_attempts or not budget.take():
+            return success, output
+        attempts[error.category] = attempt
+        delay = policy.delay(attempt - 1, error.retry_after)
+        print(f"Retrying after {error.category} error ({', '.join(sorted(error.codes)) or 'no code'}) in {delay:.1f}s")
+        sleep(delay)
+
+
+def skip_reason(error: AzError, context: str) -> Optional[str]:
+    """Return a pytest skip reason for skip-category errors, else None."""
+    if error.category == AUTH:
+        return f"Azure CLI not configured - skipping {context}"
+    if error.category == CAPACITY:
+        return f"VM SKU not available in test location - skipping {context} (transient Azure capacity issue)"
+    return None
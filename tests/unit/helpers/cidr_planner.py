@@ -0,0 +1,222 @@
+"""VNet CIDR planner for a fleet of tenant params files.
+
+network.bicep derives its six /24 subnets by adding the subnet index to the
+third octet of vnetCidr (calculateSubnetCidr). The planner mirrors that
+derivation and checks, per tenant params file:
+
+- vnetCidr parses and its prefix length is /16-/24 (network.bicep's own check)
+- every derived subnet is a valid CIDR inside the VNet (a /24 VNet, or a base
+  address near the top of the range, cannot hold all six)
+
+and, across tenants that will be peered (same metadata.peeringGroup, or the
+whole fleet with --all-peered), reports overlapping VNet address spaces using
+an interval tree.
+
+Usage:
+    python -m tests.unit.helpers.cidr_planner tenants/*.json
+    python -m tests.unit.helpers.cidr_planner tenants/*.json --all-peered
+"""
+import argparse
+import ipaddress
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Mirrors network.bicep
+SUBNET_NAMES = [
+    'snet-appgw',
+    'snet-psql',
+    'snet-private-endpoints',
+    'snet-appsvc',
+    'snet-aks',
+    'AzureBastionSubnet',
+]
+SUBNET_PREFIX_LENGTH = 24
+VALID_PREFIX_LENGTHS = range(16, 25)
+
+
+def calculate_subnet_cidr(octet_a: int, octet_b: int, octet_c: int, subnet_index: int, prefix_length: int) -> str:
+    """Python copy of network.bicep's calculateSubnetCidr."""
+    return f'{octet_a}.{octet_b}.{octet_c + subnet_index}.0/{prefix_length}'
+
+
+def derive_subnets(vnet_cidr: str) -> List[Tuple[str, str]]:
+    """Derive (subnet name, CIDR) pairs exactly as network.bicep does.
+
+    Raises:
+        ValueError: If vnet_cidr cannot be split into four octets and a prefix length
+    """
+    base_ip, prefix = vnet_cidr.split('/')
+    int(prefix)
+    octets = [int(o) for o in base_ip.split('.')]
+    if len(octets) != 4:
+        raise ValueError(f"Expected 4 octets in '{base_ip}'")
+    return [
+        (name, calculate_subnet_cidr(octets[0], octets[1], octets[2], i, SUBNET_PREFIX_LENGTH))
+        for i, name in enumerate(SUBNET_NAMES)
+    ]
+
+
+def check_subnet_fit(vnet_cidr: str) -> List[str]:
+    """Return problems that would make network.bicep fail (or misbehave) for vnet_cidr."""
+    try:
+        network = ipaddress.IPv4Network(vnet_cidr, strict=False)
+        subnets = derive_subnets(vnet_cidr)
+    except ValueError as e:
+        return [f"vnetCidr '{vnet_cidr}' is not a valid IPv4 CIDR: {e}"]
+    problems = []
+    if network.prefixlen not in VALID_PREFIX_LENGTHS:
+        problems.append(f"vnetCidr '{vnet_cidr}' prefix length /{network.prefixlen} is outside /16-/24")
+    if str(network) != vnet_cidr:
+        problems.append(f"vnetCidr '{vnet_cidr}' has host bits set (network address is {network})")
+    for name, cidr in subnets:
+        try:
+            subnet = ipaddress.IPv4Network(cidr)
+        except ValueError:
+            problems.append(f"{name}: derived prefix {cidr} is not a valid CIDR")
+            continue
+        if not subnet.subnet_of(network):
+            problems.append(f"{name}: derived prefix {cidr} is outside vnetCidr {vnet_cidr}")
+    return problems
+
+
+class IntervalTree:
+    """Static interval tree over closed integer intervals.
+
+    Intervals are sorted by start and stored as an implicit balanced tree
+    (the middle of each range is the node), with each node augmented by the
+    maximum end in its subtree. Queries are O(log n + k).
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]]):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [item[0] for item in items]
+        self.ends = [item[1] for item in items]
+        self.payloads = [item[2] for item in items]
+        self.max_end = list(self.ends)
+        self._augment(0, len(items))
+
+    def _augment(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -1
+        mid = (lo + hi) // 2
+        self.max_end[mid] = max(self.ends[mid], self._augment(lo, mid), self._augment(mid + 1, hi))
+        return self.max_end[mid]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Indices (into the sorted order) of intervals overlapping [start, end]."""
+        found = []
+        stack = [(0, len(self.starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] < start:
+                continue
+            stack.append((lo, mid))
+            if self.starts[mid] <= end:
+                if self.ends[mid] >= start:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+        return found
+
+
+def cidr_interval(cidr: str) -> Tuple[int, int]:
+    network = ipaddress.IPv4Network(cidr, strict=False)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def find_overlaps(cidrs: List[Tuple[str, str]]) -> List[Tuple[str, str, str, str]]:
+    """Find overlapping address spaces.
+
+    Args:
+        cidrs: (owner, CIDR) pairs
+
+    Returns:
+        (owner, CIDR, other owner, other CIDR) for each overlapping pair, reported once
+    """
+    tree = IntervalTree((*cidr_interval(cidr), (owner, cidr)) for owner, cidr in cidrs)
+    overlaps = []
+    for i in range(len(tree)):
+        for j in tree.overlapping(tree.starts[i], tree.ends[i]):
+            if j > i:
+                overlaps.append((*tree.payloads[i], *tree.payloads[j]))
+    return overlaps
+
+
+@dataclass
+class TenantPlan:
+    """Planner result for one tenant params file."""
+    tenant: str
+    vnet_cidr: str
+    peering_group: Optional[str]
+    subnets: List[Tuple[str, str]] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FleetPlan:
+    tenants: List[TenantPlan]
+    overlaps: List[Tuple[str, str, str, str, str]]
+
+    @property
+    def success(self) -> bool:
+        return not self.overlaps and not any(t.problems for t in self.tenants)
+
+
+def load_tenant(params_file: Path) -> TenantPlan:
+    data = json.loads(Path(params_file).read_text())
+    vnet_cidr = data.get('parameters', {}).get('vnetCidr', {}).get('value', '')
+    plan = TenantPlan(Path(params_file).stem, vnet_cidr, data.get('metadata', {}).get('peeringGroup'))
+    plan.problems = check_subnet_fit(vnet_cidr)
+    if not plan.problems:
+        plan.subnets = derive_subnets(vnet_cidr)
+    return plan
+
+
+def plan_fleet(params_files: Iterable[Path], all_peered: bool = False) -> FleetPlan:
+    """Check subnet fit per tenant and VNet overlaps within each peering group.
+
+    Args:
+        params_files: Tenant params files (tenant name = file stem)
+        all_peered: Treat the whole fleet as one peering group
+
+    Returns:
+        FleetPlan; overlaps are (peering group, tenant, CIDR, other tenant, other CIDR)
+    """
+    tenants = [load_tenant(path) for path in params_files]
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    for tenant in tenants:
+        group = '*' if all_peered else tenant.peering_group
+        if group is None or not tenant.subnets:
+            continue
+        groups.setdefault(group, []).append((tenant.tenant, tenant.vnet_cidr))
+    overlaps = [(group, *overlap) for group, cidrs in sorted(groups.items()) for overlap in find_overlaps(cidrs)]
+    return FleetPlan(tenants, overlaps)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('params_files', nargs='+', type=Path, help='tenant params files')
+    parser.add_argument('--all-peered', action='store_true', help='check overlaps across the whole fleet')
+    args = parser.parse_args(argv)
+
+    plan = plan_fleet(args.params_files, all_peered=args.all_peered)
+    for tenant in plan.tenants:
+        for problem in tenant.problems:
+            print(f"SUBNET-FIT {tenant.tenant}: {problem}")
+    for group, tenant, cidr, other, other_cidr in plan.overlaps:
+        print(f"OVERLAP [{group}] {tenant} {cidr} <-> {other} {other_cidr}")
+    print(f"{len(plan.tenants)} tenants, "
+          f"{sum(1 for t in plan.tenants if t.problems)} with subnet problems, {len(plan.overlaps)} overlaps")
+    return 0 if plan.success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,229 @@
+"""Single-deployment what-if for the whole module test matrix.
+
+Instead of one what-if per test wrapper (17 ARM round trips, each evaluating
+naming.bicep again), build_composite() generates one composite template that
+evaluates naming once and includes every wrapper as a nested module. The
+composite what-if result is then split back per wrapper by resource ID so the
+existing per-module assertions run unchanged.
+
+Splitting works from the names each wrapper references: naming.bicep gives
+every name key a literal prefix (e.g. diagKv -> 'vd-diag-kv-'), so a change is
+assigned to every wrapper that references the key whose prefix matches the
+resource name (or, for literally named children such as subnets or secrets,
+its parent's name), narrowed by the resource types the wrapper's modules declare.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from tests.unit.helpers.result_broker import named_lock
+from tests.unit.helpers.test_utils import run_what_if_shared
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+NAMING_BICEP = REPO_ROOT / 'iac' / 'lib' / 'naming.bicep'
+# Same depth as tests/unit/fixtures so the wrappers' ../../../iac paths still resolve
+COMPOSITE_DIR = REPO_ROOT / 'tests' / 'unit' / '.composite'
+COMPOSITE_FILE = 'composite.bicep'
+
+_NAMING_BLOCK_RE = re.compile(r"(?:// Include naming module\n)?module\s+naming\s+'[^']+'\s*=\s*\{.*?\n\}\n", re.S)
+_DEPLOYMENT_NAME_RE = re.compile(r"(module\s+\w+\s+'[^']+'\s*=\s*(?:if\s*\([^\n]*\)\s*)?\{\s*\n\s*name:\s*')([^']+)'")
+_PARAM_RE = re.compile(r"^param\s+(\w+)\s+(\w+)(\s*=)?", re.M)
+_NAME_REF_RE = re.compile(r"naming\.outputs\.names\.(\w+)")
+_MODULE_REF_RE = re.compile(r"module\s+\w+\s+'([^']+\.bicep)'")
+_RESOURCE_TYPE_RE = re.compile(r"resource\s+\w+\s+'([^@']+)@")
+
+
+def load_name_prefixes(naming_bicep: Path = NAMING_BICEP) -> Dict[str, str]:
+    """Map naming.bicep name keys to their literal prefix (e.g. 'kv' -> 'vd-kv-')."""
+    prefixes = {}
+    for key, value in re.findall(r"^\s*(\w+):\s*'([^']*)'", naming_bicep.read_text(), re.M):
+        prefix = value.split('${', 1)[0]
+        if prefix:
+            prefixes[key] = prefix.lower()
+    return prefixes
+
+
+def _wrapper_identifier(module_name: str) -> str:
+    return 'w' + ''.join(part.capitalize() for part in re.split(r'[^A-Za-z0-9]', module_name))
+
+
+def transform_wrapper(text: str, module_name: str) -> Tuple[str, bool]:
+    """Rewrite a wrapper to take naming outputs as a parameter.
+
+    Returns:
+        Tuple of (new text, whether the wrapper used the naming module)
+    """
+    uses_naming = bool(_NAMING_BLOCK_RE.search(text))
+    if uses_naming:
+        text = _NAMING_BLOCK_RE.sub('', text, count=1)
+        text = text.replace('naming.outputs.names', 'names')
+        text = re.sub(r"^(targetScope\s*=.*\n)",
+                      r"\1\n@description('Naming outputs from the composite template.')\nparam names object\n",
+                      text, count=1, flags=re.M)
+    # Nested deployment names must be unique across all wrappers in one deployment
+    text = _DEPLOYMENT_NAME_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}-{module_name}'", text)
+    return text, uses_naming
+
+
+def build_composite(modules: List[Tuple[str, str]], fixtures_dir: Path, output_dir: Path = COMPOSITE_DIR) -> Path:
+    """Generate the composite template and transformed wrapper copies.
+
+    Args:
+        modules: (module_name, wrapper file) pairs, as in test_modules.MODULES
+        fixtures_dir: Directory containing the wrappers
+        output_dir: Where to write generated files (must be at the fixtures' depth)
+
+    Returns:
+        Path to the composite template
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # param name -> (type, required by at least one wrapper)
+    params: Dict[str, Tuple[str, bool]] = {}
+    wrapper_params: Dict[str, List[str]] = {}
+    uses_naming: Dict[str, bool] = {}
+    for module_name, bicep_file in modules:
+        text = (fixtures_dir / bicep_file).read_text()
+        transformed, uses_naming[module_name] = transform_wrapper(text, module_name)
+        (output_dir / bicep_file).write_text(transformed)
+        wrapper_params[module_name] = []
+        for name, param_type, has_default in _PARAM_RE.findall(text):
+            wrapper_params[module_name].append(name)
+            _, required = params.get(name, (param_type, False))
+            params[name] = (param_type, required or not has_default)
+
+    declared = {name for name, (_, required) in params.items() if required} | {'resourceGroupName'}
+    lines = [
+        "targetScope = 'resourceGroup'",
+        '',
+        '// Generated by tests/unit/helpers/composite_what_if.py - do not edit',
+        '',
+    ]
+    for name in sorted(declared):
+        lines.append(f"param {name} {params.get(name, ('string', True))[0]}")
+    lines += [
+        '',
+        "module naming '../../../iac/lib/naming.bicep' = {",
+        "  name: 'naming-composite'",
+        '  params: {',
+        '    resourceGroupName: resourceGroupName',
+        '  }',
+        '}',
+    ]
+    for module_name, bicep_file in modules:
+        lines += [
+            '',
+            f"module {_wrapper_identifier(module_name)} './{bicep_file}' = {{",
+            f"  name: 'wrapper-{module_name}'",
+            '  params: {',
+        ]
+        if uses_naming[module_name]:
+            lines.append('    names: naming.outputs.names')
+        for name in wrapper_params[module_name]:
+            if name in declared:
+                lines.append(f'    {name}: {name}')
+        lines += ['  }', '}']
+    composite_path = output_dir / COMPOSITE_FILE
+    composite_path.write_text('\n'.join(lines) + '\n')
+    return composite_path
+
+
+def _wrapper_profile(fixtures_dir: Path, bicep_file: str) -> Tuple[Set[str], Set[str]]:
+    """Return (naming keys referenced, resource types declared by referenced modules)."""
+    text = (fixtures_dir / bicep_file).read_text()
+    keys = set(_NAME_REF_RE.findall(text))
+    types = set()
+    for module_path in _MODULE_REF_RE.findall(text):
+        path = (fixtures_dir / module_path).resolve()
+        if path.exists():
+            types.update(t.lower() for t in _RESOURCE_TYPE_RE.findall(path.read_text()))
+    return keys, types
+
+
+def _resource_names_and_type(resource_id: str) -> Tuple[List[str], str]:
+    """Return the resource's name chain (outermost first) and its full type."""
+    segments = [s for s in resource_id.split('/') if s]
+    lowered = [s.lower() for s in segments]
+    names, type_parts = [], []
+    i = lowered.index('providers') if 'providers' in lowered else len(segments)
+    while i < len(segments):
+        if lowered[i] == 'providers':
+            type_parts = [segments[i + 1]] if i + 1 < len(segments) else []
+            i += 2
+            continue
+        type_parts.append(segments[i])
+        if i + 1 < len(segments):
+            names.append(segments[i + 1].lower())
+        i += 2
+    return names, '/'.join(type_parts).lower()
+
+
+def assign_changes(
+    changes: List[Dict],
+    modules: List[Tuple[str, str]],
+    fixtures_dir: Path,
+    naming_bicep: Path = NAMING_BICEP
+) -> Dict[str, List[Dict]]:
+    """Split composite what-if changes into per-wrapper lists.
+
+    Returns:
+        Dict of module_name -> changes; changes that match no wrapper are under '_unassigned'
+    """
+    prefixes = sorted(load_name_prefixes(naming_bicep).items(), key=lambda item: -len(item[1]))
+    profiles = {name: _wrapper_profile(fixtures_dir, bicep_file) for name, bicep_file in modules}
+    assigned: Dict[str, List[Dict]] = {name: [] for name, _ in modules}
+    assigned['_unassigned'] = []
+
+    def key_for(name: str):
+        return next((key for key, prefix in prefixes if name.startswith(prefix)), None)
+
+    for change in changes:
+        names, resource_type = _resource_names_and_type(change.get('resourceId', ''))
+        owners: Set[str] = set()
+        # Own name first, then parents (literally named children such as subnets)
+        for depth, name in enumerate(reversed(names)):
+            key = key_for(name)
+            if key is None:
+                continue
+            candidates = {m for m, (keys, _) in profiles.items() if key in keys}
+            typed = {m for m in candidates if resource_type in profiles[m][1]}
+            owners = candidates if depth == 0 else (typed or candidates)
+            if owners:
+                break
+        if not owners:
+            owners = {m for m, (_, types) in profiles.items() if resource_type in types}
+        for owner in sorted(owners) or ['_unassigned']:
+            assigned[owner].append(change)
+    return assigned
+
+
+def split_composite_output(output: str, modules: List[Tuple[str, str]], fixtures_dir: Path) -> Dict[str, str]:
+    """Split composite what-if JSON into per-module what-if JSON strings."""
+    data = json.loads(output)
+    per_module = assign_changes(data.get('changes', []), modules, fixtures_dir)
+    return {
+        name: json.dumps({**data, 'changes': changes})
+        for name, changes in per_module.items()
+    }
+
+
+def run_composite_what_if(
+    module_name: str,
+    modules: List[Tuple[str, str]],
+    fixtures_dir: Path,
+    result_format: str = 'FullResourcePayloads'
+) -> tuple[bool, str]:
+    """Return one module's slice of the composite what-if (same contract as run_what_if).
+
+    The composite what-if runs once per session and result format (shared via
+    the result broker); if it fails, every module gets the composite error.
+    """
+    with named_lock('composite-what-if-build'):
+        composite_path = build_composite(modules, fixtures_dir)
+    success, output = run_what_if_shared(composite_path, result_format=result_format)
+    if not success:
+        return success, output
+    try:
+        return True, split_composite_output(output, modules, fixtures_dir)[module_name]
+    except (json.JSONDecodeError, KeyError) as e:
+        return False, f"Failed to split composite what-if output for {module_name}: {e}"
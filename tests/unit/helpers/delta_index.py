@@ -0,0 +1,187 @@
+"""Property-path index over what-if delta trees.
+
+Answers questions like "did properties.networkAcls.defaultAction change on any
+storage account?" without walking every nested 'delta' list by hand.
+"""
+import bisect
+import fnmatch
+from typing import Dict, List, Any, Optional, Iterator, Sequence
+
+from tests.unit.helpers.what_if_parser import get_resource_type
+
+# Characters that start a glob pattern (fnmatch syntax)
+_GLOB_CHARS = '*?['
+# Characters that may belong to a glob construct (a literal suffix starts after the last one)
+_GLOB_SYNTAX = '*?[]'
+
+
+class DeltaPathIndex:
+    """Sorted index from dotted property paths to delta entries.
+
+    The index is built lazily on the first query. Exact path lookups are a
+    binary search. A glob is only matched against the smallest of these
+    candidate sets:
+
+    - the literal prefix before the first wildcard (a range of the sorted paths)
+    - the literal suffix after the last wildcard (a range of the paths sorted
+      by their reversed string, for patterns like '*.defaultAction')
+    - the rows holding a literal dot-separated segment of the pattern (for
+      patterns like 'properties.*.ipRules.*')
+
+    Only a pattern with none of them (e.g. '*') scans every path.
+    """
+
+    def __init__(self, resource_changes: List[Dict[str, Any]]):
+        """Create an index over resource changes.
+
+        Args:
+            resource_changes: 'resource_changes' from parse_what_if_output
+        """
+        self._resource_changes = resource_changes
+        self._paths: Optional[List[str]] = None
+        self._entries: List[Dict[str, Any]] = []
+        # Reversed paths in sorted order and the row of each
+        self._reversed: List[str] = []
+        self._reversed_rows: List[int] = []
+        # Path segment -> rows whose path has it (ascending)
+        self._segments: Dict[str, List[int]] = {}
+
+    def _build(self) -> None:
+        rows = []
+        for change in self._resource_changes:
+            resource_id = change.get('resource_id', '')
+            context = {
+                'resource_id': resource_id,
+                'resource_type': get_resource_type(resource_id),
+                'resource_change_type': change.get('change_type')
+            }
+            for path, entry in _walk(change.get('delta') or [], ''):
+                rows.append((path, len(rows), {
+                    **context,
+                    'path': path,
+                    'change_type': entry.get('propertyChangeType'),
+                    'before': entry.get('before'),
+                    'after': entry.get('after')
+                }))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        self._paths = [row[0] for row in rows]
+        self._entries = [row[2] for row in rows]
+        by_suffix = sorted((path[::-1], i) for i, path in enumerate(self._paths))
+        self._reversed = [reversed_path for reversed_path, _ in by_suffix]
+        self._reversed_rows = [i for _, i in by_suffix]
+        self._segments = {}
+        for i, path in enumerate(self._paths):
+            for segment in set(path.split('.')):
+                self._segments.setdefault(segment, []).append(i)
+
+    def _ensure_built(self) -> None:
+        if self._paths is None:
+            self._build()
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._paths)
+
+    def lookup(self, path: str, resource_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return delta entries at an exact property path.
+
+        Args:
+            path: Dotted property path (e.g. 'properties.networkAcls.defaultAction')
+            resource_type: Optional resource type filter (case-insensitive)
+
+        Returns:
+            List of entries with keys: 'resource_id', 'resource_type',
+            'resource_change_type', 'path', 'change_type', 'before', 'after'
+        """
+        self._ensure_built()
+        lo = bisect.bisect_left(self._paths, path)
+        hi = bisect.bisect_right(self._paths, path, lo)
+        return list(_filter_type(self._entries[lo:hi], resource_type))
+
+    def glob(self, pattern: str, resource_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return delta entries whose path matches a glob pattern.
+
+        Args:
+            pattern: fnmatch-style pattern (e.g. 'properties.networkAcls.*')
+            resource_type: Optional resource type filter (case-insensitive)
+
+        Returns:
+            List of matching entries (same shape as lookup())
+        """
+        wildcard = min((pattern.find(c) for c in _GLOB_CHARS if c in pattern), default=-1)
+        if wildcard == -1:
+            return self.lookup(pattern, resource_type)
+        self._ensure_built()
+        matches = (
+            self._entries[i] for i in self._candidates(pattern, wildcard)
+            if fnmatch.fnmatchcase(self._paths[i], pattern)
+        )
+        return list(_filter_type(matches, resource_type))
+
+    def _candidates(self, pattern: str, wildcard: int) -> Sequence[int]:
+        """Ascending rows that can match pattern (the smallest indexed superset)."""
+        prefix = pattern[:wildcard]
+        lo, hi = _prefix_range(self._paths, prefix)
+        best: Sequence[int] = range(lo, hi)
+
+        suffix = pattern[max(pattern.rfind(c) for c in _GLOB_SYNTAX) + 1:]
+        if suffix:
+            lo, hi = _prefix_range(self._reversed, suffix[::-1])
+            if hi - lo < len(best):
+                best = sorted(self._reversed_rows[lo:hi])
+
+        # Segments between two dots match whole path segments (first/last are covered above);
+        # a dot inside a [...] class is no segment boundary
+        segments = pattern.split('.')[1:-1] if '[' not in pattern else []
+        for segment in segments:
+            if segment and not any(c in segment for c in _GLOB_SYNTAX):
+                rows = self._segments.get(segment, [])
+                if len(rows) < len(best):
+                    best = rows
+        return best
+
+    def changed(
+        self,
+        pattern: str,
+        resource_type: Optional[str] = None,
+        change_types: tuple = ('Create', 'Delete', 'Modify', 'Array')
+    ) -> bool:
+        """Check whether any property matching the path or glob actually changed.
+
+        NoEffect and Ignore entries are not counted as changes.
+        """
+        return any(entry['change_type'] in change_types for entry in self.glob(pattern, resource_type))
+
+
+def _prefix_range(keys: List[str], prefix: str) -> tuple:
+    """[lo, hi) of the sorted keys starting with prefix."""
+    if not prefix:
+        return 0, len(keys)
+    lo = bisect.bisect_left(keys, prefix)
+    return lo, bisect.bisect_left(keys, prefix + '\U0010ffff', lo)
+
+
+def _walk(delta: List[Dict], prefix: str) -> Iterator[tuple]:
+    for entry in delta:
+        path = str(entry.get('path', ''))
+        full_path = f"{prefix}.{path}" if prefix and path else (prefix or path)
+        yield full_path, entry
+        children = entry.get('children')
+        if children:
+            yield from _walk(children, full_path)
+
+
+def _filter_type(entries, resource_type: Optional[str]):
+    if resource_type is None:
+        return entries
+    wanted = resource_type.lower()
+    return (entry for entry in entries if entry['resource_type'].lower() == wanted)
+
+
+def build_delta_index(parsed_what_if: Dict[str, Any]) -> DeltaPathIndex:
+    """Return the (cached) DeltaPathIndex for a parse_what_if_output result."""
+    index = parsed_what_if.get('delta_index')
+    if index is None:
+        index = DeltaPathIndex(parsed_what_if.get('resource_changes', []))
+        parsed_what_if['delta_index'] = index
+    return index
@@ -0,0 +1,113 @@
+"""Per-resource-group ledger of the last successful deployment of each module.
+
+For every module the ledger records the hash of its compiled ARM template, the
+hash of its resolved parameters and its outputs. WaveDeployer(ledger=...)
+skips a module whose hashes match the ledger (reusing the recorded outputs)
+unless one of its dependencies was redeployed in the same run.
+
+Hashes only cover the template and its inputs: changes made to the resources
+outside of these deployments are not detected. Deploy without the ledger (or
+delete the ledger file) to force a full redeployment.
+"""
+import hashlib
+import json
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.result_broker import file_lock, write_text_atomic
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+LEDGER_DIR = REPO_ROOT / 'tests' / 'e2e' / '.deploy-state'
+
+
+def _sha256(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def compile_template(bicep_file: Path) -> tuple[bool, str]:
+    """Compile a Bicep file to ARM JSON.
+
+    Returns:
+        Tuple of (success: bool, output: str) - template JSON or error
+    """
+    try:
+        result = az_run(
+            ['az', 'bicep', 'build', '--file', str(bicep_file), '--stdout'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return True, result.stdout
+    except subprocess.CalledProcessError as e:
+        return False, e.stderr or str(e)
+    except FileNotFoundError:
+        return False, "Azure CLI not found. Please install Azure CLI."
+
+
+def template_hash(compiled: str) -> str:
+    """Hash a compiled ARM template, ignoring the Bicep generator metadata.
+
+    metadata._generator holds the Bicep version, so upgrading Bicep alone does
+    not mark every module as changed.
+    """
+    template = json.loads(compiled)
+    metadata = template.get('metadata')
+    if isinstance(metadata, dict):
+        template['metadata'] = {k: v for k, v in metadata.items() if k != '_generator'}
+    return _sha256(template)
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """Hash resolved module parameters (values are never written to the ledger)."""
+    return _sha256(params)
+
+
+class DeploymentLedger:
+    """JSON ledger of module deployments to one resource group."""
+
+    def __init__(self, resource_group: str, subscription_id: str = '', path: Optional[Path] = None):
+        """
+        Args:
+            resource_group: Resource group the ledger describes
+            subscription_id: Subscription of the resource group; entries recorded
+                for a different subscription are ignored
+            path: Ledger file (default: tests/e2e/.deploy-state/<rg>.ledger.json)
+        """
+        self.resource_group = resource_group
+        self.subscription_id = subscription_id
+        self.path = Path(path) if path else LEDGER_DIR / f'{resource_group}.ledger.json'
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get('subscription_id', '') == subscription_id:
+                self.entries = data.get('modules', {})
+
+    def is_current(self, module: str, template: str, params: str) -> bool:
+        """Whether the module's last successful deployment used the same template and params hashes."""
+        entry = self.entries.get(module)
+        return bool(entry) and entry.get('template_hash') == template and entry.get('params_hash') == params
+
+    def outputs(self, module: str) -> Dict[str, Any]:
+        return self.entries.get(module, {}).get('outputs', {})
+
+    def record(self, module: str, template: str, params: str, outputs: Dict[str, Any]) -> None:
+        """Record a successful module deployment."""
+        with self._lock:
+            self.entries[module] = {
+                'template_hash': template,
+                'params_hash': params,
+                'outputs': outputs,
+                'deployed_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.path.with_suffix('.lock')):
+                write_text_atomic(self.path, json.dumps({
+                    'resource_group': self.resource_group,
+                    'subscription_id': self.subscription_id,
+                    'modules': self.entries
+                }, indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,443 @@
+"""Submit a deployment with --no-wait and stream its operations while it runs.
+
+`az deployment group create` blocks until the whole deployment ends, so a
+resource that fails in minute 3 is only reported in minute 30. The monitor
+submits the deployment with --no-wait and polls:
+
+- `az deployment operation group list` for the top-level deployment and every
+  nested module deployment it starts. The query projects only the fields the
+  monitor needs (the error message only for failed operations), and each poll
+  is diffed against the last, so only operations whose state changed are
+  reported.
+- `az deployment group show` (provisioningState only) for the overall state.
+
+Each change is printed and appended to a JSONL event log as it happens. With
+cancel_on_failure, the first failed operation cancels the deployment
+(`az deployment group cancel`) instead of waiting for the rest to finish.
+
+The operations feed is pluggable: AzDeploymentFeed talks to ARM, and
+SimulatedDeploymentFeed replays a scripted timeline on a virtual clock
+(no Azure, no waiting).
+
+Usage:
+    python -m tests.unit.helpers.deploy_monitor --resource-group rg --template-file iac/main.bicep \\
+        --parameters params.json --cancel-on-failure
+    python -m tests.unit.helpers.deploy_monitor --simulate timeline.json --cancel-on-failure
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.tracing import span
+
+POLL_INTERVAL = 10.0
+TERMINAL_STATES = ('Succeeded', 'Failed', 'Canceled')
+DEPLOYMENT_TYPE = 'Microsoft.Resources/deployments'
+
+# Projection for `az deployment operation group list`: statusMessage can be large,
+# so it is only included for failed operations
+OPERATIONS_QUERY = (
+    "[].{id: operationId, state: properties.provisioningState, timestamp: properties.timestamp, "
+    "code: properties.statusCode, resourceId: properties.targetResource.id, "
+    "type: properties.targetResource.resourceType, name: properties.targetResource.resourceName, "
+    "error: properties.provisioningState == 'Failed' && properties.statusMessage || `null`}"
+)
+
+# (resource group, deployment name)
+DeploymentKey = Tuple[str, str]
+
+
+@dataclass
+class OperationEvent:
+    """A deployment operation that changed state between two polls."""
+    elapsed: float
+    deployment: str
+    operation_id: str
+    resource_type: str
+    resource_name: str
+    state: str
+    previous: Optional[str] = None
+    status_code: Optional[str] = None
+    error: Any = None
+
+    @property
+    def failed(self) -> bool:
+        return self.state == 'Failed'
+
+    def describe(self) -> str:
+        line = f"[{self.elapsed:7.1f}s] {self.state:<10} {self.resource_type}/{self.resource_name}"
+        if self.deployment:
+            line += f" ({self.deployment})"
+        if self.failed and self.error:
+            line += f"\n    {json.dumps(self.error)}"
+        return line
+
+
+@dataclass
+class MonitorResult:
+    name: str
+    state: str
+    seconds: float
+    events: List[OperationEvent] = field(default_factory=list)
+    canceled: bool = False
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return self.state == 'Succeeded' and not self.failed
+
+    @property
+    def failed(self) -> List[OperationEvent]:
+        return [e for e in self.events if e.failed]
+
+
+def _resource_group_of(resource_id: str) -> Optional[str]:
+    parts = (resource_id or '').split('/')
+    lowered = [p.lower() for p in parts]
+    if 'resourcegroups' in lowered:
+        index = lowered.index('resourcegroups') + 1
+        return parts[index] if index < len(parts) else None
+    return None
+
+
+class AzDeploymentFeed:
+    """Deployment operations from ARM through az (and az_run's cassette layer)."""
+
+    def __init__(self, resource_group: str):
+        self.resource_group = resource_group
+
+    def _az(self, cmd: List[str]) -> Tuple[bool, str]:
+        try:
+            result = az_run(['az', *cmd], capture_output=True, text=True, check=False)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+        if result.returncode != 0:
+            return False, result.stderr or result.stdout
+        return True, result.stdout
+
+    def submit(self, name: str, template_file: Path, params_file: Path, mode: str = 'Complete') -> Tuple[bool, str]:
+        return self._az([
+            'deployment', 'group', 'create',
+            '--resource-group', self.resource_group,
+            '--name', name,
+            '--template-file', str(template_file),
+            '--parameters', f'@{params_file}',
+            '--mode', mode,
+            '--no-wait'
+        ])
+
+    def state(self, name: str) -> Tuple[bool, str]:
+        success, output = self._az([
+            'deployment', 'group', 'show', '--resource-group', self.resource_group, '--name', name,
+            '--query', 'properties.provisioningState', '--output', 'tsv'
+        ])
+        return success, output.strip()
+
+    def operations(self, resource_group: str, name: str) -> Tuple[bool, Any]:
+        success, output = self._az([
+            'deployment', 'operation', 'group', 'list', '--resource-group', resource_group, '--name', name,
+            '--query', OPERATIONS_QUERY, '--output', 'json'
+        ])
+        if not success:
+            return False, output
+        try:
+            return True, json.loads(output or '[]')
+        except json.JSONDecodeError as e:
+            return False, f"Could not parse operations: {e}"
+
+    def cancel(self, name: str) -> Tuple[bool, str]:
+        return self._az(['deployment', 'group', 'cancel', '--resource-group', self.resource_group, '--name', name])
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def clock(self) -> float:
+        return time.monotonic()
+
+
+class SimulatedDeploymentFeed:
+    """Scripted deployment on a virtual clock, same interface as AzDeploymentFeed.
+
+    The timeline is a list of entries applied once the clock reaches `at`
+    (seconds after submit). Entries with an `id` update an operation of
+    `deployment` (default: the submitted one) using the OPERATIONS_QUERY
+    fields; entries without one set the deployment's provisioningState:
+
+        [{"at": 5, "id": "op1", "type": "Microsoft.Resources/deployments", "name": "kv", "state": "Running",
+          "resourceId": "/subscriptions/s/resourceGroups/rg/providers/Microsoft.Resources/deployments/kv"},
+         {"at": 40, "deployment": "kv", "id": "op2", "type": "Microsoft.KeyVault/vaults", "name": "kv1",
+          "state": "Failed", "error": {"code": "Conflict"}},
+         {"at": 1800, "state": "Failed"}]
+
+    Canceling marks the deployment and every running operation Canceled and
+    drops the rest of the timeline.
+    """
+
+    def __init__(self, resource_group: str, timeline: List[Dict[str, Any]]):
+        self.resource_group = resource_group
+        self.timeline = sorted(timeline, key=lambda entry: entry.get('at', 0))
+        self.now = 0.0
+        self.name: Optional[str] = None
+        self.states: Dict[str, str] = {}
+        self.ops: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.calls: Dict[str, int] = {'submit': 0, 'state': 0, 'operations': 0, 'cancel': 0}
+
+    def _advance(self) -> None:
+        while self.timeline and self.timeline[0].get('at', 0) <= self.now:
+            entry = dict(self.timeline.pop(0))
+            entry.pop('at', None)
+            deployment = entry.pop('deployment', None) or self.name
+            if 'id' in entry:
+                # Later entries for the same id only need the fields that change
+                operation = self.ops.setdefault(deployment, {}).setdefault(
+                    entry['id'], {'state': 'Running', 'code': None, 'resourceId': None, 'error': None})
+                operation.update(entry, timestamp=f'{self.now:.1f}')
+            else:
+                self.states[deployment] = entry['state']
+
+    def submit(self, name: str, template_file: Path, params_file: Path, mode: str = 'Complete') -> Tuple[bool, str]:
+        self.calls['submit'] += 1
+        self.name = name
+        self.states[name] = 'Running'
+        self._advance()
+        return True, ''
+
+    def state(self, name: str) -> Tuple[bool, str]:
+        self.calls['state'] += 1
+        self._advance()
+        if name not in self.states:
+            return False, f"DeploymentNotFound: {name}"
+        return True, self.states[name]
+
+    def operations(self, resource_group: str, name: str) -> Tuple[bool, Any]:
+        self.calls['operations'] += 1
+        self._advance()
+        return True, [dict(op) for op in self.ops.get(name, {}).values()]
+
+    def cancel(self, name: str) -> Tuple[bool, str]:
+        self.calls['cancel'] += 1
+        self.timeline = []
+        self.states[name] = 'Canceled'
+        for operations in self.ops.values():
+            for op in operations.values():
+                if op['state'] not in TERMINAL_STATES:
+                    op['state'] = 'Canceled'
+        return True, ''
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def clock(self) -> float:
+        return self.now
+
+
+class DeploymentMonitor:
+    """Poll a submitted deployment and report operation state changes as they happen."""
+
+    def __init__(
+        self,
+        feed,
+        name: str,
+        poll_interval: float = POLL_INTERVAL,
+        cancel_on_failure: bool = False,
+        log_file: Optional[Path] = None,
+        output: Callable[[str], None] = print
+    ):
+        self.feed = feed
+        self.name = name
+        self.poll_interval = poll_interval
+        self.cancel_on_failure = cancel_on_failure
+        self.log_file = Path(log_file) if log_file else None
+        self.output = output
+        self._root: DeploymentKey = (feed.resource_group, name)
+        # Deployments still polled, with the state of the operation that started each nested one
+        self._active: Dict[DeploymentKey, Optional[str]] = {self._root: None}
+        self._seen: Dict[str, str] = {}
+        self._list_errors: Dict[DeploymentKey, str] = {}
+        self._start = 0.0
+
+    def _record(self, event: OperationEvent) -> None:
+        self.output(event.describe())
+        if self.log_file:
+            with open(self.log_file, 'a') as log:
+                log.write(json.dumps({'name': self.name, **asdict(event)}) + '\n')
+
+    def _changes(self, deployment: DeploymentKey, operations: List[Dict[str, Any]]) -> List[OperationEvent]:
+        """Operations whose state changed since the last poll (nested deployments are queued)."""
+        events = []
+        for op in operations:
+            key = op.get('id') or f"{deployment[1]}/{op.get('type')}/{op.get('name')}"
+            state = op.get('state') or 'Unknown'
+            previous = self._seen.get(key)
+            if previous == state:
+                continue
+            self._seen[key] = state
+            if op.get('type') == DEPLOYMENT_TYPE and op.get('name'):
+                nested = (_resource_group_of(op.get('resourceId')) or deployment[0], op['name'])
+                if nested != self._root:
+                    self._active[nested] = state
+            events.append(OperationEvent(
+                elapsed=round(self.feed.clock() - self._start, 3),
+                deployment='' if deployment == self._root else deployment[1],
+                operation_id=key,
+                resource_type=op.get('type') or '',
+                resource_name=op.get('name') or '',
+                state=state,
+                previous=previous,
+                status_code=op.get('code'),
+                error=op.get('error')
+            ))
+        return events
+
+    def poll(self) -> List[OperationEvent]:
+        """List the operations of every deployment still in progress, once.
+
+        Nested deployments are polled until the operation that started them is
+        terminal; the listing in that same pass is their last.
+        """
+        events: List[OperationEvent] = []
+        pending = list(self._active)
+        listed = set()
+        while pending:
+            deployment = pending.pop(0)
+            listed.add(deployment)
+            success, operations = self.feed.operations(*deployment)
+            if not success:
+                # A nested deployment can be listed before ARM has created it; retried next poll
+                self._list_errors[deployment] = str(operations).strip()
+                continue
+            self._list_errors.pop(deployment, None)
+            events += self._changes(deployment, operations)
+            # Nested deployments started since the last poll are listed in this pass too
+            pending += [d for d in self._active if d not in listed and d not in pending]
+        for deployment, state in list(self._active.items()):
+            if deployment != self._root and state in TERMINAL_STATES and deployment not in self._list_errors:
+                del self._active[deployment]
+        return events
+
+    def run(self, max_state_errors: int = 3) -> MonitorResult:
+        """Poll until the deployment reaches a terminal state.
+
+        Args:
+            max_state_errors: Consecutive failed state checks before giving up
+
+        Returns:
+            MonitorResult with every state change seen, in order
+        """
+        self._start = self.feed.clock()
+        result = MonitorResult(name=self.name, state='Running', seconds=0.0)
+        state_errors = 0
+        with span('deploy_monitor', deployment=self.name, cancel_on_failure=self.cancel_on_failure) as monitor_span:
+            while True:
+                # State before operations, so the pass that sees a terminal state also sees the final operations
+                success, state = self.feed.state(self.name)
+                events = self.poll()
+                for event in events:
+                    self._record(event)
+                result.events += events
+
+                if success:
+                    state_errors = 0
+                    result.state = state
+                    if state in TERMINAL_STATES:
+                        break
+                else:
+                    state_errors += 1
+                    if state_errors >= max_state_errors:
+                        result.state = 'Unknown'
+                        result.errors.append(f"Deployment state unavailable: {state}")
+                        break
+
+                if self.cancel_on_failure and not result.canceled and result.failed:
+                    first = result.failed[0]
+                    self.output(f"Cancelling {self.name}: {first.resource_type}/{first.resource_name} failed")
+                    cancelled, output = self.feed.cancel(self.name)
+                    result.canceled = cancelled
+                    if not cancelled:
+                        result.errors.append(f"Cancel failed: {output.strip()}")
+                self.feed.sleep(self.poll_interval)
+            result.seconds = round(self.feed.clock() - self._start, 3)
+            result.errors += [f"{name}: {error}" for (_, name), error in self._list_errors.items()]
+            monitor_span.set(state=result.state, events=len(result.events), canceled=result.canceled)
+        return result
+
+
+def deployment_name(prefix: str = 'main') -> str:
+    return f"{prefix}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def deploy_and_monitor(
+    feed,
+    template_file: Path,
+    params_file: Path,
+    name: Optional[str] = None,
+    mode: str = 'Complete',
+    **monitor_args: Any
+) -> MonitorResult:
+    """Submit a deployment with --no-wait and monitor it to completion.
+
+    Args:
+        feed: AzDeploymentFeed or SimulatedDeploymentFeed
+        template_file: Bicep or JSON template
+        params_file: Parameters file
+        name: Deployment name (default: generated, so reruns never attach to an old deployment)
+        mode: Deployment mode
+        **monitor_args: DeploymentMonitor options (poll_interval, cancel_on_failure, log_file, output)
+
+    Returns:
+        MonitorResult (state 'NotSubmitted' with the az error if the submit failed)
+    """
+    name = name or deployment_name(Path(template_file).stem)
+    success, output = feed.submit(name, template_file, params_file, mode)
+    if not success:
+        return MonitorResult(name=name, state='NotSubmitted', seconds=0.0, errors=[output.strip()])
+    return DeploymentMonitor(feed, name, **monitor_args).run()
+
+
+def format_result(result: MonitorResult) -> str:
+    summary = f"{result.name}: {result.state} after {result.seconds:.0f}s, {len(result.events)} state changes"
+    if result.failed:
+        summary += f", {len(result.failed)} failed operations"
+    if result.canceled:
+        summary += " (cancelled on first failure)"
+    return "\n".join([summary] + [f"ERROR {error}" for error in result.errors])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resource-group', help='target resource group')
+    parser.add_argument('--template-file', type=Path, default=Path('iac/main.bicep'))
+    parser.add_argument('--parameters', type=Path, help='parameters file')
+    parser.add_argument('--name', help='deployment name (default: generated)')
+    parser.add_argument('--mode', default='Complete', choices=['Complete', 'Incremental'])
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--cancel-on-failure', action='store_true', help='cancel on the first failed operation')
+    parser.add_argument('--log', type=Path, help='append state changes to this JSONL file')
+    parser.add_argument('--simulate', type=Path, help='replay this timeline JSON instead of deploying')
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        feed = SimulatedDeploymentFeed(args.resource_group or 'simulated-rg', json.loads(args.simulate.read_text()))
+    elif not args.resource_group or not args.parameters:
+        parser.error('--resource-group and --parameters are required (or pass --simulate)')
+    else:
+        feed = AzDeploymentFeed(args.resource_group)
+
+    result = deploy_and_monitor(feed, args.template_file, args.parameters, name=args.name, mode=args.mode,
+                                poll_interval=args.poll_interval, cancel_on_failure=args.cancel_on_failure,
+                                log_file=args.log)
+    print(format_result(result))
+    return 0 if result.success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
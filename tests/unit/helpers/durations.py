@@ -0,0 +1,154 @@
+"""Observed what-if and deployment durations, and longest-first scheduling.
+
+Module costs are very uneven (gateway, psql and vm-jumphost take far longer
+than identity or public-ip), so the order in which parallel work is handed to
+a worker pool decides when the run finishes. DurationDB keeps the last
+HISTORY_SIZE durations per (kind, region, module) in a small JSON file;
+lpt_order() sorts modules longest-expected-first (LPT list scheduling) and
+predict_makespan() simulates the pool to predict the completion time.
+
+Used by:
+- tests/conftest.py: orders test_modules.py what-if tests longest-first and
+  prints the predicted what-if completion time in the pytest header
+- run_what_if_shared: records what-if durations
+- WaveDeployer(durations=...): orders each wave longest-first, predicts the
+  deployment completion time and records deployment durations
+"""
+import heapq
+import json
+import os
+import statistics
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from tests.unit.helpers.result_broker import file_lock, write_text_atomic
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_PATH = REPO_ROOT / 'tests' / '.durations' / 'durations.json'
+FIXTURES_DIR = REPO_ROOT / 'tests' / 'unit' / 'fixtures'
+HISTORY_SIZE = 10
+# Used for modules never observed when nothing else is known
+DEFAULT_SECONDS = 60.0
+# Set by the first pytest process so xdist workers order tests from the same data
+SNAPSHOT_ENV = 'HARNESS_DURATIONS_SNAPSHOT'
+
+
+class DurationDB:
+    """{kind: {region: {module: [seconds, ...]}}} stored as JSON."""
+
+    def __init__(self, path: Optional[Path] = None, data: Optional[Dict[str, Any]] = None):
+        self.path = Path(path) if path else DEFAULT_PATH
+        if data is not None:
+            self.data = data
+        else:
+            self.data = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    @classmethod
+    def shared(cls) -> 'DurationDB':
+        """The DB as of the start of this pytest session (snapshot shared with xdist workers)."""
+        snapshot = os.getenv(SNAPSHOT_ENV)
+        if snapshot:
+            return cls(data=json.loads(snapshot))
+        db = cls()
+        os.environ[SNAPSHOT_ENV] = json.dumps(db.data)
+        return db
+
+    def record(self, kind: str, module: str, region: str, seconds: float) -> None:
+        """Append an observation (merged under a file lock with other processes' writes)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path.with_suffix('.lock')):
+            self.data = self._load()
+            samples = self.data.setdefault(kind, {}).setdefault(region.lower(), {}).setdefault(module, [])
+            samples.append(round(seconds, 3))
+            del samples[:-HISTORY_SIZE]
+            write_text_atomic(self.path, json.dumps(self.data, indent=2, sort_keys=True) + '\n')
+
+    def expected(self, kind: str, module: str, region: Optional[str] = None) -> Optional[float]:
+        """Median observed duration in region, else across all regions; None if never observed."""
+        regions = self.data.get(kind, {})
+        samples = regions.get((region or '').lower(), {}).get(module)
+        if not samples:
+            samples = [s for by_module in regions.values() for s in by_module.get(module, [])]
+        return statistics.median(samples) if samples else None
+
+    def estimates(self, kind: str, modules: Iterable[str], region: Optional[str] = None) -> Dict[str, float]:
+        """Expected duration per module; unobserved modules get the median of the observed ones."""
+        known = {m: self.expected(kind, m, region) for m in modules}
+        observed = [v for v in known.values() if v is not None]
+        fallback = statistics.median(observed) if observed else DEFAULT_SECONDS
+        return {m: fallback if v is None else v for m, v in known.items()}
+
+    def has_data(self, kind: str) -> bool:
+        return any(self.data.get(kind, {}).values())
+
+
+def lpt_order(estimates: Dict[str, float]) -> List[str]:
+    """Modules longest-expected-first (ties by name)."""
+    return sorted(estimates, key=lambda m: (-estimates[m], m))
+
+
+def predict_makespan(estimates: Dict[str, float], workers: int, order: Optional[List[str]] = None) -> float:
+    """Simulate list scheduling: each module goes to the first free worker, in order (default LPT)."""
+    finish = [0.0] * max(1, min(workers, len(estimates) or 1))
+    for module in order or lpt_order(estimates):
+        heapq.heapreplace(finish, finish[0] + estimates[module])
+    return max(finish)
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    return f'{minutes}m{secs:02d}s' if minutes else f'{secs}s'
+
+
+def format_prediction(label: str, estimates: Dict[str, float], workers: int, makespan: Optional[float] = None) -> str:
+    makespan = predict_makespan(estimates, workers) if makespan is None else makespan
+    longest = ', '.join(f'{m} {format_seconds(estimates[m])}' for m in lpt_order(estimates)[:3])
+    return (f"Predicted {label} completion: {format_seconds(makespan)} for {len(estimates)} modules "
+            f"on {workers} worker(s) (longest first: {longest})")
+
+
+def wrapper_module(bicep_file: Path) -> str:
+    """Module name of a test wrapper (test-kv.bicep -> kv)."""
+    stem = Path(bicep_file).stem
+    return stem[len('test-'):] if stem.startswith('test-') else stem
+
+
+def order_module_items(items: List[Any], estimates: Dict[str, float]) -> None:
+    """Reorder pytest items parametrized by module_name longest-expected-first, in place.
+
+    Items keep their grouping by test function (all test_what_if_succeeds
+    items stay together, in the same relative position); only the module
+    order inside each group changes. Other items are not moved.
+    """
+    slots = [i for i, item in enumerate(items) if _module_of(item) in estimates]
+    if not slots:
+        return
+    subset = [items[i] for i in slots]
+    group_rank: Dict[str, int] = {}
+    for item in subset:
+        group_rank.setdefault(item.originalname, len(group_rank))
+    position = {id(item): i for i, item in enumerate(subset)}
+    ordered = sorted(subset, key=lambda item: (
+        group_rank[item.originalname], -estimates[_module_of(item)], position[id(item)]
+    ))
+    for slot, item in zip(slots, ordered):
+        items[slot] = item
+
+
+def _module_of(item: Any) -> Optional[str]:
+    callspec = getattr(item, 'callspec', None)
+    return callspec.params.get('module_name') if callspec else None
+
+
+def what_if_prediction(db: DurationDB, region: str, workers: int, fixtures_dir: Path = FIXTURES_DIR) -> Optional[str]:
+    """Predicted completion line for one what-if per module wrapper, or None without history."""
+    if not db.has_data('what-if'):
+        return None
+    modules = [wrapper_module(p) for p in sorted(Path(fixtures_dir).glob('test-*.bicep'))]
+    return format_prediction('what-if', db.estimates('what-if', modules, region), workers)
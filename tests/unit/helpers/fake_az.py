@@ -0,0 +1,94 @@
+"""Scriptable stand-in for the Azure CLI.
+
+install_fake_az() writes an `az` executable into a directory that, when put
+first on PATH, answers `subprocess.run(['az', ...])` calls from a JSON rules
+file instead of Azure. Each rule matches an argv prefix and returns canned
+stdout/stderr/exit code, optionally after a delay:
+
+    {
+      "rules": [
+        {"argv": ["group", "exists"], "stdout": "true"},
+        {"argv": ["deployment", "group", "what-if"], "stdout_file": "/path/what-if.json", "delay": 0.1}
+      ],
+      "log": "/path/calls.jsonl"
+    }
+
+The first matching rule wins. Unmatched calls exit 1 with an error on stderr.
+"""
+import json
+import os
+import stat
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CONFIG_ENV = 'FAKE_AZ_CONFIG'
+
+
+def install_fake_az(bin_dir: Path, rules: List[Dict[str, Any]], log_file: Optional[Path] = None) -> Path:
+    """Write an `az` shim and its rules file into bin_dir.
+
+    Args:
+        bin_dir: Directory to prepend to PATH
+        rules: Rules as described in the module docstring
+        log_file: Optional JSONL file that records every call's argv
+
+    Returns:
+        Path to the rules file (also exported via FAKE_AZ_CONFIG in the shim)
+    """
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    config_path = bin_dir / 'fake-az.json'
+    config_path.write_text(json.dumps({'rules': rules, 'log': str(log_file) if log_file else None}, indent=2))
+
+    # Project root on PYTHONPATH so the shim can import this module
+    project_root = Path(__file__).resolve().parents[3]
+    shim = bin_dir / 'az'
+    shim.write_text(
+        '#!/bin/sh\n'
+        f'{CONFIG_ENV}="${{{CONFIG_ENV}:-{config_path}}}" PYTHONPATH="{project_root}" '
+        f'exec "{sys.executable}" -m tests.unit.helpers.fake_az "$@"\n'
+    )
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return config_path
+
+
+def prepend_path(bin_dir: Path, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return a copy of env (default os.environ) with bin_dir first on PATH."""
+    env = dict(os.environ if env is None else env)
+    env['PATH'] = f"{bin_dir}{os.pathsep}{env.get('PATH', '')}"
+    return env
+
+
+def match_rule(rules: List[Dict[str, Any]], argv: List[str]) -> Optional[Dict[str, Any]]:
+    """Return the first rule whose argv prefix matches the call."""
+    for rule in rules:
+        prefix = rule.get('argv', [])
+        if argv[:len(prefix)] == prefix:
+            return rule
+    return None
+
+
+def main(argv: List[str]) -> int:
+    config = json.loads(Path(os.environ[CONFIG_ENV]).read_text())
+    if config.get('log'):
+        with open(config['log'], 'a') as log:
+            log.write(json.dumps({'argv': argv, 'time': time.time()}) + '\n')
+
+    rule = match_rule(config.get('rules', []), argv)
+    if rule is None:
+        sys.stderr.write(f"ERROR: fake az has no rule for: az {' '.join(argv)}\n")
+        return 1
+    if rule.get('delay'):
+        time.sleep(rule['delay'])
+    stdout = rule.get('stdout', '')
+    if rule.get('stdout_file'):
+        stdout = Path(rule['stdout_file']).read_text()
+    sys.stdout.write(stdout)
+    sys.stderr.write(rule.get('stderr', ''))
+    return int(rule.get('returncode', 0))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,414 @@
+"""Fleet-wide collision scan for the deterministic names in naming.bicep.
+
+iac/lib/naming.bicep derives every resource name from the resource group name
+alone: nano8/nano16 take the first 8 characters of ARM's uniqueString() (40
+bits of a 64-bit MurmurHash, base32 encoded). Storage accounts and ACR only get
+one nano8 ('vdst' + 8 chars, 'vdacr' + 8 chars), and those names are globally
+unique DNS labels, so across a large fleet two resource groups can be assigned
+the same name and the second deployment fails.
+
+The scanner re-implements uniqueString() in Python, computes the naming table
+for every resource group in an inventory, indexes each globally scoped name
+in a hash table per resource type and reports:
+
+- duplicate seeds: the same resource group name more than once (for example in
+  two subscriptions) - every derived name collides
+- collisions: different resource groups that derive the same name
+- near misses: names one character apart (a crowded namespace; one typo or
+  hand-made resource away from a collision)
+
+By default only the nano8 names (storage, acr) are scanned; --all-global adds
+the nano16 ones (kv, psql, search, ai), whose 80 bits make collisions
+practically impossible but cost four more hashes per resource group.
+
+Usage:
+    python -m tests.unit.helpers.naming_scan inventory.txt
+    az group list --query [].name -o tsv | python -m tests.unit.helpers.naming_scan -
+    python -m tests.unit.helpers.naming_scan inventory.json --all-global
+    python -m tests.unit.helpers.naming_scan --table rg-contoso-prod
+"""
+import argparse
+import json
+import math
+import os
+import re
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+NAMING_BICEP = REPO_ROOT / 'iac' / 'lib' / 'naming.bicep'
+
+# naming.bicep keys whose names must be unique across all of Azure (DNS labels)
+GLOBAL_KEYS = ('storage', 'acr', 'kv', 'psql', 'search', 'ai')
+NANO8_KEYS = ('storage', 'acr')
+# Smaller inventories are scanned in-process
+PARALLEL_MIN_SEEDS = 50_000
+
+_BASE32 = 'abcdefghijklmnopqrstuvwxyz234567'
+# Two base32 characters per 10-bit lookup
+_PAIRS = [a + b for a in _BASE32 for b in _BASE32]
+_BLOCKS = struct.Struct('<II').iter_unpack
+_M32 = 0xFFFFFFFF
+_M64 = 0xFFFFFFFFFFFFFFFF
+_C1, _C2 = 0x239b961b, 0xab0e9789
+
+_TEMPLATE = re.compile(r"^\s*(\w+):\s*'([^'$]*)\$\{(nano8|nano16)\(seedPrefix,\s*'([^']+)'\)\}'", re.MULTILINE)
+
+
+# --- uniqueString() ----------------------------------------------------------
+# ARM hashes the '-'-joined UTF-8 arguments with the 64-bit variant of
+# MurmurHash3 (two interleaved 32-bit lanes, seed 0) and base32-encodes the
+# result into 13 characters.
+
+def _absorb(h1: int, h2: int, data: bytes) -> Tuple[int, int]:
+    """Mix whole 8-byte blocks of data into the hash state."""
+    for k1, k2 in _BLOCKS(data):
+        k1 = (k1 * _C1) & _M32
+        h1 ^= (((k1 << 15) | (k1 >> 17)) * _C2) & _M32
+        h1 = (((((h1 << 19) | (h1 >> 13)) & _M32) + h2) * 5 + 0x561ccd1b) & _M32
+        k2 = (k2 * _C2) & _M32
+        h2 ^= (((k2 << 17) | (k2 >> 15)) * _C1) & _M32
+        h2 = (((((h2 << 13) | (h2 >> 19)) & _M32) + h1) * 5 + 0x0bcaa747) & _M32
+    return h1, h2
+
+
+def _finish(h1: int, h2: int, rest: bytes, length: int) -> int:
+    """Absorb the remaining bytes (after whole blocks already mixed in) and finalize."""
+    whole = len(rest) & ~7
+    if whole:
+        h1, h2 = _absorb(h1, h2, rest[:whole])
+        rest = rest[whole:]
+    if rest:
+        k1 = (int.from_bytes(rest[:4], 'little') * _C1) & _M32
+        h1 ^= (((k1 << 15) | (k1 >> 17)) * _C2) & _M32
+        if len(rest) > 4:
+            k2 = (int.from_bytes(rest[4:], 'little') * _C2) & _M32
+            h2 ^= (((k2 << 17) | (k2 >> 15)) * _C1) & _M32
+    h1 ^= length & _M32
+    h2 ^= length & _M32
+    h1 = (h1 + h2) & _M32
+    h2 = (h2 + h1) & _M32
+    # fmix32 on both lanes (inlined: this is the hot path of a fleet scan)
+    h1 = ((h1 ^ (h1 >> 16)) * 0x85ebca6b) & _M32
+    h1 = ((h1 ^ (h1 >> 13)) * 0xc2b2ae35) & _M32
+    h1 ^= h1 >> 16
+    h2 = ((h2 ^ (h2 >> 16)) * 0x85ebca6b) & _M32
+    h2 = ((h2 ^ (h2 >> 13)) * 0xc2b2ae35) & _M32
+    h2 ^= h2 >> 16
+    h1 = (h1 + h2) & _M32
+    return (((h2 + h1) & _M32) << 32) | h1
+
+
+def murmur64(data: bytes) -> int:
+    return _finish(0, 0, data, len(data))
+
+
+def _text(value: int, chars: int) -> str:
+    """Base32 text of the top 5*chars bits of value (chars even)."""
+    return ''.join(_PAIRS[(value >> shift) & 1023] for shift in range(5 * chars - 10, -1, -10))
+
+
+def unique_string(*values: str) -> str:
+    """ARM uniqueString(): 13 lowercase base32 characters."""
+    value = murmur64('-'.join(values).encode('utf-8'))
+    chars = []
+    for _ in range(13):
+        chars.append(_BASE32[value >> 59])
+        value = (value << 5) & _M64
+    return ''.join(chars)
+
+
+def nano8(seed: str, suffix: str) -> str:
+    return unique_string(f'{seed}-{suffix}')[:8]
+
+
+def nano16(seed: str, suffix: str) -> str:
+    return unique_string(f'{seed}-{suffix}-a')[:8] + unique_string(f'{seed}-{suffix}-b')[:8]
+
+
+# --- naming table --------------------------------------------------------------
+
+@dataclass(frozen=True)
+class NameTemplate:
+    """One entry of naming.bicep's names object: prefix + nano8/nano16(seed, suffix)."""
+    key: str
+    prefix: str
+    func: str
+    suffix: str
+
+    @property
+    def hashed_suffixes(self) -> Tuple[str, ...]:
+        """The strings hashed after '<seed>-' (two for nano16)."""
+        if self.func == 'nano8':
+            return (self.suffix,)
+        return (f'{self.suffix}-a', f'{self.suffix}-b')
+
+    @property
+    def chars(self) -> int:
+        return 8 if self.func == 'nano8' else 16
+
+    def render(self, seed: str) -> str:
+        return self.prefix + (nano8 if self.func == 'nano8' else nano16)(seed, self.suffix)
+
+
+def load_templates(path: Path = NAMING_BICEP) -> Dict[str, NameTemplate]:
+    """Parse the names object of naming.bicep, in declaration order."""
+    templates = {m.group(1): NameTemplate(*m.groups()) for m in _TEMPLATE.finditer(Path(path).read_text())}
+    if not templates:
+        raise ValueError(f"No nano8/nano16 name templates found in {path}")
+    return templates
+
+
+def naming_table(resource_group: str, templates: Optional[Dict[str, NameTemplate]] = None) -> Dict[str, str]:
+    """The names output of naming.bicep for one resource group."""
+    templates = templates or load_templates()
+    return {key: t.render(resource_group) for key, t in templates.items()}
+
+
+# --- scan -------------------------------------------------------------------
+
+@dataclass
+class Collision:
+    key: str
+    name: str
+    resource_groups: List[str]
+
+
+@dataclass
+class NearMiss:
+    key: str
+    names: Tuple[str, str]
+    resource_groups: Tuple[str, str]
+
+
+@dataclass
+class ScanResult:
+    """Outcome of scanning an inventory."""
+    resource_groups: int
+    keys: List[str]
+    duplicate_seeds: Dict[str, int] = field(default_factory=dict)
+    collisions: List[Collision] = field(default_factory=list)
+    near_misses: List[NearMiss] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.duplicate_seeds and not self.collisions
+
+
+def derive_values(seeds: List[str], templates: List[NameTemplate]) -> List[List[int]]:
+    """Random part of each template's name for every seed, as an int (one list per template).
+
+    A nano8 is the top 40 bits of one hash; a nano16 concatenates two. Every
+    hashed string starts with '<seed>-', so the whole 8-byte blocks of that
+    prefix are mixed once per seed and shared by all templates.
+    """
+    plans = [[s.encode('utf-8') for s in t.hashed_suffixes] for t in templates]
+    columns: List[List[int]] = [[] for _ in templates]
+    for seed in seeds:
+        head = f'{seed}-'.encode('utf-8')
+        whole = len(head) & ~7
+        h1, h2 = _absorb(0, 0, head[:whole])
+        rest = head[whole:]
+        for column, suffixes in zip(columns, plans):
+            value = 0
+            for suffix in suffixes:
+                value = (value << 40) | (_finish(h1, h2, rest + suffix, len(head) + len(suffix)) >> 24)
+            column.append(value)
+    return columns
+
+
+def _one_apart(a: int, b: int) -> bool:
+    """True if a and b differ in exactly one base32 character (5-bit group)."""
+    diff = a ^ b
+    if not diff:
+        return False
+    low = ((diff & -diff).bit_length() - 1) // 5 * 5
+    return diff >> low < 32
+
+
+def near_miss_pairs(values: List[int], chars: int) -> List[Tuple[int, int]]:
+    """Pairs of values whose chars-character names differ in exactly one character.
+
+    Two such names agree on at least one half, so it is enough to compare
+    values within runs that share their first half (sorted as-is) or their
+    second half (sorted with the halves swapped). Runs are short: a half has
+    as many possible values as a million-name fleet has names.
+    """
+    half_bits = 5 * chars // 2
+    mask = (1 << half_bits) - 1
+    distinct = set(values)
+    pairs = set()
+    for swapped in (False, True):
+        if swapped:
+            keyed = sorted(((v & mask) << half_bits) | (v >> half_bits) for v in distinct)
+        else:
+            keyed = sorted(distinct)
+        heads = [k >> half_bits for k in keyed]
+        # Entries lag places apart in the same run; runs rarely exceed two or three
+        lag = 1
+        candidates = [i for i in range(1, len(heads)) if heads[i] == heads[i - 1]]
+        while candidates:
+            for i in candidates:
+                a, b = keyed[i - lag], keyed[i]
+                if _one_apart(a, b):
+                    if swapped:
+                        a, b = (((k & mask) << half_bits) | (k >> half_bits) for k in (a, b))
+                    pairs.add((min(a, b), max(a, b)))
+            lag += 1
+            candidates = [i for i in candidates if i >= lag and heads[i] == heads[i - lag]]
+    return sorted(pairs)
+
+
+def _derive_parallel(seeds: List[str], templates: List[NameTemplate], pool: ProcessPoolExecutor,
+                     workers: int) -> List[List[int]]:
+    size = -(-len(seeds) // workers)
+    columns: List[List[int]] = [[] for _ in templates]
+    for chunk in pool.map(derive_values, [seeds[i:i + size] for i in range(0, len(seeds), size)],
+                          [templates] * workers):
+        for column, part in zip(columns, chunk):
+            column.extend(part)
+    return columns
+
+
+def scan(resource_groups: Iterable[str], keys: Iterable[str] = NANO8_KEYS,
+         templates: Optional[Dict[str, NameTemplate]] = None, workers: Optional[int] = None) -> ScanResult:
+    """Index the globally scoped names of every resource group and find clashes.
+
+    Hashing and the near-miss search are pure Python and CPU-bound, so large
+    inventories are split across worker processes.
+
+    Args:
+        resource_groups: Resource group names (the naming.bicep seed)
+        keys: naming.bicep keys to scan
+        templates: Parsed naming.bicep (default: the repo's)
+        workers: Worker processes (default: CPU count; 1 scans in-process)
+
+    Returns:
+        ScanResult
+    """
+    started = time.perf_counter()
+    templates = templates or load_templates()
+    keys = list(keys)
+    missing = [k for k in keys if k not in templates]
+    if missing:
+        raise ValueError(f"Unknown naming.bicep key(s): {', '.join(missing)}")
+
+    counts: Dict[str, int] = {}
+    for rg in resource_groups:
+        counts[rg] = counts.get(rg, 0) + 1
+    seeds = list(counts)
+    result = ScanResult(sum(counts.values()), keys)
+    result.duplicate_seeds = {rg: n for rg, n in counts.items() if n > 1}
+
+    selected = [templates[k] for k in keys]
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 and len(seeds) >= PARALLEL_MIN_SEEDS else None
+    try:
+        if pool:
+            columns = _derive_parallel(seeds, selected, pool, workers)
+            near = [pool.submit(near_miss_pairs, values, t.chars) for values, t in zip(columns, selected)]
+        else:
+            columns = derive_values(seeds, selected)
+        for n, (template, values) in enumerate(zip(selected, columns)):
+            owner = dict(zip(values, range(len(values))))
+            if len(owner) < len(values):
+                first: Dict[int, int] = {}
+                clashes: Dict[int, List[str]] = {}
+                for i, value in enumerate(values):
+                    j = first.setdefault(value, i)
+                    if j != i:
+                        clashes.setdefault(value, [seeds[j]]).append(seeds[i])
+                result.collisions += [Collision(template.key, template.prefix + _text(value, template.chars), rgs)
+                                      for value, rgs in clashes.items()]
+            pairs = near[n].result() if pool else near_miss_pairs(values, template.chars)
+            result.near_misses += [
+                NearMiss(template.key, (template.prefix + _text(a, template.chars),
+                                        template.prefix + _text(b, template.chars)),
+                         (seeds[owner[a]], seeds[owner[b]]))
+                for a, b in pairs
+            ]
+    finally:
+        if pool:
+            pool.shutdown()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def collision_odds(count: int, chars: int) -> float:
+    """Birthday-bound probability of at least one collision among count random names."""
+    space = 32.0 ** chars
+    return -math.expm1(-count * (count - 1) / (2 * space))
+
+
+def format_report(result: ScanResult, templates: Dict[str, NameTemplate], limit: int = 20) -> List[str]:
+    lines = [f"Scanned {result.resource_groups} resource group(s), "
+             f"{len(result.keys)} globally scoped name(s) each, in {result.seconds:.2f}s"]
+    unique = result.resource_groups - sum(n - 1 for n in result.duplicate_seeds.values())
+    for key in result.keys:
+        template = templates[key]
+        lines.append(f"  {key}: {template.prefix}<{template.func}>, "
+                     f"P(any collision) ~ {collision_odds(unique, template.chars):.2e}")
+    for rg, n in sorted(result.duplicate_seeds.items())[:limit]:
+        lines.append(f"DUPLICATE resource group '{rg}' appears {n} times: every derived name collides")
+    for c in result.collisions[:limit]:
+        lines.append(f"COLLISION {c.key} {c.name}: {', '.join(c.resource_groups)}")
+    for m in result.near_misses[:limit]:
+        lines.append(f"NEAR MISS {m.key} {m.names[0]} ({m.resource_groups[0]}) ~ "
+                     f"{m.names[1]} ({m.resource_groups[1]})")
+    hidden = (max(0, len(result.duplicate_seeds) - limit) + max(0, len(result.collisions) - limit)
+              + max(0, len(result.near_misses) - limit))
+    if hidden:
+        lines.append(f"... {hidden} more (raise --limit)")
+    lines.append(f"{len(result.duplicate_seeds)} duplicate seed(s), {len(result.collisions)} collision(s), "
+                 f"{len(result.near_misses)} near miss(es)")
+    return lines
+
+
+def read_inventory(path: str) -> List[str]:
+    """Resource group names from a file ('-' for stdin).
+
+    Accepts one name per line ('#' comments allowed), or JSON: a list of names
+    or of objects with a 'name' field (az group list -o json).
+    """
+    text = sys.stdin.read() if path == '-' else Path(path).read_text()
+    if text.lstrip().startswith('['):
+        return [entry['name'] if isinstance(entry, dict) else str(entry) for entry in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inventory', nargs='?', help="resource group names (text or JSON file, '-' for stdin)")
+    parser.add_argument('--all-global', action='store_true', help=f"scan {', '.join(GLOBAL_KEYS)}")
+    parser.add_argument('--key', action='append', dest='keys', help='naming.bicep key to scan (repeatable)')
+    parser.add_argument('--table', metavar='RG', help='print the full naming table for one resource group')
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--limit', type=int, default=20, help='findings listed per kind')
+    args = parser.parse_args(argv)
+
+    templates = load_templates()
+    if args.table:
+        for key, name in naming_table(args.table, templates).items():
+            print(f"{key:<18} {name}")
+        return 0
+    if not args.inventory:
+        parser.error('an inventory is required (or --table RG)')
+    keys = args.keys or (GLOBAL_KEYS if args.all_global else NANO8_KEYS)
+    try:
+        result = scan(read_inventory(args.inventory), keys, templates, args.workers)
+    except ValueError as e:
+        print(f"ERROR {e}")
+        return 1
+    for line in format_report(result, templates, args.limit):
+        print(line)
+    return 0 if result.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+"""Pairwise (n-wise) parameter matrix for main.bicep's @allowed parameters.
+
+Reads every `@allowed([...])` set from the template and builds a covering
+array: a small list of parameter combinations in which every pair (or every
+t-tuple, with --strength t) of allowed values appears in at least one row.
+For main.bicep's sku/psqlComputeTier/jumpHostComputeTier/aiServicesTier/
+nodeSize sets that is under a hundred rows for pairwise coverage instead of
+the ~10,000 rows of the full product.
+
+Each row becomes a params file holding only the row's values, and is run
+through run_what_if concurrently (which merges in params.dev.json as for any
+module override, including the customerAdminObjectId substitution); failures are then tallied per
+parameter value, so a value that fails in every row it appears in stands out.
+
+Usage:
+    python -m tests.unit.helpers.param_matrix --list             # print the rows only
+    python -m tests.unit.helpers.param_matrix --workers 8        # run what-if for every row
+    python -m tests.unit.helpers.param_matrix --strength 3 --param sku --param psqlComputeTier --param aiServicesTier
+"""
+import argparse
+import itertools
+import json
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from tests.unit.helpers.az_errors import run_with_retry
+from tests.unit.helpers.test_utils import (
+    ensure_resource_group_exists,
+    get_location_from_shared_params,
+    get_resource_group_from_shared_params,
+    run_what_if
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+MAIN_BICEP = REPO_ROOT / 'iac' / 'main.bicep'
+
+# Must match the principal in customerAdminObjectId, so it is never varied
+EXCLUDED_PARAMS = {'customerAdminPrincipalType'}
+
+_ALLOWED_PARAM = re.compile(r'@allowed\(\[(.*?)\]\)\s*(?:@[^\n]*\n\s*)*param\s+(\w+)\s+\w+', re.DOTALL)
+_VALUE = re.compile(r"'((?:[^'\\]|\\.)*)'|(-?\d+)|\b(true|false)\b")
+
+
+def parse_allowed_values(bicep_text: str) -> Dict[str, List[Any]]:
+    """Map each parameter with an @allowed decorator to its allowed values (in declaration order)."""
+    allowed = {}
+    for body, name in _ALLOWED_PARAM.findall(bicep_text):
+        values = []
+        for string, number, boolean in _VALUE.findall(body):
+            if number:
+                values.append(int(number))
+            elif boolean:
+                values.append(boolean == 'true')
+            else:
+                values.append(string)
+        allowed[name] = values
+    return allowed
+
+
+def matrix_factors(bicep_text: str, params: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """Allowed sets worth varying: more than one value, not excluded, optionally limited to `params`."""
+    allowed = parse_allowed_values(bicep_text)
+    if params:
+        missing = [p for p in params if p not in allowed]
+        if missing:
+            raise ValueError(f"No @allowed set for: {', '.join(missing)}")
+        return {p: allowed[p] for p in params}
+    return {p: v for p, v in allowed.items() if len(v) > 1 and p not in EXCLUDED_PARAMS}
+
+
+def covering_array(factors: Dict[str, List[Any]], strength: int = 2) -> List[Dict[str, Any]]:
+    """Greedy t-wise covering array.
+
+    Each row is seeded with the first uncovered t-tuple (so every row makes
+    progress); the remaining parameters are filled one at a time with the
+    value that covers the most still-uncovered tuples. Deterministic for a
+    given factor order.
+
+    Args:
+        factors: Parameter name -> allowed values
+        strength: t (2 = pairwise); capped at the number of parameters
+
+    Returns:
+        Rows mapping every parameter to a value
+    """
+    names = list(factors)
+    strength = min(strength, len(names))
+    if strength < 1:
+        return []
+    combos = list(itertools.combinations(range(len(names)), strength))
+    pending = [
+        (combo, values)
+        for combo in combos
+        for values in itertools.product(*(range(len(factors[names[i]])) for i in combo))
+    ]
+    uncovered = set(pending)
+    by_param: Dict[int, List[Tuple[int, ...]]] = {i: [c for c in combos if i in c] for i in range(len(names))}
+
+    rows = []
+    cursor = 0
+    while uncovered:
+        while pending[cursor] not in uncovered:
+            cursor += 1
+        seed_combo, seed_values = pending[cursor]
+        row: Dict[int, int] = dict(zip(seed_combo, seed_values))
+        for i in range(len(names)):
+            if i in row:
+                continue
+
+            def gain(value: int) -> int:
+                row[i] = value
+                covered = sum(
+                    1 for combo in by_param[i]
+                    if all(j in row for j in combo) and (combo, tuple(row[j] for j in combo)) in uncovered
+                )
+                del row[i]
+                return covered
+
+            row[i] = max(range(len(factors[names[i]])), key=lambda v: (gain(v), -v))
+        for combo in combos:
+            uncovered.discard((combo, tuple(row[j] for j in combo)))
+        rows.append({names[i]: factors[names[i]][row[i]] for i in range(len(names))})
+    return rows
+
+
+@dataclass
+class MatrixRun:
+    """What-if outcome for one matrix row."""
+    index: int
+    row: Dict[str, Any]
+    success: bool
+    error: str = ''
+
+
+def write_row_params(row: Dict[str, Any], path: Path, overrides_file: Optional[Path] = None) -> Path:
+    """Write the row's values (over overrides_file's parameters, if given) as a params override file.
+
+    Shared parameters are not copied: run_what_if merges them from params.dev.json.
+    """
+    parameters = {}
+    if overrides_file is not None:
+        parameters.update(json.loads(Path(overrides_file).read_text()).get('parameters', {}))
+    parameters.update({name: {'value': value} for name, value in row.items()})
+    path.write_text(json.dumps({'parameters': parameters}, indent=2))
+    return path
+
+
+def run_matrix(
+    rows: List[Dict[str, Any]],
+    bicep_file: Path = MAIN_BICEP,
+    overrides_file: Optional[Path] = None,
+    resource_group: Optional[str] = None,
+    max_workers: int = 8
+) -> List[MatrixRun]:
+    """Run what-if (ResourceIdOnly) for every row concurrently.
+
+    The resource group is checked once up front; transient errors are retried
+    per row (see az_errors.run_with_retry).
+    """
+    try:
+        resource_group = resource_group or get_resource_group_from_shared_params()
+    except ValueError as e:
+        return [MatrixRun(i, row, False, str(e)) for i, row in enumerate(rows)]
+    success, message = ensure_resource_group_exists(resource_group, get_location_from_shared_params())
+    if not success:
+        return [MatrixRun(i, row, False, f"Resource group check failed: {message}") for i, row in enumerate(rows)]
+
+    with tempfile.TemporaryDirectory(prefix='param-matrix-') as tmp_dir:
+        def run_row(index: int) -> MatrixRun:
+            params_file = write_row_params(rows[index], Path(tmp_dir) / f'row-{index}.json', overrides_file)
+            success, output = run_with_retry(lambda: run_what_if(
+                bicep_file, params_file, resource_group, ensure_rg_exists=False, result_format='ResourceIdOnly'
+            ))
+            return MatrixRun(index, rows[index], success, '' if success else output)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(run_row, range(len(rows))))
+
+
+def failures_by_value(runs: List[MatrixRun]) -> Dict[Tuple[str, Any], Tuple[int, int]]:
+    """(parameter, value) -> (failed runs, total runs), for values seen in at least one failure."""
+    totals: Dict[Tuple[str, Any], List[int]] = {}
+    for run in runs:
+        for name, value in run.row.items():
+            counts = totals.setdefault((name, value), [0, 0])
+            counts[1] += 1
+            if not run.success:
+                counts[0] += 1
+    return {key: (failed, total) for key, (failed, total) in totals.items() if failed}
+
+
+def format_report(runs: List[MatrixRun]) -> List[str]:
+    """Report lines: failing values (worst first, 'ALWAYS' if every run with it failed), then failed rows."""
+    lines = [f"{sum(1 for r in runs if r.success)}/{len(runs)} rows passed"]
+    by_value = failures_by_value(runs)
+    for (name, value), (failed, total) in sorted(by_value.items(), key=lambda item: (-item[1][0] / item[1][1], item[0][0])):
+        marker = 'ALWAYS' if failed == total else 'some'
+        lines.append(f"  {marker:6} {name}={value}: {failed}/{total} runs failed")
+    for run in runs:
+        if not run.success:
+            first_line = run.error.strip().splitlines()[0] if run.error.strip() else 'unknown error'
+            lines.append(f"  row {run.index} {json.dumps(run.row, sort_keys=True)}: {first_line}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bicep', type=Path, default=MAIN_BICEP, help='template to read @allowed sets from and what-if')
+    parser.add_argument('--params-file', type=Path,
+                        help='extra parameter overrides for every row (params.dev.json is always merged)')
+    parser.add_argument('--param', action='append', help='parameter to vary (repeatable; default: every @allowed set)')
+    parser.add_argument('--strength', type=int, default=2, help='interaction strength (2 = pairwise)')
+    parser.add_argument('--resource-group', help="resource group (default: the shared params file's metadata)")
+    parser.add_argument('--workers', type=int, default=8, help='concurrent what-if runs')
+    parser.add_argument('--list', action='store_true', help='print the rows without running what-if')
+    args = parser.parse_args(argv)
+
+    try:
+        factors = matrix_factors(args.bicep.read_text(), args.param)
+    except ValueError as e:
+        print(f"ERROR {e}")
+        return 1
+    rows = covering_array(factors, args.strength)
+    full = 1
+    for values in factors.values():
+        full *= len(values)
+    print(f"{len(rows)} rows cover every {args.strength}-way combination of {len(factors)} parameters "
+          f"(full product: {full})")
+    if args.list:
+        for i, row in enumerate(rows):
+            print(f"  row {i} {json.dumps(row, sort_keys=True)}")
+        return 0
+
+    runs = run_matrix(rows, args.bicep, args.params_file, args.resource_group, args.workers)
+    for line in format_report(runs):
+        print(line)
+    return 0 if all(r.success for r in runs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
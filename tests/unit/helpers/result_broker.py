@@ -0,0 +1,234 @@
+"""Cross-process result sharing for what-if runs under pytest-xdist.
+
+With `pytest -n auto` every worker would otherwise call `az deployment group
+what-if` for the same template. The broker keys each run by its inputs, lets
+the first worker that asks compute it while holding a file lock, and serves
+the stored result to every other worker that asks for the same key.
+
+Results live in a per-session directory under BROKER_ROOT. The pytest
+controller removes its session's directory when the run ends (see
+tests/conftest.py). Directories left by killed runs and by processes outside
+pytest are pruned when a broker starts: pid-<n> directories once process n
+is gone, and xdist run directories after SESSION_MAX_AGE.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Shared lock/cache root (same for every worker on this machine)
+BROKER_ROOT = Path(tempfile.gettempdir()) / 'managed-app-iac-broker'
+# Age after which an xdist run's session directory is considered abandoned
+SESSION_MAX_AGE = 24 * 3600
+
+_PID_SESSION = re.compile(r'pid-(\d+)')
+_RUN_SESSION = re.compile(r'[0-9a-f]{32}')
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    """Hold an exclusive OS-level lock on a file for the duration of the block.
+
+    The lock is released by the OS if the holding process dies, so a crashed
+    worker never leaves other workers blocked.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def try_file_lock(lock_path: Path) -> Optional[IO]:
+    """Take an exclusive OS-level lock on a file without waiting.
+
+    Returns:
+        The open lock file (closing it releases the lock), or None if another
+        process holds the lock. Like file_lock, the OS releases the lock if
+        the holding process dies.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(lock_path, 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+@contextmanager
+def named_lock(name: str):
+    """Machine-wide lock for a named shared resource (e.g. a resource group)."""
+    safe_name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+    with file_lock(BROKER_ROOT / 'locks' / f'{safe_name}.lock'):
+        yield
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write a file via a temp file + rename so readers never see partial content."""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(text)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def get_session_id() -> str:
+    """Return an ID shared by all xdist workers of one run (per-process otherwise)."""
+    return os.getenv('PYTEST_XDIST_TESTRUNUID') or f'pid-{os.getpid()}'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_session_dir(session_id: str, root: Path = BROKER_ROOT) -> None:
+    """Delete one session's cached results."""
+    shutil.rmtree(Path(root) / session_id, ignore_errors=True)
+
+
+def prune_session_dirs(root: Path = BROKER_ROOT, keep: Optional[str] = None,
+                       max_age: float = SESSION_MAX_AGE) -> List[Path]:
+    """Delete session directories whose run is over.
+
+    Only session directories (pid-<n> and xdist run IDs) are considered;
+    locks and other shared state under root are left alone.
+
+    Returns:
+        The directories removed
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    now = time.time()
+    removed = []
+    for path in root.iterdir():
+        if not path.is_dir() or path.name == keep:
+            continue
+        pid_match = _PID_SESSION.fullmatch(path.name)
+        if not pid_match and not _RUN_SESSION.fullmatch(path.name):
+            continue
+        try:
+            too_old = now - path.stat().st_mtime > max_age
+        except OSError:
+            continue
+        # os.kill(pid, 0) would terminate the process on Windows, so only age counts there
+        stale = too_old or (pid_match is not None and fcntl is not None and not _pid_alive(int(pid_match.group(1))))
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def make_key(*parts: Union[str, bytes, Path, None]) -> str:
+    """Build a cache key from run inputs (file paths are hashed by content)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            digest.update(str(part.resolve()).encode())
+            if part.exists():
+                digest.update(part.read_bytes())
+        elif isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+class ResultBroker:
+    """File-backed store where one process computes each result and others wait for it."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else BROKER_ROOT / get_session_id()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _result_path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.json'
+
+    def get(self, key: str) -> Optional[tuple[bool, str]]:
+        """Return a stored (success, output) result, or None if not computed yet."""
+        path = self._result_path(key)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        return data['success'], data['output']
+
+    def get_or_compute(self, key: str, compute: Callable[[], tuple[bool, str]]) -> tuple[bool, str]:
+        """Return the result for key, computing it at most once across processes.
+
+        Args:
+            key: Cache key (see make_key)
+            compute: Function returning (success, output), e.g. a run_what_if call
+
+        Returns:
+            Tuple of (success: bool, output: str)
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        with file_lock(self.cache_dir / f'{key}.lock'):
+            # Another worker may have finished while we waited for the lock
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            success, output = compute()
+            write_text_atomic(self._result_path(key), json.dumps({'success': success, 'output': output}))
+            return success, output
+
+
+_broker: Optional[ResultBroker] = None
+
+
+def get_broker() -> ResultBroker:
+    """Return the broker for the current test session."""
+    global _broker
+    if _broker is None or _broker.cache_dir.name != get_session_id():
+        prune_session_dirs(keep=get_session_id())
+        _broker = ResultBroker()
+    return _broker
+
@@ -0,0 +1,340 @@
+"""Pool of pre-created, tagged resource groups leased exclusively to test workers.
+
+Every what-if otherwise targets the one metadata.resourceGroupName from
+params.dev.json, so parallel workers share it and a resource group being
+torn down blocks everyone with ResourceGroupBeingDeleted. With RG_POOL=<N>,
+each pytest worker leases one of N pool resource groups for its session:
+
+- A lease is an exclusive, non-blocking OS lock on the slot's lock file.
+  Leasing never waits: if no slot is ready, the worker falls back to the
+  shared resource group and a refill is started in the background.
+- The OS drops the lock when the holder exits or crashes, so leases never
+  leak. Workers only run what-ifs against their group, so a released slot
+  is leased again as it is.
+- A slot's group is checked (az group show: it exists and its
+  provisioningState is Succeeded) when it is leased and by every
+  maintenance run. A group that was deleted or failed behind the pool's
+  back marks its slot missing; the worker takes another slot or the shared
+  resource group, and maintenance is started.
+- Missing slots are recycled by a detached maintenance process. It creates
+  the slot's next generation (<pool>-NN-g<gen>, tagged with the pool and
+  slot) and deletes the old generation with --no-wait. No worker waits on
+  creation or deletion, and a deleting resource group is never leased again.
+
+Slot state and locks live in the machine-wide broker directory (see
+result_broker.py), and pool names include a host hash so CI agents that
+share a subscription do not share slots.
+
+Usage:
+    python -m tests.unit.helpers.rg_pool maintain --size 4   # check/recycle slots (what RG_POOL starts)
+    python -m tests.unit.helpers.rg_pool status --size 4
+    python -m tests.unit.helpers.rg_pool drain               # delete every resource group of the pool
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.result_broker import BROKER_ROOT, try_file_lock, write_text_atomic
+from tests.unit.helpers.test_utils import (
+    SHARED_PARAMS_FILE,
+    get_location_from_shared_params,
+    get_resource_group_from_shared_params,
+    load_json_file
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+POOL_ROOT = BROKER_ROOT / 'rg-pool'
+POOL_TAG = 'rg-pool'
+# Set in each worker to the resource group it leased; run_what_if targets it
+LEASE_ENV = 'RG_POOL_LEASE'
+
+READY = 'ready'
+MISSING = 'missing'
+HEALTHY_STATE = 'Succeeded'
+
+
+def default_pool_name() -> str:
+    """<shared RG>-p<host hash> (RG_POOL_NAME overrides)."""
+    host = hashlib.sha256(socket.gethostname().encode()).hexdigest()[:6]
+    return os.getenv('RG_POOL_NAME') or f'{get_resource_group_from_shared_params()}-p{host}'
+
+
+def _default_tags() -> Dict[str, str]:
+    try:
+        return dict(load_json_file(SHARED_PARAMS_FILE).get('metadata', {}).get('defaultTags', {}))
+    except (OSError, ValueError):
+        return {}
+
+
+class AzResourceGroups:
+    """Resource group create/delete/show/list through az."""
+
+    def _az(self, cmd: List[str]) -> Tuple[bool, str]:
+        try:
+            result = az_run(['az', *cmd], capture_output=True, text=True, check=False)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+        if result.returncode != 0:
+            return False, result.stderr or result.stdout
+        return True, result.stdout
+
+    def create(self, name: str, location: str, tags: Dict[str, str]) -> Tuple[bool, str]:
+        return self._az(['group', 'create', '--name', name, '--location', location, '--tags',
+                         *[f'{key}={value}' for key, value in tags.items()], '--output', 'none'])
+
+    def delete(self, name: str) -> Tuple[bool, str]:
+        """Start deleting a resource group without waiting for it."""
+        return self._az(['group', 'delete', '--name', name, '--yes', '--no-wait'])
+
+    def state(self, name: str) -> Tuple[bool, str]:
+        """provisioningState of a resource group ('' if it does not exist)."""
+        success, output = self._az(['group', 'show', '--name', name, '--query', 'properties.provisioningState',
+                                    '--output', 'tsv'])
+        if not success:
+            return ('ResourceGroupNotFound' in output), ''
+        return True, output.strip()
+
+    def list_tagged(self, pool: str) -> Tuple[bool, Any]:
+        success, output = self._az(['group', 'list', '--tag', f'{POOL_TAG}={pool}', '--query', '[].name',
+                                    '--output', 'json'])
+        if not success:
+            return False, output
+        try:
+            return True, json.loads(output or '[]')
+        except json.JSONDecodeError as e:
+            return False, f"Could not parse group list: {e}"
+
+
+@dataclass
+class Lease:
+    """An exclusive lease on one pool slot (held until release or process exit)."""
+    pool: 'ResourceGroupPool'
+    slot: int
+    resource_group: str
+    handle: Optional[IO] = None
+
+    def release(self) -> bool:
+        """Release the slot.
+
+        Returns:
+            True if the pool needs maintenance (a slot is not ready)
+        """
+        if self.handle is None:
+            return False
+        self.handle.close()
+        self.handle = None
+        return not self.pool.all_ready()
+
+
+class ResourceGroupPool:
+    """N slots, each a resource group generation plus a state file and a lock file."""
+
+    def __init__(self, name: str, size: int, location: str, tags: Optional[Dict[str, str]] = None,
+                 root: Path = POOL_ROOT, backend=None):
+        self.name = name
+        self.size = size
+        self.location = location
+        self.tags = dict(tags or {})
+        self.root = Path(root) / name
+        self.backend = backend or AzResourceGroups()
+        # Set when a lease found a broken slot and marked it missing
+        self.needs_maintenance = False
+
+    @classmethod
+    def from_shared_params(cls, size: int, **kwargs: Any) -> 'ResourceGroupPool':
+        return cls(default_pool_name(), size, get_location_from_shared_params(), _default_tags(), **kwargs)
+
+    def resource_group(self, slot: int, generation: int) -> str:
+        return f'{self.name}-{slot:02d}-g{generation}'
+
+    def _state_path(self, slot: int) -> Path:
+        return self.root / f'slot-{slot:02d}.json'
+
+    def read_state(self, slot: int) -> Dict[str, Any]:
+        try:
+            return json.loads(self._state_path(slot).read_text())
+        except (OSError, json.JSONDecodeError):
+            return {'generation': -1, 'state': MISSING}
+
+    def _write_state(self, slot: int, generation: int, state: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(self._state_path(slot), json.dumps({'generation': generation, 'state': state,
+                                                              'updated': time.time()}))
+
+    def healthy(self, name: str) -> bool:
+        """Whether a pool resource group exists and is provisioned.
+
+        An az failure other than not-found (throttling, network) counts as
+        healthy: a slot is only recycled when its group is known to be bad.
+        """
+        success, state = self.backend.state(name)
+        return not success or state == HEALTHY_STATE
+
+    def all_ready(self) -> bool:
+        return all(self.read_state(slot)['state'] == READY for slot in range(self.size))
+
+    def lease(self) -> Optional[Lease]:
+        """Lease a ready, healthy slot without waiting (None if there is none free).
+
+        A ready slot whose group turns out missing or unprovisioned is marked
+        missing (needs_maintenance) and the next slot is tried.
+        """
+        for slot in range(self.size):
+            if self.read_state(slot)['state'] != READY:
+                continue
+            handle = try_file_lock(self.root / f'slot-{slot:02d}.lock')
+            if handle is None:
+                continue
+            # Recycled or drained between the read and the lock
+            state = self.read_state(slot)
+            if state['state'] != READY:
+                handle.close()
+                continue
+            name = self.resource_group(slot, state['generation'])
+            if not self.healthy(name):
+                self._write_state(slot, state['generation'], MISSING)
+                self.needs_maintenance = True
+                handle.close()
+                continue
+            return Lease(self, slot, name, handle)
+        return None
+
+    def recycle(self, slot: int) -> Tuple[bool, str]:
+        """Create the slot's next generation and start deleting the previous one (caller holds the slot lock)."""
+        generation = self.read_state(slot)['generation']
+        name = self.resource_group(slot, generation + 1)
+        tags = {**self.tags, POOL_TAG: self.name, 'rg-pool-slot': str(slot)}
+        success, output = self.backend.create(name, self.location, tags)
+        if not success:
+            # Keep the old generation on record so the next run still deletes it
+            self._write_state(slot, generation, MISSING)
+            return False, f"{name}: {output.strip()}"
+        self._write_state(slot, generation + 1, READY)
+        if generation >= 0:
+            # Never waited on; a failed delete (already gone) is left for drain
+            self.backend.delete(self.resource_group(slot, generation))
+        return True, name
+
+    def maintain(self) -> List[str]:
+        """Recycle every slot that is not leased and not ready or not healthy.
+
+        Only one maintainer runs per pool; a second one returns immediately.
+
+        Returns:
+            One line per slot recycled (or failing to)
+        """
+        guard = try_file_lock(self.root / 'maintain.lock')
+        if guard is None:
+            return []
+        lines = []
+        try:
+            for slot in range(self.size):
+                handle = try_file_lock(self.root / f'slot-{slot:02d}.lock')
+                if handle is None:
+                    continue
+                try:
+                    state = self.read_state(slot)
+                    if state['state'] == READY and self.healthy(self.resource_group(slot, state['generation'])):
+                        continue
+                    success, output = self.recycle(slot)
+                finally:
+                    handle.close()
+                lines.append(f"{'READY' if success else 'ERROR'} slot {slot}: {output}")
+        finally:
+            guard.close()
+        return lines
+
+    def spawn_maintenance(self) -> subprocess.Popen:
+        """Run maintain() in a detached process, so no worker waits for it."""
+        return subprocess.Popen(
+            [sys.executable, '-m', 'tests.unit.helpers.rg_pool', 'maintain', '--pool', self.name,
+             '--size', str(self.size), '--location', self.location, '--root', str(self.root.parent)],
+            cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+
+    def drain(self) -> List[str]:
+        """Delete every resource group tagged with the pool and forget all slots."""
+        success, names = self.backend.list_tagged(self.name)
+        if not success:
+            return [f"ERROR listing pool resource groups: {str(names).strip()}"]
+        lines = []
+        for name in names:
+            deleted, output = self.backend.delete(name)
+            lines.append(f"{'DELETING' if deleted else 'ERROR'} {name}{'' if deleted else ': ' + output.strip()}")
+        for slot in range(self.size):
+            self._state_path(slot).unlink(missing_ok=True)
+        return lines
+
+
+_active: Optional[Lease] = None
+
+
+def start_session_lease(size: int, **kwargs: Any) -> Optional[Lease]:
+    """Lease a slot for this process (exported as RG_POOL_LEASE).
+
+    Starts maintenance when no slot was ready or a broken slot was found.
+    """
+    global _active
+    pool = ResourceGroupPool.from_shared_params(size, **kwargs)
+    _active = pool.lease()
+    if _active is None:
+        print(f"No ready resource group in pool {pool.name}; using the shared resource group and refilling")
+    else:
+        os.environ[LEASE_ENV] = _active.resource_group
+    if _active is None or pool.needs_maintenance:
+        pool.spawn_maintenance()
+    return _active
+
+
+def end_session_lease() -> None:
+    global _active
+    lease, _active = _active, None
+    os.environ.pop(LEASE_ENV, None)
+    if lease is not None and lease.release():
+        lease.pool.spawn_maintenance()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['maintain', 'status', 'drain'])
+    parser.add_argument('--size', type=int, default=int(os.getenv('RG_POOL', '0') or 0), help='default: $RG_POOL')
+    parser.add_argument('--pool', help='pool name (default: <shared RG>-p<host hash>, or $RG_POOL_NAME)')
+    parser.add_argument('--location', help='default: location from params.dev.json')
+    parser.add_argument('--root', type=Path, default=POOL_ROOT, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    pool = ResourceGroupPool(args.pool or default_pool_name(), args.size,
+                             args.location or get_location_from_shared_params(), _default_tags(), root=args.root)
+    if args.command == 'maintain':
+        lines = pool.maintain()
+    elif args.command == 'drain':
+        lines = pool.drain()
+    else:
+        lines = []
+        for slot in range(pool.size):
+            state = pool.read_state(slot)
+            handle = try_file_lock(pool.root / f'slot-{slot:02d}.lock')
+            leased = handle is None
+            if handle is not None:
+                handle.close()
+            name = pool.resource_group(slot, state['generation']) if state['state'] != MISSING else '-'
+            lines.append(f"slot {slot}: {state['state']:<8} {name}{' (leased)' if leased else ''}")
+    for line in lines:
+        print(line)
+    return 1 if any(line.startswith('ERROR') for line in lines) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,505 @@
+"""Pre-flight check of regional SKU availability for the compute parameters.
+
+What-ifs for jumpHostComputeTier, psqlComputeTier or nodeSize in a region
+where the SKU is restricted (e.g. southeastasia) only fail after minutes
+with SkuNotAvailable / "capacity restrictions". This index answers the same
+question up front from the SKU listings:
+
+- `az vm list-skus --location <region> --resource-type virtualMachines --all`
+- `az postgres flexible-server list-skus --location <region>`
+
+Each listing is reduced to {sku: availability} per kind and cached in
+tests/.sku-index/<subscription>/<region>.json for SKU_INDEX_TTL seconds
+(default 24h), so a lookup is one dict access. For an unavailable SKU the
+check suggests the closest available SKU from the parameter's @allowed set
+(by vCPUs and memory), and when there is none, the nearest regions where the
+requested SKU is available.
+
+Listings can also come from a directory of recorded az output instead of
+Azure (vm-<region>.json, psql-<region>.json, locations.json from
+`az account list-locations`), which is how the check runs offline.
+
+Usage:
+    python -m tests.unit.helpers.sku_index                          # params.dev.json, its region
+    python -m tests.unit.helpers.sku_index --region eastasia --refresh
+    python -m tests.unit.helpers.sku_index --listing-dir recorded/  # offline
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.param_matrix import MAIN_BICEP, parse_allowed_values
+from tests.unit.helpers.result_broker import named_lock, write_text_atomic
+from tests.unit.helpers.test_utils import (
+    SHARED_PARAMS_FILE,
+    get_location_from_shared_params,
+    get_subscription_id_from_shared_params
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+CACHE_DIR = REPO_ROOT / 'tests' / '.sku-index'
+DEFAULT_TTL = float(os.getenv('SKU_INDEX_TTL', str(24 * 3600)))
+# Nearest other regions whose listings are checked when no allowed SKU is available
+MAX_REGIONS = 3
+
+VM = 'vm'
+PSQL = 'psql'
+KINDS = (VM, PSQL)
+
+FIXTURES_DIR = REPO_ROOT / 'tests' / 'unit' / 'fixtures'
+
+# SKU parameters of main.bicep and their kind
+SKU_PARAMS = {
+    'jumpHostComputeTier': VM,
+    'psqlComputeTier': PSQL,
+    'nodeSize': VM,
+}
+# Wrappers can pin a VM size instead of passing jumpHostComputeTier through
+_WRAPPER_VM_SIZE = re.compile(r"^\s*vmSize:\s*'([^']+)'", re.MULTILINE)
+
+# Single-server style tier prefixes; flexible server lists the bare VM size
+_PSQL_TIER_PREFIX = re.compile(r'^(GP|MO|B)_', re.IGNORECASE)
+
+
+@dataclass
+class SkuEntry:
+    """Availability of one SKU in one region."""
+    name: str
+    available: bool
+    reason: str = ''
+    zones: List[str] = field(default_factory=list)
+    vcpus: Optional[float] = None
+    memory_gb: Optional[float] = None
+
+
+@dataclass
+class SkuRequest:
+    """A SKU the deployment (or a module wrapper's what-if) asks for."""
+    param: str
+    kind: str
+    sku: str
+    # @allowed set to pick alternatives from
+    allowed_param: str
+    modules: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SkuCheck:
+    """Pre-flight result for one requested SKU."""
+    param: str
+    sku: str
+    kind: str
+    available: bool
+    modules: List[str] = field(default_factory=list)
+    reason: str = ''
+    suggestion: Optional[str] = None
+    regions: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        if self.available:
+            return f"OK      {self.param}={self.sku}"
+        line = f"MISSING {self.param}={self.sku} ({self.reason})"
+        if self.suggestion:
+            line += f"; closest available: {self.suggestion}"
+        if self.regions:
+            line += f"; available in: {', '.join(self.regions)}"
+        return line
+
+
+def sku_key(kind: str, sku: str) -> str:
+    if kind == PSQL:
+        sku = _PSQL_TIER_PREFIX.sub('', sku)
+    return sku.lower()
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_vm_listing(listing: List[Dict[str, Any]], region: str) -> Dict[str, SkuEntry]:
+    """Availability from `az vm list-skus --all` output (Location restrictions make a SKU unavailable)."""
+    entries = {}
+    for sku in listing:
+        if sku.get('resourceType', 'virtualMachines') != 'virtualMachines' or not sku.get('name'):
+            continue
+        zones = sorted({z for info in sku.get('locationInfo') or []
+                        if (info.get('location') or '').lower() == region.lower() for z in info.get('zones') or []})
+        reason = ''
+        for restriction in sku.get('restrictions') or []:
+            info = restriction.get('restrictionInfo') or {}
+            if restriction.get('type') == 'Location':
+                locations = [loc.lower() for loc in info.get('locations') or restriction.get('values') or []]
+                if not locations or region.lower() in locations:
+                    reason = restriction.get('reasonCode') or 'Restricted'
+            elif restriction.get('type') == 'Zone':
+                zones = [z for z in zones if z not in (info.get('zones') or [])]
+        capabilities = {c.get('name'): c.get('value') for c in sku.get('capabilities') or []}
+        entries[sku['name'].lower()] = SkuEntry(
+            name=sku['name'],
+            available=not reason,
+            reason=reason,
+            zones=zones,
+            vcpus=_number(capabilities.get('vCPUs')),
+            memory_gb=_number(capabilities.get('MemoryGB'))
+        )
+    return entries
+
+
+def parse_psql_listing(listing: List[Dict[str, Any]]) -> Dict[str, SkuEntry]:
+    """Availability from `az postgres flexible-server list-skus` output.
+
+    A capability set with restricted=Enabled means the subscription cannot
+    create servers in the region; SKUs with status Disabled are not offered.
+    """
+    entries: Dict[str, SkuEntry] = {}
+    for capability in listing:
+        restricted = (capability.get('restricted') or '').lower() == 'enabled'
+        editions = capability.get('supportedServerEditions') or capability.get('supportedFlexibleServerEditions') or []
+        for edition in editions:
+            for sku in edition.get('supportedServerSkus') or []:
+                name = sku.get('name')
+                if not name:
+                    continue
+                disabled = (sku.get('status') or '').lower() == 'disabled'
+                vcores = _number(sku.get('vCores'))
+                memory_mb = _number(sku.get('supportedMemoryPerVcoreMb'))
+                entry = SkuEntry(
+                    name=name,
+                    available=not (restricted or disabled),
+                    reason='SubscriptionRestricted' if restricted else ('Disabled' if disabled else ''),
+                    zones=sorted(sku.get('supportedZones') or []),
+                    vcpus=vcores,
+                    memory_gb=vcores * memory_mb / 1024 if vcores and memory_mb else None
+                )
+                # The same SKU can appear in several capability sets; any available listing wins
+                if name.lower() not in entries or entry.available:
+                    entries[name.lower()] = entry
+    return entries
+
+
+class SkuIndex:
+    """SKU availability for one subscription and region, looked up in O(1)."""
+
+    def __init__(self, subscription: str, region: str, skus: Dict[str, Dict[str, SkuEntry]],
+                 fetched_at: Optional[float] = None):
+        self.subscription = subscription
+        self.region = region
+        self.skus = skus
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    @classmethod
+    def from_listings(cls, subscription: str, region: str, listings: Dict[str, Any]) -> 'SkuIndex':
+        return cls(subscription, region, {
+            VM: parse_vm_listing(listings.get(VM) or [], region),
+            PSQL: parse_psql_listing(listings.get(PSQL) or []),
+        })
+
+    def lookup(self, kind: str, sku: str) -> SkuEntry:
+        """Availability of a SKU (SKUs missing from the listing are unavailable)."""
+        entry = self.skus.get(kind, {}).get(sku_key(kind, sku))
+        return entry or SkuEntry(name=sku, available=False, reason='NotListed')
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.fetched_at
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'subscription': self.subscription,
+            'region': self.region,
+            'fetched_at': self.fetched_at,
+            'skus': {kind: {key: asdict(entry) for key, entry in entries.items()} for kind, entries in self.skus.items()},
+        })
+
+    @classmethod
+    def from_json(cls, text: str) -> 'SkuIndex':
+        data = json.loads(text)
+        skus = {kind: {key: SkuEntry(**entry) for key, entry in entries.items()}
+                for kind, entries in data['skus'].items()}
+        return cls(data['subscription'], data['region'], skus, data['fetched_at'])
+
+
+class AzSkuSource:
+    """SKU listings and region coordinates from az."""
+
+    def _az_json(self, cmd: List[str]) -> Tuple[bool, Any]:
+        try:
+            result = az_run(cmd + ['--output', 'json'], capture_output=True, text=True, check=False)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+        if result.returncode != 0:
+            return False, result.stderr or result.stdout
+        try:
+            return True, json.loads(result.stdout or '[]')
+        except json.JSONDecodeError as e:
+            return False, f"Could not parse az output: {e}"
+
+    def listing(self, kind: str, region: str, subscription: str) -> Tuple[bool, Any]:
+        if kind == VM:
+            cmd = ['az', 'vm', 'list-skus', '--location', region, '--resource-type', 'virtualMachines', '--all']
+        else:
+            cmd = ['az', 'postgres', 'flexible-server', 'list-skus', '--location', region]
+        return self._az_json(cmd + (['--subscription', subscription] if subscription else []))
+
+    def locations(self, subscription: str) -> Tuple[bool, Any]:
+        return self._az_json(['az', 'account', 'list-locations']
+                             + (['--subscription', subscription] if subscription else []))
+
+
+class RecordedSkuSource:
+    """SKU listings recorded from az into a directory (vm-<region>.json, psql-<region>.json, locations.json)."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _read(self, name: str) -> Tuple[bool, Any]:
+        path = self.directory / name
+        try:
+            return True, json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError) as e:
+            return False, f"No recorded listing {path}: {e}"
+
+    def listing(self, kind: str, region: str, subscription: str) -> Tuple[bool, Any]:
+        return self._read(f'{kind}-{region.lower()}.json')
+
+    def locations(self, subscription: str) -> Tuple[bool, Any]:
+        return self._read('locations.json')
+
+
+class SkuCache:
+    """On-disk SkuIndex per subscription and region, refreshed after ttl seconds."""
+
+    def __init__(self, source=None, cache_dir: Path = CACHE_DIR, ttl: float = DEFAULT_TTL):
+        self.source = source or AzSkuSource()
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._loaded: Dict[Tuple[str, str], SkuIndex] = {}
+
+    def _path(self, subscription: str, region: str) -> Path:
+        return self.cache_dir / (subscription or 'default') / f'{region.lower()}.json'
+
+    def _read_fresh(self, subscription: str, region: str) -> Optional[SkuIndex]:
+        try:
+            index = SkuIndex.from_json(self._path(subscription, region).read_text())
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return index if index.age() <= self.ttl else None
+
+    def get(self, subscription: str, region: str) -> Tuple[bool, Any]:
+        """Index for a region, from memory, disk (if younger than the TTL) or a new listing.
+
+        The listing runs under a machine-wide lock, so when every xdist worker
+        finds the cache cold only the first one lists; the others read its result.
+
+        Returns:
+            Tuple of (success, SkuIndex) or (False, error message)
+        """
+        key = (subscription, region.lower())
+        if key in self._loaded:
+            return True, self._loaded[key]
+        index = self._read_fresh(subscription, region)
+        if index is None:
+            with named_lock(f"sku-index-{subscription or 'default'}-{region.lower()}"):
+                # Another process may have listed the region while we waited
+                index = self._read_fresh(subscription, region)
+                if index is None:
+                    success, index = self._fetch(subscription, region)
+                    if not success:
+                        return False, index
+        self._loaded[key] = index
+        return True, index
+
+    def _fetch(self, subscription: str, region: str) -> Tuple[bool, Any]:
+        listings = {}
+        for kind in KINDS:
+            success, listing = self.source.listing(kind, region, subscription)
+            if not success:
+                return False, f"{kind} SKU listing for {region} failed: {str(listing).strip()}"
+            listings[kind] = listing
+        index = SkuIndex.from_listings(subscription, region, listings)
+        path = self._path(subscription, region)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(path, index.to_json())
+        return True, index
+
+    def nearest_regions(self, subscription: str, region: str) -> List[str]:
+        """Other physical regions ordered by great-circle distance (cached with the same TTL)."""
+        path = self.cache_dir / (subscription or 'default') / 'locations.json'
+
+        def read_fresh() -> Optional[Dict[str, Any]]:
+            try:
+                cached = json.loads(path.read_text())
+                return cached['locations'] if time.time() - cached['fetched_at'] <= self.ttl else None
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+
+        locations = read_fresh()
+        if locations is None:
+            with named_lock(f"sku-index-{subscription or 'default'}-locations"):
+                locations = read_fresh()
+                if locations is None:
+                    success, listing = self.source.locations(subscription)
+                    if not success:
+                        return []
+                    locations = {}
+                    for loc in listing:
+                        metadata = loc.get('metadata') or {}
+                        lat, lon = _number(metadata.get('latitude')), _number(metadata.get('longitude'))
+                        if metadata.get('regionType', 'Physical') == 'Physical' and lat is not None and lon is not None:
+                            locations[loc['name'].lower()] = (lat, lon)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    write_text_atomic(path, json.dumps({'fetched_at': time.time(), 'locations': locations}))
+        origin = locations.get(region.lower())
+        if not origin:
+            return []
+        others = [name for name in locations if name != region.lower()]
+        return sorted(others, key=lambda name: _distance_km(origin, locations[name]))
+
+
+def _distance_km(a, b) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def closest_available(index: SkuIndex, kind: str, sku: str, allowed: List[str]) -> Optional[str]:
+    """Closest available SKU among the allowed values: by vCPUs, then memory, then declaration order."""
+    requested = index.lookup(kind, sku)
+    position = allowed.index(sku) if sku in allowed else len(allowed)
+
+    def distance(candidate: Tuple[int, str]) -> Tuple[float, float, int]:
+        i, name = candidate
+        entry = index.lookup(kind, name)
+        cpu = abs((entry.vcpus or 0) - (requested.vcpus or 0)) if requested.vcpus else 0
+        memory = abs((entry.memory_gb or 0) - (requested.memory_gb or 0)) if requested.memory_gb else 0
+        return cpu, memory, abs(i - position)
+
+    candidates = [(i, name) for i, name in enumerate(allowed) if name != sku and index.lookup(kind, name).available]
+    return min(candidates, key=distance)[1] if candidates else None
+
+
+def requested_skus(params: Dict[str, Any], fixtures_dir: Path = FIXTURES_DIR) -> List[SkuRequest]:
+    """SKUs requested by the params file, and by wrappers that pin a VM size.
+
+    Args:
+        params: Parameter values ({name: value} or params-file style {name: {'value': ...}})
+        fixtures_dir: Directory of test-<module>.bicep wrappers
+
+    Returns:
+        One SkuRequest per SKU parameter with a value, listing the wrappers
+        that declare the parameter, plus one per literal vmSize in a wrapper
+    """
+    wrappers = {path.stem[len('test-'):]: path.read_text() for path in sorted(Path(fixtures_dir).glob('test-*.bicep'))}
+    requests = []
+    for param, kind in SKU_PARAMS.items():
+        value = params.get(param)
+        value = value.get('value') if isinstance(value, dict) else value
+        if value:
+            declared = re.compile(rf'^\s*param\s+{param}\b', re.MULTILINE)
+            requests.append(SkuRequest(param, kind, value, param,
+                                       [module for module, text in wrappers.items() if declared.search(text)]))
+    for module, text in wrappers.items():
+        for size in _WRAPPER_VM_SIZE.findall(text):
+            requests.append(SkuRequest(f'{module} vmSize', VM, size, 'jumpHostComputeTier', [module]))
+    return requests
+
+
+def preflight(
+    requests: List[SkuRequest],
+    subscription: str,
+    region: str,
+    cache: Optional[SkuCache] = None,
+    allowed: Optional[Dict[str, List[Any]]] = None,
+    max_regions: int = MAX_REGIONS
+) -> Tuple[bool, Any]:
+    """Check every requested SKU against the region's index.
+
+    Args:
+        requests: SKUs to check (see requested_skus)
+        subscription: Subscription ID (cache key and az --subscription)
+        region: Deployment region
+        cache: SkuCache (default: az listings cached in tests/.sku-index)
+        allowed: @allowed sets (default: parsed from main.bicep)
+        max_regions: Nearest other regions to check when no allowed SKU is available
+
+    Returns:
+        Tuple of (success, [SkuCheck]) or (False, error message) if the index could not be built
+    """
+    cache = cache or SkuCache()
+    allowed = parse_allowed_values(MAIN_BICEP.read_text()) if allowed is None else allowed
+    success, index = cache.get(subscription, region)
+    if not success:
+        return False, index
+
+    checks = []
+    for request in requests:
+        entry = index.lookup(request.kind, request.sku)
+        check = SkuCheck(param=request.param, sku=request.sku, kind=request.kind, available=entry.available,
+                         modules=list(request.modules), reason=entry.reason)
+        if not entry.available:
+            check.suggestion = closest_available(index, request.kind, request.sku,
+                                                 allowed.get(request.allowed_param, []))
+            if not check.suggestion:
+                for other in cache.nearest_regions(subscription, region)[:max_regions]:
+                    found, other_index = cache.get(subscription, other)
+                    if found and other_index.lookup(request.kind, request.sku).available:
+                        check.regions.append(other)
+        checks.append(check)
+    return True, checks
+
+
+def blocked_modules(checks: List[SkuCheck]) -> Dict[str, str]:
+    """Module wrappers whose what-if cannot succeed, with the reason."""
+    blocked = {}
+    for check in checks:
+        if not check.available:
+            for module in check.modules:
+                blocked[module] = check.describe()
+    return blocked
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--params', type=Path, default=SHARED_PARAMS_FILE, help='parameters file to check')
+    parser.add_argument('--region', help='default: location from params.dev.json')
+    parser.add_argument('--subscription', help='default: subscriptionId from params.dev.json')
+    parser.add_argument('--listing-dir', type=Path, help='use recorded az listings from this directory')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR, help='default: tests/.sku-index')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help='cache TTL in seconds (default: 86400)')
+    parser.add_argument('--refresh', action='store_true', help='ignore the cached index')
+    args = parser.parse_args(argv)
+
+    region = args.region or get_location_from_shared_params()
+    try:
+        subscription = args.subscription or get_subscription_id_from_shared_params()
+    except ValueError:
+        subscription = ''
+    source = RecordedSkuSource(args.listing_dir) if args.listing_dir else AzSkuSource()
+    cache = SkuCache(source, cache_dir=args.cache_dir, ttl=0 if args.refresh else args.ttl)
+    params = json.loads(args.params.read_text()).get('parameters', {})
+
+    success, checks = preflight(requested_skus(params), subscription, region, cache)
+    if not success:
+        print(f"ERROR {checks}")
+        return 1
+    print(f"SKU availability in {region}:")
+    for check in checks:
+        print(f"  {check.describe()}")
+    return 0 if all(check.available for check in checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,318 @@
+"""Size and limit budget of compiled main.bicep (run_bicep_build output).
+
+ARM rejects templates over hard limits (size, parameters, variables,
+resources, outputs, expression length), and large templates validate and
+deploy more slowly. The analyzer walks the compiled JSON including every
+nested module deployment and reports per module:
+
+- compact JSON size (including nested modules) and share of the total
+- template expressions ('[...]' strings) and the longest one
+- nested-deployment depth
+- headroom against each ARM limit (per template; size for the whole file)
+
+Snapshots are stored per commit in tests/.template-budget/<sha>.json. The
+current tree is compared against a base commit (default: the merge base with
+main); when the base has no snapshot yet, its iac/ tree is exported with
+git archive and compiled once. Modules that grow by more than --threshold,
+deeper nesting and any metric past WARN_FRACTION of its limit are flagged
+(exit code 1).
+
+Usage:
+    python -m tests.unit.helpers.template_budget                 # iac/main.bicep vs merge base with main
+    python -m tests.unit.helpers.template_budget --base HEAD~1
+    python -m tests.unit.helpers.template_budget --template build.json --no-base
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tests.unit.helpers.test_utils import run_bicep_build
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+MAIN_BICEP = REPO_ROOT / 'iac' / 'main.bicep'
+SNAPSHOT_DIR = REPO_ROOT / 'tests' / '.template-budget'
+
+# ARM template limits
+LIMITS = {
+    'bytes': 4 * 1024 * 1024,
+    'parameters': 256,
+    'variables': 256,
+    'resources': 800,
+    'outputs': 64,
+    'longest_expression': 24_576,
+}
+WARN_FRACTION = 0.8
+GROWTH_THRESHOLD = 0.10
+# Growth below this many bytes is never flagged (small modules fluctuate in percent)
+MIN_GROWTH_BYTES = 1024
+
+DEPLOYMENT_TYPE = 'Microsoft.Resources/deployments'
+
+
+@dataclass
+class TemplateStats:
+    """Budget figures for one template (the root or a nested module deployment)."""
+    path: str
+    depth: int
+    bytes: int
+    expressions: int
+    longest_expression: int
+    nested_depth: int
+    parameters: int
+    variables: int
+    resources: int
+    outputs: int
+
+
+def _compact_size(value: Any) -> int:
+    return len(json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def _expressions(value: Any) -> Iterator[str]:
+    """Template expressions in a JSON value ('[[' escapes a literal bracket)."""
+    if isinstance(value, str):
+        if value.startswith('[') and value.endswith(']') and not value.startswith('[['):
+            yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _expressions(key)
+            yield from _expressions(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _expressions(item)
+
+
+def _resources(template: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(label, resource) pairs; languageVersion 2.0 templates key resources by symbolic name."""
+    resources = template.get('resources', [])
+    if isinstance(resources, dict):
+        return list(resources.items())
+    return [(str(r.get('name', i)), r) for i, r in enumerate(resources)]
+
+
+def _resource_count(resource: Dict[str, Any]) -> int:
+    """Resources after copy expansion (a copy count that is an expression counts once)."""
+    count = resource.get('copy', {}).get('count')
+    return count if isinstance(count, int) else 1
+
+
+def analyze(template: Dict[str, Any], path: str = 'main', depth: int = 0) -> List[TemplateStats]:
+    """Budget figures for a compiled template and all nested module templates (root first).
+
+    Size and expressions include nested templates; the other counts are the
+    template's own, as ARM applies those limits per template.
+    """
+    nested: List[TemplateStats] = []
+    for label, resource in _resources(template):
+        inner = resource.get('properties', {}).get('template') if resource.get('type') == DEPLOYMENT_TYPE else None
+        if isinstance(inner, dict):
+            nested += analyze(inner, f'{path}/{label}', depth + 1)
+    expressions = list(_expressions(template))
+    children = [s for s in nested if s.depth == depth + 1]
+    stats = TemplateStats(
+        path=path,
+        depth=depth,
+        bytes=_compact_size(template),
+        expressions=len(expressions),
+        longest_expression=max((len(e) for e in expressions), default=0),
+        nested_depth=max((s.nested_depth + 1 for s in children), default=0),
+        parameters=len(template.get('parameters', {})),
+        variables=len(template.get('variables', {})),
+        resources=sum(_resource_count(r) for _, r in _resources(template)),
+        outputs=len(template.get('outputs', {})),
+    )
+    return [stats] + nested
+
+
+def snapshot(stats: List[TemplateStats]) -> Dict[str, Dict[str, int]]:
+    """JSON-serializable {path: figures} as stored per commit."""
+    return {s.path: {k: v for k, v in asdict(s).items() if k != 'path'} for s in stats}
+
+
+def limit_warnings(current: Dict[str, Dict[str, int]], warn_fraction: float = WARN_FRACTION) -> List[str]:
+    """Metrics past warn_fraction of their ARM limit (size only for the whole file)."""
+    warnings = []
+    for path, figures in current.items():
+        for metric, limit in LIMITS.items():
+            if metric == 'bytes' and figures['depth'] > 0:
+                continue
+            if figures[metric] > limit * warn_fraction:
+                warnings.append(f"{path}: {metric} {figures[metric]:,} of {limit:,} "
+                                f"({figures[metric] / limit:.0%} of the ARM limit)")
+    return warnings
+
+
+def compare_snapshots(previous: Dict[str, Dict[str, int]], current: Dict[str, Dict[str, int]],
+                      threshold: float = GROWTH_THRESHOLD) -> List[str]:
+    """Modules that grew by more than threshold (fraction) or nest deeper than before."""
+    regressions = []
+    for path, figures in current.items():
+        before = previous.get(path)
+        if not before:
+            continue
+        grown = figures['bytes'] - before['bytes']
+        if grown >= MIN_GROWTH_BYTES and grown > before['bytes'] * threshold:
+            regressions.append(f"{path}: {before['bytes']:,} -> {figures['bytes']:,} bytes "
+                               f"(+{grown / before['bytes']:.0%})")
+        if figures['nested_depth'] > before['nested_depth']:
+            regressions.append(f"{path}: nested depth {before['nested_depth']} -> {figures['nested_depth']}")
+    return regressions
+
+
+def format_report(current: Dict[str, Dict[str, int]], previous: Optional[Dict[str, Dict[str, int]]] = None) -> List[str]:
+    root = next(iter(current.values()))
+    lines = [f"{'module':<40} {'bytes':>10} {'share':>6} {'delta':>8} {'exprs':>6} {'depth':>5}"]
+    for path, figures in current.items():
+        before = (previous or {}).get(path)
+        delta = f"{figures['bytes'] - before['bytes']:+,}" if before else ('new' if previous else '')
+        lines.append(f"{'  ' * figures['depth'] + path.rsplit('/', 1)[-1]:<40} {figures['bytes']:>10,} "
+                     f"{figures['bytes'] / root['bytes']:>6.0%} {delta:>8} {figures['expressions']:>6} "
+                     f"{figures['nested_depth']:>5}")
+    for metric, limit in LIMITS.items():
+        worst = max(current.values(), key=lambda f: f[metric]) if metric != 'bytes' else root
+        lines.append(f"  {metric:<20} {worst[metric]:>10,} of {limit:>10,} ({1 - worst[metric] / limit:.0%} headroom)")
+    return lines
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def commit_id(ref: str = 'HEAD') -> str:
+    return _git('rev-parse', '--verify', f'{ref}^{{commit}}')
+
+
+def default_base() -> str:
+    """Merge base of HEAD with main (or origin/main)."""
+    for branch in ('main', 'origin/main'):
+        try:
+            return _git('merge-base', 'HEAD', branch)
+        except subprocess.CalledProcessError:
+            continue
+    raise ValueError("No main branch to compare against; pass --base")
+
+
+def load_snapshot(commit: str, snapshot_dir: Path = SNAPSHOT_DIR) -> Optional[Dict[str, Dict[str, int]]]:
+    try:
+        return json.loads((snapshot_dir / f'{commit}.json').read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_snapshot(commit: str, current: Dict[str, Dict[str, int]], snapshot_dir: Path = SNAPSHOT_DIR) -> Path:
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    path = snapshot_dir / f'{commit}.json'
+    path.write_text(json.dumps(current, indent=2) + '\n')
+    return path
+
+
+def build_snapshot(bicep_file: Path) -> Dict[str, Dict[str, int]]:
+    """Compile a Bicep file and analyze it.
+
+    Raises:
+        ValueError: If the build fails
+    """
+    success, output = run_bicep_build(bicep_file)
+    if not success:
+        raise ValueError(f"Build failed for {bicep_file}: {output.strip()}")
+    return snapshot(analyze(json.loads(output)))
+
+
+def extract_archive(tar: tarfile.TarFile, dest: str) -> None:
+    """Extract tar into dest, refusing members that would land outside it.
+
+    Uses tarfile's 'data' filter where available (Python 3.12, and 3.8.17 /
+    3.9.17 / 3.10.12 / 3.11.4 onwards). Older Pythons raise TypeError for the
+    filter argument; there every member is checked first: only files,
+    directories and links are allowed, and no name or link target may be
+    absolute or resolve outside dest.
+
+    Raises:
+        tarfile.TarError: If a member is unsafe
+    """
+    try:
+        tar.extractall(dest, filter='data')
+        return
+    except TypeError:
+        pass
+    root = os.path.realpath(dest)
+
+    def inside(path: str) -> bool:
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    for member in tar.getmembers():
+        target = os.path.join(root, member.name)
+        if os.path.isabs(member.name) or not inside(target):
+            raise tarfile.TarError(f"Refusing to extract {member.name!r} outside {dest}")
+        if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+            raise tarfile.TarError(f"Refusing to extract special file {member.name!r}")
+        if member.issym() or member.islnk():
+            # Hard link targets are archive paths; symlink targets are relative to the link's directory
+            base = root if member.islnk() else os.path.dirname(target)
+            if os.path.isabs(member.linkname) or not inside(os.path.join(base, member.linkname)):
+                raise tarfile.TarError(f"Refusing to extract link {member.name!r} -> {member.linkname!r}")
+    tar.extractall(dest)
+
+
+def build_commit_snapshot(commit: str, snapshot_dir: Path = SNAPSHOT_DIR) -> Dict[str, Dict[str, int]]:
+    """Snapshot of iac/main.bicep at a commit (stored, or compiled from a git archive of iac/)."""
+    stored = load_snapshot(commit, snapshot_dir)
+    if stored is not None:
+        return stored
+    archive = subprocess.run(['git', 'archive', '--format=tar', commit, 'iac'], cwd=REPO_ROOT,
+                             capture_output=True, check=True).stdout
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            extract_archive(tar, tmp_dir)
+        current = build_snapshot(Path(tmp_dir) / MAIN_BICEP.relative_to(REPO_ROOT))
+    save_snapshot(commit, current, snapshot_dir)
+    return current
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--template', type=Path, help='analyze this compiled template instead of building main.bicep')
+    parser.add_argument('--base', help='commit to compare against (default: merge base with main)')
+    parser.add_argument('--no-base', action='store_true', help='only check the ARM limits')
+    parser.add_argument('--threshold', type=float, default=GROWTH_THRESHOLD,
+                        help='flag modules growing more than this fraction (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.template:
+            current = snapshot(analyze(json.loads(args.template.read_text())))
+        else:
+            current = build_snapshot(MAIN_BICEP)
+            head = commit_id()
+            if not _git('status', '--porcelain', '--', 'iac'):
+                save_snapshot(head, current)
+        previous = None
+        if not args.no_base:
+            base = commit_id(args.base) if args.base else default_base()
+            previous = build_commit_snapshot(base)
+            print(f"Compared against {base[:12]}")
+    except (ValueError, subprocess.CalledProcessError, OSError) as e:
+        print(f"ERROR {getattr(e, 'stderr', None) or e}")
+        return 1
+
+    for line in format_report(current, previous):
+        print(line)
+    problems = limit_warnings(current)
+    for line in problems:
+        print(f"LIMIT {line}")
+    regressions = compare_snapshots(previous, current, args.threshold) if previous else []
+    for line in regressions:
+        print(f"GROWTH {line}")
+    return 1 if problems or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -4,9 +4,17 @@ import os
 import re
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 from typing import Dict, Any, Set
 
+from tests.unit.helpers.az_cassette import az_run, get_mode
+from tests.unit.helpers.az_errors import run_with_retry
+from tests.unit.helpers.durations import DurationDB, wrapper_module
+from tests.unit.helpers.result_broker import get_broker, make_key, named_lock
+from tests.unit.helpers.tracing import span
+from tests.unit.helpers.waf_ranges import compact_params
+
 # Shared params file - single source of truth for RG name and location
 # Path: tests/unit/helpers/test_utils.py -> tests/unit/helpers -> tests/unit -> tests -> tests/fixtures
 TESTS_DIR = Path(__file__).parent.parent.parent  # tests/
@@ -47,9 +55,15 @@ def ensure_resource_group_exists(rg_name: str, location: str = 'eastus') -> tupl
     Returns:
         Tuple of (success: bool, message: str)
     """
+    # Serialize check-then-create across parallel workers sharing the same RG
+    with named_lock(f'rg-{rg_name}'):
+        return _ensure_resource_group_exists(rg_name, location)
+
+
+def _ensure_resource_group_exists(rg_name: str, location: str) -> tuple[bool, str]:
     try:
         # Check if RG exists
-        check_result = subprocess.run(
+        check_result = az_run(
             ['az', 'group', 'exists', '--name', rg_name],
             capture_output=True,
             text=True,
@@ -61,7 +75,7 @@ def ensure_resource_group_exists(rg_name: str, location: str = 'eastus') -> tupl
         
         # RG doesn't exist, create it
         print(f"Resource group {rg_name} does not exist. Creating...")
-        create_result = subprocess.run(
+        create_result = az_run(
             ['az', 'group', 'create', '--name', rg_name, '--location', location],
             capture_output=True,
             text=True,
@@ -78,7 +92,7 @@ def ensure_resource_group_exists(rg_name: str, location: str = 'eastus') -> tupl
 def run_bicep_build(bicep_file: Path) -> tuple[bool, str]:
     """Compile a Bicep file and return success status and output."""
     try:
-        result = subprocess.run(
+        result = az_run(
             ['az', 'bicep', 'build', '--file', str(bicep_file), '--stdout'],
             capture_output=True,
             text=True,
@@ -116,7 +130,7 @@ def run_bicep_build_with_params(bicep_file: Path, params_file: Path, resource_gr
         return False, f"Failed to ensure resource group exists: {resource_group}"
     
     try:
-        result = subprocess.run(
+        result = az_run(
             [
                 'az', 'deployment', 'group', 'what-if',
                 '--resource-group', resource_group,
@@ -135,6 +149,62 @@ def run_bicep_build_with_params(bicep_file: Path, params_file: Path, resource_gr
         return False, "Azure CLI not found. Please install Azure CLI."
 
 
+def strip_cli_warnings(output: str) -> str:
+    """Remove Azure CLI WARNING lines (including multi-line warnings) from command output.
+    
+    Warnings typically start with "WARNING:" and are not part of JSON output.
+    A warning block runs until the next empty line.
+    
+    Args:
+        output: Raw stdout from an az command
+    
+    Returns:
+        Output with warning blocks removed (original output if nothing is left)
+    """
+    lines = output.split('\n')
+    json_lines = []
+    skip_until_empty = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('WARNING:'):
+            skip_until_empty = True
+            continue
+        if skip_until_empty and not stripped:
+            skip_until_empty = False
+            continue
+        if not skip_until_empty:
+            json_lines.append(line)
+    
+    cleaned_output = '\n'.join(json_lines).strip()
+    
+    # If output is empty after filtering, return original (shouldn't happen, but safety check)
+    if not cleaned_output:
+        cleaned_output = output
+    
+    return cleaned_output
+
+
+def extract_module_dependencies(bicep_text: str) -> Dict[str, Set[str]]:
+    """Extract explicit module dependencies (dependsOn) from Bicep source.
+    
+    Args:
+        bicep_text: Contents of a Bicep template (e.g. main.bicep)
+    
+    Returns:
+        Dict mapping module symbolic name to the set of names in its dependsOn block
+    """
+    module_re = re.compile(r"module\s+(\w+)\s+'[^']+'\s*=\s*{(.*?)\n}", re.S)
+    deps = {}
+    for name, body in module_re.findall(bicep_text):
+        dep_match = re.search(r"dependsOn:\s*\[(.*?)\]", body, re.S)
+        if dep_match:
+            dep_block = dep_match.group(1)
+            deps[name] = set(re.findall(r"\b(\w+)\b", dep_block))
+        else:
+            deps[name] = set()
+    return deps
+
+
 def get_resource_group_from_shared_params() -> str:
     """Extract resource group name from shared params.dev.json file.
     
@@ -216,7 +286,7 @@ def get_current_user_object_id() -> str:
         RuntimeError: If Azure CLI is not available or user is not signed in
     """
     try:
-        result = subprocess.run(
+        result = az_run(
             ['az', 'ad', 'signed-in-user', 'show', '--query', 'id', '-o', 'tsv'],
             capture_output=True,
             text=True,
@@ -236,7 +306,8 @@ def run_what_if(
     bicep_file: Path,
     params_file: Path = None,  # Optional - if None, uses only shared params
     resource_group: str = None,  # Auto-extracted from shared params if None
-    ensure_rg_exists: bool = True  # Auto-create RG if it doesn't exist
+    ensure_rg_exists: bool = True,  # Auto-create RG if it doesn't exist
+    result_format: str = 'FullResourcePayloads'  # Or 'ResourceIdOnly' (smaller, faster)
 ) -> tuple[bool, str]:
     """Run Azure what-if for a Bicep deployment.
     
@@ -245,10 +316,12 @@ def run_what_if(
         params_file: Optional path to parameters JSON file (for module-specific overrides)
         resource_group: Name of the resource group (extracted from shared params.dev.json if None)
         ensure_rg_exists: If True, create RG if it doesn't exist (location from shared params)
+        result_format: What-if result format ('FullResourcePayloads' or 'ResourceIdOnly')
     
     Returns:
         Tuple of (success: bool, output: str)
-        Returns JSON output with full resource payloads for parsing and validation.
+        Returns JSON output with full resource payloads (or only resource IDs and
+        change types for ResourceIdOnly) for parsing and validation.
         
     Note:
         All parameters from tests/fixtures/params.dev.json are automatically included.
@@ -256,106 +329,137 @@ def run_what_if(
         resourceGroupName and location are always set from metadata section.
         Bicep will ignore any unused parameters, so it's safe to include all parameters.
     """
+    with span('run_what_if', module=Path(bicep_file).stem, resource_group=resource_group,
+              result_format=result_format) as what_if_span:
+        success, output = _run_what_if(bicep_file, params_file, resource_group, ensure_rg_exists, result_format)
+        what_if_span.set(success=success, payload_bytes=len(output or ''))
+    return success, output
+
+
+def _run_what_if(
+    bicep_file: Path,
+    params_file: Path,
+    resource_group: str,
+    ensure_rg_exists: bool,
+    result_format: str
+) -> tuple[bool, str]:
     # Extract resource group name from shared params file if not provided
+    target_group = None
     if resource_group is None:
         try:
             resource_group = get_resource_group_from_shared_params()
         except ValueError as e:
             return False, str(e)
+        # With RG_POOL, this worker's leased resource group (see rg_pool.py). It already
+        # exists, and resourceGroupName stays the shared name so derived names do not change.
+        target_group = os.getenv('RG_POOL_LEASE') or None
+    target_group = target_group or resource_group
     
     # Extract location from shared params file
     location = get_location_from_shared_params()
     
     # Ensure resource group exists if requested
-    if ensure_rg_exists:
-        rg_success, rg_message = ensure_resource_group_exists(resource_group, location)
+    if ensure_rg_exists and target_group == resource_group:
+        with span('ensure_resource_group', resource_group=resource_group):
+            rg_success, rg_message = ensure_resource_group_exists(resource_group, location)
         if not rg_success:
             return False, f"Resource group check failed: {rg_message}"
     
-    # Initialize module params (empty if no params_file provided)
-    module_params = {'parameters': {}}
-    if params_file is not None:
-        module_params = load_json_file(params_file)
-        if 'parameters' not in module_params:
-            module_params['parameters'] = {}
-    
-    # Extract parameters actually declared in the Bicep template
-    declared_params = extract_bicep_parameters(bicep_file)
-    
-    # Load shared params file (single source of truth)
-    shared_params = load_json_file(SHARED_PARAMS_FILE)
-    
-    # Merge parameters from shared params, but only include those declared in the template
-    # (Azure ARM rejects extra parameters)
-    shared_param_values = shared_params.get('parameters', {})
-    for param_name, param_value in shared_param_values.items():
-        # Only add if:
-        # 1. Not already in module params (module params take precedence)
-        # 2. Parameter is declared in the Bicep template (to avoid ARM validation errors)
-        if param_name not in module_params['parameters'] and param_name in declared_params:
-            # Special handling for customerAdminObjectId: replace dummy value with current user's object ID
-            if param_name == 'customerAdminObjectId':
-                current_value = param_value.get('value', '')
-                # If it's the dummy value, replace with current user's object ID
-                if current_value == '00000000-0000-0000-0000-000000000000':
-                    try:
-                        current_user_id = get_current_user_object_id()
-                        module_params['parameters'][param_name] = {'value': current_user_id}
-                        print(f"Using current user's object ID for customerAdminObjectId: {current_user_id}")
-                    except RuntimeError as e:
-                        # If we can't get the current user ID, use the original value
-                        print(f"Warning: {e}. Using customerAdminObjectId from params.dev.json")
+    # One span for the whole merge; an exception inside still ends (and marks) it
+    with span('merge_params', module=Path(bicep_file).stem) as merge_span:
+        # Initialize module params (empty if no params_file provided)
+        module_params = {'parameters': {}}
+        if params_file is not None:
+            module_params = load_json_file(params_file)
+            if 'parameters' not in module_params:
+                module_params['parameters'] = {}
+    
+        # Extract parameters actually declared in the Bicep template
+        declared_params = extract_bicep_parameters(bicep_file)
+    
+        # Load shared params file (single source of truth)
+        shared_params = load_json_file(SHARED_PARAMS_FILE)
+    
+        # Merge parameters from shared params, but only include those declared in the template
+        # (Azure ARM rejects extra parameters)
+        shared_param_values = shared_params.get('parameters', {})
+        for param_name, param_value in shared_param_values.items():
+            # Only add if:
+            # 1. Not already in module params (module params take precedence)
+            # 2. Parameter is declared in the Bicep template (to avoid ARM validation errors)
+            if param_name not in module_params['parameters'] and param_name in declared_params:
+                # Special handling for customerAdminObjectId: replace dummy value with current user's object ID
+                if param_name == 'customerAdminObjectId':
+                    current_value = param_value.get('value', '')
+                    # If it's the dummy value, replace with current user's object ID
+                    if current_value == '00000000-0000-0000-0000-000000000000':
+                        try:
+                            with span('identity_lookup'):
+                                current_user_id = get_current_user_object_id()
+                            module_params['parameters'][param_name] = {'value': current_user_id}
+                            print(f"Using current user's object ID for customerAdminObjectId: {current_user_id}")
+                        except RuntimeError as e:
+                            # If we can't get the current user ID, use the original value
+                            print(f"Warning: {e}. Using customerAdminObjectId from params.dev.json")
+                            module_params['parameters'][param_name] = param_value
+                    else:
+                        # Use the value from params.dev.json as-is
                         module_params['parameters'][param_name] = param_value
                 else:
-                    # Use the value from params.dev.json as-is
                     module_params['parameters'][param_name] = param_value
-            else:
-                module_params['parameters'][param_name] = param_value
-    
-    # Always merge resourceGroupName and location from metadata (these are special)
-    # These come from metadata section, not parameters section
-    # Only add if declared in template
-    if 'resourceGroupName' in declared_params:
-        module_params['parameters']['resourceGroupName'] = {'value': resource_group}
-    if 'location' in declared_params:
-        module_params['parameters']['location'] = {'value': location}
-    
-    # Handle subscriptionId from metadata if available (for gateway test wrapper)
-    # Only add if declared in template
-    if 'subscriptionId' in declared_params and 'subscriptionId' not in module_params['parameters']:
-        try:
-            subscription_id = get_subscription_id_from_shared_params()
-            module_params['parameters']['subscriptionId'] = {'value': subscription_id}
-        except ValueError:
-            # If subscription ID not found, skip adding it (will fail with clear error)
-            pass
     
-    # Handle defaultTags from metadata if available (for single-tenant deployments)
-    # Only add if declared in template
-    if 'defaultTags' in declared_params and 'defaultTags' not in module_params['parameters']:
-        try:
-            params_data = load_json_file(SHARED_PARAMS_FILE)
-            default_tags = params_data.get('metadata', {}).get('defaultTags', {})
-            if default_tags:
-                module_params['parameters']['defaultTags'] = {'value': default_tags}
-        except Exception:
-            # If not found, use empty object
-            module_params['parameters']['defaultTags'] = {'value': {}}
+        # Always merge resourceGroupName and location from metadata (these are special)
+        # These come from metadata section, not parameters section
+        # Only add if declared in template
+        if 'resourceGroupName' in declared_params:
+            module_params['parameters']['resourceGroupName'] = {'value': resource_group}
+        if 'location' in declared_params:
+            module_params['parameters']['location'] = {'value': location}
+    
+        # Handle subscriptionId from metadata if available (for gateway test wrapper)
+        # Only add if declared in template
+        if 'subscriptionId' in declared_params and 'subscriptionId' not in module_params['parameters']:
+            try:
+                subscription_id = get_subscription_id_from_shared_params()
+                module_params['parameters']['subscriptionId'] = {'value': subscription_id}
+            except ValueError:
+                # If subscription ID not found, skip adding it (will fail with clear error)
+                pass
     
+        # Handle defaultTags from metadata if available (for single-tenant deployments)
+        # Only add if declared in template
+        if 'defaultTags' in declared_params and 'defaultTags' not in module_params['parameters']:
+            try:
+                params_data = load_json_file(SHARED_PARAMS_FILE)
+                default_tags = params_data.get('metadata', {}).get('defaultTags', {})
+                if default_tags:
+                    module_params['parameters']['defaultTags'] = {'value': default_tags}
+            except Exception:
+                # If not found, use empty object
+                module_params['parameters']['defaultTags'] = {'value': {}}
+    
+        # Collapse customerIpRanges to the minimal covering CIDR set (see waf_ranges.py)
+        try:
+            compact_params(module_params['parameters'])
+        except ValueError as e:
+            merge_span.set(error='ValueError')
+            return False, str(e)
+        merge_span.set(parameter_count=len(module_params['parameters']))
+
     # Create temporary merged params file
     with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp_file:
         json.dump(module_params, tmp_file, indent=2)
         tmp_params_file = tmp_file.name
     
     try:
-        result = subprocess.run(
+        result = az_run(
             [
                 'az', 'deployment', 'group', 'what-if',
-                '--resource-group', resource_group,
+                '--resource-group', target_group,
                 '--template-file', str(bicep_file),
                 '--parameters', f'@{tmp_params_file}',
                 '--output', 'json',
-                '--result-format', 'FullResourcePayloads',
+                '--result-format', result_format,
                 '--no-pretty-print'
             ],
             capture_output=True,
@@ -364,30 +468,8 @@ def run_what_if(
         )
         
         # Filter out warnings from output (Azure CLI writes warnings to stderr, but they may be mixed)
-        # Warnings typically start with "WARNING:" and are not part of JSON output
-        # Also handle multi-line warnings and find the actual JSON content
-        output = result.stdout
-        
-        # Remove WARNING lines (including multi-line warnings)
-        lines = output.split('\n')
-        json_lines = []
-        skip_until_empty = False
-        for line in lines:
-            stripped = line.strip()
-            if stripped.startswith('WARNING:'):
-                skip_until_empty = True
-                continue
-            if skip_until_empty and not stripped:
-                skip_until_empty = False
-                continue
-            if not skip_until_empty:
-                json_lines.append(line)
-        
-        cleaned_output = '\n'.join(json_lines).strip()
-        
-        # If output is empty after filtering, return original (shouldn't happen, but safety check)
-        if not cleaned_output:
-            cleaned_output = output
+        with span('strip_cli_warnings', payload_bytes=len(result.stdout)):
+            cleaned_output = strip_cli_warnings(result.stdout)
         
         return True, cleaned_output
     except subprocess.CalledProcessError as e:
@@ -395,9 +477,9 @@ def run_what_if(
         if ('ResourceGroupBeingDeleted' in e.stderr or 
             'deprovisioning' in e.stderr.lower()):
             return False, (
-                f"Resource group '{resource_group}' is being deleted (deprovisioning). "
+                f"Resource group '{target_group}' is being deleted (deprovisioning). "
                 f"Please wait for deletion to complete before running tests. "
-                f"Check status with: az group exists --name {resource_group}"
+                f"Check status with: az group exists --name {target_group}"
             )
         return False, e.stderr
     except FileNotFoundError:
@@ -410,6 +492,37 @@ def run_what_if(
             pass
 
 
+def run_what_if_shared(
+    bicep_file: Path,
+    params_file: Path = None,
+    resource_group: str = None,
+    ensure_rg_exists: bool = True,
+    result_format: str = 'FullResourcePayloads'
+) -> tuple[bool, str]:
+    """Run what-if once per distinct input across all pytest-xdist workers.
+    
+    Same arguments and return value as run_what_if. The first worker to ask
+    for a given template/params/resource group combination runs what-if; the
+    others wait for and reuse its result. Throttled and transient ARM errors
+    are retried (see az_errors.run_with_retry) before the result is shared.
+    Successful what-if durations are recorded for longest-first scheduling
+    (see durations.py).
+    """
+    key = make_key('what-if', bicep_file, params_file, SHARED_PARAMS_FILE, resource_group, result_format)
+    
+    def compute() -> tuple[bool, str]:
+        start = time.perf_counter()
+        success, output = run_with_retry(
+            lambda: run_what_if(bicep_file, params_file, resource_group, ensure_rg_exists, result_format)
+        )
+        if success and get_mode() != 'replay':
+            DurationDB().record('what-if', wrapper_module(bicep_file), get_location_from_shared_params(),
+                                time.perf_counter() - start)
+        return success, output
+    
+    return get_broker().get_or_compute(key, compute)
+
+
 def load_json_file(file_path: Path) -> Dict[str, Any]:
     """Load and parse a JSON file."""
     with open(file_path, 'r') as f:
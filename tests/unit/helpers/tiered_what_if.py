@@ -0,0 +1,129 @@
+"""Tiered what-if: resource IDs first, full payloads only when needed.
+
+Most assertions (summarize, validate_no_deletions, status checks) only need
+resource IDs and change types, which `--result-format ResourceIdOnly` returns
+in a fraction of the size and time. TieredWhatIf runs that first and only
+runs the FullResourcePayloads what-if the first time a validator reads
+'before', 'after' or 'delta' from a resource change.
+
+ResourceIdOnly cannot diff resources that already exist: ARM reports them
+as 'Deploy' instead of Modify or NoChange. A ResourceIdOnly result with any
+'Deploy' change is therefore escalated to FullResourcePayloads right away,
+so summaries and saved outputs keep showing drift.
+"""
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from tests.unit.helpers.what_if_parser import parse_what_if_output
+
+ID_ONLY = 'ResourceIdOnly'
+FULL = 'FullResourcePayloads'
+
+# Resource change keys that are only populated by FullResourcePayloads
+PAYLOAD_KEYS = ('before', 'after', 'delta')
+# ResourceIdOnly change types that stand for Modify or NoChange (existing resources)
+UNRESOLVED_CHANGE_TYPES = {'Deploy'}
+
+
+def needs_full_payloads(output: str) -> bool:
+    """True if a ResourceIdOnly what-if output has changes only FullResourcePayloads can classify."""
+    changes = parse_what_if_output(output).get('resource_changes', [])
+    return any(c.get('change_type') in UNRESOLVED_CHANGE_TYPES for c in changes)
+
+
+def run_escalating(run: Callable[[str], tuple[bool, str]]) -> tuple[bool, str]:
+    """Run a ResourceIdOnly what-if, re-running with FullResourcePayloads if it reports 'Deploy'.
+
+    Args:
+        run: Function taking a result format and returning (success, output)
+    """
+    success, output = run(ID_ONLY)
+    if success and needs_full_payloads(output):
+        return run(FULL)
+    return success, output
+
+
+class LazyResourceChange(Mapping):
+    """Read-only resource change that fetches full payloads on first payload access.
+
+    A Mapping rather than a dict subclass, so every access path (`in`, keys,
+    items, values, copy, dict(), ** unpacking) goes through __getitem__ and
+    sees the full payload, never an empty one.
+    """
+
+    def __init__(self, owner: 'TieredWhatIf', data: Dict[str, Any]):
+        self._data = dict(data)
+        self._owner = owner
+
+    def _load_payload(self, key: str) -> None:
+        if key in PAYLOAD_KEYS and key not in self._data:
+            full = self._owner.full_change(self._data.get('resource_id'))
+            for payload_key in PAYLOAD_KEYS:
+                self._data[payload_key] = full.get(payload_key, [] if payload_key == 'delta' else {})
+
+    def __getitem__(self, key):
+        self._load_payload(key)
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._data
+        yield from (key for key in PAYLOAD_KEYS if key not in self._data)
+
+    def __len__(self) -> int:
+        return len(self._data) + sum(1 for key in PAYLOAD_KEYS if key not in self._data)
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f'LazyResourceChange({self._data!r})'
+
+
+class TieredWhatIf:
+    """What-if result that escalates from ResourceIdOnly to FullResourcePayloads on demand."""
+
+    def __init__(self, run: Callable[[str], tuple[bool, str]]):
+        """
+        Args:
+            run: Function taking a result format and returning (success, output),
+                 e.g. lambda fmt: run_what_if(bicep_file, result_format=fmt)
+        """
+        self._run = run
+        self._full_by_id: Optional[Dict[str, Dict[str, Any]]] = None
+        self.full_payload_runs = 0
+        self.success, self.output = run(ID_ONLY)
+        if self.success and needs_full_payloads(self.output):
+            # Existing resources: only full payloads tell Modify from NoChange
+            self.success, self.output = self._fetch_full()
+            if self.success:
+                self._index_full(self.output)
+
+    def parsed(self) -> Dict[str, Any]:
+        """Return a parse_what_if_output-shaped dict with lazy resource changes."""
+        parsed = parse_what_if_output(self.output)
+        if 'resource_changes' in parsed:
+            parsed['resource_changes'] = [
+                LazyResourceChange(self, {'resource_id': c['resource_id'], 'change_type': c['change_type']})
+                for c in parsed['resource_changes']
+            ]
+        return parsed
+
+    def _fetch_full(self) -> tuple[bool, str]:
+        self.full_payload_runs += 1
+        return self._run(FULL)
+
+    def _index_full(self, output: str) -> None:
+        changes = parse_what_if_output(output).get('resource_changes', [])
+        self._full_by_id = {c['resource_id'].lower(): c for c in changes if c.get('resource_id')}
+
+    def _load_full(self) -> Dict[str, Dict[str, Any]]:
+        if self._full_by_id is None:
+            success, output = self._fetch_full()
+            if not success:
+                raise RuntimeError(f"Full-payload what-if failed: {output}")
+            self._index_full(output)
+        return self._full_by_id
+
+    def full_change(self, resource_id: Optional[str]) -> Dict[str, Any]:
+        """Return the full-payload resource change for a resource ID (empty if absent)."""
+        return self._load_full().get((resource_id or '').lower(), {})
@@ -0,0 +1,180 @@
+"""Span tracing for harness runs, exported as Chrome/Perfetto trace-event JSON.
+
+Set HARNESS_TRACE to a file path to record nested spans (what-if phases,
+every az call, deployment steps) and open the file in chrome://tracing or
+https://ui.perfetto.dev as a flame timeline:
+
+    HARNESS_TRACE=trace.json pytest tests/unit/test_modules.py -n 8
+
+    with span('run_what_if', module='kv', resource_group=rg) as s:
+        ...
+        s.set(payload_bytes=len(output))
+
+Spans are complete ('X') events; nesting comes from time containment on the
+same thread. Each process buffers its events and merges them into the trace
+file at exit (under a file lock, so pytest-xdist workers and other child
+processes share one file). When HARNESS_TRACE is unset, span() returns a shared
+no-op object.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tests.unit.helpers.result_broker import file_lock, write_text_atomic
+
+TRACE_ENV = 'HARNESS_TRACE'
+_STARTED_ENV = 'HARNESS_TRACE_STARTED'
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled."""
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def end(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """An open span; recorded when it ends (or its with-block exits)."""
+
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start_us', 'tid', 'ended')
+
+    def __init__(self, tracer: 'Tracer', name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.tid = threading.get_ident()
+        self.ended = False
+        self.start_us = time.time_ns() // 1000
+
+    def set(self, **attrs: Any) -> None:
+        """Add or update span attributes (shown as args in the trace viewer)."""
+        self.args.update(attrs)
+
+    def end(self, **attrs: Any) -> None:
+        if self.ended:
+            return
+        self.ended = True
+        self.args.update(attrs)
+        self.tracer.record(self, time.time_ns() // 1000)
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.end()
+        return False
+
+
+class Tracer:
+    """Collects this process's spans and merges them into a trace file."""
+
+    def __init__(self, path: Path, process_name: str = 'harness'):
+        self.path = Path(path)
+        self.pid = os.getpid()
+        self.process_name = process_name
+        self.events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span, end_us: int) -> None:
+        event = {
+            'name': span.name,
+            'cat': span.cat,
+            'ph': 'X',
+            'ts': span.start_us,
+            'dur': max(end_us - span.start_us, 1),
+            'pid': self.pid,
+            'tid': span.tid,
+            'args': {k: v if isinstance(v, (str, int, float, bool)) or v is None else str(v)
+                     for k, v in span.args.items()}
+        }
+        with self._lock:
+            self.events.append(event)
+            if span.tid not in self._threads:
+                self._threads[span.tid] = threading.current_thread().name
+
+    def _metadata(self) -> List[Dict[str, Any]]:
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                   'args': {'name': f'{self.process_name} ({self.pid})'}}]
+        events += [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                   for tid, name in self._threads.items()]
+        return events
+
+    def flush(self) -> None:
+        """Merge buffered events into the trace file and clear the buffer."""
+        with self._lock:
+            if not self.events:
+                return
+            events = self._metadata() + self.events
+            self.events = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.path.with_name(self.path.name + '.lock')):
+            existing = []
+            if self.path.exists():
+                try:
+                    existing = json.loads(self.path.read_text()).get('traceEvents', [])
+                except (json.JSONDecodeError, AttributeError):
+                    existing = []
+            write_text_atomic(self.path, json.dumps({
+                'traceEvents': existing + events,
+                'displayTimeUnit': 'ms'
+            }) + '\n')
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(path: Path, reset: bool = True) -> Tracer:
+    """Start recording spans into path (reset=True truncates an existing trace)."""
+    global _tracer
+    if reset:
+        Path(path).unlink(missing_ok=True)
+    _tracer = Tracer(path, os.getenv('PYTEST_XDIST_WORKER', 'harness'))
+    return _tracer
+
+
+def disable() -> None:
+    """Flush and stop recording."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = None
+
+
+def flush() -> None:
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def span(name: str, cat: str = 'harness', **attrs: Any):
+    """Open a span (use as a context manager, or call .end()); a no-op when tracing is off."""
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, cat, attrs)
+
+
+if os.getenv(TRACE_ENV):
+    # The first process resets the file; child processes (pytest-xdist workers,
+    # background what-ifs) inherit the marker and append to the same trace
+    enable(Path(os.environ[TRACE_ENV]), reset=not os.getenv(_STARTED_ENV))
+    os.environ[_STARTED_ENV] = '1'
+    atexit.register(flush)
@@ -0,0 +1,119 @@
+"""Compaction of the customerIpRanges WAF allowlist before deployment.
+
+waf-policy.bicep puts customerIpRanges into IPMatch custom rules, one rule per
+MAX_MATCH_VALUES_PER_RULE entries. Customer-supplied lists often contain
+duplicates, single addresses already covered by a wider range, and adjacent
+ranges; compact_ip_ranges() collapses them into the minimal set of CIDRs that
+covers exactly the same addresses, so fewer values (and fewer rules) are
+deployed. The covered address space never changes.
+
+Usage:
+    python -m tests.unit.helpers.waf_ranges tests/fixtures/params.dev.json
+    python -m tests.unit.helpers.waf_ranges params.json --write
+"""
+import argparse
+import ipaddress
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Application Gateway WAF v2: match values per custom rule match condition
+MAX_MATCH_VALUES_PER_RULE = 600
+# Application Gateway WAF v2: custom rules per policy (one is Deny-All)
+MAX_CUSTOM_RULES = 100
+
+PARAM_NAME = 'customerIpRanges'
+
+
+@dataclass
+class CompactionResult:
+    """Outcome of compacting an IP range list."""
+    original_count: int
+    ranges: List[str] = field(default_factory=list)
+    chunks: List[List[str]] = field(default_factory=list)
+
+    @property
+    def saved(self) -> int:
+        return self.original_count - len(self.ranges)
+
+
+def compact_ip_ranges(ranges: Iterable[str], chunk_size: int = MAX_MATCH_VALUES_PER_RULE) -> CompactionResult:
+    """Collapse overlapping, adjacent and duplicate ranges into the minimal covering CIDR set.
+
+    Bare addresses are treated as /32 (/128); host bits are cleared. IPv4
+    ranges are listed before IPv6 ranges, each in address order.
+
+    Args:
+        ranges: CIDRs or bare IP addresses
+        chunk_size: Maximum values per WAF rule
+
+    Returns:
+        CompactionResult with the compacted ranges split into rule-sized chunks
+
+    Raises:
+        ValueError: If an entry is not an IP address or CIDR, or the chunks need
+            more custom rules than a policy allows
+    """
+    ranges = list(ranges)
+    v4, v6 = [], []
+    for entry in ranges:
+        try:
+            network = ipaddress.ip_network(str(entry).strip(), strict=False)
+        except ValueError as e:
+            raise ValueError(f"{PARAM_NAME}: '{entry}' is not an IP address or CIDR: {e}") from e
+        (v4 if network.version == 4 else v6).append(network)
+    compacted = [str(n) for n in ipaddress.collapse_addresses(v4)]
+    compacted += [str(n) for n in ipaddress.collapse_addresses(v6)]
+    chunks = [compacted[i:i + chunk_size] for i in range(0, len(compacted), chunk_size)]
+    if len(chunks) > MAX_CUSTOM_RULES - 1:
+        raise ValueError(
+            f"{PARAM_NAME}: {len(compacted)} ranges need {len(chunks)} allow rules "
+            f"(at most {MAX_CUSTOM_RULES - 1} fit next to Deny-All)"
+        )
+    return CompactionResult(len(ranges), compacted, chunks)
+
+
+def compact_params(parameters: Dict[str, Any]) -> Optional[CompactionResult]:
+    """Compact customerIpRanges in an ARM 'parameters' mapping in place.
+
+    Returns:
+        CompactionResult, or None if customerIpRanges is not set
+    """
+    entry = parameters.get(PARAM_NAME)
+    if not isinstance(entry, dict) or not isinstance(entry.get('value'), list):
+        return None
+    result = compact_ip_ranges(entry['value'])
+    parameters[PARAM_NAME] = {**entry, 'value': result.ranges}
+    return result
+
+
+def describe(result: CompactionResult) -> str:
+    return (f"{PARAM_NAME}: {result.original_count} -> {len(result.ranges)} ranges "
+            f"(saved {result.saved}, {len(result.chunks)} allow rule(s))")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('params_file', type=Path, help='ARM parameters file')
+    parser.add_argument('--write', action='store_true', help='rewrite the params file with the compacted ranges')
+    args = parser.parse_args(argv)
+
+    data = json.loads(args.params_file.read_text())
+    try:
+        result = compact_params(data.get('parameters', {}))
+    except ValueError as e:
+        print(f"ERROR {e}")
+        return 1
+    if result is None:
+        print(f"{PARAM_NAME} not set in {args.params_file}")
+        return 0
+    print(describe(result))
+    if args.write and result.saved:
+        args.params_file.write_text(json.dumps(data, indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,290 @@
+"""Watch iac/ and tests/unit/fixtures/ and re-validate only the wrappers an edit touches.
+
+On every save (debounced), the watcher works out which module wrappers
+(tests/unit/fixtures/test-*.bicep) reference the changed files, directly or
+through other modules. It builds them right away with run_bicep_build and
+queues a what-if for each wrapper that built in the background. A newer edit
+to the same wrapper cancels its queued or running what-if, so only the
+latest version of a wrapper is ever reported. main.bicep is rebuilt (never
+what-if'd) when it is affected.
+
+Files are polled (mtime and size), so no extra dependencies are needed.
+
+Usage:
+    python -m tests.unit.helpers.watch                 # build + what-if
+    python -m tests.unit.helpers.watch --no-what-if    # build only
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from tests.unit.helpers.test_utils import run_bicep_build, run_what_if
+from tests.unit.helpers.what_if_parser import parse_what_if_output, summarize
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+FIXTURES_DIR = REPO_ROOT / 'tests' / 'unit' / 'fixtures'
+MAIN_BICEP = REPO_ROOT / 'iac' / 'main.bicep'
+WATCH_DIRS = [REPO_ROOT / 'iac', FIXTURES_DIR]
+
+_MODULE_REF = re.compile(r"^\s*module\s+\w+\s+'([^']+)'", re.MULTILINE)
+
+
+def module_references(bicep_file: Path) -> Set[Path]:
+    """Local files referenced by `module x '<path>'` declarations (registry refs are skipped)."""
+    try:
+        text = Path(bicep_file).read_text()
+    except OSError:
+        return set()
+    return {
+        (Path(bicep_file).parent / ref).resolve()
+        for ref in _MODULE_REF.findall(text)
+        if ':' not in ref
+    }
+
+
+def reference_closure(root: Path) -> Set[Path]:
+    """root plus every file it references, transitively."""
+    seen: Set[Path] = set()
+    stack = [Path(root).resolve()]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        stack.extend(module_references(path) - seen)
+    return seen
+
+
+def wrapper_files(fixtures_dir: Path = FIXTURES_DIR) -> List[Path]:
+    return sorted(Path(fixtures_dir).glob('test-*.bicep'))
+
+
+def affected_roots(changed: Iterable[Path], roots: Iterable[Path]) -> List[Path]:
+    """Roots whose reference closure contains any changed file.
+
+    The graph is rebuilt on every call, so added or removed module references
+    are picked up by the next edit.
+    """
+    changed = {Path(p).resolve() for p in changed}
+    return [root for root in roots if reference_closure(root) & changed]
+
+
+class PollingWatcher:
+    """Detects changed *.bicep files under a set of directories by polling."""
+
+    def __init__(self, dirs: Iterable[Path], pattern: str = '*.bicep'):
+        self.dirs = [Path(d) for d in dirs]
+        self.pattern = pattern
+        self.state = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for directory in self.dirs:
+            for path in directory.rglob(self.pattern):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path.resolve()] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def scan(self) -> Set[Path]:
+        """Paths added, removed or modified since the previous scan."""
+        current = self._snapshot()
+        changed = {p for p in current.keys() | self.state.keys() if current.get(p) != self.state.get(p)}
+        self.state = current
+        return changed
+
+    def wait_for_batch(self, stop: threading.Event, poll_interval: float = 0.5, debounce: float = 0.3) -> Set[Path]:
+        """Block until something changes, then until nothing has changed for `debounce` seconds.
+
+        Returns an empty set if `stop` is set first.
+        """
+        batch: Set[Path] = set()
+        quiet_since = None
+        while not stop.is_set():
+            changed = self.scan()
+            if changed:
+                batch |= changed
+                quiet_since = time.monotonic()
+            elif batch and time.monotonic() - quiet_since >= debounce:
+                return batch
+            stop.wait(min(poll_interval, debounce) if batch else poll_interval)
+        return set()
+
+
+def what_if_command(wrapper: Path) -> List[str]:
+    return [sys.executable, '-m', 'tests.unit.helpers.watch', '--what-if', str(wrapper)]
+
+
+class WhatIfQueue:
+    """Background what-if runs, at most one current run per wrapper.
+
+    Each run is a child process so that a superseded run can actually be
+    stopped (the az call with it) instead of being left to finish.
+    """
+
+    def __init__(
+        self,
+        report: Callable[[str], None] = print,
+        max_workers: int = 4,
+        command: Callable[[Path], List[str]] = what_if_command
+    ):
+        self.report = report
+        self.command = command
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._generation: Dict[Path, int] = {}
+        self._running: Dict[Path, subprocess.Popen] = {}
+
+    def submit(self, wrapper: Path) -> None:
+        """Queue a what-if for wrapper, cancelling any earlier one."""
+        generation = self.cancel(wrapper)
+        self._pool.submit(self._run, wrapper, generation)
+
+    def cancel(self, wrapper: Path) -> int:
+        """Cancel the queued or running what-if for wrapper; returns the new generation."""
+        with self._lock:
+            generation = self._generation.get(wrapper, 0) + 1
+            self._generation[wrapper] = generation
+            proc = self._running.pop(wrapper, None)
+        if proc is not None and proc.poll() is None:
+            _terminate(proc)
+            self.report(f"what-if CANCELLED {wrapper.name} (superseded)")
+        return generation
+
+    def _run(self, wrapper: Path, generation: int) -> None:
+        with self._lock:
+            if self._generation.get(wrapper) != generation:
+                return
+            proc = subprocess.Popen(
+                self.command(wrapper),
+                cwd=REPO_ROOT,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                start_new_session=hasattr(os, 'killpg')
+            )
+            self._running[wrapper] = proc
+        output, _ = proc.communicate()
+        with self._lock:
+            if self._running.get(wrapper) is proc:
+                del self._running[wrapper]
+            if self._generation.get(wrapper) != generation:
+                return
+        status = 'OK' if proc.returncode == 0 else 'FAIL'
+        self.report(f"what-if {status} {wrapper.name}: {output.strip()}")
+
+    def shutdown(self, cancel: bool = True) -> None:
+        """Stop the queue; with cancel=False, let queued and running what-ifs finish first."""
+        if cancel:
+            with self._lock:
+                wrappers = list(self._generation)
+            for wrapper in wrappers:
+                self.cancel(wrapper)
+        self._pool.shutdown(wait=True)
+
+
+def _terminate(proc: subprocess.Popen) -> None:
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+    except ProcessLookupError:
+        pass
+
+
+def validate_batch(
+    changed: Set[Path],
+    queue: Optional[WhatIfQueue],
+    report: Callable[[str], None] = print,
+    fixtures_dir: Path = FIXTURES_DIR,
+    main_bicep: Path = MAIN_BICEP
+) -> List[Path]:
+    """Build every affected root now and queue what-if for wrappers that built.
+
+    Returns:
+        The affected roots (wrappers, then main.bicep if affected)
+    """
+    roots = affected_roots(changed, wrapper_files(fixtures_dir) + [Path(main_bicep)])
+    names = ', '.join(sorted(p.name for p in changed))
+    if not roots:
+        report(f"changed: {names} (no wrappers affected)")
+        return roots
+    report(f"changed: {names} -> {', '.join(r.name for r in roots)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(roots)))) as pool:
+        builds = list(pool.map(run_bicep_build, roots))
+    for root, (success, output) in zip(roots, builds):
+        if success:
+            report(f"build OK {root.name}")
+        else:
+            report(f"build FAIL {root.name}: {output.strip()}")
+        if queue is None or root == Path(main_bicep):
+            continue
+        if success:
+            queue.submit(root)
+        else:
+            queue.cancel(root)  # a what-if of the previous version is stale now
+    return roots
+
+
+def run_single_what_if(wrapper: Path) -> int:
+    """Child-process entry point: what-if one wrapper and print a one-line summary."""
+    success, output = run_what_if(wrapper, result_format='ResourceIdOnly')
+    if not success:
+        print(output.strip().splitlines()[0] if output.strip() else 'what-if failed')
+        return 1
+    parsed = parse_what_if_output(output)
+    print(json.dumps(summarize(parsed.get('changes', []))))
+    return 0
+
+
+def watch(what_if: bool = True, poll_interval: float = 0.5, debounce: float = 0.3,
+          stop: Optional[threading.Event] = None) -> None:
+    stop = stop or threading.Event()
+    watcher = PollingWatcher(WATCH_DIRS)
+    queue = WhatIfQueue() if what_if else None
+    print(f"Watching {', '.join(str(d.relative_to(REPO_ROOT)) for d in WATCH_DIRS)} (Ctrl+C to stop)")
+    try:
+        while not stop.is_set():
+            batch = watcher.wait_for_batch(stop, poll_interval, debounce)
+            if batch:
+                validate_batch(batch, queue)
+    finally:
+        if queue is not None:
+            queue.shutdown()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--no-what-if', action='store_true', help='only build affected wrappers')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between scans')
+    parser.add_argument('--debounce', type=float, default=0.3, help='quiet period before validating')
+    parser.add_argument('--what-if', type=Path, help=argparse.SUPPRESS)  # child process mode
+    args = parser.parse_args(argv)
+
+    if args.what_if:
+        return run_single_what_if(args.what_if)
+    try:
+        watch(not args.no_what_if, args.poll_interval, args.debounce)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
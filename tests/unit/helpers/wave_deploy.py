@@ -0,0 +1,533 @@
+"""Wave-parallel deployment of main.bicep, one ARM deployment per module.
+
+`az deployment group create --template-file main.bicep` deploys all modules as
+one deployment: a failure late in the run means deploying everything again.
+WaveDeployer instead:
+
+1. Parses main.bicep's modules, their params and dependsOn edges (plus
+   implicit `<module>.outputs` references) and groups them into waves; every
+   module in a wave depends only on modules in earlier waves
+2. Deploys each wave's modules as concurrent `az deployment group create`
+   calls (Incremental mode, so modules never delete each other's resources)
+3. Resolves module params from the params file, main.bicep's defaults and
+   vars, and the outputs of modules deployed in earlier waves
+4. Records every succeeded module and its outputs in a state file, so a
+   rerun after a failure resumes at the failed wave
+5. With incremental=True, skips modules whose compiled template and resolved
+   params match the deployment ledger (see deploy_ledger.py) and none of whose
+   dependencies were redeployed
+
+Module params are resolved in Python, so only the expression forms main.bicep
+uses are supported: literals, string interpolation, dotted references and
+resourceGroup()/subscription(). Vars that call other functions are
+implemented in COMPUTED_VARS.
+"""
+import json
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.az_errors import run_with_retry
+from tests.unit.helpers.deploy_ledger import DeploymentLedger, compile_template, params_hash, template_hash
+from tests.unit.helpers.durations import DurationDB, format_prediction, lpt_order, predict_makespan
+from tests.unit.helpers.result_broker import make_key, write_text_atomic
+from tests.unit.helpers.test_utils import extract_module_dependencies
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+MAIN_BICEP = REPO_ROOT / 'iac' / 'main.bicep'
+STATE_DIR = REPO_ROOT / 'tests' / 'e2e' / '.deploy-state'
+
+# Namespace ARM's guid() function uses for its name-based (v5) UUIDs
+ARM_GUID_NAMESPACE = uuid.UUID('11fb06fb-712d-4ddd-98c7-e71bbd588830')
+
+_MODULE_RE = re.compile(r"^module\s+(\w+)\s+'([^']+)'\s*=\s*{(.*?)\n}", re.S | re.M)
+_DEPLOYMENT_NAME_RE = re.compile(r"^\s*name:\s*'([^']+)'", re.M)
+_PARAMS_BLOCK_RE = re.compile(r"^\s*params:\s*{\n(.*?)\n\s*}", re.S | re.M)
+_PARAM_LINE_RE = re.compile(r"^\s*(\w+):\s*(.+?)\s*$", re.M)
+_OUTPUT_REF_RE = re.compile(r"\b(\w+)\.outputs\b")
+_TEMPLATE_PARAM_RE = re.compile(r"^param\s+(\w+)\s+\w+(?:\s*=\s*(.+?))?\s*$", re.M)
+_TEMPLATE_VAR_RE = re.compile(r"^var\s+(\w+)\s*=\s*(.+?)\s*$", re.M)
+_REFERENCE_RE = re.compile(r"^(resourceGroup\(\)|subscription\(\)|[A-Za-z_]\w*)((?:\.\w+)*)$")
+
+
+@dataclass
+class ModuleSpec:
+    """One module declaration in main.bicep."""
+    symbol: str
+    path: str
+    deployment_name: str
+    params: Dict[str, str]
+    depends_on: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class ModuleResult:
+    """Outcome of deploying (or resuming) one module."""
+    module: str
+    success: bool
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    error: str = ''
+    duration: float = 0.0
+    resumed: bool = False
+    unchanged: bool = False
+
+
+@dataclass
+class WaveRunResult:
+    """Outcome of a WaveDeployer run."""
+    waves: List[List[str]]
+    results: Dict[str, ModuleResult]
+
+    @property
+    def success(self) -> bool:
+        return all(self.results.get(m, ModuleResult(m, False)).success for wave in self.waves for m in wave)
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, result in self.results.items() if not result.success]
+
+    @property
+    def deployed(self) -> List[str]:
+        """Modules deployed in this run (not resumed or skipped as unchanged)."""
+        return [name for name, r in self.results.items() if r.success and not (r.resumed or r.unchanged)]
+
+
+def arm_guid(*values: str) -> str:
+    """Deterministic GUID from strings, computed the way ARM's guid() is."""
+    return str(uuid.uuid5(ARM_GUID_NAMESPACE, '-'.join(values)))
+
+
+def parse_modules(bicep_text: str) -> Dict[str, ModuleSpec]:
+    """Parse module declarations (path, deployment name, params, dependencies).
+
+    Dependencies are the explicit dependsOn entries plus any module whose
+    outputs a param references; references to non-module symbols are dropped.
+    """
+    explicit = extract_module_dependencies(bicep_text)
+    modules = {}
+    for symbol, path, body in _MODULE_RE.findall(bicep_text):
+        name_match = _DEPLOYMENT_NAME_RE.search(body)
+        params_match = _PARAMS_BLOCK_RE.search(body)
+        params = dict(_PARAM_LINE_RE.findall(params_match.group(1))) if params_match else {}
+        implicit = {ref for expr in params.values() for ref in _OUTPUT_REF_RE.findall(expr)}
+        modules[symbol] = ModuleSpec(
+            symbol=symbol,
+            path=path,
+            deployment_name=name_match.group(1) if name_match else symbol,
+            params=params,
+            depends_on=explicit.get(symbol, set()) | implicit
+        )
+    for spec in modules.values():
+        spec.depends_on &= set(modules)
+    return modules
+
+
+def plan_waves(modules: Dict[str, ModuleSpec]) -> List[List[str]]:
+    """Group modules into dependency waves (each wave depends only on earlier ones).
+
+    Raises:
+        ValueError: If the dependencies contain a cycle
+    """
+    remaining = {name: set(spec.depends_on) for name, spec in modules.items()}
+    waves = []
+    while remaining:
+        wave = sorted(name for name, deps in remaining.items() if not deps)
+        if not wave:
+            raise ValueError(f"Dependency cycle between modules: {', '.join(sorted(remaining))}")
+        waves.append(wave)
+        for name in wave:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(wave)
+    return waves
+
+
+def _empty(value: Any) -> bool:
+    return value is None or value == '' or value == {} or value == []
+
+
+def _effective_tags(scope: 'TemplateScope') -> Dict[str, Any]:
+    tag_params = ('environment', 'owner', 'purpose', 'created')
+    values = {name: scope.value(name) for name in tag_params}
+    if all(_empty(v) for v in values.values()):
+        return scope.value('defaultTags')
+    tags = {name: v for name, v in values.items() if not _empty(v)}
+    if not _empty(scope.value('contactEmail')):
+        tags['contactEmail'] = scope.value('contactEmail')
+    return tags
+
+
+def _generated_password(param: str, purpose: str) -> Callable[['TemplateScope'], str]:
+    def compute(scope: 'TemplateScope') -> str:
+        provided = scope.value(param)
+        if not _empty(provided):
+            return provided
+        return arm_guid(scope.value('subscription()')['id'], scope.value('kvId'), purpose)
+    return compute
+
+
+# main.bicep vars whose expressions call functions the resolver does not evaluate
+COMPUTED_VARS: Dict[str, Callable[['TemplateScope'], Any]] = {
+    'deployerInfo': lambda scope: scope.deployer,
+    'effectiveTags': _effective_tags,
+    'vmAdminPasswordValue': _generated_password('vmAdminPassword', 'vm-admin-password'),
+    'psqlAdminPasswordValue': _generated_password('psqlAdminPassword', 'psql-admin-password'),
+    'deployerPrincipalType': lambda scope: (
+        'ServicePrincipal' if _empty(scope.deployer.get('userPrincipalName')) else 'User'),
+}
+
+
+class TemplateScope:
+    """Resolves main.bicep expressions against params, vars and module outputs."""
+
+    def __init__(
+        self,
+        bicep_text: str,
+        params: Dict[str, Any],
+        outputs: Dict[str, Dict[str, Any]],
+        resource_group: str,
+        location: str,
+        subscription_id: str,
+        deployer: Dict[str, Any],
+        modules: Optional[Set[str]] = None
+    ):
+        self.params = params
+        self.outputs = outputs
+        self.deployer = deployer
+        self.modules = modules if modules is not None else set(parse_modules(bicep_text))
+        self.defaults = {name: default for name, default in _TEMPLATE_PARAM_RE.findall(bicep_text) if default}
+        self.vars = dict(_TEMPLATE_VAR_RE.findall(bicep_text))
+        self.builtins = {
+            'resourceGroup()': {'name': resource_group, 'location': location},
+            'subscription()': {
+                'id': f'/subscriptions/{subscription_id}',
+                'subscriptionId': subscription_id
+            }
+        }
+        self._cache: Dict[str, Any] = {}
+
+    def value(self, name: str) -> Any:
+        """Value of a param, var, builtin function or module symbol."""
+        if name in self.builtins:
+            return self.builtins[name]
+        if name in self.modules:
+            if name not in self.outputs:
+                raise KeyError(f"Outputs of module '{name}' are not available yet")
+            return {'outputs': self.outputs[name]}
+        if name in self.params:
+            return self.params[name]
+        if name not in self._cache:
+            if name in self.defaults:
+                self._cache[name] = self.resolve(self.defaults[name])
+            elif name in COMPUTED_VARS:
+                self._cache[name] = COMPUTED_VARS[name](self)
+            elif name in self.vars:
+                self._cache[name] = self.resolve(self.vars[name])
+            else:
+                raise KeyError(f"Unknown symbol '{name}' (not a param, var or module)")
+        return self._cache[name]
+
+    def resolve(self, expr: str) -> Any:
+        """Evaluate a Bicep expression.
+
+        Raises:
+            ValueError: For expression forms the resolver does not support
+            KeyError: For unknown symbols or outputs that are not available yet
+        """
+        expr = expr.strip()
+        if expr.startswith("'") and expr.endswith("'") and len(expr) >= 2:
+            return re.sub(r"\$\{([^}]+)\}", lambda m: str(self.resolve(m.group(1))), expr[1:-1])
+        if re.fullmatch(r"-?\d+", expr):
+            return int(expr)
+        if expr in ('true', 'false'):
+            return expr == 'true'
+        if expr in ('{}', '[]'):
+            return {} if expr == '{}' else []
+        match = _REFERENCE_RE.match(expr)
+        if not match:
+            raise ValueError(f"Unsupported expression: {expr}")
+        value = self.value(match.group(1))
+        for key in filter(None, match.group(2).split('.')):
+            value = value[key]
+        return value
+
+
+def load_parameter_values(params_file: Path) -> Dict[str, Any]:
+    """Read {name: value} from an ARM parameters file."""
+    data = json.loads(Path(params_file).read_text())
+    return {name: entry.get('value') for name, entry in data.get('parameters', {}).items()}
+
+
+class WaveDeployer:
+    """Deploy main.bicep module by module, wave by wave, resuming after failures."""
+
+    def __init__(
+        self,
+        resource_group: str,
+        params_file: Path,
+        main_bicep: Path = MAIN_BICEP,
+        state_file: Optional[Path] = None,
+        max_workers: int = 8,
+        location: Optional[str] = None,
+        subscription_id: Optional[str] = None,
+        deployer: Optional[Dict[str, Any]] = None,
+        incremental: bool = False,
+        ledger_file: Optional[Path] = None,
+        durations: Optional[DurationDB] = None
+    ):
+        """
+        Args:
+            resource_group: Target resource group
+            params_file: ARM parameters file for main.bicep
+            main_bicep: Template whose modules are deployed
+            state_file: Resume state (default: tests/e2e/.deploy-state/<rg>.json)
+            max_workers: Maximum concurrent deployments within a wave
+            location: resourceGroup().location (looked up with az if None)
+            subscription_id: subscription().subscriptionId (looked up with az if None)
+            deployer: az.deployer() result, {'objectId', 'userPrincipalName'} (looked up with az if None)
+            incremental: Skip modules whose template and params hashes match the deployment ledger
+            ledger_file: Ledger path (default: tests/e2e/.deploy-state/<rg>.ledger.json)
+            durations: Duration history; when given, each wave is dispatched
+                longest-expected-first, the completion time is predicted up
+                front and observed deployment durations are recorded
+        """
+        self.resource_group = resource_group
+        self.params_file = Path(params_file)
+        self.main_bicep = Path(main_bicep)
+        self.state_file = Path(state_file) if state_file else STATE_DIR / f'{resource_group}.json'
+        self.max_workers = max_workers
+        self.location = location
+        self.subscription_id = subscription_id
+        self.deployer = deployer
+        self.incremental = incremental
+        self.ledger_file = ledger_file
+        self.ledger: Optional[DeploymentLedger] = None
+        self.durations = durations
+        self.bicep_text = self.main_bicep.read_text()
+        self.modules = parse_modules(self.bicep_text)
+        self.waves = plan_waves(self.modules)
+        self.params = load_parameter_values(self.params_file)
+        self.run_key = make_key('wave-deploy', self.main_bicep, json.dumps(self.params, sort_keys=True))
+        self._state_lock = threading.Lock()
+
+    def _az_json(self, cmd: List[str]) -> tuple[bool, Any]:
+        try:
+            result = az_run(cmd, capture_output=True, text=True, check=True)
+            return True, json.loads(result.stdout)
+        except subprocess.CalledProcessError as e:
+            return False, getattr(e, 'stderr', None) or str(e)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+
+    def load_context(self) -> tuple[bool, str]:
+        """Look up location, subscription and deployer identity not passed in."""
+        if self.location is None:
+            ok, group = self._az_json(['az', 'group', 'show', '--name', self.resource_group, '--output', 'json'])
+            if not ok:
+                return False, group
+            self.location = group['location']
+        if self.subscription_id is None or self.deployer is None:
+            ok, account = self._az_json(['az', 'account', 'show', '--output', 'json'])
+            if not ok:
+                return False, account
+            self.subscription_id = self.subscription_id or account['id']
+            if self.deployer is None:
+                ok, deployer = self._deployer_identity(account.get('user', {}))
+                if not ok:
+                    return False, deployer
+                self.deployer = deployer
+        return True, ''
+
+    def _deployer_identity(self, user: Dict[str, Any]) -> tuple[bool, Any]:
+        """deployer() for the logged-in account (as ARM reports it: no userPrincipalName for service principals)."""
+        if user.get('type') == 'servicePrincipal':
+            # user.name is the application (client) ID
+            ok, principal = self._az_json(['az', 'ad', 'sp', 'show', '--id', user.get('name', ''), '--output', 'json'])
+            if not ok:
+                return False, principal
+            return True, {'objectId': principal['id'], 'userPrincipalName': ''}
+        ok, signed_in = self._az_json(['az', 'ad', 'signed-in-user', 'show', '--output', 'json'])
+        if not ok:
+            return False, signed_in
+        return True, {'objectId': signed_in['id'], 'userPrincipalName': signed_in.get('userPrincipalName', user.get('name', ''))}
+
+    def load_state(self) -> tuple[Dict[str, Dict[str, Any]], Set[str]]:
+        """Return state of an unfinished run with the same inputs.
+
+        Returns:
+            Tuple of ({module: outputs} for completed modules, modules it actually deployed)
+        """
+        if not self.state_file.exists():
+            return {}, set()
+        state = json.loads(self.state_file.read_text())
+        if state.get('run_key') != self.run_key or state.get('status') == 'succeeded':
+            return {}, set()
+        return state.get('completed', {}), set(state.get('deployed', []))
+
+    def _save_state(self, completed: Dict[str, Dict[str, Any]], deployed: Set[str], status: str) -> None:
+        with self._state_lock:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self.state_file, json.dumps({
+                'run_key': self.run_key,
+                'resource_group': self.resource_group,
+                'status': status,
+                'completed': completed,
+                'deployed': sorted(deployed)
+            }, indent=2, sort_keys=True) + '\n')
+
+    def _scope(self, outputs: Dict[str, Dict[str, Any]]) -> TemplateScope:
+        return TemplateScope(
+            self.bicep_text, self.params, outputs, self.resource_group,
+            self.location, self.subscription_id, self.deployer, set(self.modules)
+        )
+
+    def resolve_params(self, module: str, outputs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Resolve a module's params given the outputs of already deployed modules."""
+        scope = self._scope(outputs)
+        return {name: scope.resolve(expr) for name, expr in self.modules[module].params.items()}
+
+    def deploy_module(self, module: str, params: Dict[str, Any]) -> tuple[bool, str]:
+        """Run one module deployment (Incremental mode).
+
+        Returns:
+            Tuple of (success: bool, output: str) - deployment JSON or error
+        """
+        spec = self.modules[module]
+        template = (self.main_bicep.parent / spec.path).resolve()
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as params_file:
+            json.dump({
+                '$schema': 'https://schema.management.azure.com/schemas/2019-04-01/deploymentParameters.json#',
+                'contentVersion': '1.0.0.0',
+                'parameters': {name: {'value': value} for name, value in params.items()}
+            }, params_file, indent=2)
+        try:
+            result = az_run(
+                [
+                    'az', 'deployment', 'group', 'create',
+                    '--name', spec.deployment_name,
+                    '--resource-group', self.resource_group,
+                    '--template-file', str(template),
+                    '--parameters', f'@{params_file.name}',
+                    '--mode', 'Incremental',
+                    '--output', 'json'
+                ],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            return True, result.stdout
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr or e.stdout or str(e)
+        except FileNotFoundError:
+            return False, "Azure CLI not found. Please install Azure CLI."
+        finally:
+            Path(params_file.name).unlink(missing_ok=True)
+
+    def _run_module(self, module: str, outputs: Dict[str, Dict[str, Any]], force: bool = False) -> ModuleResult:
+        start = time.perf_counter()
+        try:
+            params = self.resolve_params(module, outputs)
+        except (KeyError, ValueError) as e:
+            return ModuleResult(module, False, error=f"Cannot resolve params: {e}")
+        hashes = None
+        if self.ledger is not None:
+            success, compiled = compile_template((self.main_bicep.parent / self.modules[module].path).resolve())
+            if not success:
+                return ModuleResult(module, False, error=f"Cannot compile template: {compiled}")
+            hashes = (template_hash(compiled), params_hash(params))
+            if not force and self.ledger.is_current(module, *hashes):
+                return ModuleResult(module, True, outputs=self.ledger.outputs(module), unchanged=True,
+                                    duration=time.perf_counter() - start)
+        success, output = run_with_retry(lambda: self.deploy_module(module, params))
+        duration = time.perf_counter() - start
+        if not success:
+            return ModuleResult(module, False, error=output, duration=duration)
+        try:
+            deployment = json.loads(output)
+        except json.JSONDecodeError:
+            return ModuleResult(module, False, error=f"Unparseable deployment output: {output[:500]}", duration=duration)
+        props = deployment.get('properties', {})
+        if props.get('provisioningState', 'Succeeded') != 'Succeeded':
+            return ModuleResult(module, False, error=json.dumps(props.get('error', props.get('provisioningState'))),
+                                duration=duration)
+        module_outputs = {name: entry.get('value') for name, entry in (props.get('outputs') or {}).items()}
+        if hashes is not None:
+            self.ledger.record(module, *hashes, module_outputs)
+        return ModuleResult(module, True, outputs=module_outputs, duration=duration)
+
+    def _estimates(self, modules: List[str]) -> Dict[str, float]:
+        """Expected deployment seconds per module symbol (history is keyed by deployment name)."""
+        by_name = self.durations.estimates('deploy', [self.modules[m].deployment_name for m in modules], self.location)
+        return {m: by_name[self.modules[m].deployment_name] for m in modules}
+
+    def _dispatch_order(self, pending: List[str]) -> List[str]:
+        if self.durations is None or not pending:
+            return pending
+        return lpt_order(self._estimates(pending))
+
+    def _print_prediction(self, completed: Dict[str, Dict[str, Any]]) -> None:
+        waves = [[m for m in wave if m not in completed] for wave in self.waves]
+        waves = [wave for wave in waves if wave]
+        if not waves or not self.durations.has_data('deploy'):
+            return
+        estimates = self._estimates([m for wave in waves for m in wave])
+        makespan = sum(
+            predict_makespan({m: estimates[m] for m in wave}, min(self.max_workers, len(wave))) for wave in waves
+        )
+        print(format_prediction('deployment', estimates, self.max_workers, makespan))
+
+    def run(self) -> WaveRunResult:
+        """Deploy all waves, stopping after the first wave with a failed module.
+
+        Modules recorded as completed by a previous unfinished run with the same
+        template and params are not deployed again; their recorded outputs are reused.
+        With incremental=True, modules matching the ledger are skipped the same way
+        unless a dependency was deployed in this run.
+        """
+        results: Dict[str, ModuleResult] = {}
+        ok, error = self.load_context()
+        if not ok:
+            first = self.waves[0][0] if self.waves else ''
+            return WaveRunResult(self.waves, {first: ModuleResult(first, False, error=error)})
+        if self.incremental:
+            self.ledger = DeploymentLedger(self.resource_group, self.subscription_id, self.ledger_file)
+
+        completed, deployed = self.load_state()
+        if self.durations is not None:
+            self._print_prediction(completed)
+        for wave_index, wave in enumerate(self.waves):
+            pending = self._dispatch_order([m for m in wave if m not in completed])
+            for module in wave:
+                if module in completed:
+                    results[module] = ModuleResult(module, True, outputs=completed[module], resumed=True)
+            if not pending:
+                continue
+            print(f"Wave {wave_index + 1}/{len(self.waves)}: {', '.join(pending)}")
+            snapshot = dict(completed)
+            forced = {m: bool(self.modules[m].depends_on & deployed) for m in pending}
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                for result in pool.map(lambda m: self._run_module(m, snapshot, forced[m]), pending):
+                    results[result.module] = result
+                    if result.success:
+                        completed[result.module] = result.outputs
+                        if not result.unchanged:
+                            deployed.add(result.module)
+                            if self.durations is not None:
+                                self.durations.record('deploy', self.modules[result.module].deployment_name,
+                                                      self.location, result.duration)
+                        self._save_state(completed, deployed, 'running')
+            failed = [m for m in pending if not results[m].success]
+            if failed:
+                self._save_state(completed, deployed, 'failed')
+                print(f"Wave {wave_index + 1} failed ({', '.join(failed)}); rerun to resume from this wave")
+                return WaveRunResult(self.waves, results)
+        self._save_state(completed, deployed, 'succeeded')
+        return WaveRunResult(self.waves, results)
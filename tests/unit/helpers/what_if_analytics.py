@@ -0,0 +1,195 @@
+"""Columnar drift analytics over many stored what-if outputs.
+
+Loads parsed what-if results (see what_if_parser.parse_what_if_output) into
+dictionary-encoded integer columns (array('l') per column, one shared string
+dictionary per column). That keeps a corpus of thousands of runs compact:
+a row costs a few machine integers instead of a dict of strings.
+
+The aggregates are plain Python: each is one pass over the zipped columns
+into a Counter keyed by small integer tuples, decoded to strings only per
+distinct group at the end. There is no vectorization (no numpy), so a query
+costs a Python-level loop over every row it reads.
+"""
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Tuple, Union
+
+from tests.unit.helpers.what_if_parser import (
+    parse_what_if_output,
+    flatten_delta,
+    get_resource_type,
+    summarize
+)
+
+# Columns that aggregates can be grouped by
+GROUP_COLUMNS = ('resource_type', 'region', 'source')
+
+
+class _Dictionary:
+    """Interns string values to dense integer codes."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+
+class WhatIfCorpus:
+    """Columnar store of resource changes and leaf property changes.
+
+    One row per resource change (resource type, region, change type, source)
+    and one row per leaf delta entry (owning resource row, property path,
+    property change type). All string columns are dictionary-encoded.
+    Queries loop over the rows in Python (see the module docstring).
+    """
+
+    def __init__(self):
+        self._dicts = {name: _Dictionary() for name in ('resource_type', 'region', 'source', 'change_type', 'path')}
+        # Resource change columns
+        self.resource_type = array('l')
+        self.region = array('l')
+        self.source = array('l')
+        self.change_type = array('l')
+        # Property change columns (row -> resource change row)
+        self.path_row = array('l')
+        self.path = array('l')
+        self.path_change_type = array('l')
+        self.results_loaded = 0
+
+    def __len__(self) -> int:
+        return len(self.change_type)
+
+    def add_result(self, what_if: Union[str, Dict[str, Any]], source: str = '', region: str = '') -> int:
+        """Add one what-if result to the corpus.
+
+        Args:
+            what_if: Raw what-if JSON string or output of parse_what_if_output
+            source: Label for the result (e.g. file name or tenant)
+            region: Fallback region when a resource payload has no 'location'
+
+        Returns:
+            Number of resource changes added
+        """
+        parsed = parse_what_if_output(what_if) if isinstance(what_if, str) else what_if
+        resource_changes = parsed.get('resource_changes', [])
+        source_code = self._dicts['source'].encode(source)
+        for change in resource_changes:
+            row = len(self.change_type)
+            payload = change.get('after') or change.get('before') or {}
+            location = payload.get('location') or region or 'unknown'
+            self.resource_type.append(self._dicts['resource_type'].encode(get_resource_type(change.get('resource_id', ''))))
+            self.region.append(self._dicts['region'].encode(location.lower().replace(' ', '')))
+            self.source.append(source_code)
+            self.change_type.append(self._dicts['change_type'].encode(change.get('change_type') or 'Unknown'))
+            for prop in flatten_delta(change.get('delta', [])):
+                self.path_row.append(row)
+                self.path.append(self._dicts['path'].encode(prop['path']))
+                self.path_change_type.append(self._dicts['change_type'].encode(prop['change_type'] or 'Unknown'))
+        self.results_loaded += 1
+        return len(resource_changes)
+
+    def change_type_counts(self, by: Tuple[str, ...] = ()) -> Dict[Tuple[str, ...], Dict[str, int]]:
+        """Count resource changes by change type, optionally grouped.
+
+        One Counter pass over the resource change rows.
+
+        Args:
+            by: Columns to group by (subset of GROUP_COLUMNS)
+
+        Returns:
+            Mapping of group key tuple to a summarize()-shaped dict
+        """
+        _check_columns(by)
+        columns = [getattr(self, col) for col in by] + [self.change_type]
+        counts = Counter(zip(*columns))
+        decode = self._dicts['change_type'].decode
+        result: Dict[Tuple[str, ...], Dict[str, int]] = {}
+        for codes, count in counts.items():
+            key = tuple(self._dicts[col].decode(code) for col, code in zip(by, codes[:-1]))
+            summary = result.setdefault(key, summarize([]))
+            change_type = decode(codes[-1])
+            summary[change_type] = summary.get(change_type, 0) + count
+        return result
+
+    def top_drift_paths(
+        self,
+        n: int = 10,
+        by: Tuple[str, ...] = (),
+        change_types: Optional[Iterable[str]] = None
+    ) -> List[Tuple[Tuple[str, ...], str, int]]:
+        """Return the property paths that change most often.
+
+        One Counter pass over the property change rows, then a sort per group.
+
+        Args:
+            n: Number of entries to return (per group when 'by' is set)
+            by: Columns to group by (subset of GROUP_COLUMNS)
+            change_types: Property change types to count (default: all except NoEffect)
+
+        Returns:
+            List of (group key, property path, count), most frequent first
+        """
+        _check_columns(by)
+        change_dict = self._dicts['change_type']
+        if change_types is None:
+            wanted = {code for value, code in change_dict.codes.items() if value != 'NoEffect'}
+        else:
+            wanted = {change_dict.codes[value] for value in change_types if value in change_dict.codes}
+        group_cols = [getattr(self, col) for col in by]
+        counts = Counter(
+            (tuple(col[row] for col in group_cols), path)
+            for row, path, change_type in zip(self.path_row, self.path, self.path_change_type)
+            if change_type in wanted
+        )
+        per_group: Dict[Tuple[str, ...], List[Tuple[str, int]]] = {}
+        for (codes, path), count in counts.items():
+            key = tuple(self._dicts[col].decode(code) for col, code in zip(by, codes))
+            per_group.setdefault(key, []).append((self._dicts['path'].decode(path), count))
+        ranked = []
+        for key in sorted(per_group):
+            entries = sorted(per_group[key], key=lambda item: (-item[1], item[0]))[:n]
+            ranked.extend((key, path, count) for path, count in entries)
+        return ranked
+
+    def values(self, column: str) -> List[str]:
+        """Return the distinct values seen in a dictionary-encoded column."""
+        return list(self._dicts[column].values)
+
+
+def _check_columns(by: Tuple[str, ...]) -> None:
+    unknown = [col for col in by if col not in GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown group column(s): {unknown}. Expected any of {GROUP_COLUMNS}")
+
+
+def load_corpus(paths: Iterable[Path], region: str = '') -> WhatIfCorpus:
+    """Load stored what-if output files into a WhatIfCorpus.
+
+    Files that are not valid what-if JSON are skipped.
+
+    Args:
+        paths: What-if output files (e.g. saved what-if-output.json files)
+        region: Fallback region for resources without a 'location'
+
+    Returns:
+        Populated WhatIfCorpus
+    """
+    corpus = WhatIfCorpus()
+    for path in paths:
+        path = Path(path)
+        parsed = parse_what_if_output(path.read_text())
+        if parsed.get('error') == 'Invalid JSON output':
+            continue
+        corpus.add_result(parsed, source=path.name, region=region)
+    return corpus
@@ -2,20 +2,23 @@
 import json
 from typing import Dict, List, Any, Optional
 
+from tests.unit.helpers.tracing import span
+
 
 def parse_what_if_output(what_if_json: str) -> Dict[str, Any]:
     """Parse Azure what-if JSON output into structured data."""
-    try:
-        data = json.loads(what_if_json)
-        return {
-            'status': data.get('status', 'Unknown'),
-            'changes': data.get('changes', []),
-            'resource_changes': _extract_resource_changes(data.get('changes', [])),
-            'error': data.get('error'),
-            'properties': data.get('properties', {})
-        }
-    except json.JSONDecodeError:
-        return {'error': 'Invalid JSON output', 'raw': what_if_json}
+    with span('parse_what_if', payload_bytes=len(what_if_json or '')):
+        try:
+            data = json.loads(what_if_json)
+            return {
+                'status': data.get('status', 'Unknown'),
+                'changes': data.get('changes', []),
+                'resource_changes': _extract_resource_changes(data.get('changes', [])),
+                'error': data.get('error'),
+                'properties': data.get('properties', {})
+            }
+        except json.JSONDecodeError:
+            return {'error': 'Invalid JSON output', 'raw': what_if_json}
 
 
 def _extract_resource_changes(changes: List[Dict]) -> List[Dict[str, Any]]:
@@ -33,6 +36,60 @@ def _extract_resource_changes(changes: List[Dict]) -> List[Dict[str, Any]]:
     return resource_changes
 
 
+def summarize(changes: List[Dict]) -> Dict[str, int]:
+    """Summarize what-if changes by change type."""
+    summary = {"Create": 0, "Modify": 0, "Delete": 0, "NoChange": 0}
+    for change in changes:
+        change_type = change.get("changeType", "Unknown")
+        summary[change_type] = summary.get(change_type, 0) + 1
+    return summary
+
+
+def flatten_delta(delta: List[Dict], prefix: str = '') -> List[Dict[str, Any]]:
+    """Flatten a nested what-if delta tree into leaf property changes.
+    
+    Modify and Array entries carry their own changes in 'children'; only the
+    leaves are returned, each with the full dotted property path.
+    
+    Args:
+        delta: 'delta' list from a what-if resource change
+        prefix: Path of the parent entry (used for recursion)
+    
+    Returns:
+        List of dicts with keys: 'path', 'change_type', 'before', 'after'
+    """
+    flattened = []
+    for entry in delta or []:
+        path = str(entry.get('path', ''))
+        full_path = f"{prefix}.{path}" if prefix and path else (prefix or path)
+        children = entry.get('children')
+        if children:
+            flattened.extend(flatten_delta(children, full_path))
+        else:
+            flattened.append({
+                'path': full_path,
+                'change_type': entry.get('propertyChangeType'),  # Create, Delete, Modify, Array, NoEffect
+                'before': entry.get('before'),
+                'after': entry.get('after')
+            })
+    return flattened
+
+
+def get_resource_type(resource_id: str) -> str:
+    """Derive the full resource type (e.g. 'Microsoft.Network/virtualNetworks/subnets') from a resource ID."""
+    segments = [s for s in (resource_id or '').split('/') if s]
+    lowered = [s.lower() for s in segments]
+    if 'providers' not in lowered:
+        return 'Unknown'
+    # Use the last provider segment so extension resources resolve to their own type
+    idx = len(lowered) - 1 - lowered[::-1].index('providers')
+    tail = segments[idx + 1:]
+    if len(tail) < 3:
+        return 'Unknown'
+    namespace, type_segments = tail[0], tail[1::2]
+    return '/'.join([namespace] + type_segments)
+
+
 def validate_resource_created(resource_changes: List[Dict], resource_type: str, name_pattern: str) -> bool:
     """Check if a resource of given type would be created."""
     for change in resource_changes:
@@ -0,0 +1,196 @@
+"""Tests for the cross-process ARM rate limiter (virtual clock and fake az, no Azure needed)."""
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers import arm_rate
+from tests.unit.helpers.arm_rate import (
+    READ, WHAT_IF, WRITE, RateLimiter, operation_class, split_debug_output, subscription_of)
+from tests.unit.helpers.az_cassette import az_run
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.test_utils import get_subscription_id_from_shared_params
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+LIMITS = {READ: (10.0, 5.0), WRITE: (2.0, 2.0), WHAT_IF: (1.0, 1.0)}
+SHOW = ['az', 'group', 'show', '--name', 'rg', '--subscription', 'sub']
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+def make_limiter(tmp_path, clock):
+    return RateLimiter(root=tmp_path / 'rate', limits=LIMITS, clock=clock, sleep=clock.sleep)
+
+
+def test_operation_class():
+    assert operation_class(['az', 'deployment', 'group', 'what-if', '--template-file', 'main.bicep']) == WHAT_IF
+    assert operation_class(['az', 'group', 'delete', '--name', 'rg', '--yes']) == WRITE
+    assert operation_class(['az', 'role', 'assignment', 'create', '--role', 'Reader']) == WRITE
+    assert operation_class(['az', 'vm', 'list-skus', '--location', 'eastasia']) == READ
+    assert operation_class(['az', 'account', 'list-locations']) == READ
+    for local in (['az', 'bicep', 'build', '--file', 'main.bicep'], ['az', 'account', 'show'], ['az', 'version']):
+        assert operation_class(local) is None
+
+
+def test_subscription_defaults_to_shared_params(monkeypatch):
+    monkeypatch.delenv('AZURE_SUBSCRIPTION_ID', raising=False)
+    monkeypatch.setattr(arm_rate, '_default_subscription', None)
+    monkeypatch.setenv('PATH', '/nonexistent')
+
+    assert subscription_of(['az', 'group', 'show', '--name', 'rg']) == get_subscription_id_from_shared_params()
+    assert subscription_of(['az', 'graph', 'query', '-q', 'Resources', '--subscriptions', 'sub']) == 'sub'
+    monkeypatch.setenv('AZURE_SUBSCRIPTION_ID', 'env-sub')
+    assert subscription_of(['az', 'group', 'show', '--name', 'rg']) == 'env-sub'
+
+
+def test_bucket_spends_burst_then_paces_each_class(tmp_path):
+    clock = Clock()
+    limiter = make_limiter(tmp_path, clock)
+
+    for _ in range(5):
+        limiter.acquire(SHOW)
+    assert clock.sleeps == []
+    # Empty: each further read waits 1/rate after the previous one
+    limiter.acquire(SHOW)
+    limiter.acquire(SHOW)
+    assert clock.sleeps == [0.1, 0.1]
+    # Other classes and subscriptions have their own buckets; local commands are free
+    assert limiter.acquire(['az', 'group', 'create', '--name', 'rg', '--subscription', 'sub']) == 0
+    assert limiter.acquire(['az', 'group', 'show', '--name', 'rg', '--subscription', 'other']) == 0
+    assert limiter.acquire(['az', 'bicep', 'build', '--file', 'main.bicep']) == 0
+
+
+def test_throttling_halves_rate_and_honours_retry_after(tmp_path):
+    clock = Clock()
+    limiter = make_limiter(tmp_path, clock)
+
+    limiter.feedback(SHOW, 1, "ERROR: (TooManyRequests) Too many requests. Retry after 7 seconds.")
+    bucket = limiter.state('sub', READ)
+    assert bucket.rate == 5.0 and bucket.paused_until == 1007.0
+    assert limiter.acquire(SHOW) == 7.0
+
+    # Successes add the rate back a step at a time, never above the configured rate
+    limiter.feedback(SHOW, 0, '{}')
+    assert limiter.state('sub', READ).rate == 5.5
+    for _ in range(20):
+        limiter.feedback(SHOW, 0, '{}')
+    assert limiter.state('sub', READ).rate == 10.0
+
+
+
+def test_remaining_quota_headers_set_the_rate(tmp_path):
+    clock = Clock()
+    limiter = make_limiter(tmp_path, clock)
+
+    # The server's reads bucket (250) is 40% full: cap the tokens, run at 40% of the configured rate
+    limiter.feedback(SHOW, 0, "DEBUG: cli.azure.cli.core.sdk.policies:     "
+                              "'x-ms-ratelimit-remaining-subscription-global-reads': '100'\n")
+    bucket = limiter.state('sub', READ)
+    assert bucket.tokens == 5 and bucket.rate == 4.0
+    # The last response of the call counts; a full server bucket restores the configured rate
+    limiter.feedback(SHOW, 0, "'x-ms-ratelimit-remaining-subscription-reads': '2'\n"
+                              "'x-ms-ratelimit-remaining-subscription-reads': '250'")
+    assert limiter.state('sub', READ).rate == 10.0
+
+    # The writes header also covers what-if; an empty server bucket drops to the floor rate
+    limiter.feedback(SHOW, 0, "'x-ms-ratelimit-remaining-subscription-writes': '0'")
+    assert limiter.state('sub', WHAT_IF).tokens == 0
+    assert limiter.state('sub', WRITE).rate == 2.0 * arm_rate.MIN_RATE_FRACTION
+
+
+def test_split_debug_output_keeps_warnings_and_errors():
+    stderr = ("DEBUG: cli.knack.cli: Command arguments: ['group', 'show']\n"
+              "DEBUG: cli.azure.cli.core.sdk.policies: Response content:\n"
+              "{\"id\": \"/subscriptions/sub\",\n"
+              " \"name\": \"rg\"}\n"
+              "WARNING: Command group 'x' is in preview\n"
+              "INFO: az_command_data_logger : exit code: 1\n"
+              "ERROR: (ResourceGroupNotFound) Resource group 'rg' could not be found.\n"
+              "Code: ResourceGroupNotFound\n")
+    kept, debug = split_debug_output(stderr)
+
+    assert kept == ("WARNING: Command group 'x' is in preview\n"
+                    "ERROR: (ResourceGroupNotFound) Resource group 'rg' could not be found.\n"
+                    "Code: ResourceGroupNotFound\n")
+    assert '"name": "rg"' in debug and 'exit code: 1' in debug
+    assert split_debug_output('ERROR: plain failure') == ('ERROR: plain failure', '')
+
+
+def test_bucket_is_shared_across_processes(tmp_path):
+    spend = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {str(PROJECT_ROOT)!r})
+        from tests.unit.helpers.arm_rate import RateLimiter
+        limiter = RateLimiter(root={str(tmp_path / 'rate')!r}, limits={{'read': (0.001, 5.0)}})
+        print(sum(limiter.reserve('sub', 'read') == 0 for _ in range(3)))
+    """)
+    workers = [subprocess.Popen([sys.executable, '-c', spend], stdout=subprocess.PIPE, text=True) for _ in range(3)]
+    free = sum(int(worker.communicate()[0]) for worker in workers)
+
+    # 9 reservations, 5 in the burst: the other 4 had to wait
+    assert free == 5
+
+
+def test_az_run_takes_tokens_and_reports_throttling(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['group', 'show'], 'stderr': 'ERROR: (TooManyRequests) Retry after 3 seconds.', 'returncode': 1},
+        {'argv': ['group', 'list'], 'stdout': '[]'},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    monkeypatch.setenv('AZ_CASSETTE_MODE', 'off')
+    clock = Clock()
+    monkeypatch.setattr(arm_rate, '_limiter', make_limiter(tmp_path, clock))
+
+    assert az_run(SHOW).returncode == 1
+    assert az_run(['az', 'group', 'list', '--subscription', 'sub']).returncode == 0
+
+    # The second read waited out the Retry-After before az was called
+    assert clock.sleeps == [3.0]
+    assert [json.loads(line)['argv'][1] for line in log_file.read_text().splitlines()] == ['show', 'list']
+
+    monkeypatch.setenv('ARM_RATE_LIMIT', 'false')
+    limiter = arm_rate._limiter
+    limiter.feedback(SHOW, 1, 'ERROR: (TooManyRequests) Retry after 60 seconds.')
+    az_run(['az', 'group', 'list', '--subscription', 'sub'])
+    assert clock.sleeps == [3.0]
+
+
+def test_az_run_reads_rate_headers_from_debug_log(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    debug_log = ("DEBUG: cli.azure.cli.core.sdk.policies: Response headers:\n"
+                 "DEBUG: cli.azure.cli.core.sdk.policies:     "
+                 "'x-ms-ratelimit-remaining-subscription-reads': '50'\n")
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['group', 'list'], 'stdout': '[]', 'stderr': debug_log + 'WARNING: preview\n'},
+        {'argv': ['bicep', 'build'], 'stdout': '{}'},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    monkeypatch.setenv('AZ_CASSETTE_MODE', 'off')
+    monkeypatch.setattr(arm_rate, '_limiter', make_limiter(tmp_path, Clock()))
+
+    result = az_run(['az', 'group', 'list', '--subscription', 'sub'])
+    az_run(['az', 'bicep', 'build', '--file', 'main.bicep'])
+
+    # Only the limited call ran with --debug; its caller sees neither the flag nor the log
+    calls = [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+    assert calls == [['group', 'list', '--subscription', 'sub', '--debug'],
+                     ['bicep', 'build', '--file', 'main.bicep']]
+    assert result.args == ['az', 'group', 'list', '--subscription', 'sub']
+    assert result.stderr == 'WARNING: preview\n' and result.stdout == '[]'
+    assert arm_rate._limiter.state('sub', READ).rate == 2.0
@@ -0,0 +1,119 @@
+"""Tests for the az record/replay cassette layer (no Azure CLI needed)."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from tests.unit.helpers import arm_rate, az_cassette
+from tests.unit.helpers.az_cassette import CassetteMiss, az_run, use_cassette
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.test_utils import run_what_if
+
+MAIN_BICEP = Path(__file__).parent.parent.parent / 'iac' / 'main.bicep'
+WHAT_IF_STDOUT = 'WARNING: A new Bicep release is available.\n\n{"status": "Succeeded", "changes": []}'
+
+
+@pytest.fixture
+def cassette_env(tmp_path, monkeypatch):
+    monkeypatch.setenv(az_cassette.DIR_ENV, str(tmp_path / 'cassettes'))
+    monkeypatch.setattr(az_cassette, '_cassettes', {})
+    monkeypatch.setenv(az_cassette.SESSION_ENV, 'session-1')
+    use_cassette('test-cassette')
+    return tmp_path
+
+
+def _record_with_fake_az(tmp_path, monkeypatch, rules):
+    install_fake_az(tmp_path / 'bin', rules)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    monkeypatch.setenv(az_cassette.MODE_ENV, 'record')
+
+
+def _switch_to_replay(monkeypatch):
+    # Drop the fake az from PATH so replay cannot reach any az binary
+    monkeypatch.setenv('PATH', '/nonexistent')
+    monkeypatch.setenv(az_cassette.MODE_ENV, 'replay')
+    monkeypatch.setattr(az_cassette, '_cassettes', {})
+
+
+def test_run_what_if_replays_offline(cassette_env, monkeypatch):
+    _record_with_fake_az(cassette_env, monkeypatch, [
+        {'argv': ['group', 'exists'], 'stdout': 'true\n'},
+        {'argv': ['ad', 'signed-in-user', 'show'], 'stdout': '11111111-1111-1111-1111-111111111111\n'},
+        {'argv': ['deployment', 'group', 'what-if'], 'stdout': WHAT_IF_STDOUT},
+    ])
+    recorded = run_what_if(MAIN_BICEP)
+    assert recorded == (True, '{"status": "Succeeded", "changes": []}')
+
+    cassette = json.loads((cassette_env / 'cassettes' / 'test-cassette.json').read_text())
+    what_if = [i for i in cassette['interactions'] if i['argv'][1:3] == ['deployment', 'group']][0]
+    assert 'tests/' not in ' '.join(what_if['argv']) and 'iac/main.bicep' in what_if['argv']
+    assert what_if['params'][0]['parameters']['customerAdminObjectId']['value'] == '11111111-1111-1111-1111-111111111111'
+
+    _switch_to_replay(monkeypatch)
+    assert run_what_if(MAIN_BICEP) == recorded
+
+
+def test_replay_reproduces_errors(cassette_env, monkeypatch):
+    _record_with_fake_az(cassette_env, monkeypatch, [
+        {'argv': ['bicep', 'build'], 'stderr': 'ERROR: (InvalidTemplate) bad', 'returncode': 1},
+    ])
+    cmd = ['az', 'bicep', 'build', '--file', str(MAIN_BICEP), '--stdout']
+    with pytest.raises(subprocess.CalledProcessError):
+        az_run(cmd, check=True)
+
+    _switch_to_replay(monkeypatch)
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        az_run(cmd, check=True)
+    assert excinfo.value.stderr == 'ERROR: (InvalidTemplate) bad'
+
+
+def test_replay_is_strict(cassette_env, monkeypatch):
+    _switch_to_replay(monkeypatch)
+    with pytest.raises(CassetteMiss):
+        az_run(['az', 'group', 'exists', '--name', 'never-recorded'])
+
+
+def test_replay_fails_when_calls_outnumber_recordings(cassette_env, monkeypatch):
+    _record_with_fake_az(cassette_env, monkeypatch, [{'argv': ['group', 'exists'], 'stdout': 'true\n'}])
+    cmd = ['az', 'group', 'exists', '--name', 'test-rg']
+    az_run(cmd)
+
+    _switch_to_replay(monkeypatch)
+    assert az_run(cmd).stdout == 'true\n'
+    with pytest.raises(CassetteMiss, match='recorded 1 time'):
+        az_run(cmd)
+
+
+def test_new_record_session_replaces_old_interactions(cassette_env, monkeypatch):
+    cmd = ['az', 'group', 'exists', '--name', 'test-rg']
+    _record_with_fake_az(cassette_env, monkeypatch, [{'argv': ['group', 'exists'], 'stdout': 'false\n'}])
+    az_run(cmd)
+    az_run(cmd)
+
+    monkeypatch.setenv(az_cassette.SESSION_ENV, 'session-2')
+    _record_with_fake_az(cassette_env, monkeypatch, [{'argv': ['group', 'exists'], 'stdout': 'true\n'}])
+    az_run(cmd)
+
+    cassette = json.loads((cassette_env / 'cassettes' / 'test-cassette.json').read_text())
+    assert cassette['session'] == 'session-2'
+    assert [i['stdout'] for i in cassette['interactions']] == ['true\n']
+
+
+def test_debug_log_is_not_recorded(cassette_env, monkeypatch):
+    _record_with_fake_az(cassette_env, monkeypatch, [
+        {'argv': ['group', 'show'], 'stdout': '{}',
+         'stderr': "DEBUG: cli.azure.cli.core.sdk.policies:     "
+                   "'x-ms-ratelimit-remaining-subscription-reads': '249'\n"},
+    ])
+    monkeypatch.setattr(arm_rate, '_limiter', arm_rate.RateLimiter(root=cassette_env / 'rate'))
+    cmd = ['az', 'group', 'show', '--name', 'rg', '--subscription', 'sub']
+    az_run(cmd)
+
+    interaction = json.loads((cassette_env / 'cassettes' / 'test-cassette.json').read_text())['interactions'][0]
+    assert interaction['argv'] == cmd and interaction['stderr'] == ''
+    _switch_to_replay(monkeypatch)
+    assert az_run(cmd).stdout == '{}'
@@ -0,0 +1,65 @@
+"""Tests for Azure CLI error classification and retry (no Azure CLI needed)."""
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from tests.unit.helpers.az_errors import (
+    AUTH, CAPACITY, PERMANENT, RG_DELETING, THROTTLED, TRANSIENT,
+    RetryBudget, RetryPolicy, classify_az_error, run_with_retry
+)
+
+
+@pytest.mark.parametrize('output,category', [
+    ("ERROR: Please run 'az login' to setup account. You are not logged in.", AUTH),
+    ('ERROR: {"code": "DeploymentFailed", "details": [{"code": "SkuNotAvailable", "message": "..."}]}', CAPACITY),
+    ("The requested size has capacity restrictions in southeastasia", CAPACITY),
+    ("ERROR: (ResourceGroupBeingDeleted) The resource group 'rg' is in deprovisioning state", RG_DELETING),
+    ("ERROR: (TooManyRequests) Too many requests. Retry after 7 seconds.\nCode: TooManyRequests", THROTTLED),
+    ("ERROR: (InternalServerError) Encountered internal server error.", TRANSIENT),
+    ("ERROR: (InvalidTemplate) Deployment template validation failed", PERMANENT),
+])
+def test_classify_az_error(output, category):
+    assert classify_az_error(output).category == category
+
+
+def test_retry_after_is_parsed():
+    error = classify_az_error("ERROR: (TooManyRequests) Retry after 7 seconds.")
+    assert error.codes == {'TooManyRequests'}
+    assert error.retry_after == 7.0
+    assert RetryPolicy(3, 1.0, 2.0).delay(5, error.retry_after) == 7.0
+
+
+def _calls(*results):
+    results = list(results)
+    calls = []
+
+    def call():
+        calls.append(1)
+        return results.pop(0)
+    return call, calls
+
+
+def test_transient_errors_are_retried_until_success():
+    call, calls = _calls((False, 'ERROR: (ServiceUnavailable) try later'), (True, '{}'))
+    sleeps = []
+    assert run_with_retry(call, budget=RetryBudget(5), sleep=sleeps.append) == (True, '{}')
+    assert len(calls) == 2 and len(sleeps) == 1
+
+
+def test_permanent_errors_fail_immediately():
+    call, calls = _calls((False, 'ERROR: (InvalidTemplate) bad'), (True, '{}'))
+    assert run_with_retry(call, budget=RetryBudget(5), sleep=lambda _: None) == (False, 'ERROR: (InvalidTemplate) bad')
+    assert len(calls) == 1
+
+
+def test_global_budget_caps_retries():
+    throttled = (False, 'ERROR: (TooManyRequests) slow down')
+    budget = RetryBudget(1)
+    call, calls = _calls(throttled, throttled, throttled)
+    success, _ = run_with_retry(call, budget=budget, sleep=lambda _: None)
+    assert not success
+    assert len(calls) == 2
+    assert budget.remaining == 0
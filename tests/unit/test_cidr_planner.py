@@ -0,0 +1,102 @@
+"""Tests for the fleet VNet CIDR planner (no Azure CLI needed)."""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.cidr_planner import (
+    SUBNET_NAMES,
+    IntervalTree,
+    check_subnet_fit,
+    derive_subnets,
+    find_overlaps,
+    main,
+    plan_fleet
+)
+
+NETWORK_BICEP = Path(__file__).parent.parent.parent / 'iac' / 'modules' / 'network.bicep'
+
+
+def test_mirror_matches_network_bicep():
+    text = NETWORK_BICEP.read_text()
+    for name in SUBNET_NAMES:
+        assert f"'{name}'" in text
+    assert "'${octetA}.${octetB}.${octetC + subnetIndex}.0/${prefixLength}'" in text
+    assert derive_subnets('10.20.0.0/16') == [
+        ('snet-appgw', '10.20.0.0/24'),
+        ('snet-psql', '10.20.1.0/24'),
+        ('snet-private-endpoints', '10.20.2.0/24'),
+        ('snet-appsvc', '10.20.3.0/24'),
+        ('snet-aks', '10.20.4.0/24'),
+        ('AzureBastionSubnet', '10.20.5.0/24'),
+    ]
+
+
+def test_subnet_fit():
+    assert check_subnet_fit('10.20.0.0/16') == []
+    assert check_subnet_fit('10.20.16.0/20') == []
+    # /24 VNet holds only the first derived subnet
+    assert len(check_subnet_fit('10.20.0.0/24')) == 5
+    # /21 at .8 spans .8-.15, enough for .8-.13; a /22 at .12 spans only .12-.15
+    assert check_subnet_fit('10.20.8.0/21') == []
+    assert any('AzureBastionSubnet' in p for p in check_subnet_fit('10.20.12.0/22'))
+    # Third octet overflows past 255
+    assert any('not a valid CIDR' in p for p in check_subnet_fit('10.20.252.0/22'))
+    assert any('outside /16-/24' in p for p in check_subnet_fit('10.0.0.0/8'))
+    assert any('host bits' in p for p in check_subnet_fit('10.20.3.0/16'))
+    assert any('not a valid IPv4 CIDR' in p for p in check_subnet_fit('10.20.0.0'))
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for i in range(500):
+        start = rng.randint(0, 10000)
+        intervals.append((start, start + rng.randint(0, 300), i))
+    tree = IntervalTree(intervals)
+    for _ in range(200):
+        start = rng.randint(0, 10000)
+        end = start + rng.randint(0, 300)
+        expected = {p for s, e, p in intervals if s <= end and e >= start}
+        assert {tree.payloads[i] for i in tree.overlapping(start, end)} == expected
+
+
+def test_find_overlaps():
+    overlaps = find_overlaps([('a', '10.20.0.0/16'), ('b', '10.21.0.0/16'), ('c', '10.20.128.0/20'), ('d', '10.0.0.0/8')])
+    pairs = {frozenset((o[0], o[2])) for o in overlaps}
+    assert pairs == {frozenset('ac'), frozenset('ad'), frozenset('bd'), frozenset('cd')}
+
+
+def test_find_overlaps_scales_to_fleet_size():
+    rng = random.Random(1)
+    cidrs = [(f't{i}', f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.0/24') for i in range(20000)]
+    start = time.perf_counter()
+    find_overlaps(cidrs)
+    assert time.perf_counter() - start < 1.0
+
+
+def write_tenant(directory, name, cidr, group=None):
+    metadata = {'peeringGroup': group} if group else {}
+    path = directory / f'{name}.json'
+    path.write_text(json.dumps({'metadata': metadata, 'parameters': {'vnetCidr': {'value': cidr}}}))
+    return path
+
+
+def test_plan_fleet_only_checks_peered_tenants(tmp_path):
+    files = [
+        write_tenant(tmp_path, 'contoso', '10.20.0.0/16', 'hub-east'),
+        write_tenant(tmp_path, 'fabrikam', '10.20.0.0/20', 'hub-east'),
+        write_tenant(tmp_path, 'northwind', '10.20.0.0/16', 'hub-west'),
+        write_tenant(tmp_path, 'tailspin', '10.30.0.0/24'),
+    ]
+    plan = plan_fleet(files)
+
+    assert [(o[0], {o[1], o[3]}) for o in plan.overlaps] == [('hub-east', {'contoso', 'fabrikam'})]
+    assert [t.tenant for t in plan.tenants if t.problems] == ['tailspin']
+    assert not plan.success
+    assert len(plan_fleet(files, all_peered=True).overlaps) == 3
+    assert main([str(f) for f in files[2:3]]) == 0
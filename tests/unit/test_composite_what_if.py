@@ -0,0 +1,63 @@
+"""Tests for composite what-if generation and result splitting (no Azure CLI needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.composite_what_if import (
+    assign_changes,
+    build_composite,
+    split_composite_output,
+    transform_wrapper
+)
+from tests.unit.test_modules import FIXTURES_DIR, MODULES
+
+RG_ID = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/test-rg-sg/providers'
+
+
+def test_transform_wrapper_takes_names_as_param():
+    text, uses_naming = transform_wrapper((FIXTURES_DIR / 'test-kv.bicep').read_text(), 'kv')
+    assert uses_naming
+    assert "module naming" not in text
+    assert 'naming.outputs' not in text
+    assert 'param names object' in text
+    assert "name: 'kv-kv'" in text
+
+
+def test_build_composite_evaluates_naming_once(tmp_path):
+    composite = build_composite(MODULES, FIXTURES_DIR, tmp_path).read_text()
+    assert composite.count("module naming ") == 1
+    assert composite.count("name: 'wrapper-") == len(MODULES)
+    # Params with defaults in every wrapper are left to the wrappers
+    assert 'param tags ' not in composite
+    assert 'param vnetCidr string' in composite
+    for _, bicep_file in MODULES:
+        assert (tmp_path / bicep_file).exists()
+
+
+def test_assign_changes_by_name_prefix_and_parent():
+    changes = [
+        {'resourceId': f'{RG_ID}/Microsoft.KeyVault/vaults/vd-kv-abcdef0123456789', 'changeType': 'Create'},
+        {'resourceId': f'{RG_ID}/Microsoft.KeyVault/vaults/vd-kv-abcdef0123456789/providers/'
+                       f'Microsoft.Insights/diagnosticSettings/vd-diag-kv-0123456789abcdef', 'changeType': 'Create'},
+        {'resourceId': f'{RG_ID}/Microsoft.Search/searchServices/vd-search-0123456789abcdef', 'changeType': 'Create'},
+        {'resourceId': f'{RG_ID}/Microsoft.Example/unknown/thing', 'changeType': 'Create'},
+    ]
+    assigned = assign_changes(changes, MODULES, FIXTURES_DIR)
+    kv_ids = {c['resourceId'].rsplit('/', 1)[-1] for c in assigned['kv']}
+    assert kv_ids == {'vd-kv-abcdef0123456789', 'vd-diag-kv-0123456789abcdef'}
+    assert [c['resourceId'].rsplit('/', 1)[-1] for c in assigned['search']] == ['vd-search-0123456789abcdef']
+    assert assigned['network'] == []
+    assert [c['resourceId'] for c in assigned['_unassigned']] == [f'{RG_ID}/Microsoft.Example/unknown/thing']
+
+
+def test_split_composite_output_keeps_status():
+    output = json.dumps({'status': 'Succeeded', 'changes': [
+        {'resourceId': f'{RG_ID}/Microsoft.Search/searchServices/vd-search-0123456789abcdef', 'changeType': 'Create'}
+    ]})
+    per_module = split_composite_output(output, MODULES, FIXTURES_DIR)
+    assert set(per_module) == {name for name, _ in MODULES} | {'_unassigned'}
+    search = json.loads(per_module['search'])
+    assert search['status'] == 'Succeeded' and len(search['changes']) == 1
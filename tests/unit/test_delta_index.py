@@ -0,0 +1,92 @@
+"""Tests for the what-if delta property-path index (no Azure CLI needed)."""
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers import delta_index
+from tests.unit.helpers.delta_index import DeltaPathIndex, build_delta_index
+
+RG_ID = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/test-rg/providers'
+
+RESOURCE_CHANGES = [
+    {
+        'resource_id': f'{RG_ID}/Microsoft.Storage/storageAccounts/vdstabc12345',
+        'change_type': 'Modify',
+        'delta': [{
+            'path': 'properties',
+            'propertyChangeType': 'Modify',
+            'children': [{
+                'path': 'networkAcls',
+                'propertyChangeType': 'Modify',
+                'children': [
+                    {'path': 'defaultAction', 'propertyChangeType': 'Modify', 'before': 'Allow', 'after': 'Deny'},
+                    {'path': 'bypass', 'propertyChangeType': 'NoEffect', 'before': 'AzureServices'}
+                ]
+            }]
+        }]
+    },
+    {
+        'resource_id': f'{RG_ID}/Microsoft.KeyVault/vaults/vd-kv-x',
+        'change_type': 'Modify',
+        'delta': [{
+            'path': 'properties.networkAcls.defaultAction',
+            'propertyChangeType': 'NoEffect',
+            'before': 'Deny'
+        }]
+    }
+]
+
+
+def test_lookup_exact_path_across_resources():
+    index = DeltaPathIndex(RESOURCE_CHANGES)
+    entries = index.lookup('properties.networkAcls.defaultAction')
+    assert {e['resource_type'] for e in entries} == {'Microsoft.Storage/storageAccounts', 'Microsoft.KeyVault/vaults'}
+    storage = index.lookup('properties.networkAcls.defaultAction', resource_type='microsoft.storage/storageaccounts')
+    assert [(e['before'], e['after']) for e in storage] == [('Allow', 'Deny')]
+    assert index.lookup('properties.missing') == []
+
+
+def test_glob_and_changed():
+    index = DeltaPathIndex(RESOURCE_CHANGES)
+    assert sorted(e['path'] for e in index.glob('properties.networkAcls.*', 'Microsoft.Storage/storageAccounts')) == [
+        'properties.networkAcls.bypass', 'properties.networkAcls.defaultAction'
+    ]
+    assert index.changed('*.defaultAction', resource_type='Microsoft.Storage/storageAccounts')
+    assert not index.changed('*.defaultAction', resource_type='Microsoft.KeyVault/vaults')
+    assert not index.changed('properties.networkAcls.bypass')
+
+
+def test_index_is_lazy_and_cached():
+    parsed = {'resource_changes': RESOURCE_CHANGES}
+    index = build_delta_index(parsed)
+    assert index._paths is None
+    assert len(index) == 5
+    assert build_delta_index(parsed) is index
+
+
+def test_suffix_and_segment_globs_only_match_indexed_candidates(monkeypatch):
+    changes = [{
+        'resource_id': f'{RG_ID}/Microsoft.Storage/storageAccounts/st{i}',
+        'change_type': 'Modify',
+        'delta': [{'path': f'properties.filler{j}', 'propertyChangeType': 'NoEffect'} for j in range(50)] + [
+            {'path': 'properties.networkAcls.defaultAction', 'propertyChangeType': 'Modify', 'after': 'Deny'},
+            {'path': 'properties.networkAcls.ipRules', 'propertyChangeType': 'Array',
+             'children': [{'path': '0', 'propertyChangeType': 'Create', 'after': {'value': '10.0.0.1'}}]},
+        ]
+    } for i in range(20)]
+    index = DeltaPathIndex(changes)
+    matched = []
+    fnmatchcase = delta_index.fnmatch.fnmatchcase
+    monkeypatch.setattr(delta_index.fnmatch, 'fnmatchcase', lambda path, pattern: matched.append(path) or
+                        fnmatchcase(path, pattern))
+
+    assert len(index.glob('*.defaultAction')) == 20
+    assert len(index.glob('properties.*.ipRules')) == 20
+    assert len(index.glob('*.ipRules.*')) == 20
+    assert {e['path'] for e in index.glob('*.ipRules.?')} == {'properties.networkAcls.ipRules.0'}
+    # Each glob only looked at its candidates (20 per suffix, 40 paths hold the ipRules
+    # segment), never at all 1060 paths
+    assert len(matched) == 20 + 20 + 40 + 40
+    assert len(index.glob('*')) == len(index) == 1060
@@ -0,0 +1,53 @@
+"""Tests for the module deployment ledger (no Azure CLI needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.deploy_ledger import DeploymentLedger, params_hash, template_hash
+
+TEMPLATE = {
+    '$schema': 'https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#',
+    'metadata': {'_generator': {'name': 'bicep', 'version': '0.30.3.12046', 'templateHash': '123'}},
+    'resources': [{'type': 'Microsoft.Search/searchServices', 'sku': {'name': "[parameters('aiServicesTier')]"}}]
+}
+
+
+def test_template_hash_ignores_bicep_generator_metadata():
+    upgraded = json.loads(json.dumps(TEMPLATE))
+    upgraded['metadata']['_generator'] = {'name': 'bicep', 'version': '0.31.0.1', 'templateHash': '456'}
+    changed = json.loads(json.dumps(TEMPLATE))
+    changed['resources'][0]['sku']['name'] = 'basic'
+
+    assert template_hash(json.dumps(TEMPLATE)) == template_hash(json.dumps(upgraded))
+    assert template_hash(json.dumps(TEMPLATE)) != template_hash(json.dumps(changed))
+
+
+def test_params_hash_is_order_independent():
+    assert params_hash({'a': 1, 'b': [1, 2]}) == params_hash({'b': [1, 2], 'a': 1})
+    assert params_hash({'a': 1}) != params_hash({'a': 2})
+
+
+def test_ledger_round_trip(tmp_path):
+    path = tmp_path / 'ledger.json'
+    ledger = DeploymentLedger('test-rg', 'sub-1', path)
+    assert not ledger.is_current('search', 't1', 'p1')
+
+    ledger.record('search', 't1', 'p1', {'searchId': 'id-1'})
+
+    reloaded = DeploymentLedger('test-rg', 'sub-1', path)
+    assert reloaded.is_current('search', 't1', 'p1')
+    assert not reloaded.is_current('search', 't2', 'p1')
+    assert not reloaded.is_current('search', 't1', 'p2')
+    assert reloaded.outputs('search') == {'searchId': 'id-1'}
+    # Hashes only: param values are never stored
+    assert 'p1' in path.read_text() and 'aiServicesTier' not in path.read_text()
+
+
+def test_ledger_ignores_other_subscription(tmp_path):
+    path = tmp_path / 'ledger.json'
+    DeploymentLedger('test-rg', 'sub-1', path).record('search', 't1', 'p1', {})
+
+    assert not DeploymentLedger('test-rg', 'sub-2', path).is_current('search', 't1', 'p1')
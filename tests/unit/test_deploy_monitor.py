@@ -0,0 +1,120 @@
+"""Tests for the deployment monitor (simulated operations feed and fake az, no Azure needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.deploy_monitor import (
+    AzDeploymentFeed,
+    SimulatedDeploymentFeed,
+    deploy_and_monitor,
+    main
+)
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+
+RG_ID = '/subscriptions/sub/resourceGroups/rg'
+DEPLOYMENTS = 'Microsoft.Resources/deployments'
+
+
+def module(at, name, state, op_id=None):
+    return {'at': at, 'id': op_id or f'op-{name}', 'type': DEPLOYMENTS, 'name': name, 'state': state,
+            'resourceId': f'{RG_ID}/providers/{DEPLOYMENTS}/{name}'}
+
+
+# kv fails in minute 3; without cancelling, the deployment only ends in minute 30
+TIMELINE = [
+    module(5, 'kv', 'Running'),
+    module(5, 'search', 'Running'),
+    {'at': 30, 'deployment': 'kv', 'id': 'op-vault', 'type': 'Microsoft.KeyVault/vaults', 'name': 'kv-1'},
+    {'at': 180, 'deployment': 'kv', 'id': 'op-vault', 'state': 'Failed', 'code': 'Conflict',
+     'error': {'error': {'code': 'VaultAlreadyExists'}}},
+    module(185, 'kv', 'Failed'),
+    module(1790, 'search', 'Succeeded'),
+    {'at': 1800, 'state': 'Failed'},
+]
+
+
+def run(timeline, tmp_path, **options):
+    feed = SimulatedDeploymentFeed('rg', timeline)
+    lines = []
+    result = deploy_and_monitor(feed, Path('main.bicep'), Path('params.json'), name='main-1',
+                                log_file=tmp_path / 'events.jsonl', output=lines.append, **options)
+    return feed, result, lines
+
+
+def test_first_failure_cancels_the_deployment(tmp_path):
+    feed, result, lines = run(TIMELINE, tmp_path, poll_interval=10, cancel_on_failure=True)
+
+    assert result.state == 'Canceled' and result.canceled and not result.success
+    assert result.seconds == 190
+    assert [(e.resource_name, e.state) for e in result.failed] == [('kv-1', 'Failed')]
+    assert result.failed[0].deployment == 'kv' and result.failed[0].previous == 'Running'
+    assert result.failed[0].elapsed == 180
+    assert feed.calls['cancel'] == 1
+    assert 'VaultAlreadyExists' in '\n'.join(lines)
+    assert 'Cancelling main-1: Microsoft.KeyVault/vaults/kv-1 failed' in lines
+
+    logged = [json.loads(line) for line in (tmp_path / 'events.jsonl').read_text().splitlines()]
+    assert [e['state'] for e in logged] == [e.state for e in result.events]
+    # search was still running when the deployment was cancelled
+    assert logged[-1]['resource_name'] == 'search' and logged[-1]['state'] == 'Canceled'
+
+
+def test_only_state_changes_are_reported(tmp_path):
+    feed, result, _ = run(TIMELINE, tmp_path, poll_interval=60)
+
+    assert result.state == 'Failed' and not result.canceled and feed.calls['cancel'] == 0
+    assert [(e.resource_name, e.state) for e in result.events] == [
+        ('kv', 'Running'), ('search', 'Running'), ('kv-1', 'Running'),
+        ('kv-1', 'Failed'), ('kv', 'Failed'), ('search', 'Succeeded'),
+    ]
+    # 31 passes over main; from 60s, kv is listed until its operation failed and search until it succeeded
+    assert feed.calls['state'] == 31
+    assert feed.calls['operations'] == 31 + 4 + 30
+
+
+def test_successful_deployment(tmp_path):
+    timeline = [module(0, 'naming', 'Running'), module(20, 'naming', 'Succeeded'), {'at': 25, 'state': 'Succeeded'}]
+    _, result, _ = run(timeline, tmp_path, poll_interval=10, cancel_on_failure=True)
+
+    assert result.success and result.seconds == 30 and result.errors == []
+
+
+def test_az_feed_submits_with_no_wait(tmp_path, monkeypatch):
+    operations = [{'id': 'op-kv', 'state': 'Failed', 'type': DEPLOYMENTS, 'name': 'kv', 'code': 'Conflict',
+                   'resourceId': f'/subscriptions/sub/resourceGroups/other-rg/providers/{DEPLOYMENTS}/kv',
+                   'error': {'code': 'DeploymentFailed'}}]
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['deployment', 'group', 'create'], 'stdout': ''},
+        {'argv': ['deployment', 'group', 'show'], 'stdout': 'Failed\n'},
+        {'argv': ['deployment', 'operation', 'group', 'list', '--resource-group', 'rg'],
+         'stdout': json.dumps(operations)},
+        {'argv': ['deployment', 'operation', 'group', 'list'], 'stdout': '[]'},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+
+    result = deploy_and_monitor(AzDeploymentFeed('rg'), Path('main.bicep'), Path('params.json'), name='main-1',
+                                output=lambda line: None)
+
+    calls = [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+    assert calls[0][:3] == ['deployment', 'group', 'create'] and '--no-wait' in calls[0]
+    assert calls[0][calls[0].index('--name') + 1] == 'main-1'
+    # The module deployment is listed in its own resource group
+    listed = [argv[argv.index('--resource-group') + 1:argv.index('--name') + 2]
+              for argv in calls if argv[1] == 'operation']
+    assert listed == [['rg', '--name', 'main-1'], ['other-rg', '--name', 'kv']]
+    assert '--query' in calls[2]
+    assert result.state == 'Failed' and result.failed[0].error == {'code': 'DeploymentFailed'}
+
+
+def test_main_replays_a_simulated_timeline(tmp_path, capsys):
+    timeline = tmp_path / 'timeline.json'
+    timeline.write_text(json.dumps(TIMELINE))
+
+    assert main(['--simulate', str(timeline), '--cancel-on-failure', '--poll-interval', '15']) == 1
+    assert 'Failed after 1800s' not in capsys.readouterr().out
+    assert main(['--simulate', str(timeline), '--poll-interval', '15']) == 1
+    assert capsys.readouterr().out.splitlines()[-1].endswith('Failed after 1800s, 6 state changes, 2 failed operations')
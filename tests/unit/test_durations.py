@@ -0,0 +1,79 @@
+"""Tests for the duration history and longest-first scheduling (fake az, no Azure needed)."""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.durations import (
+    HISTORY_SIZE,
+    DurationDB,
+    format_prediction,
+    lpt_order,
+    order_module_items,
+    predict_makespan,
+    what_if_prediction,
+    wrapper_module
+)
+
+
+def test_record_keeps_recent_history_per_region(tmp_path):
+    db = DurationDB(tmp_path / 'durations.json')
+    for seconds in range(1, HISTORY_SIZE + 3):
+        db.record('what-if', 'gateway', 'SoutheastAsia', seconds)
+    db.record('what-if', 'psql', 'eastus', 40)
+
+    reloaded = DurationDB(tmp_path / 'durations.json')
+    assert reloaded.data['what-if']['southeastasia']['gateway'] == [float(s) for s in range(3, HISTORY_SIZE + 3)]
+    assert reloaded.expected('what-if', 'gateway', 'southeastasia') == 7.5
+    # Falls back to other regions, then to the median of known modules
+    assert reloaded.expected('what-if', 'psql', 'southeastasia') == 40
+    assert reloaded.expected('deploy', 'psql') is None
+    assert reloaded.estimates('what-if', ['gateway', 'psql', 'identity'], 'southeastasia') == {
+        'gateway': 7.5, 'psql': 40, 'identity': 23.75
+    }
+
+
+def test_longest_first_beats_declaration_order():
+    estimates = {'identity': 1, 'public-ip': 1, 'dns': 1, 'kv': 1, 'gateway': 4}
+
+    assert lpt_order(estimates) == ['gateway', 'dns', 'identity', 'kv', 'public-ip']
+    assert predict_makespan(estimates, 2, order=list(estimates)) == 6
+    assert predict_makespan(estimates, 2) == 4
+    assert predict_makespan(estimates, 8) == 4
+    assert format_prediction('what-if', estimates, 2) == (
+        'Predicted what-if completion: 4s for 5 modules on 2 worker(s) (longest first: gateway 4s, dns 1s, identity 1s)'
+    )
+
+
+def item(test, module=None):
+    callspec = SimpleNamespace(params={'module_name': module}) if module else None
+    return SimpleNamespace(originalname=test, callspec=callspec, name=f'{test}[{module}]')
+
+
+def test_order_module_items_reorders_within_each_test_function():
+    items = [item('test_other')] + [item(test, m) for test in ('test_compiles', 'test_what_if')
+                                    for m in ('identity', 'gateway', 'psql')] + [item('test_last')]
+
+    order_module_items(items, {'identity': 5, 'gateway': 90, 'psql': 60})
+
+    assert [i.name for i in items] == [
+        'test_other[None]',
+        'test_compiles[gateway]', 'test_compiles[psql]', 'test_compiles[identity]',
+        'test_what_if[gateway]', 'test_what_if[psql]', 'test_what_if[identity]',
+        'test_last[None]',
+    ]
+
+
+def test_what_if_prediction_needs_history(tmp_path):
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    for name in ('test-kv.bicep', 'test-gateway.bicep'):
+        (fixtures / name).write_text('')
+    db = DurationDB(tmp_path / 'durations.json')
+
+    assert what_if_prediction(db, 'eastus', 4, fixtures) is None
+    db.record('what-if', 'gateway', 'eastus', 95)
+    assert what_if_prediction(db, 'eastus', 4, fixtures).startswith('Predicted what-if completion: 1m35s for 2 modules')
+    assert wrapper_module(fixtures / 'test-kv.bicep') == 'kv'
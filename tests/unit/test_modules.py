@@ -1,4 +1,5 @@
 """Parameterized unit tests for all Bicep modules."""
+import os
 import re
 import sys
 from pathlib import Path
@@ -11,10 +12,14 @@ from tests.unit.helpers.test_utils import (
     run_bicep_build,
     run_bicep_build_with_params,
     run_what_if,
+    run_what_if_shared,
     load_json_file,
+    extract_module_dependencies,
     SHARED_PARAMS_FILE
 )
-from tests.unit.helpers.what_if_parser import parse_what_if_output
+from tests.unit.helpers.az_errors import classify_az_error, skip_reason
+from tests.unit.helpers.composite_what_if import run_composite_what_if
+from tests.unit.helpers.tiered_what_if import TieredWhatIf, run_escalating
 
 # Define all modules to test (no params files needed - all params come from params.dev.json)
 MODULES = [
@@ -39,6 +44,20 @@ MODULES = [
 
 FIXTURES_DIR = Path(__file__).parent / 'fixtures'
 
+# Run one composite what-if for all modules instead of one per wrapper (opt-in)
+COMPOSITE_WHAT_IF = os.getenv('WHAT_IF_COMPOSITE', 'false').lower() == 'true'
+
+
+def run_module_what_if(module_name: str, bicep_file: str, result_format: str = 'FullResourcePayloads') -> tuple[bool, str]:
+    """Run (or reuse) the what-if for one module wrapper.
+    
+    With WHAT_IF_COMPOSITE=true, all wrappers share a single composite what-if
+    and each module gets its slice of the changes.
+    """
+    if COMPOSITE_WHAT_IF:
+        return run_composite_what_if(module_name, MODULES, FIXTURES_DIR, result_format)
+    return run_what_if_shared(FIXTURES_DIR / bicep_file, result_format=result_format)
+
 
 @pytest.mark.parametrize('module_name,bicep_file', MODULES)
 class TestBicepModules:
@@ -60,25 +79,25 @@ class TestBicepModules:
             None: If what-if fails or Azure CLI is not configured (tests should skip)
         """
         
-        bicep_path = FIXTURES_DIR / bicep_file
-        
         # Run what-if once per module (no params_file - uses shared params.dev.json)
-        success, output = run_what_if(bicep_path)
+        # Shared across pytest-xdist workers so each module is only evaluated once per run.
+        # Tiered: ResourceIdOnly first; full payloads are fetched only if a test reads
+        # 'before', 'after' or 'delta' from a resource change.
+        tiered = TieredWhatIf(lambda result_format: run_module_what_if(module_name, bicep_file, result_format))
+        success, output = tiered.success, tiered.output
         
         # Handle failures gracefully
         if not success:
-            # Check if it's an authentication issue (should skip, not fail)
-            if "not logged in" in output.lower() or "authentication" in output.lower():
-                pytest.skip(f"Azure CLI not configured - skipping what-if cache for {module_name}")
-            # Skip if SKU is not available (transient Azure capacity issue)
-            if "skunotavailable" in output.lower() or "sku not available" in output.lower() or "capacity restrictions" in output.lower():
-                pytest.skip(f"VM SKU not available in test location - skipping what-if cache for {module_name} (transient Azure capacity issue)")
+            # Skip on authentication or SKU capacity issues (environment, not template, problems)
+            reason = skip_reason(classify_az_error(output), f"what-if cache for {module_name}")
+            if reason:
+                pytest.skip(reason)
             # For other failures, return None (tests can check for this)
             return None
         
         # Parse and cache the output
         try:
-            parsed_output = parse_what_if_output(output)
+            parsed_output = tiered.parsed()
             return parsed_output
         except Exception as e:
             # If parsing fails, return None
@@ -97,16 +116,14 @@ class TestBicepModules:
         """
         # Check if cached output is available (None indicates failure)
         if cached_what_if_output is None:
-            # If cached output is None, it means what-if failed
-            # Try running it once more to get the error message
-            bicep_path = FIXTURES_DIR / bicep_file
-            success, output = run_what_if(bicep_path)
+            # If cached output is None, it means what-if failed. Fetch the error
+            # message with the same formats (and broker keys) as the tiered run,
+            # so its results are reused instead of calling ARM again
+            success, output = run_escalating(lambda fmt: run_module_what_if(module_name, bicep_file, fmt))
             if not success:
-                if "not logged in" in output.lower():
-                    pytest.skip(f"Azure CLI not configured - skipping what-if test for {module_name}")
-                # Skip if SKU is not available (transient Azure capacity issue)
-                if "skunotavailable" in output.lower() or "sku not available" in output.lower() or "capacity restrictions" in output.lower():
-                    pytest.skip(f"VM SKU not available in test location - skipping what-if test for {module_name} (transient Azure capacity issue)")
+                reason = skip_reason(classify_az_error(output), f"what-if test for {module_name}")
+                if reason:
+                    pytest.skip(reason)
             if not success:
                 pytest.fail(f"What-if failed for {module_name}: {output}")
         
@@ -243,26 +260,13 @@ class TestBicepModules:
                 Path(tmp_params_file).unlink(missing_ok=True)
 
 
-def _extract_module_dependencies(bicep_text):
-    module_re = re.compile(r"module\s+(\w+)\s+'[^']+'\s*=\s*{(.*?)\n}", re.S)
-    deps = {}
-    for name, body in module_re.findall(bicep_text):
-        dep_match = re.search(r"dependsOn:\s*\[(.*?)\]", body, re.S)
-        if dep_match:
-            dep_block = dep_match.group(1)
-            deps[name] = set(re.findall(r"\b(\w+)\b", dep_block))
-        else:
-            deps[name] = set()
-    return deps
-
-
 def test_static_dependency_rules():
     """Validate explicit dependency rules for static Bicep sequencing."""
     repo_root = Path(__file__).resolve().parents[2]
     main_bicep_path = repo_root / 'iac' / 'main.bicep'
     bicep_text = main_bicep_path.read_text()
 
-    deps = _extract_module_dependencies(bicep_text)
+    deps = extract_module_dependencies(bicep_text)
 
     pe_modules = {'kv', 'storage', 'acr', 'psql', 'search', 'cognitiveServices'}
     vnet_modules = {'gateway', 'bastion', 'vmJumphost', 'dns'}
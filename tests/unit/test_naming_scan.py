@@ -0,0 +1,196 @@
+"""Tests for the naming.bicep collision scanner (offline)."""
+import json
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+
+from tests.unit.helpers.naming_scan import (
+    GLOBAL_KEYS,
+    _one_apart,
+    derive_values,
+    load_templates,
+    main,
+    murmur64,
+    nano8,
+    nano16,
+    naming_table,
+    near_miss_pairs,
+    read_inventory,
+    scan,
+    unique_string
+)
+from tests.unit.helpers.test_utils import get_resource_group_from_shared_params, run_what_if_shared
+from tests.unit.helpers.what_if_parser import parse_what_if_output
+
+TEMPLATES = load_templates()
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def _rotl(x, r):
+    return ((x << r) | (x >> (32 - r))) & 0xFFFFFFFF
+
+
+def _fmix(h):
+    h = ((h ^ (h >> 16)) * 0x85ebca6b) & 0xFFFFFFFF
+    h = ((h ^ (h >> 13)) * 0xc2b2ae35) & 0xFFFFFFFF
+    return h ^ (h >> 16)
+
+
+def reference_murmur64(data: bytes) -> int:
+    """Line-by-line port of ARM's MurmurHash64 (C#, uint arithmetic), kept independent of naming_scan."""
+    c1, c2 = 0x239b961b, 0xab0e9789
+    h1 = h2 = 0
+    index = 0
+    while index + 7 < len(data):
+        k1 = int.from_bytes(data[index:index + 4], 'little')
+        k2 = int.from_bytes(data[index + 4:index + 8], 'little')
+        h1 ^= (_rotl((k1 * c1) & 0xFFFFFFFF, 15) * c2) & 0xFFFFFFFF
+        h1 = ((_rotl(h1, 19) + h2) * 5 + 0x561ccd1b) & 0xFFFFFFFF
+        h2 ^= (_rotl((k2 * c2) & 0xFFFFFFFF, 17) * c1) & 0xFFFFFFFF
+        h2 = ((_rotl(h2, 13) + h1) * 5 + 0x0bcaa747) & 0xFFFFFFFF
+        index += 8
+    tail = data[index:]
+    if tail:
+        h1 ^= (_rotl((int.from_bytes(tail[:4], 'little') * c1) & 0xFFFFFFFF, 15) * c2) & 0xFFFFFFFF
+        if len(tail) > 4:
+            h2 ^= (_rotl((int.from_bytes(tail[4:], 'little') * c2) & 0xFFFFFFFF, 17) * c1) & 0xFFFFFFFF
+    h1 ^= len(data) & 0xFFFFFFFF
+    h2 ^= len(data) & 0xFFFFFFFF
+    h1 = (h1 + h2) & 0xFFFFFFFF
+    h2 = (h2 + h1) & 0xFFFFFFFF
+    h1, h2 = _fmix(h1), _fmix(h2)
+    h1 = (h1 + h2) & 0xFFFFFFFF
+    h2 = (h2 + h1) & 0xFFFFFFFF
+    return (h2 << 32) | h1
+
+
+# Pinned outputs (regression vectors), cross-checked against reference_murmur64
+# below. test_unique_string_matches_arm_what_if checks the implementation
+# against names ARM itself derived, whenever az can run a what-if.
+KNOWN_ANSWERS = {
+    '': (0x0000000000000000, 'aaaaaaaaaaaaa'),
+    'a': (0x25488a37fbdfb87c, 'eveiun73364hy'),
+    'test-rg-sg-st': (0x360e4546dcd8355e, 'gyhekrw43a2v4'),
+    'test-rg-sg-pestblob-a': (0xeaac283e4879179d, '5kwcqpsipelz2'),
+    'rg-contoso-prod-acr': (0xe83578d94b81cbd7, '5a2xrwklqhf5o'),
+    'rg-ünïcode-prod-kv-b': (0x0bc0b732c440229a, 'bpalomweiarju'),
+}
+
+
+def test_unique_string_shape():
+    assert murmur64(b'') == 0
+    assert unique_string('') == 'a' * 13
+    value = unique_string('rg-contoso-prod', 'st')
+    assert value == unique_string('rg-contoso-prod-st')
+    assert len(value) == 13 and set(value) <= set('abcdefghijklmnopqrstuvwxyz234567')
+    assert value != unique_string('rg-contoso-prod-acr')
+
+
+def test_unique_string_known_answers():
+    for seed, (hashed, text) in KNOWN_ANSWERS.items():
+        data = seed.encode('utf-8')
+        assert (murmur64(data), unique_string(seed)) == (hashed, text), seed
+        assert reference_murmur64(data) == hashed, seed
+    # Every tail length and block count, against the independent port
+    for length in range(41):
+        data = bytes((i * 37 + 11) & 0xFF for i in range(length))
+        assert murmur64(data) == reference_murmur64(data), length
+
+
+def test_unique_string_matches_arm_what_if():
+    """The storage and private endpoint names ARM derives in a what-if equal naming_table()'s."""
+    if shutil.which('az') is None:
+        pytest.skip("Azure CLI not found. Please install Azure CLI.")
+    success, output = run_what_if_shared(FIXTURES_DIR / 'test-storage.bicep', result_format='ResourceIdOnly')
+    if not success:
+        pytest.skip(f"Storage what-if unavailable: {output.strip()[:200]}")
+    names = {change['resource_id'].rstrip('/').split('/')[-1]
+             for change in parse_what_if_output(output)['resource_changes']}
+
+    table = naming_table(get_resource_group_from_shared_params())
+    assert table['storage'] in names
+    assert table['peStBlob'] in names
+
+
+def test_naming_table_mirrors_naming_bicep():
+    assert (TEMPLATES['storage'].prefix, TEMPLATES['storage'].func, TEMPLATES['storage'].suffix) == \
+        ('vdst', 'nano8', 'st')
+    assert TEMPLATES['kv'].func == 'nano16'
+    assert set(GLOBAL_KEYS) <= set(TEMPLATES)
+
+    table = naming_table('rg-contoso-prod')
+    assert table['storage'] == 'vdst' + nano8('rg-contoso-prod', 'st')
+    assert table['acr'] == 'vdacr' + nano8('rg-contoso-prod', 'acr')
+    assert table['kv'] == 'vd-kv-' + nano16('rg-contoso-prod', 'kv')
+    assert len(table['storage']) == 12 and len(table['kv']) == 22
+
+
+def test_fast_path_matches_reference_for_every_block_alignment():
+    seeds = ['', 'a', 'rg-1', 'rg-tenant', 'rg-tenant-12', 'rg-ünïcode-prod', 'x' * 37]
+    templates = [TEMPLATES['storage'], TEMPLATES['acr'], TEMPLATES['kv']]
+    columns = derive_values(seeds, templates)
+    for template, values in zip(templates, columns):
+        for seed, value in zip(seeds, values):
+            width = 5 * template.chars
+            expected = template.render(seed)[len(template.prefix):]
+            chars = ''.join('abcdefghijklmnopqrstuvwxyz234567'[(value >> s) & 31] for s in range(width - 5, -1, -5))
+            assert chars == expected, (template.key, seed)
+
+
+def test_near_miss_pairs_match_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(20) for _ in range(2000)]
+    values += [values[0] ^ (3 << 15), values[1] ^ 1]
+    brute = sorted({(min(a, b), max(a, b)) for i, a in enumerate(values)
+                    for b in values[i + 1:] if _one_apart(a, b)})
+
+    assert near_miss_pairs(values, 4) == brute
+    assert _one_apart(0b00001_00000, 0) and not _one_apart(0b00001_00001, 0)
+
+
+def test_scan_reports_duplicates_collisions_and_near_misses():
+    # Regression vectors: these fleet names derive the same ACR name, and
+    # storage names one character apart
+    inventory = ['rg-tenant0804213-prod', 'rg-tenant0897716-prod',
+                 'rg-tenant0638979-prod', 'rg-tenant0954124-prod',
+                 'rg-shared', 'rg-shared', 'rg-other']
+
+    result = scan(inventory, workers=1)
+
+    assert result.resource_groups == 7
+    assert result.duplicate_seeds == {'rg-shared': 2}
+    assert [(c.key, c.name, c.resource_groups) for c in result.collisions] == [
+        ('acr', 'vdacreucpnmxj', ['rg-tenant0804213-prod', 'rg-tenant0897716-prod'])
+    ]
+    assert [(m.key, m.names, m.resource_groups) for m in result.near_misses] == [
+        ('storage', ('vdst22p4ffen', 'vdst22p4fpen'), ('rg-tenant0638979-prod', 'rg-tenant0954124-prod'))
+    ]
+    assert not result.ok
+
+
+def test_scan_is_fast_enough_for_large_fleets():
+    inventory = [f'rg-tenant{i:06d}-prod' for i in range(20_000)]
+    start = time.perf_counter()
+    result = scan(inventory, workers=1)
+    assert time.perf_counter() - start < 5
+    assert result.ok
+
+
+def test_inventory_formats_and_cli(tmp_path, capsys):
+    text = tmp_path / 'rgs.txt'
+    text.write_text('# fleet\nrg-a\n\nrg-b\n')
+    listing = tmp_path / 'rgs.json'
+    listing.write_text(json.dumps([{'name': 'rg-a', 'location': 'eastus'}, {'name': 'rg-a'}]))
+
+    assert read_inventory(str(text)) == ['rg-a', 'rg-b']
+    assert main([str(text)]) == 0
+    assert '0 duplicate seed(s), 0 collision(s)' in capsys.readouterr().out
+    assert main([str(listing), '--all-global']) == 1
+    assert "DUPLICATE resource group 'rg-a' appears 2 times" in capsys.readouterr().out
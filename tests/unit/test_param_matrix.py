@@ -0,0 +1,125 @@
+"""Tests for the pairwise parameter matrix (fake az, no Azure needed)."""
+import itertools
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.param_matrix import (
+    MAIN_BICEP,
+    MatrixRun,
+    covering_array,
+    failures_by_value,
+    format_report,
+    matrix_factors,
+    parse_allowed_values,
+    run_matrix,
+    write_row_params
+)
+
+MAIN_TEXT = MAIN_BICEP.read_text()
+
+
+def uncovered_tuples(factors, rows, strength):
+    missing = []
+    for names in itertools.combinations(factors, strength):
+        seen = {tuple(row[n] for n in names) for row in rows}
+        missing += [(names, values) for values in itertools.product(*(factors[n] for n in names)) if values not in seen]
+    return missing
+
+
+def test_reads_allowed_sets_from_main_bicep():
+    allowed = parse_allowed_values(MAIN_TEXT)
+    assert allowed['customerAdminPrincipalType'] == ['User', 'Group']
+    assert allowed['appGwSku'] == ['WAF_v2']
+
+    factors = matrix_factors(MAIN_TEXT)
+    assert {name: len(values) for name, values in factors.items()} == {
+        'sku': 9, 'nodeSize': 3, 'jumpHostComputeTier': 9, 'psqlComputeTier': 6, 'aiServicesTier': 7
+    }
+    assert factors['sku'][-1] == 'P3v3'
+    with pytest.raises(ValueError, match='retentionDays'):
+        matrix_factors(MAIN_TEXT, ['sku', 'retentionDays'])
+
+
+def test_pairwise_covers_every_pair_with_few_rows():
+    factors = matrix_factors(MAIN_TEXT)
+
+    rows = covering_array(factors)
+
+    assert uncovered_tuples(factors, rows, 2) == []
+    # Lower bound is 9 * 9 = 81 (the two largest sets); the full product is 10,206
+    assert 81 <= len(rows) <= 100
+    assert rows == covering_array(factors)  # deterministic
+
+
+@pytest.mark.parametrize('strength', [1, 3])
+def test_n_wise_coverage(strength):
+    factors = {'a': [1, 2, 3], 'b': ['x', 'y'], 'c': [True, False], 'd': ['p', 'q', 'r']}
+
+    rows = covering_array(factors, strength)
+
+    assert uncovered_tuples(factors, rows, strength) == []
+    assert len(rows) < 3 * 2 * 2 * 3
+
+
+def test_report_ranks_values_that_always_fail():
+    runs = [
+        MatrixRun(0, {'sku': 'B1', 'nodeSize': 'Standard_D4s_v3'}, True),
+        MatrixRun(1, {'sku': 'P3v3', 'nodeSize': 'Standard_D4s_v3'}, False, 'ERROR: (SkuNotAvailable) P3v3\nmore'),
+        MatrixRun(2, {'sku': 'P3v3', 'nodeSize': 'Standard_D8s_v3'}, False, 'ERROR: (SkuNotAvailable) P3v3'),
+    ]
+
+    assert failures_by_value(runs) == {
+        ('sku', 'P3v3'): (2, 2),
+        ('nodeSize', 'Standard_D4s_v3'): (1, 2),
+        ('nodeSize', 'Standard_D8s_v3'): (1, 1),
+    }
+    lines = format_report(runs)
+    assert lines[0] == '1/3 rows passed'
+    assert lines[1].split() == ['ALWAYS', 'nodeSize=Standard_D8s_v3:', '1/1', 'runs', 'failed']
+    assert any(line.split()[:2] == ['ALWAYS', 'sku=P3v3:'] for line in lines)
+    assert lines[-1].endswith('ERROR: (SkuNotAvailable) P3v3')
+
+
+def test_run_matrix_checks_rg_once_and_runs_every_row(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['group', 'exists'], 'stdout': 'true'},
+        {'argv': ['ad', 'signed-in-user', 'show'], 'stdout': '11111111-2222-3333-4444-555555555555'},
+        {'argv': ['deployment', 'group', 'what-if'], 'stdout': json.dumps({'changes': []})},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    rows = covering_array({'sku': ['B1', 'S1'], 'nodeSize': ['Standard_D4s_v3', 'Standard_D8s_v3']})
+
+    runs = run_matrix(rows, resource_group='test-rg', max_workers=4)
+
+    assert [run.success for run in runs] == [True] * 4
+    calls = [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+    assert sum(1 for argv in calls if argv[:2] == ['group', 'exists']) == 1
+    what_ifs = [argv for argv in calls if argv[:3] == ['deployment', 'group', 'what-if']]
+    assert len(what_ifs) == 4
+    assert all(argv[argv.index('--result-format') + 1] == 'ResourceIdOnly' for argv in what_ifs)
+    # Rows carry only their overrides, so the dummy customerAdminObjectId is replaced per row
+    assert sum(1 for argv in calls if argv[:2] == ['ad', 'signed-in-user']) == 4
+
+
+def test_row_params_hold_only_overrides(tmp_path):
+    overrides = tmp_path / 'overrides.json'
+    overrides.write_text(json.dumps({'parameters': {'sku': {'value': 'B1'}, 'enableAi': {'value': False}}}))
+
+    path = write_row_params({'sku': 'S1'}, tmp_path / 'row-0.json', overrides)
+
+    assert json.loads(path.read_text()) == {'parameters': {'sku': {'value': 'S1'}, 'enableAi': {'value': False}}}
+
+
+def test_run_matrix_without_az(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    runs = run_matrix([{'sku': 'B1'}], resource_group='test-rg')
+    assert not runs[0].success
+    assert 'Azure CLI not found' in runs[0].error
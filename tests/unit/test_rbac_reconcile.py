@@ -0,0 +1,127 @@
+"""Tests for the RBAC reconciler (fake az and local stand-in, no Azure needed)."""
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from scripts.rbac_reconcile import (
+    PARAMETERS,
+    AzRoleAssignments,
+    LocalRoleAssignments,
+    deterministic_guid,
+    desired_assignments,
+    main,
+    reconcile
+)
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+
+RG = '/subscriptions/sub/resourceGroups/rg'
+PARAMS = {
+    'resource_group_id': RG,
+    'uami_principal_id': 'uami-principal',
+    'uami_id': f'{RG}/providers/Microsoft.ManagedIdentity/userAssignedIdentities/uami',
+    'law_id': f'{RG}/providers/Microsoft.OperationalInsights/workspaces/law',
+    'law_name': 'law',
+    'kv_id': f'{RG}/providers/Microsoft.KeyVault/vaults/kv',
+    'storage_id': f'{RG}/providers/Microsoft.Storage/storageAccounts/st',
+    'acr_id': f'{RG}/providers/Microsoft.ContainerRegistry/registries/acr',
+    'search_id': f'{RG}/providers/Microsoft.Search/searchServices/search',
+    'ai_id': f'{RG}/providers/Microsoft.CognitiveServices/accounts/ai',
+    'automation_id': f'{RG}/providers/Microsoft.Automation/automationAccounts/aa',
+}
+
+
+def dotnet_guid(text):
+    """System.Guid(byte[]) formatting of the PowerShell scripts' hash, spelled out."""
+    b = bytearray(hashlib.md5(text.encode()).digest())
+    b[6] = (b[6] & 0x0F) | 0x40
+    b[8] = (b[8] & 0x3F) | 0x80
+    return '-'.join([b[3::-1].hex(), b[5:3:-1].hex(), b[7:5:-1].hex(), b[8:10].hex(), b[10:].hex()])
+
+
+def test_names_match_the_powershell_scripts():
+    assert deterministic_guid(RG, 'oid', 'Reader') == dotnet_guid(f'{RG}-oid-Reader')
+
+    uami = desired_assignments('uami', PARAMS)
+    assert [a.role for a in uami][:3] == ['Contributor', 'LogAnalyticsContributor', 'KeyVaultSecretsOfficer']
+    assert len(uami) == 11
+    # Resource group and LAW names are seeded with the UAMI resource ID
+    assert uami[0].name == deterministic_guid(RG, PARAMS['uami_id'], 'Contributor')
+    assert uami[2].name == deterministic_guid(PARAMS['kv_id'], 'uami-principal', 'kv-secret-officer')
+
+    # LAW needs LAW_NAME too; the admin defaults to a User principal
+    assert len(desired_assignments('uami', {**PARAMS, 'law_name': None})) == 10
+    admin = desired_assignments('admin', {'resource_group_id': RG, 'customer_admin_object_id': 'admin-oid',
+                                          'kv_id': PARAMS['kv_id']})
+    assert [(a.role, a.principal_type) for a in admin] == [('Reader', 'User'), ('KeyVaultSecretsUser', 'User')]
+    with pytest.raises(ValueError, match='UAMI_ID is required'):
+        desired_assignments('uami', {**PARAMS, 'uami_id': ''})
+
+
+def test_reconcile_lists_each_scope_once_and_creates_only_missing(tmp_path):
+    desired = desired_assignments('uami', PARAMS)
+    by_name, by_grant = desired[3], desired[4]
+    state = tmp_path / 'assignments.json'
+    state.write_text(json.dumps([
+        {'name': by_name.name, 'scope': by_name.scope, 'principalId': 'uami-principal',
+         'roleDefinitionId': f'/x/roleDefinitions/{by_name.role_definition_id}'},
+        # Same principal and role under another name (e.g. created by hand)
+        {'name': 'other-name', 'scope': by_grant.scope, 'principalId': 'UAMI-PRINCIPAL',
+         'roleDefinitionId': f'/x/roleDefinitions/{by_grant.role_definition_id.upper()}'},
+    ]))
+    backend = LocalRoleAssignments(state)
+
+    result = reconcile(desired, backend, workers=4)
+
+    assert result.success
+    assert result.present == [by_name, by_grant]
+    assert len(result.created) == 9
+    assert backend.calls == {'list': 8, 'create': 9}
+
+    again = reconcile(desired, LocalRoleAssignments(state))
+    assert len(again.present) == 11 and again.created == []
+
+
+def test_creates_run_concurrently_through_az(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['role', 'assignment', 'list', '--scope', PARAMS['kv_id']], 'stderr': 'AuthorizationFailed',
+         'returncode': 1},
+        {'argv': ['role', 'assignment', 'list'], 'stdout': '[]'},
+        {'argv': ['role', 'assignment', 'create'], 'delay': 0.4},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    desired = desired_assignments('uami', PARAMS)
+
+    start = time.perf_counter()
+    result = reconcile(desired, AzRoleAssignments(), workers=5)
+    elapsed = time.perf_counter() - start
+
+    calls = [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+    creates = [argv for argv in calls if argv[2] == 'create']
+    assert len([argv for argv in calls if argv[2] == 'list']) == 8
+    # Nothing is created where the current state could not be listed
+    assert len(creates) == 10 and not any(PARAMS['kv_id'] in argv for argv in creates)
+    assert '--assignee-object-id' in creates[0]
+    assert elapsed < 10 * 0.4
+    assert not result.success and list(result.list_errors) == [PARAMS['kv_id']]
+
+
+def test_main_dry_run_with_state_file(tmp_path, capsys, monkeypatch):
+    for env in PARAMETERS.values():
+        monkeypatch.delenv(env, raising=False)
+    state = tmp_path / 'assignments.json'
+    args = ['admin', '--resource-group-id', RG, '--customer-admin-object-id', 'admin-oid',
+            '--customer-admin-principal-type', 'Group', '--state-file', str(state)]
+
+    assert main(args + ['--dry-run']) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == '0 present, 1 missing, 0 created, 0 failed'
+    assert not state.exists()
+    assert main(args) == 0
+    assert json.loads(state.read_text())[0]['principalType'] == 'Group'
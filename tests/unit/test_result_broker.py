@@ -0,0 +1,61 @@
+"""Tests for the cross-process what-if result broker (no Azure CLI needed)."""
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.result_broker import ResultBroker, make_key, prune_session_dirs, remove_session_dir
+
+
+def _slow_compute(cache_dir, counter_file):
+    def compute():
+        with open(counter_file, 'a') as f:
+            f.write('x')
+        time.sleep(0.2)
+        return True, '{"status": "Succeeded"}'
+    return ResultBroker(Path(cache_dir)).get_or_compute('key', compute)
+
+
+def test_result_computed_once_across_processes(tmp_path):
+    counter_file = tmp_path / 'calls.txt'
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        results = pool.starmap(_slow_compute, [(str(tmp_path / 'cache'), str(counter_file))] * 4)
+    assert results == [(True, '{"status": "Succeeded"}')] * 4
+    assert counter_file.read_text() == 'x'
+
+
+def test_failures_are_shared_too(tmp_path):
+    broker = ResultBroker(tmp_path)
+    assert broker.get_or_compute('k', lambda: (False, 'boom')) == (False, 'boom')
+    assert broker.get_or_compute('k', lambda: (True, 'unused')) == (False, 'boom')
+
+
+def test_make_key_tracks_file_content(tmp_path):
+    params = tmp_path / 'params.json'
+    params.write_text('{"a": 1}')
+    first = make_key('what-if', params, 'rg')
+    params.write_text('{"a": 2}')
+    assert make_key('what-if', params, 'rg') != first
+    assert make_key('what-if', params, 'rg') != make_key('what-if', params, 'other-rg')
+
+
+def test_finished_session_dirs_are_pruned(tmp_path):
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    names = [f'pid-{dead.pid}', f'pid-{os.getpid()}', 'a' * 32, 'b' * 32, 'locks', 'arm-rate']
+    for name in names:
+        (tmp_path / name).mkdir()
+    old = time.time() - 2 * 24 * 3600
+    os.utime(tmp_path / ('b' * 32), (old, old))
+    os.utime(tmp_path / 'locks', (old, old))
+
+    removed = prune_session_dirs(tmp_path, keep='a' * 32)
+
+    assert sorted(path.name for path in removed) == sorted([f'pid-{dead.pid}', 'b' * 32])
+    remove_session_dir(f'pid-{os.getpid()}', tmp_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(['a' * 32, 'locks', 'arm-rate'])
@@ -0,0 +1,126 @@
+"""Tests for the resource group lease pool (fake az, no Azure needed)."""
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.rg_pool import LEASE_ENV, ResourceGroupPool, main
+from tests.unit.helpers.test_utils import run_what_if
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def fake_az(tmp_path, monkeypatch, rules=()):
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [*rules, {'argv': ['group', 'show'], 'stdout': 'Succeeded\n'},
+                                       {'argv': ['group'], 'stdout': ''}], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    return lambda: [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+
+
+def make_pool(tmp_path, size=2):
+    return ResourceGroupPool('rg-ci-pabc', size, 'southeastasia', {'owner': 'ci'}, root=tmp_path / 'pool')
+
+
+def test_slots_are_created_tagged_and_leased_exclusively(tmp_path, monkeypatch):
+    calls = fake_az(tmp_path, monkeypatch)
+    pool = make_pool(tmp_path)
+    assert pool.lease() is None
+
+    assert pool.maintain() == ['READY slot 0: rg-ci-pabc-00-g0', 'READY slot 1: rg-ci-pabc-01-g0']
+    create = calls()[0]
+    assert create[:4] == ['group', 'create', '--name', 'rg-ci-pabc-00-g0']
+    assert {'owner=ci', 'rg-pool=rg-ci-pabc', 'rg-pool-slot=0'} <= set(create)
+
+    first, second = pool.lease(), pool.lease()
+    assert {first.resource_group, second.resource_group} == {'rg-ci-pabc-00-g0', 'rg-ci-pabc-01-g0'}
+    assert pool.lease() is None
+    assert second.release() is False
+    assert first.release() is False
+    assert pool.maintain() == []
+    # Released slots are leased again as they are, after a health check
+    again = [pool.lease(), pool.lease()]
+    assert {lease.resource_group for lease in again} == {'rg-ci-pabc-00-g0', 'rg-ci-pabc-01-g0'}
+    assert [argv[1] for argv in calls()] == ['create', 'create'] + ['show'] * 6
+
+
+def test_broken_groups_are_recycled_in_the_background(tmp_path, monkeypatch):
+    gone = {'argv': ['group', 'show', '--name', 'rg-ci-pabc-00-g0'],
+            'stderr': "ERROR: (ResourceGroupNotFound) Resource group 'rg-ci-pabc-00-g0' could not be found.",
+            'returncode': 3}
+    calls = fake_az(tmp_path, monkeypatch, [gone])
+    pool = make_pool(tmp_path)
+    pool.maintain()
+
+    # The deleted group's slot is marked missing and the worker gets the other slot
+    lease = pool.lease()
+    assert lease.resource_group == 'rg-ci-pabc-01-g0' and pool.needs_maintenance
+    assert pool.read_state(0)['state'] == 'missing'
+
+    # Maintenance creates the next generation and deletes the old one without waiting;
+    # the leased slot is left alone
+    assert pool.maintain() == ['READY slot 0: rg-ci-pabc-00-g1']
+    assert calls()[-2][:4] == ['group', 'create', '--name', 'rg-ci-pabc-00-g1']
+    assert calls()[-1][:6] == ['group', 'delete', '--name', 'rg-ci-pabc-00-g0', '--yes', '--no-wait']
+    assert pool.lease().resource_group == 'rg-ci-pabc-00-g1'
+
+
+def test_maintenance_recycles_idle_unprovisioned_groups(tmp_path, monkeypatch):
+    calls = fake_az(tmp_path, monkeypatch, [{'argv': ['group', 'show', '--name', 'rg-ci-pabc-00-g0'],
+                                             'stdout': 'Failed\n'}])
+    pool = make_pool(tmp_path, size=1)
+    pool.maintain()
+
+    assert pool.maintain() == ['READY slot 0: rg-ci-pabc-00-g1']
+    assert calls()[-1][:6] == ['group', 'delete', '--name', 'rg-ci-pabc-00-g0', '--yes', '--no-wait']
+    # The new generation is healthy, so the next run leaves it as it is
+    assert pool.maintain() == []
+
+
+def test_crashed_holder_frees_its_slot(tmp_path, monkeypatch):
+    calls = fake_az(tmp_path, monkeypatch)
+    pool = make_pool(tmp_path, size=1)
+    pool.maintain()
+
+    crash = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {str(PROJECT_ROOT)!r})
+        from tests.unit.helpers.rg_pool import ResourceGroupPool
+        lease = ResourceGroupPool('rg-ci-pabc', 1, 'southeastasia', root={str(tmp_path / 'pool')!r}).lease()
+        print(lease.resource_group, flush=True)
+        os._exit(1)
+    """)
+    result = subprocess.run([sys.executable, '-c', crash], capture_output=True, text=True)
+    assert result.stdout.strip() == 'rg-ci-pabc-00-g0'
+
+    # The OS dropped the crashed holder's lock
+    assert pool.lease().resource_group == 'rg-ci-pabc-00-g0'
+    assert [argv[1] for argv in calls()] == ['create', 'show', 'show']
+
+
+def test_failed_create_keeps_the_slot_missing(tmp_path, monkeypatch, capsys):
+    fake_az(tmp_path, monkeypatch, [{'argv': ['group', 'create', '--name', 'rg-ci-pabc-01-g0'],
+                                     'stderr': '(QuotaExceeded) too many resource groups', 'returncode': 1}])
+    args = ['--pool', 'rg-ci-pabc', '--size', '2', '--location', 'southeastasia', '--root', str(tmp_path / 'pool')]
+
+    assert main(['maintain', *args]) == 1
+    assert main(['status', *args]) == 0
+    assert capsys.readouterr().out.splitlines()[-2:] == ['slot 0: ready    rg-ci-pabc-00-g0', 'slot 1: missing  -']
+
+
+def test_what_if_targets_the_leased_group(tmp_path, monkeypatch):
+    calls = fake_az(tmp_path, monkeypatch, [{'argv': ['deployment', 'group', 'what-if'], 'stdout': '{"changes": []}'}])
+    monkeypatch.setenv(LEASE_ENV, 'rg-ci-pabc-01-g3')
+
+    success, _ = run_what_if(FIXTURES_DIR / 'test-dns.bicep')
+
+    assert success
+    # No existence check or create for the pool group; the what-if goes to it
+    assert [argv[:3] for argv in calls()] == [['deployment', 'group', 'what-if']]
+    assert calls()[0][calls()[0].index('--resource-group') + 1] == 'rg-ci-pabc-01-g3'
@@ -0,0 +1,175 @@
+"""Tests for the SKU availability index (recorded listings, no Azure needed)."""
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.sku_index import (
+    PSQL,
+    VM,
+    RecordedSkuSource,
+    SkuCache,
+    blocked_modules,
+    main,
+    parse_psql_listing,
+    parse_vm_listing,
+    preflight,
+    requested_skus
+)
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+ALLOWED = {
+    'jumpHostComputeTier': ['Standard_A1_v2', 'Standard_B1s', 'Standard_B2s', 'Standard_B2ms', 'Standard_D2ds_v4'],
+    'psqlComputeTier': ['Standard_B1ms', 'Standard_B2s', 'GP_Standard_D2s_v3'],
+}
+
+
+def vm_sku(name, vcpus, memory, region, restricted=False, restricted_zones=()):
+    restrictions = []
+    if restricted:
+        restrictions.append({'type': 'Location', 'reasonCode': 'NotAvailableForSubscription', 'values': [region],
+                             'restrictionInfo': {'locations': [region], 'zones': None}})
+    if restricted_zones:
+        restrictions.append({'type': 'Zone', 'reasonCode': 'NotAvailableForSubscription', 'values': [region],
+                             'restrictionInfo': {'locations': [region], 'zones': list(restricted_zones)}})
+    return {'resourceType': 'virtualMachines', 'name': name, 'locations': [region],
+            'locationInfo': [{'location': region, 'zones': ['1', '2', '3']}], 'restrictions': restrictions,
+            'capabilities': [{'name': 'vCPUs', 'value': str(vcpus)}, {'name': 'MemoryGB', 'value': str(memory)}]}
+
+
+def psql_listing(restricted=False, disabled=()):
+    skus = [{'name': name, 'vCores': vcores, 'supportedMemoryPerVcoreMb': memory, 'supportedZones': ['1'],
+             'status': 'Disabled' if name in disabled else 'Available'}
+            for name, vcores, memory in (('Standard_B1ms', 1, 2048), ('Standard_B2s', 2, 2048),
+                                         ('Standard_D2s_v3', 2, 4096))]
+    return [{'name': 'FlexibleServerCapabilities', 'restricted': 'Enabled' if restricted else 'Disabled',
+             'supportedServerEditions': [{'name': 'Burstable', 'supportedServerSkus': skus}]}]
+
+
+def location(name, latitude, longitude):
+    return {'name': name, 'metadata': {'regionType': 'Physical', 'latitude': str(latitude),
+                                       'longitude': str(longitude)}}
+
+
+def record_listings(directory):
+    """southeastasia restricts D2ds_v4 and all of PostgreSQL; eastasia has both."""
+    directory.mkdir()
+    (directory / 'vm-southeastasia.json').write_text(json.dumps([
+        vm_sku('Standard_B2s', 2, 4, 'southeastasia', restricted_zones=['2']),
+        vm_sku('Standard_B2ms', 2, 8, 'southeastasia'),
+        vm_sku('Standard_A1_v2', 1, 2, 'southeastasia'),
+        vm_sku('Standard_D2ds_v4', 2, 8, 'southeastasia', restricted=True),
+    ]))
+    (directory / 'psql-southeastasia.json').write_text(json.dumps(psql_listing(restricted=True)))
+    for region in ('eastasia', 'australiaeast', 'japaneast'):
+        (directory / f'vm-{region}.json').write_text(json.dumps([vm_sku('Standard_D2ds_v4', 2, 8, region)]))
+        (directory / f'psql-{region}.json').write_text(json.dumps(psql_listing(disabled=('Standard_B1ms',)
+                                                                                if region == 'japaneast' else ())))
+    (directory / 'locations.json').write_text(json.dumps([
+        location('southeastasia', 1.283, 103.833), location('eastasia', 22.267, 114.188),
+        location('australiaeast', -33.86, 151.2094), location('japaneast', 35.68, 139.77),
+        location('westeurope', 52.3667, 4.9), {'name': 'asia', 'metadata': {'regionType': 'Logical'}},
+    ]))
+    return directory
+
+
+class CountingSource(RecordedSkuSource):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.calls = []
+
+    def listing(self, kind, region, subscription):
+        self.calls.append((kind, region))
+        return super().listing(kind, region, subscription)
+
+
+def test_listings_are_parsed_into_availability():
+    vm = parse_vm_listing([vm_sku('Standard_B2s', 2, 4, 'southeastasia', restricted_zones=['2']),
+                           vm_sku('Standard_D2ds_v4', 2, 8, 'southeastasia', restricted=True),
+                           {'resourceType': 'disks', 'name': 'Premium_LRS'}], 'southeastasia')
+    assert sorted(vm) == ['standard_b2s', 'standard_d2ds_v4']
+    assert vm['standard_b2s'].available and vm['standard_b2s'].zones == ['1', '3']
+    assert not vm['standard_d2ds_v4'].available and vm['standard_d2ds_v4'].reason == 'NotAvailableForSubscription'
+
+    psql = parse_psql_listing(psql_listing(disabled=('Standard_B2s',)))
+    assert psql['standard_d2s_v3'].memory_gb == 8 and psql['standard_d2s_v3'].available
+    assert psql['standard_b2s'].reason == 'Disabled'
+    assert all(entry.reason == 'SubscriptionRestricted' for entry in parse_psql_listing(psql_listing(True)).values())
+
+
+def test_preflight_suggests_closest_sku_then_nearest_regions(tmp_path):
+    cache = SkuCache(RecordedSkuSource(record_listings(tmp_path / 'recorded')), cache_dir=tmp_path / 'cache')
+    requests = requested_skus({'jumpHostComputeTier': {'value': 'Standard_D2ds_v4'},
+                               'psqlComputeTier': {'value': 'GP_Standard_D2s_v3'}})
+
+    success, checks = preflight(requests, 'sub', 'southeastasia', cache, ALLOWED)
+
+    assert success
+    by_param = {check.param: check for check in checks}
+    jump = by_param['jumpHostComputeTier']
+    assert not jump.available and jump.suggestion == 'Standard_B2ms' and jump.regions == []
+    # No PostgreSQL SKU at all in southeastasia: regions by distance, where the SKU is offered
+    psql = by_param['psqlComputeTier']
+    assert psql.suggestion is None and psql.regions == ['eastasia', 'japaneast', 'australiaeast']
+    assert psql.modules == ['psql']
+    # The jump host wrapper pins Standard_B2s, which is available
+    assert by_param['vm-jumphost vmSize'].available
+    assert blocked_modules(checks) == {'psql': psql.describe()}
+
+
+def test_index_is_cached_on_disk_until_the_ttl(tmp_path):
+    recorded = record_listings(tmp_path / 'recorded')
+    source = CountingSource(recorded)
+    SkuCache(source, cache_dir=tmp_path / 'cache').get('sub', 'southeastasia')
+
+    success, index = SkuCache(source, cache_dir=tmp_path / 'cache').get('sub', 'southeastasia')
+    assert success and source.calls == [(VM, 'southeastasia'), (PSQL, 'southeastasia')]
+    assert index.lookup(PSQL, 'GP_Standard_D2s_v3').name == 'Standard_D2s_v3'
+    assert index.lookup(VM, 'standard_b2ms').available
+    assert index.lookup(VM, 'Standard_E64s_v5').reason == 'NotListed'
+    assert (tmp_path / 'cache' / 'sub' / 'southeastasia.json').exists()
+
+    expired = SkuCache(source, cache_dir=tmp_path / 'cache', ttl=0)
+    expired.get('sub', 'southeastasia')
+    expired.get('sub', 'southeastasia')
+    assert len(source.calls) == 4
+
+
+def test_cold_cache_is_listed_once_across_processes(tmp_path):
+    recorded = record_listings(tmp_path / 'recorded')
+    fill = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {str(PROJECT_ROOT)!r})
+        from tests.unit.helpers.sku_index import RecordedSkuSource, SkuCache
+
+        class SlowSource(RecordedSkuSource):
+            def listing(self, kind, region, subscription):
+                with open({str(tmp_path / 'listings.txt')!r}, 'a') as log:
+                    log.write(kind + '\\n')
+                time.sleep(0.2)
+                return super().listing(kind, region, subscription)
+
+        cache = SkuCache(SlowSource({str(recorded)!r}), cache_dir={str(tmp_path / 'cache')!r})
+        print(cache.get({tmp_path.name!r}, 'southeastasia')[0])
+    """)
+    workers = [subprocess.Popen([sys.executable, '-c', fill], stdout=subprocess.PIPE, text=True) for _ in range(3)]
+
+    assert [worker.communicate()[0].strip() for worker in workers] == ['True'] * 3
+    assert (tmp_path / 'listings.txt').read_text().split() == [VM, PSQL]
+
+
+def test_main_offline(tmp_path, capsys):
+    recorded = record_listings(tmp_path / 'recorded')
+    params = tmp_path / 'params.json'
+    params.write_text(json.dumps({'parameters': {'jumpHostComputeTier': {'value': 'Standard_B2ms'}}}))
+
+    args = ['--params', str(params), '--listing-dir', str(recorded), '--subscription', 'sub',
+            '--cache-dir', str(tmp_path / 'cache')]
+    assert main(args + ['--region', 'southeastasia', '--refresh']) == 0
+    assert main(args + ['--region', 'westeurope', '--refresh']) == 1
+    assert 'ERROR vm SKU listing for westeurope failed' in capsys.readouterr().out
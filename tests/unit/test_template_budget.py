@@ -0,0 +1,162 @@
+"""Tests for the compiled template budget analyzer (fake az, no Azure needed)."""
+import io
+import json
+import sys
+import tarfile
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.template_budget import (
+    LIMITS,
+    analyze,
+    build_commit_snapshot,
+    commit_id,
+    compare_snapshots,
+    extract_archive,
+    format_report,
+    limit_warnings,
+    main,
+    snapshot
+)
+
+GATEWAY_JSON = Path(__file__).parent / 'fixtures' / 'test-gateway.json'
+
+
+def deployment(template):
+    return {'type': 'Microsoft.Resources/deployments', 'properties': {'template': template}}
+
+
+def test_analyze_compiled_wrapper():
+    stats = snapshot(analyze(json.loads(GATEWAY_JSON.read_text())))
+
+    assert list(stats) == ['main', 'main/naming', 'main/publicIp', 'main/wafPolicy', 'main/gateway']
+    root = stats['main']
+    assert root['nested_depth'] == 1 and stats['main/gateway']['nested_depth'] == 0
+    assert root['bytes'] > sum(stats[p]['bytes'] for p in stats if p != 'main')
+    assert root['expressions'] >= sum(stats[p]['expressions'] for p in stats if p != 'main')
+    assert stats['main/naming']['outputs'] == 1
+
+
+def test_analyze_counts_expressions_copies_and_depth():
+    leaf = {'resources': [{'type': 'Microsoft.Network/publicIPAddresses', 'copy': {'count': 3}}],
+            'outputs': {'id': {'value': "[resourceId('x', 'y')]"}}}
+    template = {
+        'parameters': {'a': {}, 'b': {}},
+        'variables': {'literal': '[[not an expression]', 'expr': "[concat('a', 'b')]"},
+        'resources': {'mid': deployment({'resources': {'leaf': deployment(leaf)}})}
+    }
+
+    stats = snapshot(analyze(template))
+
+    assert list(stats) == ['main', 'main/mid', 'main/mid/leaf']
+    assert stats['main']['nested_depth'] == 2 and stats['main/mid/leaf']['depth'] == 2
+    assert stats['main']['expressions'] == 2
+    assert stats['main']['longest_expression'] == len("[resourceId('x', 'y')]")
+    assert stats['main/mid/leaf']['resources'] == 3
+    assert stats['main']['parameters'] == 2 and stats['main']['resources'] == 1
+
+
+def test_limits_and_growth_are_flagged():
+    crowded = {'parameters': {f'p{i}': {} for i in range(210)}, 'resources': []}
+    assert limit_warnings(snapshot(analyze(crowded))) == [
+        f"main: parameters 210 of {LIMITS['parameters']} (82% of the ARM limit)"
+    ]
+
+    before = {'main': {'bytes': 50_000, 'nested_depth': 1, 'depth': 0},
+              'main/kv': {'bytes': 2_000, 'nested_depth': 0, 'depth': 1},
+              'main/dns': {'bytes': 5_000, 'nested_depth': 0, 'depth': 1}}
+    after = {'main': {'bytes': 52_000, 'nested_depth': 2, 'depth': 0},
+             'main/kv': {'bytes': 2_900, 'nested_depth': 0, 'depth': 1},
+             'main/dns': {'bytes': 6_500, 'nested_depth': 1, 'depth': 1},
+             'main/new': {'bytes': 9_000, 'nested_depth': 0, 'depth': 1}}
+
+    # kv grew 45% but by less than MIN_GROWTH_BYTES; main grew 4%
+    assert compare_snapshots(before, after) == [
+        'main: nested depth 1 -> 2',
+        'main/dns: 5,000 -> 6,500 bytes (+30%)',
+        'main/dns: nested depth 0 -> 1',
+    ]
+
+
+def test_report_shows_share_delta_and_headroom():
+    current = snapshot(analyze(json.loads(GATEWAY_JSON.read_text())))
+    previous = {path: dict(figures) for path, figures in current.items() if path != 'main/gateway'}
+    previous['main']['bytes'] -= 100
+
+    lines = format_report(current, previous)
+
+    assert lines[1].split()[:4] == ['main', f"{current['main']['bytes']:,}", '100%', '+100']
+    assert lines[5].split()[0] == 'gateway' and lines[5].split()[3] == 'new'
+    assert any(line.split()[0] == 'outputs' and line.endswith('headroom)') for line in lines)
+
+
+def test_base_commit_is_built_from_git_archive_once(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['bicep', 'build'], 'stdout': GATEWAY_JSON.read_text()},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    head = commit_id()
+
+    first = build_commit_snapshot(head, tmp_path / 'budget')
+    second = build_commit_snapshot(head, tmp_path / 'budget')
+
+    calls = [json.loads(line)['argv'] for line in log_file.read_text().splitlines()]
+    assert len(calls) == 1
+    built = Path(calls[0][3])
+    assert built.parts[-2:] == ('iac', 'main.bicep') and not built.is_relative_to(Path(__file__).parents[2])
+    assert first == second and (tmp_path / 'budget' / f'{head}.json').exists()
+
+
+def test_main_exit_code(tmp_path, capsys):
+    small = tmp_path / 'small.json'
+    small.write_text(GATEWAY_JSON.read_text())
+    crowded = tmp_path / 'crowded.json'
+    crowded.write_text(json.dumps({'outputs': {f'o{i}': {} for i in range(60)}}))
+
+    assert main(['--template', str(small), '--no-base']) == 0
+    assert main(['--template', str(crowded), '--no-base']) == 1
+    assert 'LIMIT main: outputs 60 of 64' in capsys.readouterr().out
+
+
+class NoFilterTarFile(tarfile.TarFile):
+    """TarFile as on Pythons without extraction filters."""
+
+    def extractall(self, path='.', members=None, *, numeric_owner=False, **kwargs):
+        if kwargs:
+            raise TypeError(f"extractall() got an unexpected keyword argument {next(iter(kwargs))!r}")
+        super().extractall(path, members, numeric_owner=numeric_owner, filter='fully_trusted')
+
+
+def make_tar(entries):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w') as tar:
+        for name, kind, target in entries:
+            info = tarfile.TarInfo(name)
+            if kind == 'file':
+                info.size = len(target)
+                tar.addfile(info, io.BytesIO(target))
+            else:
+                info.type, info.linkname = kind, target
+                tar.addfile(info)
+    data.seek(0)
+    return data
+
+
+def test_extract_archive_checks_paths_without_tar_filters(tmp_path):
+    safe = make_tar([('iac/main.bicep', 'file', b'param x string'), ('iac/link.bicep', tarfile.SYMTYPE, 'main.bicep')])
+    with NoFilterTarFile.open(fileobj=safe) as tar:
+        extract_archive(tar, str(tmp_path / 'ok'))
+    assert (tmp_path / 'ok' / 'iac' / 'link.bicep').read_text() == 'param x string'
+
+    for entries in ([('../evil', 'file', b'x')], [('/abs/evil', 'file', b'x')],
+                    [('iac/up', tarfile.SYMTYPE, '../../outside')], [('iac/hard', tarfile.LNKTYPE, '../outside')],
+                    [('iac/dev', tarfile.CHRTYPE, '')]):
+        with NoFilterTarFile.open(fileobj=make_tar(entries)) as tar:
+            with pytest.raises(tarfile.TarError):
+                extract_archive(tar, str(tmp_path / 'bad'))
+    assert not (tmp_path / 'evil').exists() and not (tmp_path / 'bad').exists()
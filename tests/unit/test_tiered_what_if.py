@@ -0,0 +1,125 @@
+"""Tests for tiered (ResourceIdOnly first) what-if results (no Azure CLI needed)."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.tiered_what_if import FULL, ID_ONLY, TieredWhatIf, run_escalating
+from tests.unit.helpers.what_if_parser import summarize, validate_no_deletions
+
+RG_ID = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/test-rg/providers'
+KV_ID = f'{RG_ID}/Microsoft.KeyVault/vaults/vd-kv-x'
+ST_ID = f'{RG_ID}/Microsoft.Storage/storageAccounts/vdstabc12345'
+
+ID_ONLY_OUTPUT = json.dumps({
+    'status': 'Succeeded',
+    'changes': [
+        {'resourceId': KV_ID, 'changeType': 'Create'},
+        {'resourceId': ST_ID, 'changeType': 'Modify'}
+    ]
+})
+
+FULL_OUTPUT = json.dumps({
+    'status': 'Succeeded',
+    'changes': [
+        {'resourceId': KV_ID, 'changeType': 'Create', 'after': {'name': 'vd-kv-x'}},
+        {
+            'resourceId': ST_ID.upper(),
+            'changeType': 'Modify',
+            'before': {'name': 'vdstabc12345'},
+            'after': {'name': 'vdstabc12345'},
+            'delta': [{'path': 'properties.minimumTlsVersion', 'propertyChangeType': 'Modify'}]
+        }
+    ]
+})
+
+
+class FakeRun:
+    """Records requested result formats and returns canned output per format."""
+
+    def __init__(self, full=(True, FULL_OUTPUT)):
+        self.formats = []
+        self.full = full
+
+    def __call__(self, result_format):
+        self.formats.append(result_format)
+        return (True, ID_ONLY_OUTPUT) if result_format == ID_ONLY else self.full
+
+
+def test_id_only_checks_do_not_fetch_full_payloads():
+    run = FakeRun()
+    tiered = TieredWhatIf(run)
+    parsed = tiered.parsed()
+
+    assert tiered.success
+    assert parsed['status'] == 'Succeeded'
+    assert validate_no_deletions(parsed['resource_changes']) == []
+    assert [c['change_type'] for c in parsed['resource_changes']] == ['Create', 'Modify']
+    assert summarize(json.loads(tiered.output)['changes']) == {'Create': 1, 'Modify': 1, 'Delete': 0, 'NoChange': 0}
+    assert run.formats == [ID_ONLY]
+    assert tiered.full_payload_runs == 0
+
+
+def test_payload_access_fetches_full_payloads_once():
+    run = FakeRun()
+    tiered = TieredWhatIf(run)
+    kv, storage = tiered.parsed()['resource_changes']
+
+    assert kv['after'] == {'name': 'vd-kv-x'}
+    assert kv.get('delta') == []
+    # Resource IDs are matched case-insensitively
+    assert storage['delta'][0]['path'] == 'properties.minimumTlsVersion'
+    assert storage.get('before') == {'name': 'vdstabc12345'}
+    assert run.formats == [ID_ONLY, FULL]
+    assert tiered.full_payload_runs == 1
+
+
+def test_every_access_path_sees_full_payloads():
+    for access in (lambda c: 'delta' in c, lambda c: dict(c.items()), lambda c: dict(c), lambda c: c.copy(),
+                   lambda c: {**c}, lambda c: list(c.values())):
+        run = FakeRun()
+        storage = TieredWhatIf(run).parsed()['resource_changes'][1]
+        access(storage)
+        assert run.formats == [ID_ONLY, FULL]
+
+    storage = TieredWhatIf(FakeRun()).parsed()['resource_changes'][1]
+    assert 'after' in storage
+    assert dict(storage.items())['delta'][0]['path'] == 'properties.minimumTlsVersion'
+    assert dict(storage) == {'resource_id': ST_ID, 'change_type': 'Modify', 'before': {'name': 'vdstabc12345'},
+                             'after': {'name': 'vdstabc12345'},
+                             'delta': [{'path': 'properties.minimumTlsVersion', 'propertyChangeType': 'Modify'}]}
+    assert sorted(storage) == ['after', 'before', 'change_type', 'delta', 'resource_id']
+
+
+def test_full_payload_failure_raises():
+    tiered = TieredWhatIf(FakeRun(full=(False, 'ERROR: (Throttled) too many requests')))
+    change = tiered.parsed()['resource_changes'][0]
+
+    with pytest.raises(RuntimeError, match='Throttled'):
+        change['after']
+
+
+def test_existing_resources_escalate_to_full_payloads():
+    deploy_output = json.dumps({'status': 'Succeeded', 'changes': [
+        {'resourceId': KV_ID, 'changeType': 'Create'}, {'resourceId': ST_ID, 'changeType': 'Deploy'}]})
+    formats = []
+
+    def run(result_format):
+        formats.append(result_format)
+        return (True, deploy_output) if result_format == ID_ONLY else (True, FULL_OUTPUT)
+
+    tiered = TieredWhatIf(run)
+    storage = tiered.parsed()['resource_changes'][1]
+
+    # 'Deploy' hides Modify/NoChange, so the full result replaces it straight away
+    assert summarize(json.loads(tiered.output)['changes']) == {'Create': 1, 'Modify': 1, 'Delete': 0, 'NoChange': 0}
+    assert storage['change_type'] == 'Modify' and storage['delta'][0]['path'] == 'properties.minimumTlsVersion'
+    assert formats == [ID_ONLY, FULL] and tiered.full_payload_runs == 1
+
+    formats.clear()
+    assert run_escalating(run) == (True, FULL_OUTPUT) and formats == [ID_ONLY, FULL]
+    assert run_escalating(FakeRun()) == (True, ID_ONLY_OUTPUT)
@@ -0,0 +1,129 @@
+"""Tests for span tracing and the Chrome trace export (fake az, no Azure needed)."""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers import tracing
+from tests.unit.helpers.az_cassette import az_span_name
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.test_utils import run_what_if
+
+WRAPPER = Path(__file__).parent / 'fixtures' / 'test-kv.bicep'
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / 'trace.json'
+    previous = tracing._tracer  # HARNESS_TRACE may be tracing this very run
+    tracing.enable(path)
+    yield path
+    tracing.disable()
+    tracing._tracer = previous
+
+
+def complete_events(path):
+    return [e for e in json.loads(path.read_text())['traceEvents'] if e['ph'] == 'X']
+
+
+def contains(outer, inner):
+    return (outer['tid'] == inner['tid'] and outer['ts'] <= inner['ts']
+            and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'])
+
+
+def test_nested_spans_export_chrome_trace_events(trace_file):
+    def worker():
+        with tracing.span('worker', n=1):
+            time.sleep(0.01)
+
+    with tracing.span('outer', module='kv') as outer:
+        with tracing.span('inner'):
+            time.sleep(0.01)
+        outer.set(payload_bytes=123, path=Path('x'))
+    thread = threading.Thread(target=worker, name='pool-1')
+    thread.start()
+    thread.join()
+    with pytest.raises(RuntimeError):
+        with tracing.span('failing'):
+            raise RuntimeError('boom')
+    tracing.flush()
+
+    trace = json.loads(trace_file.read_text())
+    events = {e['name']: e for e in trace['traceEvents'] if e['ph'] == 'X'}
+    assert events['outer']['args'] == {'module': 'kv', 'payload_bytes': 123, 'path': 'x'}
+    assert contains(events['outer'], events['inner'])
+    assert events['worker']['tid'] != events['outer']['tid']
+    assert events['failing']['args'] == {'error': 'RuntimeError'}
+    thread_names = {e['args']['name'] for e in trace['traceEvents'] if e['name'] == 'thread_name'}
+    assert 'pool-1' in thread_names
+
+
+def test_flush_merges_events_from_several_writers(trace_file):
+    with tracing.span('first'):
+        pass
+    tracing.flush()
+    other = tracing.Tracer(trace_file, 'gw1')
+    tracing.Span(other, 'second', 'harness', {}).end()
+    other.flush()
+
+    assert [e['name'] for e in complete_events(trace_file)] == ['first', 'second']
+
+
+def test_disabled_tracing_is_a_shared_noop(monkeypatch):
+    monkeypatch.setattr(tracing, '_tracer', None)
+    assert tracing.span('a', module='kv') is tracing.span('b')
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        with tracing.span('hot', module='kv') as s:
+            s.set(payload_bytes=1)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_az_span_name_stops_at_first_option():
+    assert az_span_name(['az', 'deployment', 'group', 'what-if', '--name', 'x']) == 'az deployment group what-if'
+    assert az_span_name(['az', 'deployment', 'operation', 'group', 'list', '-g', 'rg']) == \
+        'az deployment operation group list'
+
+
+def test_run_what_if_phases_are_traced(trace_file, tmp_path, monkeypatch):
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['group', 'exists'], 'stdout': 'true'},
+        {'argv': ['ad', 'signed-in-user', 'show'], 'stdout': 'deployer-oid\n'},
+        {'argv': ['deployment', 'group', 'what-if'], 'stdout': json.dumps({'changes': []})},
+    ])
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+
+    success, output = run_what_if(WRAPPER, resource_group='test-rg')
+    tracing.flush()
+
+    assert success, output
+    events = {e['name']: e for e in complete_events(trace_file)}
+    root = events['run_what_if']
+    assert root['args']['module'] == 'test-kv'
+    assert root['args']['resource_group'] == 'test-rg'
+    assert root['args']['payload_bytes'] == len(output)
+    for name in ['ensure_resource_group', 'az group exists', 'merge_params',
+                 'az deployment group what-if', 'strip_cli_warnings']:
+        assert contains(root, events[name]), name
+    assert events['az deployment group what-if']['cat'] == 'az'
+    assert events['az deployment group what-if']['args']['returncode'] == 0
+
+
+def test_merge_params_span_ends_when_the_merge_raises(trace_file, tmp_path):
+    broken = tmp_path / 'params.json'
+    broken.write_text('{"parameters": ')
+
+    with pytest.raises(ValueError):
+        run_what_if(WRAPPER, broken, resource_group='test-rg', ensure_rg_exists=False)
+    tracing.flush()
+
+    events = {e['name']: e for e in complete_events(trace_file)}
+    assert events['merge_params']['args']['error'] == 'JSONDecodeError'
+    assert contains(events['run_what_if'], events['merge_params'])
@@ -0,0 +1,94 @@
+"""Tests for customerIpRanges compaction (no Azure CLI needed)."""
+import ipaddress
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.waf_ranges import (
+    MAX_MATCH_VALUES_PER_RULE,
+    compact_ip_ranges,
+    compact_params,
+    main
+)
+
+WAF_POLICY_BICEP = Path(__file__).parent.parent.parent / 'iac' / 'modules' / 'waf-policy.bicep'
+
+
+def covered(ranges):
+    return {int(a) for r in ranges for a in ipaddress.ip_network(r, strict=False)}
+
+
+def test_chunk_size_matches_waf_policy_bicep():
+    assert f'var maxMatchValuesPerRule = {MAX_MATCH_VALUES_PER_RULE}' in WAF_POLICY_BICEP.read_text()
+
+
+def test_collapses_duplicates_overlaps_and_adjacent_ranges():
+    result = compact_ip_ranges([
+        '203.0.113.0/25',
+        '203.0.113.128/25',   # adjacent: together a /24
+        '203.0.113.7',        # inside the /24
+        '198.51.100.0/24',
+        '198.51.100.0/24',    # duplicate
+        '198.51.100.10/32',
+        '2001:db8::/33',
+        '2001:db8:8000::/33',
+    ])
+
+    assert result.ranges == ['198.51.100.0/24', '203.0.113.0/24', '2001:db8::/32']
+    assert result.original_count == 8
+    assert result.saved == 5
+    assert result.chunks == [result.ranges]
+
+
+def test_never_changes_covered_addresses():
+    rng = random.Random(38)
+    ranges = [f'10.0.{rng.randrange(4)}.{rng.randrange(256)}/{rng.choice([28, 30, 32])}' for _ in range(300)]
+
+    result = compact_ip_ranges(ranges)
+
+    assert covered(result.ranges) == covered(ranges)
+    assert len(result.ranges) < len(set(ranges))
+
+
+def test_splits_into_rule_sized_chunks():
+    ranges = [f'10.{i // 256}.{i % 256}.1' for i in range(1300)]  # non-adjacent /32s
+
+    result = compact_ip_ranges(ranges)
+
+    assert [len(chunk) for chunk in result.chunks] == [600, 600, 100]
+    assert sum(result.chunks, []) == result.ranges
+
+
+def test_rejects_invalid_entries_and_too_many_rules():
+    with pytest.raises(ValueError, match="'not-an-ip'"):
+        compact_ip_ranges(['10.0.0.0/24', 'not-an-ip'])
+    with pytest.raises(ValueError, match='allow rules'):
+        compact_ip_ranges([f'10.0.{i // 128}.{(i % 128) * 2}' for i in range(400)], chunk_size=4)
+
+
+def test_compact_params_rewrites_value_only():
+    parameters = {
+        'customerIpRanges': {'value': ['10.0.0.0/25', '10.0.0.128/25']},
+        'location': {'value': 'eastus'}
+    }
+
+    result = compact_params(parameters)
+
+    assert result.saved == 1
+    assert parameters['customerIpRanges'] == {'value': ['10.0.0.0/24']}
+    assert compact_params({'location': {'value': 'eastus'}}) is None
+
+
+def test_cli_reports_savings_and_writes(tmp_path, capsys):
+    params_file = tmp_path / 'params.json'
+    params_file.write_text(json.dumps({'parameters': {'customerIpRanges': {'value': ['10.0.0.1', '10.0.0.1/32']}}}))
+
+    assert main([str(params_file), '--write']) == 0
+    assert 'customerIpRanges: 2 -> 1 ranges (saved 1' in capsys.readouterr().out
+    assert json.loads(params_file.read_text())['parameters']['customerIpRanges']['value'] == ['10.0.0.1/32']
@@ -0,0 +1,133 @@
+"""Tests for watch mode (fake az, no Azure needed)."""
+import json
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.watch import (
+    FIXTURES_DIR,
+    MAIN_BICEP,
+    REPO_ROOT,
+    PollingWatcher,
+    WhatIfQueue,
+    affected_roots,
+    validate_batch,
+    wrapper_files
+)
+
+MODULES_DIR = REPO_ROOT / 'iac' / 'modules'
+ROOTS = wrapper_files() + [MAIN_BICEP]
+
+
+def names(paths):
+    return [p.name for p in paths]
+
+
+def test_affected_roots_follow_module_references():
+    assert names(affected_roots([MODULES_DIR / 'waf-policy.bicep'], ROOTS)) == [
+        'test-gateway.bicep', 'test-waf-policy.bicep', 'main.bicep'
+    ]
+    # secrets.bicep is only used through other wrappers
+    assert names(affected_roots([MODULES_DIR / 'secrets.bicep'], ROOTS)) == [
+        'test-psql.bicep', 'test-vm-jumphost.bicep', 'main.bicep'
+    ]
+    assert names(affected_roots([FIXTURES_DIR / 'test-kv.bicep'], ROOTS)) == ['test-kv.bicep']
+    assert len(affected_roots([REPO_ROOT / 'iac' / 'lib' / 'naming.bicep'], ROOTS)) > 10
+
+
+def test_watcher_debounces_a_burst_of_saves(tmp_path):
+    first, second = tmp_path / 'a.bicep', tmp_path / 'b.bicep'
+    first.write_text('param a string')
+    (tmp_path / 'notes.txt').write_text('ignored')
+    watcher = PollingWatcher([tmp_path])
+    stop = threading.Event()
+
+    def edit():
+        first.write_text('param a int')
+        time.sleep(0.1)
+        second.write_text('param b string')
+        (tmp_path / 'notes.txt').write_text('still ignored')
+
+    threading.Thread(target=edit).start()
+    batch = watcher.wait_for_batch(stop, poll_interval=0.02, debounce=0.25)
+
+    assert batch == {first.resolve(), second.resolve()}
+    assert watcher.scan() == set()
+    stop.set()
+    assert watcher.wait_for_batch(stop) == set()
+
+
+def test_newer_edit_cancels_running_what_if(tmp_path):
+    started, release = tmp_path / 'started', tmp_path / 'release'
+    # Each run records its start, then blocks until the test releases it
+    child = textwrap.dedent(f"""
+        import sys, time
+        from pathlib import Path
+        with open({str(started)!r}, 'a') as log:
+            log.write('run\\n')
+        deadline = time.time() + 30
+        while not Path({str(release)!r}).exists() and time.time() < deadline:
+            time.sleep(0.01)
+        print(sys.argv[1])
+    """)
+    reports = []
+    queue = WhatIfQueue(report=reports.append, command=lambda wrapper: [sys.executable, '-c', child, wrapper.name])
+    wrapper = FIXTURES_DIR / 'test-kv.bicep'
+
+    queue.submit(wrapper)
+    deadline = time.time() + 30
+    while not started.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    assert started.exists(), 'first what-if never started'
+    # The first run is blocked, so the newer edit must cancel it
+    queue.submit(wrapper)
+    release.touch()
+    queue.shutdown(cancel=False)
+
+    assert reports[0] == 'what-if CANCELLED test-kv.bicep (superseded)'
+    assert reports[1:] == ['what-if OK test-kv.bicep: test-kv.bicep']
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted, self.cancelled = [], []
+
+    def submit(self, wrapper):
+        self.submitted.append(wrapper.name)
+
+    def cancel(self, wrapper):
+        self.cancelled.append(wrapper.name)
+
+
+def test_validate_batch_builds_then_queues_what_if(tmp_path, monkeypatch):
+    log_file = tmp_path / 'calls.jsonl'
+    gateway = FIXTURES_DIR / 'test-gateway.bicep'
+    install_fake_az(tmp_path / 'bin', [
+        {'argv': ['bicep', 'build', '--file', str(gateway)], 'stderr': 'Error BCP057: boom\n', 'returncode': 1},
+        {'argv': ['bicep', 'build'], 'stdout': '{}'},
+    ], log_file)
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    queue, reports = RecordingQueue(), []
+
+    roots = validate_batch({MODULES_DIR / 'waf-policy.bicep'}, queue, reports.append)
+
+    assert names(roots) == ['test-gateway.bicep', 'test-waf-policy.bicep', 'main.bicep']
+    built = [json.loads(line)['argv'][3] for line in log_file.read_text().splitlines()]
+    assert sorted(built) == sorted(str(root) for root in roots)
+    assert reports[0] == 'changed: waf-policy.bicep -> test-gateway.bicep, test-waf-policy.bicep, main.bicep'
+    assert 'build FAIL test-gateway.bicep: Error BCP057: boom' in reports
+    # Only the wrapper that built gets a what-if; main.bicep is build-only
+    assert queue.submitted == ['test-waf-policy.bicep']
+    assert queue.cancelled == ['test-gateway.bicep']
+
+
+def test_unrelated_change_validates_nothing(tmp_path):
+    reports = []
+    assert validate_batch({tmp_path / 'other.bicep'}, None, reports.append) == []
+    assert reports == ['changed: other.bicep (no wrappers affected)']
@@ -0,0 +1,322 @@
+"""Tests for the wave-parallel deployment executor (fake az, no Azure needed)."""
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from tests.unit.helpers.durations import DurationDB
+from tests.unit.helpers.fake_az import install_fake_az, prepend_path
+from tests.unit.helpers.test_utils import run_what_if
+from tests.unit.helpers.wave_deploy import (
+    MAIN_BICEP,
+    ModuleSpec,
+    TemplateScope,
+    WaveDeployer,
+    arm_guid,
+    load_parameter_values,
+    parse_modules,
+    plan_waves
+)
+from tests.unit.helpers.what_if_parser import parse_what_if_output
+
+PARAMS_FILE = Path(__file__).parent.parent / 'fixtures' / 'params.dev.json'
+MAIN_TEXT = MAIN_BICEP.read_text()
+MODULE_DELAY = 0.3
+
+
+def deployment_stdout(outputs):
+    return json.dumps({
+        'name': 'deployment',
+        'properties': {
+            'provisioningState': 'Succeeded',
+            'outputs': {name: {'type': 'String', 'value': value} for name, value in outputs.items()}
+        }
+    })
+
+
+def fake_outputs():
+    """Outputs for every module.outputs reference in main.bicep."""
+    outputs = {'naming': {'names': {key: f'vd-{key}' for key in re.findall(r'naming\.outputs\.names\.(\w+)', MAIN_TEXT)}}}
+    for module, name in re.findall(r'\b(\w+)\.outputs\.(\w+)', MAIN_TEXT):
+        if module != 'naming':
+            outputs.setdefault(module, {})[name] = f'{module}-{name}'
+    return outputs
+
+
+def deploy_rules(fail=(), templates=None, delay=MODULE_DELAY):
+    """Fake az rules; templates maps module symbol to its compiled template JSON (for the ledger)."""
+    rules = [
+        {'argv': ['group', 'show'], 'stdout': json.dumps({'name': 'test-rg', 'location': 'southeastasia'})},
+        {'argv': ['account', 'show'], 'stdout': json.dumps({'id': '00000000-0000-0000-0000-000000000000',
+                                                             'user': {'name': 'ci@example.com', 'type': 'user'}})},
+        {'argv': ['ad', 'signed-in-user', 'show'], 'stdout': json.dumps({'id': 'deployer-oid', 'userPrincipalName': 'ci@example.com'})},
+    ]
+    outputs = fake_outputs()
+    for symbol, compiled in (templates or {}).items():
+        path = (MAIN_BICEP.parent / parse_modules(MAIN_TEXT)[symbol].path).resolve()
+        rules.append({'argv': ['bicep', 'build', '--file', str(path)], 'stdout': compiled})
+    rules.append({'argv': ['bicep', 'build'], 'stdout': json.dumps({'resources': []})})
+    for spec in parse_modules(MAIN_TEXT).values():
+        rule = {'argv': ['deployment', 'group', 'create', '--name', spec.deployment_name], 'delay': delay}
+        if spec.symbol in fail:
+            rule.update(stderr='ERROR: (InvalidTemplateDeployment) The template deployment failed.\n', returncode=1)
+        else:
+            rule['stdout'] = deployment_stdout(outputs.get(spec.symbol, {}))
+        rules.append(rule)
+    return rules
+
+
+@pytest.fixture
+def fake_az(tmp_path, monkeypatch):
+    """Install a fake az; returns (install(rules), deployed()) where deployed() maps deployment name to start time."""
+    log_file = tmp_path / 'calls.jsonl'
+
+    def install(rules):
+        install_fake_az(tmp_path / 'bin', rules, log_file)
+        log_file.write_text('')
+
+    def deployed():
+        calls = [json.loads(line) for line in log_file.read_text().splitlines()]
+        return {
+            call['argv'][call['argv'].index('--name') + 1]: call['time']
+            for call in calls if call['argv'][:3] == ['deployment', 'group', 'create']
+        }
+
+    monkeypatch.setenv('PATH', prepend_path(tmp_path / 'bin')['PATH'])
+    return install, deployed
+
+
+def test_load_context_as_service_principal(tmp_path, fake_az):
+    install, _ = fake_az
+    install([
+        {'argv': ['group', 'show'], 'stdout': json.dumps({'name': 'test-rg', 'location': 'southeastasia'})},
+        {'argv': ['account', 'show'], 'stdout': json.dumps({
+            'id': 'sub-id', 'user': {'name': 'app-client-id', 'type': 'servicePrincipal'}})},
+        {'argv': ['ad', 'sp', 'show', '--id', 'app-client-id'], 'stdout': json.dumps({'id': 'sp-oid'})},
+        {'argv': ['ad', 'signed-in-user', 'show'], 'stderr': 'ERROR: /me request is only valid with delegated authentication flow.',
+         'returncode': 1},
+    ])
+    deployer = WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'state.json')
+
+    assert deployer.load_context() == (True, '')
+    assert deployer.subscription_id == 'sub-id'
+    assert deployer.deployer == {'objectId': 'sp-oid', 'userPrincipalName': ''}
+    assert deployer._scope({}).resolve('deployerPrincipalType') == 'ServicePrincipal'
+
+
+def test_plan_waves_for_main_bicep():
+    modules = parse_modules(MAIN_TEXT)
+    waves = plan_waves(modules)
+
+    assert len(modules) == 19  # 18 modules plus naming
+    assert waves[0] == ['naming']
+    position = {name: i for i, wave in enumerate(waves) for name in wave}
+    for spec in modules.values():
+        assert all(position[dep] < position[spec.symbol] for dep in spec.depends_on)
+    # Implicit dependency through outputs: gateway needs publicIp and wafPolicy
+    assert {'publicIp', 'wafPolicy', 'network'} <= modules['gateway'].depends_on
+    assert modules['cognitiveServices'].deployment_name == 'cognitive-services'
+
+
+def test_plan_waves_rejects_cycles():
+    modules = {
+        'a': ModuleSpec('a', 'a.bicep', 'a', {}, {'b'}),
+        'b': ModuleSpec('b', 'b.bicep', 'b', {}, {'a'})
+    }
+    with pytest.raises(ValueError, match='cycle'):
+        plan_waves(modules)
+
+
+def test_template_scope_resolves_main_bicep_expressions():
+    outputs = fake_outputs()
+    scope = TemplateScope(
+        MAIN_TEXT, load_parameter_values(PARAMS_FILE), outputs,
+        'test-rg', 'southeastasia', 'sub-id', {'objectId': 'oid', 'userPrincipalName': ''}
+    )
+
+    assert scope.resolve('location') == 'southeastasia'
+    assert scope.resolve('wafPolicyName') == 'vd-agw-waf'
+    assert scope.resolve('network.outputs.subnetPeId') == 'network-subnetPeId'
+    assert scope.resolve('deployerPrincipalType') == 'ServicePrincipal'
+    assert scope.resolve('tags')['contactEmail'] == 'dev@example.com'
+    assert scope.resolve('vmAdminPasswordValue') == arm_guid('/subscriptions/sub-id', 'kv-kvId', 'vm-admin-password')
+    with pytest.raises(ValueError):
+        scope.resolve("empty(owner) ? 'a' : 'b'")
+
+
+# (guid() arguments, value) pairs from RFC 4122 name-based UUIDs (version 5, SHA-1, UTF-8
+# names joined with '-') in ARM's guid() namespace. test_arm_guid_matches_arm_what_if
+# checks the same construction against ARM whenever az can run a what-if.
+GUID_VECTORS = [
+    (('a',), '3703365d-5a9f-59b4-bca7-b9681389e4c1'),
+    (('/subscriptions/sub-id', 'kv-kvId', 'vm-admin-password'), '13898566-6297-5f1b-9bcb-a3970e93d3fe'),
+    (('/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/test-rg-sg', 'automation',
+      '11111111-1111-1111-1111-111111111111', 'automation-job-operator'), '0238ac7c-0091-54cc-8e46-4851b4c0ded8'),
+]
+
+
+def rfc4122_v5(namespace: str, name: str) -> str:
+    """Version 5 UUID built by hand from RFC 4122 section 4.3 (independent of the uuid module)."""
+    digest = bytearray(hashlib.sha1(bytes.fromhex(namespace.replace('-', '')) + name.encode('utf-8')).digest()[:16])
+    digest[6] = (digest[6] & 0x0F) | 0x50
+    digest[8] = (digest[8] & 0x3F) | 0x80
+    h = digest.hex()
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+
+
+def test_arm_guid_golden_vectors():
+    for values, expected in GUID_VECTORS:
+        assert arm_guid(*values) == expected
+        assert rfc4122_v5('11fb06fb-712d-4ddd-98c7-e71bbd588830', '-'.join(values)) == expected
+
+
+def test_arm_guid_matches_arm_what_if(tmp_path):
+    """ARM evaluates guid() in a resource name; the what-if resource ID carries the result."""
+    if shutil.which('az') is None:
+        pytest.skip("Azure CLI not found. Please install Azure CLI.")
+    values = GUID_VECTORS[1][0]
+    template = tmp_path / 'guid.bicep'
+    template.write_text(
+        "param location string\n"
+        "resource probe 'Microsoft.ManagedIdentity/userAssignedIdentities@2023-01-31' = {\n"
+        f"  name: guid({', '.join(repr(v) for v in values)})\n"
+        "  location: location\n"
+        "}\n"
+    )
+    success, output = run_what_if(template, result_format='ResourceIdOnly')
+    if not success:
+        pytest.skip(f"guid() what-if unavailable: {output.strip()[:200]}")
+    names = [change['resource_id'].split('/')[-1] for change in parse_what_if_output(output)['resource_changes']]
+    assert names == [arm_guid(*values)]
+
+
+def test_module_outputs_must_be_deployed_first():
+    scope = TemplateScope(MAIN_TEXT, {}, {}, 'test-rg', 'southeastasia', 'sub-id', {})
+    with pytest.raises(KeyError, match='network'):
+        scope.resolve('network.outputs.subnetPeId')
+
+
+def test_waves_deploy_concurrently(tmp_path, fake_az):
+    install, deployed = fake_az
+    install(deploy_rules())
+    deployer = WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'state.json')
+
+    result = deployer.run()
+
+    assert result.success, result.failed
+    started = deployed()
+    assert sorted(started) == sorted(spec.deployment_name for spec in deployer.modules.values())
+    for earlier, later in zip(deployer.waves, deployer.waves[1:]):
+        earlier_starts = [started[deployer.modules[m].deployment_name] for m in earlier]
+        later_starts = [started[deployer.modules[m].deployment_name] for m in later]
+        # Modules in a wave run concurrently; the next wave starts after they finish
+        assert max(earlier_starts) - min(earlier_starts) < MODULE_DELAY
+        assert min(later_starts) >= max(earlier_starts) + MODULE_DELAY
+    assert result.results['kv'].outputs == {'kvId': 'kv-kvId'}
+
+
+def test_failed_wave_resumes_without_redeploying_earlier_waves(tmp_path, fake_az):
+    install, deployed = fake_az
+    state_file = tmp_path / 'state.json'
+    install(deploy_rules(fail={'kv'}))
+
+    first = WaveDeployer('test-rg', PARAMS_FILE, state_file=state_file).run()
+    assert not first.success
+    assert first.failed == ['kv']
+    assert 'secrets' not in first.results  # later waves never started
+    state = json.loads(state_file.read_text())
+    assert state['status'] == 'failed'
+    assert 'storage' in state['completed']  # same-wave successes are kept
+
+    install(deploy_rules())
+    second = WaveDeployer('test-rg', PARAMS_FILE, state_file=state_file).run()
+    assert second.success, second.failed
+    assert sorted(deployed()) == ['kv', 'psql', 'secrets', 'vm-jumphost']
+    assert second.results['network'].resumed
+    assert json.loads(state_file.read_text())['status'] == 'succeeded'
+
+
+def test_missing_az_reports_error(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    result = WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'state.json').run()
+    assert not result.success
+    assert 'Azure CLI not found' in result.results['naming'].error
+
+
+def test_incremental_run_skips_unchanged_modules(tmp_path, fake_az):
+    install, deployed = fake_az
+    ledger_file = tmp_path / 'ledger.json'
+
+    def run():
+        return WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'state.json',
+                            incremental=True, ledger_file=ledger_file).run()
+
+    install(deploy_rules(delay=0))
+    assert run().success
+    assert len(deployed()) == 19
+
+    # Nothing changed: nothing is deployed, outputs come from the ledger
+    install(deploy_rules(delay=0))
+    result = run()
+    assert result.success and result.deployed == []
+    assert result.results['kv'].unchanged and result.results['kv'].outputs == {'kvId': 'kv-kvId'}
+    assert deployed() == {}
+
+    # Leaf module changed: only it is deployed
+    install(deploy_rules(templates={'search': json.dumps({'resources': ['changed']})}, delay=0))
+    assert run().deployed == ['search']
+    assert list(deployed()) == ['search']
+
+    # Module with dependents changed: it and everything downstream is deployed
+    install(deploy_rules(templates={'search': json.dumps({'resources': ['changed']}),
+                                    'kv': json.dumps({'resources': ['changed']})}, delay=0))
+    assert sorted(run().deployed) == ['kv', 'psql', 'secrets', 'vmJumphost']
+
+
+def test_incremental_run_redeploys_on_param_change(tmp_path, fake_az):
+    install, deployed = fake_az
+    ledger_file = tmp_path / 'ledger.json'
+    params = json.loads(PARAMS_FILE.read_text())
+    params_file = tmp_path / 'params.json'
+    params_file.write_text(json.dumps(params))
+
+    def run():
+        return WaveDeployer('test-rg', params_file, state_file=tmp_path / 'state.json',
+                            incremental=True, ledger_file=ledger_file).run()
+
+    install(deploy_rules(delay=0))
+    assert run().success
+
+    params['parameters']['aiServicesTier'] = {'value': 'standard'}
+    params_file.write_text(json.dumps(params))
+    install(deploy_rules(delay=0))
+    assert run().deployed == ['search']
+
+
+def test_wave_deployer_dispatches_longest_first_and_records(tmp_path, fake_az, capsys):
+    install, deployed = fake_az
+    install(deploy_rules(delay=0))
+    db = DurationDB(tmp_path / 'durations.json')
+    probe = WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'probe.json', location='southeastasia')
+    wave = max(probe.waves, key=len)
+    for rank, module in enumerate(sorted(wave)):
+        db.record('deploy', probe.modules[module].deployment_name, 'southeastasia', 10 + rank)
+
+    result = WaveDeployer('test-rg', PARAMS_FILE, state_file=tmp_path / 'state.json', max_workers=1,
+                          location='southeastasia', durations=db).run()
+
+    assert result.success, result.failed
+    assert 'Predicted deployment completion:' in capsys.readouterr().out
+    started = deployed()
+    names = [probe.modules[m].deployment_name for m in wave]
+    assert sorted(names, key=started.get) == [probe.modules[m].deployment_name for m in sorted(wave, reverse=True)]
+    history = json.loads((tmp_path / 'durations.json').read_text())['deploy']['southeastasia']
+    assert len(history) == len(probe.modules)
+    assert all(len(history[probe.modules[m].deployment_name]) == 2 for m in wave)
@@ -0,0 +1,95 @@
+"""Tests for columnar what-if drift analytics (no Azure CLI needed)."""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+from tests.unit.helpers.what_if_analytics import WhatIfCorpus, load_corpus
+from tests.unit.helpers.what_if_parser import flatten_delta
+
+RG_ID = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/test-rg/providers'
+
+
+def _what_if(location, default_action_changes=True):
+    """Build a minimal what-if payload with one storage account and one vnet."""
+    storage_delta = []
+    if default_action_changes:
+        storage_delta = [{
+            'path': 'properties',
+            'propertyChangeType': 'Modify',
+            'children': [{
+                'path': 'networkAcls',
+                'propertyChangeType': 'Modify',
+                'children': [
+                    {'path': 'defaultAction', 'propertyChangeType': 'Modify', 'before': 'Allow', 'after': 'Deny'}
+                ]
+            }]
+        }]
+    return json.dumps({
+        'status': 'Succeeded',
+        'changes': [
+            {
+                'resourceId': f'{RG_ID}/Microsoft.Storage/storageAccounts/vdstabc12345',
+                'changeType': 'Modify' if default_action_changes else 'NoChange',
+                'after': {'location': location},
+                'delta': storage_delta
+            },
+            {
+                'resourceId': f'{RG_ID}/Microsoft.Network/virtualNetworks/vd-vnet-x',
+                'changeType': 'Create',
+                'after': {'location': location}
+            }
+        ]
+    })
+
+
+def test_flatten_delta_returns_leaf_paths():
+    parsed = json.loads(_what_if('eastus'))
+    leaves = flatten_delta(parsed['changes'][0]['delta'])
+    assert leaves == [{
+        'path': 'properties.networkAcls.defaultAction',
+        'change_type': 'Modify',
+        'before': 'Allow',
+        'after': 'Deny'
+    }]
+
+
+def test_change_type_counts_grouped_by_type_and_region():
+    corpus = WhatIfCorpus()
+    corpus.add_result(_what_if('eastus'), source='a')
+    corpus.add_result(_what_if('East US', default_action_changes=False), source='b')
+    corpus.add_result(_what_if('southeastasia'), source='c')
+
+    counts = corpus.change_type_counts(by=('resource_type', 'region'))
+    assert counts[('Microsoft.Storage/storageAccounts', 'eastus')]['Modify'] == 1
+    assert counts[('Microsoft.Storage/storageAccounts', 'eastus')]['NoChange'] == 1
+    assert counts[('Microsoft.Network/virtualNetworks', 'southeastasia')]['Create'] == 1
+    assert corpus.change_type_counts()[()]['Create'] == 3
+
+
+def test_top_drift_paths():
+    corpus = WhatIfCorpus()
+    for i in range(3):
+        corpus.add_result(_what_if('eastus', default_action_changes=i != 0))
+
+    assert corpus.top_drift_paths(n=1) == [((), 'properties.networkAcls.defaultAction', 2)]
+    by_type = corpus.top_drift_paths(by=('resource_type',))
+    assert by_type == [(('Microsoft.Storage/storageAccounts',), 'properties.networkAcls.defaultAction', 2)]
+    assert corpus.top_drift_paths(change_types=['Delete']) == []
+
+
+def test_unknown_group_column_rejected():
+    with pytest.raises(ValueError):
+        WhatIfCorpus().change_type_counts(by=('tenant',))
+
+
+def test_load_corpus_skips_invalid_files(tmp_path):
+    (tmp_path / 'good.json').write_text(_what_if('eastus'))
+    (tmp_path / 'bad.json').write_text('WARNING: not json')
+    corpus = load_corpus(sorted(tmp_path.glob('*.json')))
+    assert corpus.results_loaded == 1
+    assert len(corpus) == 2
+    assert corpus.values('source') == ['good.json']